@@ -1,17 +1,16 @@
 import os
-import json
-import boto3
 import hmac
 import hashlib
 import base64
 from typing import Dict, Any
-from botocore.exceptions import ClientError
 from aws_lambda_powertools import Logger
 from utils.http import success_response, error_response, parse_body
-from utils.models import UserCreate, UserLogin
+from utils.models import UserCreate, UserLogin, TokenRefresh
+from utils.metrics import HandlerMetrics, phase
 
-# Configure logger
+# Configure logger and phase metrics
 logger = Logger(service="auth-service")
+metrics = HandlerMetrics(service="auth-service")
 
 # Get Cognito configuration
 USER_POOL_ID = os.environ.get("COGNITO_USER_POOL_ID")
@@ -19,8 +18,42 @@ CLIENT_ID = os.environ.get("COGNITO_CLIENT_ID")
 CLIENT_SECRET = os.environ.get("COGNITO_CLIENT_SECRET", "")
 REGION = os.environ.get("REGION", "us-east-1")
 
-# Cognito client
-cognito = boto3.client('cognito-idp', region_name=REGION)
+# Cognito HTTP client tuning: connections kept alive and reused across
+# invocations, short timeouts and adaptive (client-side rate limited) retries
+COGNITO_MAX_POOL_CONNECTIONS = int(os.environ.get("COGNITO_MAX_POOL_CONNECTIONS", "10"))
+COGNITO_CONNECT_TIMEOUT = float(os.environ.get("COGNITO_CONNECT_TIMEOUT", "2"))
+COGNITO_READ_TIMEOUT = float(os.environ.get("COGNITO_READ_TIMEOUT", "5"))
+COGNITO_MAX_ATTEMPTS = int(os.environ.get("COGNITO_MAX_ATTEMPTS", "3"))
+
+# Cognito client, created on first use so importing this module does not load boto3
+_cognito = None
+
+
+def get_cognito_client() -> Any:
+    """
+    Gets the Cognito client (Singleton pattern).
+    """
+    global _cognito
+    if _cognito is None:
+        import boto3
+        from botocore.config import Config
+        _cognito = boto3.client('cognito-idp', region_name=REGION, config=Config(
+            max_pool_connections=COGNITO_MAX_POOL_CONNECTIONS,
+            tcp_keepalive=True,
+            connect_timeout=COGNITO_CONNECT_TIMEOUT,
+            read_timeout=COGNITO_READ_TIMEOUT,
+            retries={"mode": "adaptive", "max_attempts": COGNITO_MAX_ATTEMPTS}
+        ))
+    return _cognito
+
+
+def _client_error() -> type:
+    """
+    Returns botocore's ClientError. Only evaluated once a Cognito call failed,
+    at which point botocore is already loaded.
+    """
+    from botocore.exceptions import ClientError
+    return ClientError
 
 
 def get_secret_hash(username: str) -> str:
@@ -43,6 +76,7 @@ def get_secret_hash(username: str) -> str:
 
 
 @logger.inject_lambda_context
+@metrics.measure
 def register(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """
     Registers a new user in Cognito.
@@ -59,7 +93,8 @@ def register(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         body = parse_body(event)
         
         # Validate data with Pydantic
-        user_data = UserCreate(**body)
+        with phase("validation"):
+            user_data = UserCreate(**body)
         
         # Registration parameters
         sign_up_params = {
@@ -80,13 +115,16 @@ def register(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         }
         
         # Register user in Cognito
-        response = cognito.sign_up(**sign_up_params)
+        cognito = get_cognito_client()
+        with phase("cognito.sign_up"):
+            response = cognito.sign_up(**sign_up_params)
         
         # Auto-confirm the user
-        cognito.admin_confirm_sign_up(
-            UserPoolId=USER_POOL_ID,
-            Username=user_data.email
-        )
+        with phase("cognito.admin_confirm_sign_up"):
+            cognito.admin_confirm_sign_up(
+                UserPoolId=USER_POOL_ID,
+                Username=user_data.email
+            )
         
         return success_response({
             "message": "User registered successfully",
@@ -98,7 +136,7 @@ def register(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         logger.error(f"Validation error: {str(e)}")
         return error_response(str(e), 422, "validation_error")
         
-    except ClientError as e:
+    except _client_error() as e:
         # Cognito error
         error_code = e.response['Error']['Code']
         error_message = e.response['Error']['Message']
@@ -119,6 +157,7 @@ def register(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
 
 
 @logger.inject_lambda_context
+@metrics.measure
 def login(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """
     Authenticates a user with Cognito.
@@ -135,19 +174,21 @@ def login(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         body = parse_body(event)
         
         # Validate data with Pydantic
-        user_data = UserLogin(**body)
+        with phase("validation"):
+            user_data = UserLogin(**body)
         
         # Initiate authentication in Cognito
-        response = cognito.admin_initiate_auth(
-            UserPoolId=USER_POOL_ID,
-            ClientId=CLIENT_ID,
-            AuthFlow='ADMIN_USER_PASSWORD_AUTH',
-            AuthParameters={
-                'USERNAME': user_data.email,
-                'PASSWORD': user_data.password,
-                'SECRET_HASH': get_secret_hash(user_data.email)
-            }
-        )
+        with phase("cognito.admin_initiate_auth"):
+            response = get_cognito_client().admin_initiate_auth(
+                UserPoolId=USER_POOL_ID,
+                ClientId=CLIENT_ID,
+                AuthFlow='ADMIN_USER_PASSWORD_AUTH',
+                AuthParameters={
+                    'USERNAME': user_data.email,
+                    'PASSWORD': user_data.password,
+                    'SECRET_HASH': get_secret_hash(user_data.email)
+                }
+            )
         
         # Extract authentication tokens
         auth_result = response['AuthenticationResult']
@@ -164,7 +205,7 @@ def login(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         logger.error(f"Validation error: {str(e)}")
         return error_response(str(e), 422, "validation_error")
         
-    except ClientError as e:
+    except _client_error() as e:
         # Cognito error
         error_code = e.response['Error']['Code']
         error_message = e.response['Error']['Message']
@@ -181,4 +222,74 @@ def login(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     except Exception as e:
         # General error
         logger.exception("Unexpected error during login")
-        return error_response("Unexpected error during login", 500, "server_error") 
\ No newline at end of file
+        return error_response("Unexpected error during login", 500, "server_error") 
+
+
+@logger.inject_lambda_context
+@metrics.measure
+def refresh(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Issues new id and access tokens from a refresh token, without asking
+    the user for the password again.
+    
+    Args:
+        event: API Gateway event
+        context: Lambda context
+        
+    Returns:
+        HTTP response with authentication tokens
+    """
+    try:
+        # Parse body
+        body = parse_body(event)
+        
+        # Validate data with Pydantic
+        with phase("validation"):
+            token_data = TokenRefresh(**body)
+        
+        # Renew the tokens in Cognito
+        with phase("cognito.admin_initiate_auth"):
+            response = get_cognito_client().admin_initiate_auth(
+                UserPoolId=USER_POOL_ID,
+                ClientId=CLIENT_ID,
+                AuthFlow='REFRESH_TOKEN_AUTH',
+                AuthParameters={
+                    'REFRESH_TOKEN': token_data.refresh_token,
+                    'SECRET_HASH': get_secret_hash(token_data.email)
+                }
+            )
+        
+        # Extract authentication tokens. Cognito only returns a refresh token
+        # when refresh token rotation is enabled.
+        auth_result = response['AuthenticationResult']
+        
+        return success_response({
+            "id_token": auth_result['IdToken'],
+            "access_token": auth_result['AccessToken'],
+            "refresh_token": auth_result.get('RefreshToken', token_data.refresh_token),
+            "expires_in": auth_result['ExpiresIn']
+        })
+        
+    except ValueError as e:
+        # Data validation error
+        logger.error(f"Validation error: {str(e)}")
+        return error_response(str(e), 422, "validation_error")
+        
+    except _client_error() as e:
+        # Cognito error
+        error_code = e.response['Error']['Code']
+        error_message = e.response['Error']['Message']
+        
+        logger.error(f"Cognito refresh error: {error_code} - {error_message}")
+        
+        if error_code == "NotAuthorizedException":
+            return error_response("Invalid or expired refresh token", 401, "invalid_refresh_token")
+        elif error_code == "UserNotFoundException":
+            return error_response("User does not exist", 404, "user_not_found")
+        else:
+            return error_response(f"Token refresh error: {error_message}", 400, error_code)
+            
+    except Exception as e:
+        # General error
+        logger.exception("Unexpected error during token refresh")
+        return error_response("Unexpected error during token refresh", 500, "server_error")
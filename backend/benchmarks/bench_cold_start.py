@@ -0,0 +1,244 @@
+"""
+Measures the cold start of every Lambda handler in a fresh interpreter:
+
+    import_ms:            time to import the handler module (Lambda init phase)
+    first_invocation_ms:  latency of the first call, with MongoDB and Cognito stubbed
+    modules:              heavy dependencies loaded by the import
+
+Results are compared against cold_start_budget.json; tests/test_cold_start.py
+fails when a handler exceeds its budget or imports a forbidden dependency.
+
+Usage:
+    python -m benchmarks.bench_cold_start [--repeat 5] [handler ...]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+from typing import Any, Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cold_start_budget.json")
+
+# serverless.yml function name -> (module, function)
+HANDLERS = {
+    "register": ("auth.handler", "register"),
+    "login": ("auth.handler", "login"),
+    "refresh": ("auth.handler", "refresh"),
+    "health": ("health.handler", "health"),
+    "getTasks": ("tasks.handler", "get_tasks"),
+    "getTaskStats": ("tasks.handler", "get_task_stats"),
+    "getTaskOverview": ("tasks.handler", "get_task_overview"),
+    "searchTasks": ("tasks.handler", "search_tasks"),
+    "getTaskChanges": ("tasks.handler", "get_task_changes"),
+    "getTask": ("tasks.handler", "get_task"),
+    "createTask": ("tasks.handler", "create_task"),
+    "batchTasks": ("tasks.handler", "batch_tasks"),
+    "updateTask": ("tasks.handler", "update_task"),
+    "deleteTask": ("tasks.handler", "delete_task"),
+}
+
+# Dependencies whose import cost we track
+HEAVY_MODULES = ["boto3", "botocore.client", "pymongo", "bson", "pydantic", "email_validator", "orjson"]
+
+ENVIRONMENT = {
+    "MONGODB_URI": "mongodb://localhost:27017/benchmark",
+    "MONGODB_DB_NAME": "benchmark",
+    "COGNITO_USER_POOL_ID": "us-east-1_benchmark",
+    "COGNITO_CLIENT_ID": "benchmark-client-id",
+    "COGNITO_CLIENT_SECRET": "benchmark-secret",
+    "REGION": "us-east-1",
+    "AWS_ACCESS_KEY_ID": "benchmark",
+    "AWS_SECRET_ACCESS_KEY": "benchmark",
+    "POWERTOOLS_LOG_LEVEL": "WARNING",
+}
+
+# Runs inside the fresh interpreter. Nothing is imported before the timed
+# import except the standard library modules needed to measure it.
+CHILD_SCRIPT = r"""
+import importlib, json, sys, time
+module_name, function_name, heavy = sys.argv[1], sys.argv[2], json.loads(sys.argv[3])
+
+start = time.perf_counter()
+module = importlib.import_module(module_name)
+import_ms = (time.perf_counter() - start) * 1000
+loaded = [name for name in heavy if name in sys.modules]
+
+from benchmarks.bench_cold_start import sample_event, stub_backends, LambdaContext
+handler = getattr(module, function_name)
+event = sample_event(function_name)
+with stub_backends():
+    start = time.perf_counter()
+    response = handler(event, LambdaContext())
+    first_invocation_ms = (time.perf_counter() - start) * 1000
+
+print(json.dumps({
+    "import_ms": import_ms,
+    "first_invocation_ms": first_invocation_ms,
+    "status_code": response["statusCode"],
+    "modules": loaded
+}))
+"""
+
+
+class LambdaContext:
+    function_name = "cold-start-benchmark"
+    memory_limit_in_mb = 1024
+    invoked_function_arn = "arn:aws:lambda:us-east-1:123456789012:function:cold-start-benchmark"
+    aws_request_id = "cold-start-benchmark"
+
+
+SAMPLE_TASK = {
+    "id": "task-1",
+    "title": "Benchmark task",
+    "description": "Task used by the cold start benchmark",
+    "status": "to_do",
+    "user_id": "benchmark-user",
+    "created_at": "2024-01-01T00:00:00",
+    "updated_at": None,
+    "version": 1,
+    "seq": 1,
+    "changed_at": datetime(2024, 1, 1),
+}
+
+
+def sample_event(function_name: str) -> Dict[str, Any]:
+    """
+    Builds a realistic API Gateway event for a handler.
+    """
+    event = {
+        "headers": {"Accept-Encoding": "gzip"},
+        "requestContext": {"authorizer": {"claims": {
+            "sub": "benchmark-user", "email": "bench@example.com", "name": "Bench"
+        }}},
+        "pathParameters": {"taskId": "task-1"},
+        "queryStringParameters": None,
+        "body": None,
+    }
+    bodies = {
+        "register": {"email": "bench@example.com", "password": "Password123#", "name": "Bench"},
+        "login": {"email": "bench@example.com", "password": "Password123#"},
+        "refresh": {"email": "bench@example.com", "refresh_token": "refresh"},
+        "create_task": {"title": "New task", "description": "Created by the benchmark"},
+        "update_task": {"status": "completed"},
+        "batch_tasks": {"operations": [
+            {"op": "create", "data": {"title": "Batch task", "description": "Created in a batch"}},
+            {"op": "update", "id": "task-1", "data": {"status": "in_progress"}},
+        ]},
+    }
+    if function_name in bodies:
+        event["body"] = json.dumps(bodies[function_name])
+    return event
+
+
+def stub_backends():
+    """
+    Replaces the MongoDB client and the Cognito client with in-process stubs.
+    """
+    from contextlib import ExitStack
+    from unittest.mock import MagicMock, patch
+
+    collection = MagicMock()
+    collection.find.return_value.sort.return_value.limit.return_value = iter([dict(SAMPLE_TASK)])
+    collection.find.return_value.__iter__.side_effect = lambda: iter([dict(SAMPLE_TASK)])
+    collection.find_one.side_effect = lambda *args, **kwargs: dict(SAMPLE_TASK)
+    # Also answers the sequence allocations of the task_stats collection
+    collection.find_one_and_update.side_effect = lambda *args, **kwargs: {**SAMPLE_TASK, "sequence": 1}
+    collection.find_one_and_delete.side_effect = lambda *args, **kwargs: dict(SAMPLE_TASK)
+    collection.list_indexes.return_value = []
+    collection.aggregate.return_value = []
+    # The batch body updates one task
+    collection.bulk_write.return_value = MagicMock(matched_count=1, deleted_count=0)
+    client = MagicMock()
+    client.__getitem__.return_value.__getitem__.return_value = collection
+
+    cognito = MagicMock()
+    cognito.sign_up.return_value = {"UserSub": "benchmark-user"}
+    cognito.admin_initiate_auth.return_value = {"AuthenticationResult": {
+        "IdToken": "id", "AccessToken": "access", "RefreshToken": "refresh", "ExpiresIn": 3600
+    }}
+
+    stack = ExitStack()
+    stack.enter_context(patch("utils.db.get_mongodb_client", return_value=client))
+    if "auth.handler" in sys.modules:
+        stack.enter_context(patch("auth.handler.get_cognito_client", return_value=cognito))
+    return stack
+
+
+def run_handler(name: str) -> Dict[str, Any]:
+    """
+    Measures one handler in a fresh interpreter.
+    """
+    module_name, function_name = HANDLERS[name]
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD_SCRIPT, module_name, function_name, json.dumps(HEAVY_MODULES)],
+        cwd=BACKEND_DIR,
+        env={**os.environ, **ENVIRONMENT, "PYTHONPATH": BACKEND_DIR},
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def measure(name: str, repeat: int) -> Dict[str, Any]:
+    """
+    Runs a handler `repeat` times and keeps the median timings.
+    """
+    runs = [run_handler(name) for _ in range(repeat)]
+    return {
+        "import_ms": statistics.median(run["import_ms"] for run in runs),
+        "first_invocation_ms": statistics.median(run["first_invocation_ms"] for run in runs),
+        "status_code": runs[-1]["status_code"],
+        "modules": runs[-1]["modules"],
+    }
+
+
+def load_budget() -> Dict[str, Any]:
+    with open(BUDGET_FILE) as budget_file:
+        return json.load(budget_file)
+
+
+def check_budget(name: str, result: Dict[str, Any], budget: Dict[str, Any]) -> List[str]:
+    """
+    Returns the budget violations of a handler measurement.
+    """
+    module_name = HANDLERS[name][0]
+    violations = []
+    for metric in ("import_ms", "first_invocation_ms"):
+        limit = budget[metric].get(name, budget[metric]["default"])
+        if result[metric] > limit:
+            violations.append(f"{name}: {metric} {result[metric]:.1f} > {limit}")
+    for module in budget["forbidden_modules"].get(module_name, []):
+        if module in result["modules"]:
+            violations.append(f"{name}: importing {module_name} loads {module}")
+    return violations
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("handlers", nargs="*", default=list(HANDLERS))
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    budget = load_budget()
+    violations = []
+    print(f"{'handler':<14} {'import ms':>10} {'first call ms':>14} {'status':>7}  heavy modules")
+    for name in args.handlers:
+        result = measure(name, args.repeat)
+        violations += check_budget(name, result, budget)
+        print(
+            f"{name:<14} {result['import_ms']:>10.1f} {result['first_invocation_ms']:>14.1f}"
+            f" {result['status_code']:>7}  {', '.join(result['modules'])}"
+        )
+
+    for violation in violations:
+        print(f"BUDGET EXCEEDED {violation}")
+    return 1 if violations else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
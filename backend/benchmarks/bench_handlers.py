@@ -0,0 +1,615 @@
+"""
+Measures every tasks and auth handler end to end with realistic API Gateway
+events, for several dataset sizes (tasks of the benchmark user):
+
+    p50_ms, p99_ms:  latency of warm invocations
+    alloc_kib:       memory allocated per invocation (median tracemalloc peak)
+    round_trips:     MongoDB commands per invocation (mean)
+    errors:          invocations that did not answer 2xx
+
+MongoDB is either the in-memory stand-in of benchmarks/fake_mongo.py (the
+default) or a local mongod (--mongodb-uri). In both cases the scratch
+database `bench_handlers` is dropped and seeded again for every size.
+Cognito is always stubbed.
+
+Every run is saved as JSON. --baseline compares the run with a previous one
+and exits with 1 when a handler's p50 latency or allocations grew by more
+than the tolerance, or it makes more round trips.
+
+Usage:
+    python -m benchmarks.bench_handlers [--sizes 100 10000 1000000] [--iterations 200]
+        [--mongodb-uri mongodb://localhost:27017] [--output FILE] [--baseline FILE] [handler ...]
+
+With the in-memory stand-in, 1M tasks need about 2 GB of memory.
+"""
+import argparse
+import base64
+import gzip
+import importlib
+import itertools
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from contextlib import ExitStack, contextmanager, nullcontext
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from unittest.mock import patch
+
+from pymongo import MongoClient, monitoring
+
+from benchmarks.bench_cold_start import ENVIRONMENT, HANDLERS, LambdaContext
+from benchmarks.fake_mongo import FakeMongoClient
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# Scratch database, dropped before every dataset size
+DATABASE = "bench_handlers"
+
+# Read handlers also benchmarked with the in-process read cache, as
+# "<name>:cached" cases that repeat one request. Every other case runs with
+# the cache disabled, so it measures the query path.
+CACHED_SUFFIX = ":cached"
+CACHED_READS = ("getTasks", "getTask", "searchTasks")
+
+# Handlers in run order: reads before writes, and deleteTask last so it
+# deletes the tasks created by createTask and batchTasks
+BENCHMARKED = [
+    case for name in HANDLERS if name != "health"
+    for case in ([name, name + CACHED_SUFFIX] if name in CACHED_READS else [name])
+]
+
+# Invocations before the measured ones, and invocations traced for allocations
+WARMUP = 5
+ALLOC_SAMPLES = 20
+
+# Tasks written per insert_many while seeding
+SEED_CHUNK = 100_000
+
+USER_ID = "3f2b6c1e-7a4d-4e8b-9c0f-1a2b3c4d5e6f"
+EMAIL = "bench@example.com"
+PASSWORD = "Password123#"
+
+# Cognito tokens are about 1 KB
+ID_TOKEN = "eyJraWQiOiJiZW5jaG1hcmsiLCJhbGciOiJSUzI1NiJ9." + "A" * 900 + ".c2lnbmF0dXJl"
+REFRESH_TOKEN = "eyJjdHkiOiJKV1QiLCJlbmMiOiJBMjU2R0NNIn0." + "B" * 1600
+USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Safari/605.1.15"
+
+VERBS = ("Review", "Prepare", "Update", "Schedule", "Fix", "Write", "Plan", "Call", "Send", "Archive")
+SUBJECTS = (
+    "quarterly report", "budget", "release notes", "team meeting", "invoice",
+    "onboarding guide", "database backup", "customer email", "roadmap", "expense sheet",
+)
+DESCRIPTIONS = (
+    "Check the numbers with finance before Friday and share the summary with the team.",
+    "Follow up on the open questions from the last meeting.",
+    "Draft a first version, then ask for feedback in the weekly sync.",
+    "Low priority, only if there is time left this sprint.",
+    "Blocked until the vendor answers the support ticket about the invoice.",
+)
+STATUSES = ("to_do", "in_progress", "completed")
+SEARCH_TERMS = ("report", "budget meeting", '"release notes"', "invoice -customer", "roadmap")
+
+# A client syncing is at most this many changes behind
+SYNC_LAG = 500
+
+
+class StubCognito:
+    """
+    Answers the Cognito calls of auth/handler.py without a network call.
+    """
+
+    def sign_up(self, **kwargs: Any) -> Dict[str, Any]:
+        return {"UserConfirmed": False, "UserSub": str(uuid.uuid4())}
+
+    def admin_confirm_sign_up(self, **kwargs: Any) -> Dict[str, Any]:
+        return {}
+
+    def admin_initiate_auth(self, **kwargs: Any) -> Dict[str, Any]:
+        return {"ChallengeParameters": {}, "AuthenticationResult": {
+            "AccessToken": ID_TOKEN, "ExpiresIn": 3600, "TokenType": "Bearer",
+            "RefreshToken": REFRESH_TOKEN, "IdToken": ID_TOKEN
+        }}
+
+
+class CommandCounter(monitoring.CommandListener):
+    """
+    Counts the commands a pymongo client sends.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def started(self, event: Any) -> None:
+        with self._lock:
+            self.count += 1
+
+    def succeeded(self, event: Any) -> None:
+        pass
+
+    def failed(self, event: Any) -> None:
+        pass
+
+
+def api_event(
+    method: str,
+    resource: str,
+    path: str,
+    path_parameters: Optional[Dict[str, str]] = None,
+    query: Optional[Dict[str, str]] = None,
+    body: Optional[Dict[str, Any]] = None,
+    authorized: bool = True,
+    user_id: str = USER_ID
+) -> Dict[str, Any]:
+    """
+    Builds an API Gateway (REST, Lambda proxy) event as the deployed API sends it.
+    """
+    headers = {
+        "Accept": "application/json",
+        "Accept-Encoding": "gzip, deflate, br",
+        "Content-Type": "application/json",
+        "Host": "abc123.execute-api.us-east-1.amazonaws.com",
+        "Origin": "http://localhost:3000",
+        "User-Agent": USER_AGENT,
+        "X-Forwarded-For": "203.0.113.10",
+    }
+    request_context: Dict[str, Any] = {
+        "resourcePath": resource,
+        "httpMethod": method,
+        "path": f"/dev{path}",
+        "stage": "dev",
+        "requestId": str(uuid.uuid4()),
+        "requestTimeEpoch": int(time.time() * 1000),
+        "identity": {"sourceIp": "203.0.113.10", "userAgent": USER_AGENT},
+    }
+    if authorized:
+        headers["Authorization"] = ID_TOKEN
+        request_context["authorizer"] = {"claims": {
+            "sub": user_id, "email": EMAIL, "name": "Bench User", "email_verified": "true", "token_use": "id"
+        }}
+    return {
+        "resource": resource,
+        "path": path,
+        "httpMethod": method,
+        "headers": headers,
+        "multiValueHeaders": {name: [value] for name, value in headers.items()},
+        "queryStringParameters": query,
+        "multiValueQueryStringParameters": {name: [value] for name, value in query.items()} if query else None,
+        "pathParameters": path_parameters,
+        "stageVariables": None,
+        "requestContext": request_context,
+        "body": json.dumps(body) if body is not None else None,
+        "isBase64Encoded": False,
+    }
+
+
+def response_json(response: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Decodes a handler response body, compressed or not.
+    """
+    body = response.get("body") or ""
+    if response.get("isBase64Encoded"):
+        body = decompress(base64.b64decode(body), (response.get("headers") or {}).get("Content-Encoding"))
+    return json.loads(body) if body else {}
+
+
+def decompress(raw: bytes, encoding: Optional[str]) -> bytes:
+    """
+    Undoes the Content-Encoding chosen by utils.http.negotiate_compression.
+    """
+    if encoding == "gzip":
+        return gzip.decompress(raw)
+    if encoding == "br":
+        import brotli
+        return brotli.decompress(raw)
+    return raw
+
+
+def new_task(rng: random.Random) -> Dict[str, str]:
+    return {
+        "title": f"{rng.choice(VERBS)} {rng.choice(SUBJECTS)}",
+        "description": rng.choice(DESCRIPTIONS),
+        "status": rng.choice(STATUSES),
+    }
+
+
+def seed(
+    database: Any,
+    size: int,
+    rng: random.Random,
+    user_id: str = USER_ID,
+    indexes: bool = True
+) -> List[str]:
+    """
+    Writes `size` tasks of a user, shaped like the ones the handlers write,
+    with their counters and, unless `indexes` is False, the declared indexes.
+
+    Returns:
+        The ids of the tasks
+    """
+    from tasks.records import TaskRecord
+
+    start = datetime(2022, 1, 1)
+    counts: Counter = Counter()
+    task_ids = []
+    for chunk_start in range(0, size, SEED_CHUNK):
+        documents = []
+        for number in range(chunk_start, min(size, chunk_start + SEED_CHUNK)):
+            created_at = start + timedelta(minutes=number)
+            payload = new_task(rng)
+            record = TaskRecord(
+                str(uuid.UUID(int=rng.getrandbits(128), version=4)), payload["title"], payload["description"],
+                payload["status"], user_id, created_at
+            )
+            document = record.to_document()
+            # Half of the tasks have been updated at least once
+            if rng.random() < 0.5:
+                document["updated_at"] = created_at + timedelta(hours=rng.randrange(1, 500))
+                document["version"] = 2
+            document["seq"] = number + 1
+            document["changed_at"] = document["updated_at"] or created_at
+            documents.append(document)
+            task_ids.append(record.id)
+            counts[record.status] += 1
+        if documents:
+            database["tasks"].insert_many(documents, ordered=False)
+
+    database["task_stats"].insert_one({
+        "_id": user_id, "counts": dict(counts), "total": size, "version": 1, "sequence": size
+    })
+    # Indexes are built after the load, as for a restored backup
+    if indexes:
+        create_indexes(database)
+    return task_ids
+
+
+def create_indexes(database: Any) -> None:
+    """
+    Creates the indexes declared in utils/db.py.
+    """
+    from utils.db import COLLECTION_INDEXES
+    for collection, indexes in COLLECTION_INDEXES.items():
+        database[collection].create_indexes(indexes)
+
+
+class Workload:
+    """
+    Builds the events of each handler over a seeded dataset, and follows the
+    responses like a client does: listings walk through their pages and the
+    tasks created are the ones deleted later.
+    """
+
+    def __init__(self, task_ids: List[str], rng: random.Random):
+        self.task_ids = task_ids
+        self.rng = rng
+        self.created: List[str] = []
+        self.list_cursor: Optional[str] = None
+        self.searches = itertools.cycle(SEARCH_TERMS)
+        self.registrations = itertools.count()
+        self.builders: Dict[str, Callable[[], Dict[str, Any]]] = {
+            "register": self._register,
+            "login": self._login,
+            "refresh": self._refresh,
+            "getTasks": self._get_tasks,
+            "getTaskStats": lambda: api_event("GET", "/tasks/stats", "/tasks/stats"),
+            "getTaskOverview": lambda: api_event("GET", "/tasks/overview", "/tasks/overview", query={"limit": "50"}),
+            "searchTasks": self._search_tasks,
+            "getTaskChanges": self._get_task_changes,
+            "getTask": lambda: self._task_event("GET", self.rng.choice(self.task_ids)),
+            "createTask": lambda: api_event("POST", "/tasks", "/tasks", body=new_task(self.rng)),
+            "batchTasks": self._batch_tasks,
+            "updateTask": lambda: self._task_event("PUT", self.rng.choice(self.task_ids), {
+                "status": self.rng.choice(STATUSES), "title": new_task(self.rng)["title"]
+            }),
+            "deleteTask": self._delete_task,
+            # The same request every time, so every measured call is a cache hit
+            "getTasks:cached": lambda: api_event("GET", "/tasks", "/tasks", query={"limit": "50"}),
+            "getTask:cached": lambda: self._task_event("GET", self.task_ids[0]),
+            "searchTasks:cached": lambda: api_event(
+                "GET", "/tasks/search", "/tasks/search", query={"q": SEARCH_TERMS[0], "limit": "20"}
+            ),
+        }
+
+    def event(self, name: str) -> Dict[str, Any]:
+        return self.builders[name]()
+
+    def observe(self, name: str, response: Dict[str, Any]) -> None:
+        if not 200 <= response["statusCode"] < 300:
+            return
+        if name == "getTasks":
+            self.list_cursor = response_json(response).get("next_cursor")
+        elif name == "createTask":
+            self.created.append(response_json(response)["id"])
+        elif name == "batchTasks":
+            self.created += [
+                result["task"]["id"] for result in response_json(response)["results"] if result["status"] == 201
+            ]
+
+    def _register(self) -> Dict[str, Any]:
+        email = f"bench+{next(self.registrations)}@example.com"
+        return api_event("POST", "/auth/register", "/auth/register", authorized=False, body={
+            "email": email, "password": PASSWORD, "name": "Bench User"
+        })
+
+    def _login(self) -> Dict[str, Any]:
+        return api_event("POST", "/auth/login", "/auth/login", authorized=False, body={
+            "email": EMAIL, "password": PASSWORD
+        })
+
+    def _refresh(self) -> Dict[str, Any]:
+        return api_event("POST", "/auth/refresh", "/auth/refresh", authorized=False, body={
+            "email": EMAIL, "refresh_token": REFRESH_TOKEN
+        })
+
+    def _get_tasks(self) -> Dict[str, Any]:
+        query = {"limit": "50"}
+        if self.list_cursor:
+            query["cursor"] = self.list_cursor
+        return api_event("GET", "/tasks", "/tasks", query=query)
+
+    def _search_tasks(self) -> Dict[str, Any]:
+        return api_event("GET", "/tasks/search", "/tasks/search", query={"q": next(self.searches), "limit": "20"})
+
+    def _get_task_changes(self) -> Dict[str, Any]:
+        from utils.pagination import encode_sync_token
+        since = max(0, len(self.task_ids) - self.rng.randrange(SYNC_LAG))
+        return api_event("GET", "/tasks/changes", "/tasks/changes", query={
+            "since": encode_sync_token(since, time.time())
+        })
+
+    def _task_event(self, method: str, task_id: str, body: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return api_event(method, "/tasks/{taskId}", f"/tasks/{task_id}", {"taskId": task_id}, body=body)
+
+    def _batch_tasks(self) -> Dict[str, Any]:
+        return api_event("POST", "/tasks/batch", "/tasks/batch", body={"operations": [
+            {"op": "create", "data": new_task(self.rng)},
+            {"op": "update", "id": self.rng.choice(self.task_ids), "data": {"status": self.rng.choice(STATUSES)}},
+            {"op": "update", "id": self.rng.choice(self.task_ids), "data": {"status": self.rng.choice(STATUSES)}},
+        ]})
+
+    def _delete_task(self) -> Dict[str, Any]:
+        if self.created:
+            task_id = self.created.pop()
+        else:
+            task_id = self.task_ids.pop(self.rng.randrange(len(self.task_ids)))
+        return self._task_event("DELETE", task_id)
+
+
+def percentile(values: List[float], percent: float) -> float:
+    """
+    Nearest-rank percentile of sorted values.
+    """
+    return values[max(0, math.ceil(percent / 100 * len(values)) - 1)]
+
+
+def measure(
+    function: Callable[[Dict[str, Any], Any], Dict[str, Any]],
+    name: str,
+    workload: Workload,
+    iterations: int,
+    round_trips: Callable[[], int]
+) -> Dict[str, Any]:
+    """
+    Measures the warm invocations of one handler.
+    """
+    context = LambdaContext()
+
+    def invoke() -> Dict[str, Any]:
+        response = function(workload.event(name), context)
+        workload.observe(name, response)
+        return response
+
+    for _ in range(WARMUP):
+        invoke()
+
+    latencies = []
+    trips = 0
+    errors = 0
+    for _ in range(iterations):
+        event = workload.event(name)
+        before = round_trips()
+        start = time.perf_counter()
+        response = function(event, context)
+        latencies.append(time.perf_counter() - start)
+        trips += round_trips() - before
+        errors += not 200 <= response["statusCode"] < 300
+        workload.observe(name, response)
+
+    # Traced apart, tracemalloc slows every allocation down
+    tracemalloc.start()
+    allocations = []
+    for _ in range(ALLOC_SAMPLES):
+        event = workload.event(name)
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        response = function(event, context)
+        _, peak = tracemalloc.get_traced_memory()
+        allocations.append(peak - base)
+        workload.observe(name, response)
+    tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "alloc_kib": statistics.median(allocations) / 1024,
+        "round_trips": trips / iterations,
+        "errors": errors,
+    }
+
+
+def open_backend(mongodb_uri: Optional[str]) -> Tuple[Any, Callable[[], int]]:
+    """
+    Opens the MongoDB client of the run and the counter of its commands.
+    """
+    if mongodb_uri is None:
+        client = FakeMongoClient()
+        return client, lambda: client.round_trips
+    counter = CommandCounter()
+    return MongoClient(mongodb_uri, event_listeners=[counter]), lambda: counter.count
+
+
+@contextmanager
+def patched_handlers(client: Any, database: str, read_cache: bool = False) -> Iterator[None]:
+    """
+    Points the handlers at `client` and `database` and stubs Cognito, until
+    exit. The read cache of tasks/handler.py is disabled unless `read_cache`.
+    """
+    with ExitStack() as stack:
+        stack.enter_context(patch.dict(os.environ, {"MONGODB_DB_NAME": database}))
+        stack.enter_context(patch("utils.db.get_mongodb_client", return_value=client))
+        stack.enter_context(patch("auth.handler.get_cognito_client", return_value=StubCognito()))
+        # The auth module reads them at import, possibly before main() set the environment
+        stack.enter_context(patch("auth.handler.CLIENT_ID", ENVIRONMENT["COGNITO_CLIENT_ID"]))
+        stack.enter_context(patch("auth.handler.CLIENT_SECRET", ENVIRONMENT["COGNITO_CLIENT_SECRET"]))
+        stack.enter_context(patch("auth.handler.USER_POOL_ID", ENVIRONMENT["COGNITO_USER_POOL_ID"]))
+        cache = importlib.import_module("tasks.handler").read_cache
+        if not read_cache:
+            stack.enter_context(patch.object(cache, "ttl", 0))
+        cache.clear()
+        yield
+
+
+@contextmanager
+def read_cache_enabled(ttl: float = 3600) -> Iterator[None]:
+    """
+    Turns the read cache of tasks/handler.py back on inside patched_handlers,
+    empty, with a TTL longer than any run.
+    """
+    cache = importlib.import_module("tasks.handler").read_cache
+    with patch.object(cache, "ttl", ttl):
+        cache.clear()
+        try:
+            yield
+        finally:
+            cache.clear()
+
+
+def run(
+    sizes: List[int],
+    names: List[str],
+    iterations: int,
+    mongodb_uri: Optional[str] = None,
+    seed_value: int = 42,
+    report: Callable[[int, str, Dict[str, Any]], None] = lambda size, name, result: None
+) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """
+    Benchmarks the handlers for every dataset size.
+
+    Returns:
+        Results per size (as a string, for JSON) and handler
+    """
+    results: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    for size in sizes:
+        rng = random.Random(seed_value)
+        client, round_trips = open_backend(mongodb_uri)
+        try:
+            client.drop_database(DATABASE)
+            task_ids = seed(client[DATABASE], size, rng)
+            with patched_handlers(client, DATABASE):
+                workload = Workload(task_ids, rng)
+                results[str(size)] = {}
+                for name in names:
+                    module_name, function_name = HANDLERS[name.split(":")[0]]
+                    function = getattr(importlib.import_module(module_name), function_name)
+                    with read_cache_enabled() if name.endswith(CACHED_SUFFIX) else nullcontext():
+                        result = measure(function, name, workload, iterations, round_trips)
+                    results[str(size)][name] = result
+                    report(size, name, result)
+        finally:
+            client.drop_database(DATABASE)
+            client.close()
+    return results
+
+
+def compare(
+    current: Dict[str, Any],
+    baseline: Dict[str, Any],
+    tolerance: float
+) -> List[str]:
+    """
+    Returns the regressions of a run against a baseline run.
+    """
+    regressions = []
+    for size, handlers in current["results"].items():
+        for name, result in handlers.items():
+            base = baseline["results"].get(size, {}).get(name)
+            if base is None:
+                continue
+            for metric in ("p50_ms", "alloc_kib"):
+                if result[metric] > base[metric] * (1 + tolerance):
+                    regressions.append(f"{name} @ {size}: {metric} {base[metric]:.2f} -> {result[metric]:.2f}")
+            if result["round_trips"] > base["round_trips"] + 0.01:
+                regressions.append(
+                    f"{name} @ {size}: round_trips {base['round_trips']:.2f} -> {result['round_trips']:.2f}"
+                )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("handlers", nargs="*", default=BENCHMARKED)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 10_000, 1_000_000])
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--mongodb-uri", help="Local mongod to run against instead of the in-memory stand-in")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/handlers-<backend>-<time>.json)")
+    parser.add_argument("--baseline", help="Results file of a previous run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    # Before the handler modules are imported, they read it at import
+    os.environ.update({
+        **ENVIRONMENT, "POWERTOOLS_LOG_LEVEL": "CRITICAL", "LOG_LEVEL": "CRITICAL", "METRICS_SINK": "memory",
+        "MONGODB_DB_NAME": DATABASE,
+    })
+    backend = "mongod" if args.mongodb_uri else "fake"
+
+    def report(size: int, name: str, result: Dict[str, Any]) -> None:
+        print(
+            f"{size:>9} {name:<16} {result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f}"
+            f" {result['alloc_kib']:>10.1f} {result['round_trips']:>12.2f} {result['errors']:>7}"
+        )
+
+    print(f"MongoDB: {args.mongodb_uri or 'in-memory stand-in'}")
+    print(f"{'tasks':>9} {'handler':<16} {'p50 ms':>8} {'p99 ms':>8} {'alloc KiB':>10} {'round trips':>12} {'errors':>7}")
+    current = {
+        "backend": backend,
+        "created_at": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.platform(),
+        "iterations": args.iterations,
+        "results": run(args.sizes, args.handlers, args.iterations, args.mongodb_uri, args.seed, report),
+    }
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"handlers-{backend}-{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as results_file:
+        json.dump(current, results_file, indent=2)
+    print(f"Results saved to {output}")
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline) as baseline_file:
+        baseline = json.load(baseline_file)
+    if baseline.get("backend") != backend:
+        print(f"WARNING the baseline ran against {baseline.get('backend')}, this run against {backend}")
+    regressions = compare(current, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
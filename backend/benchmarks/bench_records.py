@@ -0,0 +1,119 @@
+"""
+Compares the per-request CPU time and allocations of the write paths.
+
+    models:  TaskCreate(**body) -> Task(...) -> to_dict() for the insert,
+             the response and the ETag (the handler before tasks.records)
+    records: TaskRecord.new(body) -> to_document() once
+
+The update path is measured the same way (TaskUpdate plus the $set document
+against tasks.records.update_fields). Only validation and document building
+are measured; the response encoding is the same for both paths.
+
+Usage:
+    python -m benchmarks.bench_records [--requests 20000] [--repeat 5]
+"""
+import argparse
+import time
+import tracemalloc
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+from utils.models import Task, TaskCreate, TaskUpdate
+from tasks.records import TaskRecord, update_fields
+
+USER_ID = "3f2b6c1e-7a4d-4e8b-9c0f-1a2b3c4d5e6f"
+
+CREATE_BODY = {
+    "title": "Prepare the quarterly report",
+    "description": "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 3,
+    "status": "in_progress"
+}
+
+UPDATE_BODY = {"title": "Review the quarterly report", "status": "completed"}
+
+
+def models_create(body: Dict[str, Any]) -> Dict[str, Any]:
+    task_data = TaskCreate(**body)
+    task = Task(
+        id=str(uuid.uuid4()),
+        title=task_data.title,
+        description=task_data.description,
+        status=task_data.status,
+        user_id=USER_ID,
+        created_at=datetime.utcnow()
+    )
+    task.to_dict()
+    task.to_dict()
+    return task.to_dict()
+
+
+def records_create(body: Dict[str, Any]) -> Dict[str, Any]:
+    return TaskRecord.new(body, USER_ID).to_document()
+
+
+def models_update(body: Dict[str, Any]) -> Dict[str, Any]:
+    task_update = TaskUpdate(**body)
+    update_data = {}
+    if task_update.title is not None:
+        update_data["title"] = task_update.title
+    if task_update.description is not None:
+        update_data["description"] = task_update.description
+    if task_update.status is not None:
+        update_data["status"] = task_update.status
+    update_data["updated_at"] = datetime.utcnow()
+    return update_data
+
+
+def measure(path: Callable[[Dict[str, Any]], Any], body: Dict[str, Any], requests: int, repeat: int) -> Dict[str, float]:
+    """
+    Runs a path and returns its best CPU time per request and the memory it
+    allocates per request (peak traced memory of a single call).
+    """
+    cpu_times: List[float] = []
+    for _ in range(repeat):
+        start = time.process_time()
+        for _ in range(requests):
+            path(body)
+        cpu_times.append(time.process_time() - start)
+
+    tracemalloc.start()
+    peaks = []
+    for _ in range(100):
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        path(body)
+        _, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - base)
+    tracemalloc.stop()
+
+    return {"cpu_us": min(cpu_times) / requests * 1_000_000, "peak_kib": sorted(peaks)[len(peaks) // 2] / 1024}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    scenarios = {
+        "create": (CREATE_BODY, models_create, records_create),
+        "update": (UPDATE_BODY, models_update, update_fields),
+    }
+    print(f"{'request':>8} {'path':>10} {'cpu us':>10} {'peak KiB':>10}")
+    for name, (body, models_path, records_path) in scenarios.items():
+        results = {
+            "models": measure(models_path, body, args.requests, args.repeat),
+            "records": measure(records_path, body, args.requests, args.repeat)
+        }
+        for path, result in results.items():
+            print(f"{name:>8} {path:>10} {result['cpu_us']:>10.2f} {result['peak_kib']:>10.2f}")
+        models, records = results["models"], results["records"]
+        print(
+            f"{name:>8} {'saving':>10} {1 - records['cpu_us'] / models['cpu_us']:>10.0%}"
+            f" {1 - records['peak_kib'] / models['peak_kib']:>10.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
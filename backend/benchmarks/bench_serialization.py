@@ -0,0 +1,102 @@
+"""
+Compares the peak memory and CPU time of the list response serialization paths.
+
+    legacy:    list(find()) -> [serialize_mongodb_doc(...)] -> json.dumps
+    streaming: encode_page(cursor) straight into the response buffer
+
+Documents are produced by a generator that mimics a pymongo cursor, so only
+the serialization cost is measured.
+
+Usage:
+    python -m benchmarks.bench_serialization [--sizes 10000 100000] [--repeat 3]
+"""
+import argparse
+import json
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, List
+
+from bson import ObjectId
+
+from utils.db import serialize_mongodb_doc
+from utils.serialization import encode_page, close_page, orjson
+
+
+def fake_cursor(size: int, with_object_id: bool = True) -> Iterator[Dict[str, Any]]:
+    """
+    Yields task documents shaped like the ones stored by create_task.
+    """
+    start = datetime(2024, 1, 1)
+    for i in range(size):
+        doc = {}
+        if with_object_id:
+            doc["_id"] = ObjectId()
+        doc.update({
+            "id": f"00000000-0000-0000-0000-{i:012d}",
+            "title": f"Task number {i}",
+            "description": "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 3,
+            "status": ("to_do", "in_progress", "completed")[i % 3],
+            "user_id": "3f2b6c1e-7a4d-4e8b-9c0f-1a2b3c4d5e6f",
+            "created_at": (start + timedelta(seconds=i)).isoformat(),
+            "updated_at": start + timedelta(seconds=i, minutes=5),
+            "version": 1
+        })
+        yield doc
+
+
+def legacy_path(size: int) -> str:
+    tasks = list(fake_cursor(size))
+    serialized_tasks = [serialize_mongodb_doc(task) for task in tasks]
+    return json.dumps({"items": serialized_tasks, "next_cursor": None})
+
+
+def streaming_path(size: int) -> str:
+    # get_tasks projects out _id, so the cursor never yields it
+    body, _, _ = encode_page(fake_cursor(size, with_object_id=False), size)
+    close_page(body, {"next_cursor": None})
+    return body.decode("utf-8")
+
+
+def measure(path: Callable[[int], str], size: int, repeat: int) -> Dict[str, float]:
+    """
+    Runs a path and returns its best CPU time and its peak traced memory.
+    """
+    cpu_times: List[float] = []
+    for _ in range(repeat):
+        start = time.process_time()
+        path(size)
+        cpu_times.append(time.process_time() - start)
+
+    tracemalloc.start()
+    path(size)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {"cpu_ms": min(cpu_times) * 1000, "peak_mib": peak / (1024 * 1024)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"JSON codec: {'orjson' if orjson else 'json (stdlib)'}")
+    print(f"{'tasks':>8} {'path':>10} {'cpu ms':>10} {'peak MiB':>10}")
+    for size in args.sizes:
+        results = {
+            "legacy": measure(legacy_path, size, args.repeat),
+            "streaming": measure(streaming_path, size, args.repeat)
+        }
+        for name, result in results.items():
+            print(f"{size:>8} {name:>10} {result['cpu_ms']:>10.1f} {result['peak_mib']:>10.1f}")
+        legacy, streaming = results["legacy"], results["streaming"]
+        print(
+            f"{size:>8} {'saving':>10} {1 - streaming['cpu_ms'] / legacy['cpu_ms']:>10.0%}"
+            f" {1 - streaming['peak_mib'] / legacy['peak_mib']:>10.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1191 @@
+"""
+In-memory stand-in for the pymongo client, used by the handler benchmarks
+when no mongod is available.
+
+It implements the part of the pymongo API that the handlers, tasks.stats and
+utils.db.ensure_indexes use, with MongoDB's semantics wherever they change a
+result:
+
+    find / find_one             projection, sort, limit, hint
+    find_one_and_update         $set, $inc (dotted paths), upsert, BEFORE/AFTER
+    find_one_and_delete, update_one, update_many, delete_one, delete_many
+    insert_one, insert_many, bulk_write (InsertOne, UpdateOne, DeleteOne)
+    aggregate                   $indexStats, $match (with $text), $addFields textScore, $sort, $limit,
+                                $skip, $project
+    create_indexes, list_indexes
+    command                     ping, serverStatus (opcounters only)
+    filters                     equality, $eq, $ne, $gt, $gte, $lt, $lte, $in, $exists, $or, $and
+
+Indexes are used the way the server uses them. Ascending indexes keep their
+rows sorted, and the filter is turned into index bounds: the equality prefix,
+$in points and a range on the next field. The scan stops at the limit when the
+index order satisfies the sort; otherwise the matches are sorted in memory.
+Text indexes keep an inverted list per token. A hint that names no index fails
+as it does on the server, and unique indexes reject duplicate keys. So the cost
+of a query grows with the index entries it reads, not with the size of the
+collection, which keeps latencies at 1M tasks per user meaningful. Text scores
+only approximate MongoDB's.
+
+Every command is counted as one round trip, as the driver would send it. A
+cursor read past its first batch of 101 documents adds a getMore for each
+16 MiB after that. serverStatus reports them as mongod's opcounters, except
+that inserts, updates and deletes count commands rather than documents.
+"""
+import bisect
+import heapq
+import itertools
+import operator
+import re
+import threading
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple, Union
+
+import bson
+from bson import ObjectId
+from pymongo import TEXT, DeleteOne, InsertOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from pymongo.results import BulkWriteResult, DeleteResult, InsertManyResult, InsertOneResult, UpdateResult
+
+# Cursor batches as the server sends them
+FIRST_BATCH_SIZE = 101
+MAX_BATCH_BYTES = 16 * 1024 * 1024
+
+# Writes per insert/update/delete command, as the driver splits them
+MAX_WRITE_BATCH_SIZE = 100_000
+
+# Rows per bucket of a sorted index; buckets split at twice this size
+BUCKET_SIZE = 1000
+
+# Largest number of $in point combinations scanned one by one
+MAX_SCAN_POINTS = 1000
+
+# serverStatus opcounters of each counted command; the rest count as "command"
+OPCOUNTERS = {"find": "query", "insert": "insert", "update": "update", "delete": "delete", "getMore": "getmore"}
+
+_MISSING = object()
+
+# Hidden field carrying the text score through a pipeline
+_TEXT_SCORE = "\0textScore"
+
+_TOKEN = re.compile(r"\w+")
+
+_RANGE_OPERATORS: Dict[str, Callable[[Any, Any], bool]] = {
+    "$gt": operator.gt,
+    "$gte": operator.ge,
+    "$lt": operator.lt,
+    "$lte": operator.le,
+}
+
+# Index key bounds below and above every value
+MIN_KEY = (0,)
+MAX_KEY = (99,)
+
+
+def _rank(value: Any) -> int:
+    # BSON comparison order of the types stored by the application
+    if value is None:
+        return 1
+    if isinstance(value, bool):
+        return 8
+    if isinstance(value, (int, float)):
+        return 2
+    if isinstance(value, str):
+        return 3
+    if isinstance(value, dict):
+        return 4
+    if isinstance(value, (list, tuple)):
+        return 5
+    if isinstance(value, bytes):
+        return 6
+    if isinstance(value, ObjectId):
+        return 7
+    if isinstance(value, datetime):
+        return 9
+    return 10
+
+
+def _bson_key(value: Any) -> Tuple[int, Any]:
+    """
+    Sort key of a value: values of different types never compare directly.
+    """
+    return (_rank(value), value)
+
+
+def _value(document: Dict[str, Any], path: str) -> Any:
+    if "." not in path:
+        return document.get(path, _MISSING)
+    value: Any = document
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def _set_value(document: Dict[str, Any], path: str, value: Any) -> None:
+    *parents, field = path.split(".")
+    for part in parents:
+        document = document.setdefault(part, {})
+    document[field] = value
+
+
+def _copy(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {key: _copy(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_copy(item) for item in value]
+    return value
+
+
+def _is_operator(condition: Any) -> bool:
+    return isinstance(condition, dict) and bool(condition) and next(iter(condition)).startswith("$")
+
+
+def _equals(value: Any, operand: Any) -> bool:
+    if operand is None:
+        return value is None or value is _MISSING
+    return value is not _MISSING and _rank(value) == _rank(operand) and value == operand
+
+
+def _match_condition(value: Any, condition: Any) -> bool:
+    if not _is_operator(condition):
+        return _equals(value, condition)
+    for name, operand in condition.items():
+        if name == "$eq":
+            matched = _equals(value, operand)
+        elif name == "$ne":
+            matched = not _equals(value, operand)
+        elif name == "$in":
+            matched = any(_equals(value, item) for item in operand)
+        elif name == "$exists":
+            matched = (value is not _MISSING) == bool(operand)
+        elif name in _RANGE_OPERATORS:
+            matched = value is not _MISSING and _rank(value) == _rank(operand) \
+                and _RANGE_OPERATORS[name](value, operand)
+        else:
+            raise NotImplementedError(f"Query operator {name} is not supported by the fake")
+        if not matched:
+            return False
+    return True
+
+
+def matches(document: Dict[str, Any], query: Dict[str, Any]) -> bool:
+    """
+    Evaluates a query filter against a document. $text conditions are
+    resolved by the text index and ignored here.
+    """
+    for field, condition in query.items():
+        if field == "$or":
+            if not any(matches(document, branch) for branch in condition):
+                return False
+        elif field == "$and":
+            if not all(matches(document, branch) for branch in condition):
+                return False
+        elif field == "$text":
+            continue
+        elif not _match_condition(_value(document, field), condition):
+            return False
+    return True
+
+
+def project(document: Dict[str, Any], projection: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Applies an inclusion or exclusion projection, returning a copy.
+    """
+    if not projection:
+        return _copy(document)
+    included = {field for field, value in projection.items() if value and field != "_id"}
+    if included:
+        keep_id = projection.get("_id", 1)
+        return {
+            field: _copy(value) for field, value in document.items()
+            if field in included or (field == "_id" and keep_id)
+        }
+    excluded = {field for field, value in projection.items() if not value}
+    return {field: _copy(value) for field, value in document.items() if field not in excluded}
+
+
+def sort_documents(documents: List[Any], sort: List[Tuple[str, int]], get: Callable[[Any], Dict[str, Any]]) -> None:
+    """
+    Sorts in place by several fields (BSON order), with one stable pass per field.
+    """
+    for field, direction in reversed(sort):
+        documents.sort(key=lambda item: _bson_key(_none(_value(get(item), field))), reverse=direction == -1)
+
+
+def _none(value: Any) -> Any:
+    return None if value is _MISSING else value
+
+
+def _normalize_sort(key_or_list: Any, direction: Optional[int] = None) -> List[Tuple[str, int]]:
+    if isinstance(key_or_list, str):
+        return [(key_or_list, direction or 1)]
+    if isinstance(key_or_list, dict):
+        return list(key_or_list.items())
+    return [(field, value) for field, value in key_or_list]
+
+
+class Interval(NamedTuple):
+    lo: Tuple[Any, ...]
+    lo_inclusive: bool
+    hi: Tuple[Any, ...]
+    hi_inclusive: bool
+
+    @property
+    def is_point(self) -> bool:
+        return self.lo == self.hi and self.lo_inclusive and self.hi_inclusive
+
+
+FULL_INTERVAL = Interval(MIN_KEY, True, MAX_KEY, True)
+
+
+def _point(value: Any) -> Interval:
+    key = _bson_key(value)
+    return Interval(key, True, key, True)
+
+
+def _intersect(a: Interval, b: Interval) -> Optional[Interval]:
+    if a.lo != b.lo:
+        lo, lo_inclusive = max((a.lo, a.lo_inclusive), (b.lo, b.lo_inclusive), key=lambda bound: bound[0])
+    else:
+        lo, lo_inclusive = a.lo, a.lo_inclusive and b.lo_inclusive
+    if a.hi != b.hi:
+        hi, hi_inclusive = min((a.hi, a.hi_inclusive), (b.hi, b.hi_inclusive), key=lambda bound: bound[0])
+    else:
+        hi, hi_inclusive = a.hi, a.hi_inclusive and b.hi_inclusive
+    if lo > hi or (lo == hi and not (lo_inclusive and hi_inclusive)):
+        return None
+    return Interval(lo, lo_inclusive, hi, hi_inclusive)
+
+
+def _intersect_all(intervals: List[Interval], bounds: List[Interval]) -> List[Interval]:
+    result = []
+    for interval in intervals:
+        for bound in bounds:
+            common = _intersect(interval, bound)
+            if common is not None:
+                result.append(common)
+    return sorted(result, key=lambda interval: (interval.lo, not interval.lo_inclusive))
+
+
+def _hull(intervals: List[Interval]) -> List[Interval]:
+    if not intervals:
+        return []
+    lo = min(interval.lo for interval in intervals)
+    hi = max(interval.hi for interval in intervals)
+    return [Interval(
+        lo, any(i.lo_inclusive for i in intervals if i.lo == lo),
+        hi, any(i.hi_inclusive for i in intervals if i.hi == hi)
+    )]
+
+
+def _condition_intervals(condition: Any) -> Optional[List[Interval]]:
+    if not _is_operator(condition):
+        return [_point(condition)]
+    intervals = [FULL_INTERVAL]
+    bounded = False
+    for name, operand in condition.items():
+        if name == "$eq":
+            bounds = [_point(operand)]
+        elif name == "$in":
+            bounds = [_point(value) for value in sorted(set(operand), key=_bson_key)] if operand else []
+        elif name in ("$gt", "$gte"):
+            bounds = [Interval(_bson_key(operand), name == "$gte", (_rank(operand) + 1,), False)]
+        elif name in ("$lt", "$lte"):
+            bounds = [Interval((_rank(operand),), True, _bson_key(operand), name == "$lte")]
+        else:
+            continue
+        bounded = True
+        intervals = _intersect_all(intervals, bounds)
+    return intervals if bounded else None
+
+
+def field_intervals(query: Dict[str, Any], field: str) -> Optional[List[Interval]]:
+    """
+    Index bounds of a field implied by a filter, or None if it does not
+    bound the field. An $or bounds a field when all its branches do.
+    """
+    intervals = _condition_intervals(query[field]) if field in query else None
+    if "$or" in query:
+        branch_intervals = [field_intervals(branch, field) for branch in query["$or"]]
+        if all(bounds is not None for bounds in branch_intervals):
+            hull = _hull([interval for bounds in branch_intervals for interval in bounds])
+            intervals = hull if intervals is None else _intersect_all(intervals, hull)
+    for branch in query.get("$and", []):
+        bounds = field_intervals(branch, field)
+        if bounds is not None:
+            intervals = bounds if intervals is None else _intersect_all(intervals, bounds)
+    return intervals
+
+
+def _tokens(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+
+def parse_search(text: str) -> Tuple[Set[str], List[str], Set[str]]:
+    """
+    Splits a $search string into terms, "phrases" and -negated terms.
+    """
+    phrases = [phrase.lower() for phrase in re.findall(r'"([^"]*)"', text) if phrase.strip()]
+    terms: Set[str] = set()
+    negated: Set[str] = set()
+    for word in re.sub(r'"[^"]*"', " ", text).split():
+        (negated if word.startswith("-") else terms).update(_tokens(word))
+    for phrase in phrases:
+        terms.update(_tokens(phrase))
+    return terms, phrases, negated
+
+
+class SortedIndex:
+    """
+    Ascending (compound) index: rows in key order, in buckets of about
+    BUCKET_SIZE rows with the largest key of each bucket.
+    """
+
+    def __init__(self, document: Dict[str, Any], documents: Dict[int, Dict[str, Any]]):
+        self.document = document
+        self.name = document["name"]
+        self.fields = [field for field, _ in document["key"].items()]
+        self.unique = bool(document.get("unique"))
+        self.documents = documents
+        self.buckets: List[List[int]] = []
+        self.maxes: List[Tuple[Any, ...]] = []
+
+    def key_of(self, document: Dict[str, Any]) -> Tuple[Any, ...]:
+        return tuple(_bson_key(_none(_value(document, field))) for field in self.fields)
+
+    def _key(self, row: int) -> Tuple[Any, ...]:
+        return self.key_of(self.documents[row])
+
+    def affected(self, before: Dict[str, Any], after: Dict[str, Any]) -> bool:
+        return any(_value(before, field) != _value(after, field) for field in self.fields)
+
+    def _bisect(self, bucket: List[int], key: Tuple[Any, ...], right: bool, width: Optional[int] = None) -> int:
+        lo, hi = 0, len(bucket)
+        while lo < hi:
+            middle = (lo + hi) // 2
+            current = self._key(bucket[middle])[:width]
+            if current < key or (right and current == key):
+                lo = middle + 1
+            else:
+                hi = middle
+        return lo
+
+    def _locate(self, bound: Tuple[Any, ...], right: bool) -> Tuple[int, int]:
+        # First position whose key prefix is > bound (right) or >= bound
+        width = len(bound)
+        lo, hi = 0, len(self.maxes)
+        while lo < hi:
+            middle = (lo + hi) // 2
+            current = self.maxes[middle][:width]
+            if current < bound or (right and current == bound):
+                lo = middle + 1
+            else:
+                hi = middle
+        if lo == len(self.buckets):
+            return lo, 0
+        return lo, self._bisect(self.buckets[lo], bound, right, width)
+
+    def insert(self, row: int) -> None:
+        key = self._key(row)
+        if not self.buckets:
+            self.buckets.append([row])
+            self.maxes.append(key)
+            return
+        position = bisect.bisect_right(self.maxes, key)
+        if position == len(self.buckets):
+            position -= 1
+        bucket = self.buckets[position]
+        offset = self._bisect(bucket, key, right=True)
+        bucket.insert(offset, row)
+        if offset == len(bucket) - 1:
+            self.maxes[position] = key
+        if len(bucket) > 2 * BUCKET_SIZE:
+            half = len(bucket) // 2
+            self.buckets[position:position + 1] = [bucket[:half], bucket[half:]]
+            self.maxes[position:position + 1] = [self._key(bucket[half - 1]), self.maxes[position]]
+
+    def remove(self, row: int) -> None:
+        key = self._key(row)
+        position = bisect.bisect_left(self.maxes, key)
+        while position < len(self.buckets):
+            bucket = self.buckets[position]
+            offset = self._bisect(bucket, key, right=False)
+            while offset < len(bucket):
+                if bucket[offset] == row:
+                    del bucket[offset]
+                    if not bucket:
+                        del self.buckets[position]
+                        del self.maxes[position]
+                    elif offset == len(bucket):
+                        self.maxes[position] = self._key(bucket[-1])
+                    return
+                if self._key(bucket[offset]) != key:
+                    return
+                offset += 1
+            position += 1
+
+    def rebuild(self) -> None:
+        rows = sorted(self.documents, key=self._key)
+        self.buckets = [rows[start:start + BUCKET_SIZE] for start in range(0, len(rows), BUCKET_SIZE)]
+        self.maxes = [self._key(bucket[-1]) for bucket in self.buckets]
+        if self.unique:
+            for previous, row in zip(rows, rows[1:]):
+                if self._key(previous) == self._key(row):
+                    raise DuplicateKeyError(f"E11000 duplicate key error index: {self.name}", 11000)
+
+    def check_unique(self, document: Dict[str, Any], row: Optional[int] = None) -> None:
+        if not self.unique:
+            return
+        key = self.key_of(document)
+        for existing in self.scan(Interval(key, True, key, True)):
+            if existing != row:
+                raise DuplicateKeyError(
+                    f"E11000 duplicate key error index: {self.name} dup key: {dict(zip(self.fields, key))}",
+                    11000
+                )
+
+    def scan(self, bounds: Interval, reverse: bool = False) -> Iterator[int]:
+        """
+        Yields the rows whose key prefix is within the bounds, in key order.
+        """
+        if reverse:
+            position, offset = self._locate(bounds.hi, right=bounds.hi_inclusive)
+            if position == len(self.buckets):
+                position -= 1
+                offset = len(self.buckets[position]) if position >= 0 else 0
+            offset -= 1
+            width = len(bounds.lo)
+            while position >= 0:
+                bucket = self.buckets[position]
+                while offset >= 0:
+                    row = bucket[offset]
+                    key = self._key(row)[:width]
+                    if key < bounds.lo or (key == bounds.lo and not bounds.lo_inclusive):
+                        return
+                    yield row
+                    offset -= 1
+                position -= 1
+                if position >= 0:
+                    offset = len(self.buckets[position]) - 1
+            return
+
+        position, offset = self._locate(bounds.lo, right=not bounds.lo_inclusive)
+        width = len(bounds.hi)
+        while position < len(self.buckets):
+            bucket = self.buckets[position]
+            while offset < len(bucket):
+                row = bucket[offset]
+                key = self._key(row)[:width]
+                if key > bounds.hi or (key == bounds.hi and not bounds.hi_inclusive):
+                    return
+                yield row
+                offset += 1
+            position += 1
+            offset = 0
+
+    def bounded_fields(self, query: Dict[str, Any]) -> int:
+        """
+        Number of leading fields of the index the query bounds.
+        """
+        count = 0
+        for field in self.fields:
+            if field_intervals(query, field) is None:
+                break
+            count += 1
+        return count
+
+    def candidates(self, query: Dict[str, Any], sort: List[Tuple[str, int]]) -> Tuple[Iterable[int], bool]:
+        """
+        Plans the index scan of a query.
+
+        Returns:
+            The candidate rows and whether they already come in the sort order
+        """
+        prefixes: List[Tuple[Any, ...]] = [()]
+        points = 0
+        ranges: Optional[List[Interval]] = None
+        for field in self.fields:
+            intervals = field_intervals(query, field)
+            if intervals is None:
+                break
+            if not intervals:
+                return [], True
+            if all(interval.is_point for interval in intervals) \
+                    and len(prefixes) * len(intervals) <= MAX_SCAN_POINTS:
+                prefixes = [prefix + (interval.lo,) for prefix in prefixes for interval in intervals]
+                points += 1
+                continue
+            ranges = intervals
+            break
+
+        if ranges is None:
+            bounds = [Interval(prefix, True, prefix, True) for prefix in prefixes]
+        else:
+            bounds = [
+                Interval(prefix + (interval.lo,), interval.lo_inclusive, prefix + (interval.hi,), interval.hi_inclusive)
+                for prefix in prefixes for interval in ranges
+            ]
+
+        # Each scan is ordered by the fields after the equality prefix
+        provided = self.fields[points:]
+        directions = {direction for _, direction in sort}
+        ordered = not sort or (
+            [field for field, _ in sort] == provided[:len(sort)] and len(directions) == 1
+        )
+        reverse = bool(sort) and ordered and directions == {-1}
+        scans = [self.scan(bound, reverse) for bound in bounds]
+        if len(scans) == 1:
+            return scans[0], ordered
+        if ordered:
+            return heapq.merge(*scans, key=lambda row: self._key(row)[points:], reverse=reverse), True
+        return itertools.chain(*scans), False
+
+
+class TextIndex:
+    """
+    Text index: an inverted list of rows per token. Rows are not removed from
+    the lists; the candidates of a search are checked against the documents.
+    """
+
+    def __init__(self, document: Dict[str, Any], documents: Dict[int, Dict[str, Any]]):
+        self.document = document
+        self.name = document["name"]
+        key = list(document["key"].items())
+        self.prefix = [field for field, kind in key if kind != TEXT]
+        self.weights = document.get("weights") or {field: 1 for field, kind in key if kind == TEXT}
+        self.fields = self.prefix + list(self.weights)
+        self.unique = False
+        self.documents = documents
+        self.postings: Dict[str, List[int]] = defaultdict(list)
+
+    def affected(self, before: Dict[str, Any], after: Dict[str, Any]) -> bool:
+        return any(_value(before, field) != _value(after, field) for field in self.weights)
+
+    def insert(self, row: int) -> None:
+        document = self.documents[row]
+        tokens = set()
+        for field in self.weights:
+            value = document.get(field)
+            if isinstance(value, str):
+                tokens.update(_tokens(value))
+        for token in tokens:
+            self.postings[token].append(row)
+
+    def remove(self, row: int) -> None:
+        pass
+
+    def rebuild(self) -> None:
+        self.postings.clear()
+        for row in self.documents:
+            self.insert(row)
+
+    def check_unique(self, document: Dict[str, Any], row: Optional[int] = None) -> None:
+        pass
+
+    def search(self, terms: Set[str]) -> List[int]:
+        rows: Set[int] = set()
+        for term in terms:
+            rows.update(self.postings.get(term, ()))
+        return sorted(rows)
+
+    def score(self, document: Dict[str, Any], terms: Set[str], phrases: List[str], negated: Set[str]) -> Optional[float]:
+        """
+        Relevance of a document, or None if it does not match the search.
+        """
+        score = 0.0
+        texts = []
+        for field, weight in self.weights.items():
+            value = document.get(field)
+            if not isinstance(value, str):
+                continue
+            texts.append(value.lower())
+            words = _tokens(value)
+            if negated.intersection(words):
+                return None
+            hits = sum(1 for word in words if word in terms)
+            if hits:
+                score += weight * (1.0 + hits / len(words))
+        if not score or not all(any(phrase in text for text in texts) for phrase in phrases):
+            return None
+        return score
+
+
+Index = Union[SortedIndex, TextIndex]
+
+
+class FakeCursor:
+    """
+    Cursor over the results of a find or aggregate, executed on first read.
+    """
+
+    def __init__(self, collection: "FakeCollection", execute: Callable[["FakeCursor"], List[Dict[str, Any]]]):
+        self._collection = collection
+        self._execute = execute
+        self._documents: Optional[List[Dict[str, Any]]] = None
+        self._position = 0
+        self._batch_end = 0
+        self.sort_spec: List[Tuple[str, int]] = []
+        self.limit_value = 0
+
+    def sort(self, key_or_list: Any, direction: Optional[int] = None) -> "FakeCursor":
+        self.sort_spec = _normalize_sort(key_or_list, direction)
+        return self
+
+    def limit(self, limit: int) -> "FakeCursor":
+        self.limit_value = abs(limit)
+        return self
+
+    def __iter__(self) -> "FakeCursor":
+        return self
+
+    def __next__(self) -> Dict[str, Any]:
+        if self._documents is None:
+            self._documents = self._execute(self)
+            self._batch_end = min(len(self._documents), FIRST_BATCH_SIZE)
+        if self._position >= len(self._documents):
+            raise StopIteration
+        if self._position == self._batch_end:
+            self._get_more()
+        document = self._documents[self._position]
+        self._position += 1
+        return document
+
+    def _get_more(self) -> None:
+        self._collection.database.client.count_command("getMore")
+        size = 0
+        end = self._position
+        while end < len(self._documents) and (end == self._position or size < MAX_BATCH_BYTES):
+            size += len(bson.encode(self._documents[end]))
+            end += 1
+        self._batch_end = end
+
+    @property
+    def alive(self) -> bool:
+        return self._documents is None or self._position < len(self._documents)
+
+    def close(self) -> None:
+        self._documents = []
+
+    def __enter__(self) -> "FakeCursor":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+
+class FakeCollection:
+    def __init__(self, database: "FakeDatabase", name: str):
+        self.database = database
+        self.name = name
+        self.full_name = f"{database.name}.{name}"
+        self._documents: Dict[int, Dict[str, Any]] = {}
+        self._ids: Dict[Tuple[int, Any], int] = {}
+        self._indexes: Dict[str, Index] = {}
+        self._rows = itertools.count()
+        # Queries that used each index, for $indexStats
+        self._accesses: Counter = Counter()
+        self._created_at = datetime.utcnow()
+
+    @property
+    def _lock(self) -> threading.RLock:
+        return self.database.client.lock
+
+    def _count(self, command: str, times: int = 1) -> None:
+        self.database.client.count_command(command, times)
+
+    # Indexes
+
+    def create_indexes(self, indexes: List[Any], **kwargs: Any) -> List[str]:
+        with self._lock:
+            self._count("createIndexes")
+            names = []
+            for model in indexes:
+                document = dict(model.document)
+                if document["name"] not in self._indexes:
+                    kinds = set(document["key"].values())
+                    index: Index = TextIndex(document, self._documents) if TEXT in kinds \
+                        else SortedIndex(document, self._documents)
+                    if not kinds <= {1, TEXT}:
+                        raise NotImplementedError("Only ascending and text indexes are supported by the fake")
+                    index.rebuild()
+                    self._indexes[index.name] = index
+                names.append(document["name"])
+            return names
+
+    def list_indexes(self) -> Iterator[Dict[str, Any]]:
+        with self._lock:
+            self._count("listIndexes")
+            return iter(self._index_infos())
+
+    def _index_infos(self) -> List[Dict[str, Any]]:
+        infos = [{"v": 2, "key": {"_id": 1}, "name": "_id_"}]
+        for index in self._indexes.values():
+            info = {"v": 2, **{k: v for k, v in index.document.items() if k != "key"}}
+            if isinstance(index, TextIndex):
+                info["key"] = {**{field: 1 for field in index.prefix}, "_fts": TEXT, "_ftsx": 1}
+                info["weights"] = dict(index.weights)
+                info.setdefault("default_language", "english")
+            else:
+                info["key"] = dict(index.document["key"])
+            infos.append(info)
+        return infos
+
+    def _index_for_hint(self, hint: Any) -> Index:
+        for index in self._indexes.values():
+            if hint == index.name or (not isinstance(hint, str) and list(hint) == list(index.document["key"].items())):
+                return index
+        raise OperationFailure(
+            "error processing query: planner returned error :: caused by :: "
+            "hint provided does not correspond to an existing index",
+            code=2
+        )
+
+    # Reads
+
+    def _plan(self, query: Dict[str, Any], hint: Any) -> Optional[Index]:
+        if hint is not None:
+            return self._index_for_hint(hint)
+        best, best_fields = None, 0
+        for index in self._indexes.values():
+            if isinstance(index, SortedIndex):
+                fields = index.bounded_fields(query)
+                if fields > best_fields or (fields == best_fields and fields and index.unique and not best.unique):
+                    best, best_fields = index, fields
+        return best
+
+    def _find_rows(
+        self,
+        query: Dict[str, Any],
+        sort: Optional[List[Tuple[str, int]]] = None,
+        limit: int = 0,
+        hint: Any = None
+    ) -> List[int]:
+        if "$text" in query:
+            raise NotImplementedError("$text is only supported in aggregate by the fake")
+        sort = sort or []
+        if "_id" in query and not _is_operator(query["_id"]) and hint is None:
+            row = self._ids.get(_bson_key(query["_id"]))
+            candidates: Iterable[int] = [] if row is None else [row]
+            ordered = True
+            self._accesses["_id_"] += 1
+        else:
+            index = self._plan(query, hint)
+            if isinstance(index, TextIndex):
+                raise OperationFailure("hint a text index is only allowed with $text", code=2)
+            if index is None:
+                candidates, ordered = list(self._documents), not sort
+            else:
+                candidates, ordered = index.candidates(query, sort)
+                self._accesses[index.name] += 1
+
+        rows = []
+        for row in candidates:
+            if matches(self._documents[row], query):
+                rows.append(row)
+                if ordered and limit and len(rows) >= limit:
+                    break
+        if not ordered:
+            sort_documents(rows, sort, self._documents.__getitem__)
+            if limit:
+                rows = rows[:limit]
+        return rows
+
+    def find(self, filter: Optional[Dict[str, Any]] = None, projection: Optional[Dict[str, Any]] = None,
+             hint: Any = None, sort: Any = None, limit: int = 0, **kwargs: Any) -> FakeCursor:
+        query = filter or {}
+
+        def execute(cursor: FakeCursor) -> List[Dict[str, Any]]:
+            with self._lock:
+                self._count("find")
+                rows = self._find_rows(query, cursor.sort_spec, cursor.limit_value, hint)
+                return [project(self._documents[row], projection) for row in rows]
+
+        cursor = FakeCursor(self, execute)
+        if sort:
+            cursor.sort(sort)
+        return cursor.limit(limit)
+
+    def find_one(self, filter: Optional[Dict[str, Any]] = None, projection: Optional[Dict[str, Any]] = None,
+                 **kwargs: Any) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._count("find")
+            rows = self._find_rows(filter or {}, _normalize_sort(kwargs.get("sort") or []), 1, kwargs.get("hint"))
+            return project(self._documents[rows[0]], projection) if rows else None
+
+    def count_documents(self, filter: Dict[str, Any], **kwargs: Any) -> int:
+        with self._lock:
+            self._count("aggregate")
+            return len(self._find_rows(filter, hint=kwargs.get("hint")))
+
+    def aggregate(self, pipeline: List[Dict[str, Any]], **kwargs: Any) -> FakeCursor:
+        with self._lock:
+            self._count("aggregate")
+            items: Optional[List[Dict[str, Any]]] = None
+            for position, stage in enumerate(pipeline):
+                (name, spec), = stage.items()
+                if name == "$match":
+                    if "$text" in spec:
+                        if position:
+                            raise OperationFailure("$match with $text is only allowed as the first pipeline stage",
+                                                   code=17313)
+                        items = self._text_search(spec)
+                    elif items is None:
+                        items = [_copy(self._documents[row]) for row in self._find_rows(spec)]
+                    else:
+                        items = [item for item in items if matches(item, spec)]
+                    continue
+                if name == "$indexStats":
+                    if position:
+                        raise OperationFailure("$indexStats is only valid as the first stage in a pipeline",
+                                               code=40602)
+                    items = [{
+                        "name": info["name"], "key": info["key"],
+                        "accesses": {"ops": self._accesses[info["name"]], "since": self._created_at}
+                    } for info in self._index_infos()]
+                    continue
+                if items is None:
+                    items = [_copy(document) for document in self._documents.values()]
+                if name == "$addFields":
+                    for item in items:
+                        for field, expression in spec.items():
+                            if expression == {"$meta": "textScore"}:
+                                item[field] = item.get(_TEXT_SCORE)
+                            elif not _is_operator(expression):
+                                item[field] = _copy(expression)
+                            else:
+                                raise NotImplementedError(f"Expression {expression} is not supported by the fake")
+                elif name == "$sort":
+                    sort_documents(items, _normalize_sort(spec), lambda item: item)
+                elif name == "$limit":
+                    items = items[:spec]
+                elif name == "$skip":
+                    items = items[spec:]
+                elif name == "$project":
+                    items = [project(item, spec) for item in items]
+                else:
+                    raise NotImplementedError(f"Aggregation stage {name} is not supported by the fake")
+            results = items if items is not None else [_copy(d) for d in self._documents.values()]
+            for item in results:
+                item.pop(_TEXT_SCORE, None)
+
+        return FakeCursor(self, lambda cursor: results)
+
+    def _text_search(self, match: Dict[str, Any]) -> List[Dict[str, Any]]:
+        index = next((index for index in self._indexes.values() if isinstance(index, TextIndex)), None)
+        if index is None:
+            raise OperationFailure("text index required for $text query", code=27)
+        self._accesses[index.name] += 1
+        terms, phrases, negated = parse_search(match["$text"]["$search"])
+        results = []
+        for row in index.search(terms):
+            document = self._documents.get(row)
+            if document is None or not matches(document, match):
+                continue
+            score = index.score(document, terms, phrases, negated)
+            if score is not None:
+                item = _copy(document)
+                item[_TEXT_SCORE] = score
+                results.append(item)
+        return results
+
+    # Writes
+
+    def _insert(self, document: Dict[str, Any]) -> Any:
+        # Like pymongo, the _id is added to the given document
+        if "_id" not in document:
+            document["_id"] = ObjectId()
+        stored = _copy(document)
+        key = _bson_key(stored["_id"])
+        if key in self._ids:
+            raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.full_name} index: _id_", 11000)
+        for index in self._indexes.values():
+            index.check_unique(stored)
+        row = next(self._rows)
+        self._documents[row] = stored
+        self._ids[key] = row
+        for index in self._indexes.values():
+            index.insert(row)
+        return stored["_id"]
+
+    def _replace(self, row: int, document: Dict[str, Any]) -> None:
+        current = self._documents[row]
+        affected = [index for index in self._indexes.values() if index.affected(current, document)]
+        for index in affected:
+            index.check_unique(document, row)
+        for index in affected:
+            index.remove(row)
+        self._documents[row] = document
+        for index in affected:
+            index.insert(row)
+
+    def _delete(self, row: int) -> Dict[str, Any]:
+        for index in self._indexes.values():
+            index.remove(row)
+        document = self._documents.pop(row)
+        del self._ids[_bson_key(document["_id"])]
+        return document
+
+    @staticmethod
+    def _apply_update(document: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, Any]:
+        updated = _copy(document)
+        for name, fields in update.items():
+            if name == "$set":
+                for path, value in fields.items():
+                    _set_value(updated, path, _copy(value))
+            elif name == "$inc":
+                for path, amount in fields.items():
+                    current = _value(updated, path)
+                    _set_value(updated, path, (0 if current is _MISSING else current) + amount)
+            elif name == "$max":
+                for path, value in fields.items():
+                    current = _value(updated, path)
+                    if current is _MISSING or current < value:
+                        _set_value(updated, path, _copy(value))
+            else:
+                raise NotImplementedError(f"Update operator {name} is not supported by the fake")
+        return updated
+
+    def _upsert(self, query: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, Any]:
+        base = {
+            field: _copy(value) for field, value in query.items()
+            if not field.startswith("$") and not _is_operator(value)
+        }
+        document = self._apply_update(base, update)
+        self._insert(document)
+        return document
+
+    def _update(self, query: Dict[str, Any], update: Dict[str, Any], upsert: bool, many: bool,
+                hint: Any = None) -> Dict[str, Any]:
+        rows = self._find_rows(query, limit=0 if many else 1, hint=hint)
+        modified = 0
+        for row in rows:
+            updated = self._apply_update(self._documents[row], update)
+            if updated != self._documents[row]:
+                self._replace(row, updated)
+                modified += 1
+        if not rows and upsert:
+            document = self._upsert(query, update)
+            return {"n": 1, "nModified": 0, "upserted": document["_id"]}
+        return {"n": len(rows), "nModified": modified}
+
+    def find_one_and_update(self, filter: Dict[str, Any], update: Dict[str, Any],
+                            projection: Optional[Dict[str, Any]] = None, sort: Any = None, upsert: bool = False,
+                            return_document: bool = ReturnDocument.BEFORE, hint: Any = None,
+                            **kwargs: Any) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._count("findAndModify")
+            rows = self._find_rows(filter, _normalize_sort(sort or []), 1, hint)
+            if not rows:
+                if not upsert:
+                    return None
+                document = self._upsert(filter, update)
+                return project(document, projection) if return_document == ReturnDocument.AFTER else None
+            before = self._documents[rows[0]]
+            after = self._apply_update(before, update)
+            self._replace(rows[0], after)
+            return project(after if return_document == ReturnDocument.AFTER else before, projection)
+
+    def find_one_and_delete(self, filter: Dict[str, Any], projection: Optional[Dict[str, Any]] = None,
+                            sort: Any = None, hint: Any = None, **kwargs: Any) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._count("findAndModify")
+            rows = self._find_rows(filter, _normalize_sort(sort or []), 1, hint)
+            return project(self._delete(rows[0]), projection) if rows else None
+
+    def insert_one(self, document: Dict[str, Any], **kwargs: Any) -> InsertOneResult:
+        with self._lock:
+            self._count("insert")
+            return InsertOneResult(self._insert(document), True)
+
+    def insert_many(self, documents: Iterable[Dict[str, Any]], ordered: bool = True, **kwargs: Any) -> InsertManyResult:
+        documents = list(documents)
+        with self._lock:
+            self._count("insert", max(1, -(-len(documents) // MAX_WRITE_BATCH_SIZE)))
+            if not self._documents and len(documents) > BUCKET_SIZE:
+                return InsertManyResult(self._load(documents), True)
+            inserted, errors = [], []
+            for position, document in enumerate(documents):
+                try:
+                    inserted.append(self._insert(document))
+                except DuplicateKeyError as e:
+                    errors.append({"index": position, "code": 11000, "errmsg": str(e)})
+                    if ordered:
+                        break
+            if errors:
+                raise BulkWriteError({"writeErrors": errors, "nInserted": len(inserted)})
+            return InsertManyResult(inserted, True)
+
+    def _load(self, documents: List[Dict[str, Any]]) -> List[Any]:
+        # Bulk load of an empty collection: the indexes are built once at the end
+        ids = []
+        for document in documents:
+            if "_id" not in document:
+                document["_id"] = ObjectId()
+            row = next(self._rows)
+            stored = _copy(document)
+            self._documents[row] = stored
+            self._ids[_bson_key(stored["_id"])] = row
+            ids.append(stored["_id"])
+        if len(self._ids) != len(self._documents):
+            raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.full_name} index: _id_", 11000)
+        for index in self._indexes.values():
+            index.rebuild()
+        return ids
+
+    def update_one(self, filter: Dict[str, Any], update: Dict[str, Any], upsert: bool = False,
+                   hint: Any = None, **kwargs: Any) -> UpdateResult:
+        with self._lock:
+            self._count("update")
+            return UpdateResult(self._update(filter, update, upsert, False, hint), True)
+
+    def update_many(self, filter: Dict[str, Any], update: Dict[str, Any], upsert: bool = False,
+                    hint: Any = None, **kwargs: Any) -> UpdateResult:
+        with self._lock:
+            self._count("update")
+            return UpdateResult(self._update(filter, update, upsert, True, hint), True)
+
+    def delete_one(self, filter: Dict[str, Any], hint: Any = None, **kwargs: Any) -> DeleteResult:
+        with self._lock:
+            self._count("delete")
+            rows = self._find_rows(filter, limit=1, hint=hint)
+            for row in rows:
+                self._delete(row)
+            return DeleteResult({"n": len(rows)}, True)
+
+    def delete_many(self, filter: Dict[str, Any], hint: Any = None, **kwargs: Any) -> DeleteResult:
+        with self._lock:
+            self._count("delete")
+            rows = self._find_rows(filter, hint=hint)
+            for row in rows:
+                self._delete(row)
+            return DeleteResult({"n": len(rows)}, True)
+
+    def bulk_write(self, requests: List[Any], ordered: bool = True, **kwargs: Any) -> BulkWriteResult:
+        with self._lock:
+            # The driver sends one command per request type (unordered) or per
+            # run of consecutive requests of the same type (ordered)
+            if ordered:
+                commands = sum(1 for _ in itertools.groupby(requests, key=type))
+            else:
+                commands = len({type(request) for request in requests})
+            self._count("bulkWrite", max(1, commands))
+            result = {
+                "writeErrors": [], "writeConcernErrors": [], "nInserted": 0, "nUpserted": 0,
+                "nMatched": 0, "nModified": 0, "nRemoved": 0, "upserted": []
+            }
+            for position, request in enumerate(requests):
+                try:
+                    if isinstance(request, InsertOne):
+                        self._insert(request._doc)
+                        result["nInserted"] += 1
+                    elif isinstance(request, UpdateOne):
+                        outcome = self._update(request._filter, request._doc, request._upsert, False, request._hint)
+                        if "upserted" in outcome:
+                            result["nUpserted"] += 1
+                            result["upserted"].append({"index": position, "_id": outcome["upserted"]})
+                        else:
+                            result["nMatched"] += outcome["n"]
+                            result["nModified"] += outcome["nModified"]
+                    elif isinstance(request, DeleteOne):
+                        rows = self._find_rows(request._filter, limit=1, hint=request._hint)
+                        for row in rows:
+                            self._delete(row)
+                        result["nRemoved"] += len(rows)
+                    else:
+                        raise NotImplementedError(f"{type(request).__name__} is not supported by the fake")
+                except DuplicateKeyError as e:
+                    result["writeErrors"].append({"index": position, "code": 11000, "errmsg": str(e)})
+                    if ordered:
+                        break
+            if result["writeErrors"]:
+                raise BulkWriteError(result)
+            return BulkWriteResult(result, True)
+
+    def drop(self) -> None:
+        self.database.drop_collection(self.name)
+
+
+class FakeDatabase:
+    def __init__(self, client: "FakeMongoClient", name: str):
+        self.client = client
+        self.name = name
+        self._collections: Dict[str, FakeCollection] = {}
+
+    def __getitem__(self, name: str) -> FakeCollection:
+        with self.client.lock:
+            if name not in self._collections:
+                self._collections[name] = FakeCollection(self, name)
+            return self._collections[name]
+
+    def __getattr__(self, name: str) -> FakeCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def get_collection(self, name: str, **kwargs: Any) -> FakeCollection:
+        return self[name]
+
+    def list_collection_names(self) -> List[str]:
+        return list(self._collections)
+
+    def drop_collection(self, name: str) -> None:
+        with self.client.lock:
+            self.client.count_command("drop")
+            self._collections.pop(name, None)
+
+    def command(self, name: str, *args: Any, **kwargs: Any) -> Dict[str, Any]:
+        if name not in ("ping", "serverStatus"):
+            raise NotImplementedError(f"Command {name} is not supported by the fake")
+        self.client.count_command(name)
+        if name == "ping":
+            return {"ok": 1.0}
+        opcounters = dict.fromkeys(("insert", "query", "update", "delete", "getmore", "command"), 0)
+        with self.client.lock:
+            for command, count in self.client.commands.items():
+                opcounters[OPCOUNTERS.get(command, "command")] += count
+        return {"opcounters": opcounters, "ok": 1.0}
+
+
+class FakeMongoClient:
+    """
+    Client whose databases live in memory. `commands` counts the commands
+    that would have been sent to the server, by name.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.commands: Counter = Counter()
+        self._databases: Dict[str, FakeDatabase] = {}
+
+    def __getitem__(self, name: str) -> FakeDatabase:
+        with self.lock:
+            if name not in self._databases:
+                self._databases[name] = FakeDatabase(self, name)
+            return self._databases[name]
+
+    def __getattr__(self, name: str) -> FakeDatabase:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def get_database(self, name: str, **kwargs: Any) -> FakeDatabase:
+        return self[name]
+
+    def drop_database(self, name: str) -> None:
+        with self.lock:
+            self.count_command("dropDatabase")
+            self._databases.pop(name, None)
+
+    def count_command(self, name: str, times: int = 1) -> None:
+        with self.lock:
+            self.commands[name] += times
+
+    @property
+    def round_trips(self) -> int:
+        with self.lock:
+            return sum(self.commands.values())
+
+    def close(self) -> None:
+        pass
@@ -0,0 +1,758 @@
+"""
+Load generator: replays a weighted mix of the serverless.yml routes for
+synthetic users, step by step, to find where the design saturates.
+
+Each step runs for --duration seconds, either closed-loop (--concurrency N:
+N clients, each sending its next request when the previous one answers) or
+open-loop (--rps R: requests start on schedule whatever the latency, and
+their latency counts from the scheduled start, so queueing is not hidden).
+For every step it reports:
+
+    throughput, error rate and status codes
+    latency percentiles and histogram, overall and per route
+    in flight:  mean concurrent requests (throughput x mean latency), the
+                Lambda concurrency the step would need
+    MongoDB server-side opcounters (serverStatus) and operations per request
+
+and flags the first saturated step: error rate over --max-error-rate, p99
+over --slo-ms, throughput under 90% of the --rps target, or, with
+--concurrency, throughput growing less than 5% over the previous step.
+
+Targets:
+    in-process (default)  the handlers, called on threads in this process, on
+                          the in-memory stand-in of benchmarks/fake_mongo.py or
+                          on --mongodb-uri; Cognito is stubbed. The stand-in
+                          serializes every operation, so only the mongod
+                          target tells where the database saturates.
+    --base-url URL        a running stack: `serverless offline`
+                          (http://localhost:3000/dev) or server mode.
+
+Against a running stack the users get unsigned tokens by default, which
+serverless offline and server mode with SERVER_AUTH_MODE=unverified accept;
+--auth login registers and logs them in through the API instead (login
+requests of the mix only succeed then). With --mongodb-uri the tasks are
+seeded straight into --database and deleted afterwards (unless --keep),
+and opcounters are recorded; otherwise they are created through
+POST /tasks/batch and left in place.
+
+Usage:
+    python -m benchmarks.load [--users 50] [--tasks-per-user 200]
+        [--mix getTasks=35,getTask=25,createTask=10,updateTask=15,deleteTask=5,login=5,getTaskStats=5]
+        [--concurrency 1 2 4 8 16 32 | --rps 50 100 200 400] [--duration 10]
+        [--base-url http://localhost:3000/dev] [--auth mint|login]
+        [--mongodb-uri URI] [--database NAME] [--keep] [--slo-ms 500] [--output FILE]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.client import HTTPConnection, HTTPException, HTTPSConnection
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+from benchmarks.bench_cold_start import ENVIRONMENT, LambdaContext
+from benchmarks.bench_handlers import (
+    PASSWORD, RESULTS_DIR, SEARCH_TERMS, STATUSES, SYNC_LAG,
+    api_event, create_indexes, decompress, new_task, patched_handlers, percentile, response_json, seed
+)
+from benchmarks.fake_mongo import FakeMongoClient
+from server.routes import ROUTES, Route, load_handler
+
+# Scratch database of the in-process target, dropped before and after the run
+DATABASE = "load_test"
+
+DEFAULT_MIX = {
+    "getTasks": 35, "getTask": 25, "createTask": 10, "updateTask": 15,
+    "deleteTask": 5, "login": 5, "getTaskStats": 5,
+}
+
+# Upper bounds (ms) of the latency histogram buckets; the last one is open
+HISTOGRAM_BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+# Unrecorded closed-loop traffic before the first step, so cold starts and
+# empty caches do not land in it
+WARMUP_SECONDS = 2.0
+
+# Create operations per POST /tasks/batch while seeding through the API
+SEED_BATCH_SIZE = 200
+
+# Secret of the unsigned (never verified) tokens of the synthetic users
+MINT_SECRET = "load-test"
+
+ROUTES_BY_NAME = {route.name: route for route in ROUTES}
+
+
+class User:
+    """
+    Synthetic user and the client state it keeps between requests.
+    """
+
+    def __init__(self, user_id: str, email: str, token: Optional[str] = None):
+        self.user_id = user_id
+        self.email = email
+        self.token = token
+        self.task_ids: List[str] = []
+        self.cursor: Optional[str] = None
+        self.sequence = 0
+
+
+class Operation(NamedTuple):
+    route: Route
+    path: str
+    path_parameters: Optional[Dict[str, str]]
+    query: Optional[Dict[str, str]]
+    body: Optional[Dict[str, Any]]
+    user: User
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    """
+    Parses "getTasks=35,getTask=25" into route weights.
+    """
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in ROUTES_BY_NAME:
+            raise argparse.ArgumentTypeError(f"unknown route {name!r}; routes: {', '.join(ROUTES_BY_NAME)}")
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"invalid weight for {name}: {weight!r}")
+    if not mix or sum(mix.values()) <= 0:
+        raise argparse.ArgumentTypeError("the mix needs at least one positive weight")
+    return mix
+
+
+class Traffic:
+    """
+    Draws the next request of the mix for a random user, and follows the
+    responses like a client does: listings walk through their pages, created
+    tasks join the user's tasks and deleted ones leave them.
+    """
+
+    def __init__(self, users: List[User], mix: Dict[str, float], rng: random.Random):
+        self.users = users
+        self._names = list(mix)
+        self._weights = list(mix.values())
+        self._rng = rng
+        self._lock = threading.Lock()
+        self._searches = 0
+        self._builders: Dict[str, Callable[[User], Tuple[str, Any, Any, Any]]] = {
+            "register": lambda user: ("/auth/register", None, None, {
+                "email": f"load+{uuid.uuid4().hex}@example.com", "password": PASSWORD, "name": "Load User"
+            }),
+            "login": lambda user: ("/auth/login", None, None, {"email": user.email, "password": PASSWORD}),
+            "refresh": lambda user: ("/auth/refresh", None, None, {
+                "email": user.email, "refresh_token": user.token or ""
+            }),
+            "health": lambda user: ("/health", None, None, None),
+            "getTasks": self._get_tasks,
+            "getTaskStats": lambda user: ("/tasks/stats", None, None, None),
+            "getTaskChanges": self._get_task_changes,
+            "searchTasks": self._search_tasks,
+            "getTaskOverview": lambda user: ("/tasks/overview", None, {"limit": "50"}, None),
+            "getTask": lambda user: self._task(self._pick_task(user)),
+            "createTask": lambda user: ("/tasks", None, None, new_task(self._rng)),
+            "batchTasks": self._batch_tasks,
+            "updateTask": lambda user: self._task(self._pick_task(user), {
+                "status": self._rng.choice(STATUSES), "title": new_task(self._rng)["title"]
+            }),
+            "deleteTask": self._delete_task,
+        }
+
+    def next_operation(self) -> Operation:
+        with self._lock:
+            name = self._rng.choices(self._names, self._weights)[0]
+            user = self._rng.choice(self.users)
+            path, path_parameters, query, body = self._builders[name](user)
+        return Operation(ROUTES_BY_NAME[name], path, path_parameters, query, body, user)
+
+    def observe(self, operation: Operation, status: int, payload: Callable[[], Any]) -> None:
+        if not 200 <= status < 300:
+            return
+        name = operation.route.name
+        user = operation.user
+        if name == "getTasks":
+            user.cursor = payload().get("next_cursor")
+        elif name == "createTask":
+            task_id = payload()["id"]
+            with self._lock:
+                user.task_ids.append(task_id)
+                user.sequence += 1
+        elif name == "batchTasks":
+            created = [result["task"]["id"] for result in payload()["results"] if result["status"] == 201]
+            with self._lock:
+                user.task_ids += created
+                user.sequence += len(operation.body["operations"])
+        elif name in ("updateTask", "deleteTask"):
+            with self._lock:
+                user.sequence += 1
+
+    def _pick_task(self, user: User) -> str:
+        # A missing task answers 404 and counts as an error, as it would for a client
+        return self._rng.choice(user.task_ids) if user.task_ids else str(uuid.uuid4())
+
+    def _task(self, task_id: str, body: Optional[Dict[str, Any]] = None) -> Tuple[str, Any, Any, Any]:
+        return f"/tasks/{task_id}", {"taskId": task_id}, None, body
+
+    def _get_tasks(self, user: User) -> Tuple[str, Any, Any, Any]:
+        query = {"limit": "50"}
+        if user.cursor:
+            query["cursor"] = user.cursor
+        return "/tasks", None, query, None
+
+    def _get_task_changes(self, user: User) -> Tuple[str, Any, Any, Any]:
+        from utils.pagination import encode_sync_token
+        since = max(0, user.sequence - self._rng.randrange(SYNC_LAG))
+        return "/tasks/changes", None, {"since": encode_sync_token(since, time.time())}, None
+
+    def _search_tasks(self, user: User) -> Tuple[str, Any, Any, Any]:
+        self._searches += 1
+        return "/tasks/search", None, {"q": SEARCH_TERMS[self._searches % len(SEARCH_TERMS)], "limit": "20"}, None
+
+    def _batch_tasks(self, user: User) -> Tuple[str, Any, Any, Any]:
+        operations = [{"op": "create", "data": new_task(self._rng)}]
+        operations += [
+            {"op": "update", "id": self._pick_task(user), "data": {"status": self._rng.choice(STATUSES)}}
+            for _ in range(2)
+        ]
+        return "/tasks/batch", None, None, {"operations": operations}
+
+    def _delete_task(self, user: User) -> Tuple[str, Any, Any, Any]:
+        if not user.task_ids:
+            return self._task(str(uuid.uuid4()))
+        # Swap with the last one, so removing is O(1)
+        index = self._rng.randrange(len(user.task_ids))
+        user.task_ids[index], user.task_ids[-1] = user.task_ids[-1], user.task_ids[index]
+        return self._task(user.task_ids.pop())
+
+
+class InProcessTarget:
+    """
+    Calls the handlers directly, with the events API Gateway would send.
+    """
+
+    def __init__(self):
+        self._handlers = {route.name: load_handler(route.handler) for route in ROUTES}
+        self._context = LambdaContext()
+
+    def send(self, operation: Operation) -> Tuple[int, Callable[[], Any]]:
+        route = operation.route
+        event = api_event(
+            route.method, route.path, operation.path, operation.path_parameters, operation.query,
+            operation.body, route.authorized, operation.user.user_id
+        )
+        try:
+            response = self._handlers[route.name](event, self._context)
+        except Exception:
+            return 0, dict
+        return response["statusCode"], lambda: response_json(response)
+
+
+class HttpTarget:
+    """
+    Sends the requests to a running stack, over one keep-alive connection per thread.
+    """
+
+    def __init__(self, base_url: str, timeout: float = 30.0):
+        parsed = urlsplit(base_url)
+        self._connection_class = HTTPSConnection if parsed.scheme == "https" else HTTPConnection
+        self._host = parsed.hostname
+        self._port = parsed.port
+        self._base_path = parsed.path.rstrip("/")
+        self._timeout = timeout
+        self._local = threading.local()
+
+    def send(self, operation: Operation) -> Tuple[int, Callable[[], Any]]:
+        url = self._base_path + operation.path
+        if operation.query:
+            url += "?" + urlencode(operation.query)
+        headers = {"Accept": "application/json", "Accept-Encoding": "gzip", "Content-Type": "application/json"}
+        if operation.route.authorized and operation.user.token:
+            headers["Authorization"] = f"Bearer {operation.user.token}"
+        body = json.dumps(operation.body) if operation.body is not None else None
+
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = self._connection_class(self._host, self._port, timeout=self._timeout)
+        try:
+            connection.request(operation.route.method, url, body, headers)
+            response = connection.getresponse()
+            raw = response.read()
+        except (OSError, HTTPException):
+            connection.close()
+            self._local.connection = None
+            return 0, dict
+        encoding = response.getheader("Content-Encoding")
+        return response.status, lambda: json.loads(decompress(raw, encoding) or b"{}")
+
+
+class Recorder:
+    """
+    Collects the latency and status of every request of a step.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latencies: Dict[str, List[float]] = defaultdict(list)
+        self._statuses: Dict[str, Counter] = defaultdict(Counter)
+
+    def record(self, name: str, seconds: float, status: int) -> None:
+        with self._lock:
+            self._latencies[name].append(seconds)
+            self._statuses[name][status] += 1
+
+    def summary(self, elapsed: float) -> Dict[str, Any]:
+        """
+        Aggregates the step. Responses other than 2xx/3xx, and requests that
+        got no response (status 0), are errors.
+        """
+        with self._lock:
+            latencies = [seconds for values in self._latencies.values() for seconds in values]
+            statuses = sum(self._statuses.values(), Counter())
+            operations = {
+                name: {
+                    "completed": len(values),
+                    "error_rate": _error_rate(self._statuses[name]),
+                    **_latency_stats(values),
+                }
+                for name, values in sorted(self._latencies.items())
+            }
+        throughput = len(latencies) / elapsed if elapsed else 0.0
+        stats = _latency_stats(latencies)
+        return {
+            "completed": len(latencies),
+            "elapsed_s": elapsed,
+            "throughput_rps": throughput,
+            "error_rate": _error_rate(statuses),
+            **stats,
+            "in_flight": throughput * stats["mean_ms"] / 1000,
+            "histogram": histogram(latencies),
+            "statuses": {str(status): count for status, count in sorted(statuses.items())},
+            "operations": operations,
+        }
+
+
+def _error_rate(statuses: Counter) -> float:
+    total = sum(statuses.values())
+    errors = sum(count for status, count in statuses.items() if not 200 <= status < 400)
+    return errors / total if total else 0.0
+
+
+def _latency_stats(latencies: List[float]) -> Dict[str, float]:
+    if not latencies:
+        return {"mean_ms": 0.0, "p50_ms": 0.0, "p90_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+    ordered = sorted(latencies)
+    return {
+        "mean_ms": sum(ordered) / len(ordered) * 1000,
+        "p50_ms": percentile(ordered, 50) * 1000,
+        "p90_ms": percentile(ordered, 90) * 1000,
+        "p99_ms": percentile(ordered, 99) * 1000,
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+def histogram(latencies: List[float]) -> Dict[str, int]:
+    """
+    Counts the latencies per bucket, keyed by the bucket's upper bound in ms.
+    """
+    counts = dict.fromkeys([str(bound) for bound in HISTOGRAM_BOUNDS_MS] + ["+Inf"], 0)
+    for seconds in latencies:
+        milliseconds = seconds * 1000
+        bucket = next((str(bound) for bound in HISTOGRAM_BOUNDS_MS if milliseconds <= bound), "+Inf")
+        counts[bucket] += 1
+    return counts
+
+
+def opcounters(client: Any) -> Optional[Dict[str, int]]:
+    """
+    Reads the server's opcounters, or None when serverStatus is not allowed.
+    """
+    try:
+        counters = client["admin"].command("serverStatus")["opcounters"]
+    except PyMongoError:
+        return None
+    return {name: int(value) for name, value in counters.items() if name != "deprecated"}
+
+
+def run_closed(target: Any, traffic: Traffic, concurrency: int, duration: float) -> Tuple[Recorder, float]:
+    """
+    Runs `concurrency` clients that send their next request as soon as the
+    previous one answers.
+    """
+    recorder = Recorder()
+    start = time.perf_counter()
+    deadline = start + duration
+
+    def client() -> None:
+        while time.perf_counter() < deadline:
+            operation = traffic.next_operation()
+            sent = time.perf_counter()
+            status, payload = target.send(operation)
+            recorder.record(operation.route.name, time.perf_counter() - sent, status)
+            traffic.observe(operation, status, payload)
+
+    threads = [threading.Thread(target=client, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder, time.perf_counter() - start
+
+
+def run_open(
+    target: Any,
+    traffic: Traffic,
+    rps: float,
+    duration: float,
+    max_in_flight: int
+) -> Tuple[Recorder, float]:
+    """
+    Starts `rps` requests per second on schedule, on up to `max_in_flight`
+    threads. Latency counts from the scheduled start, so the time a request
+    waits for a free thread is part of it.
+    """
+    recorder = Recorder()
+
+    def call(scheduled: float) -> None:
+        operation = traffic.next_operation()
+        status, payload = target.send(operation)
+        recorder.record(operation.route.name, time.perf_counter() - scheduled, status)
+        traffic.observe(operation, status, payload)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        for number in range(int(rps * duration)):
+            scheduled = start + number / rps
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(call, scheduled)
+    return recorder, time.perf_counter() - start
+
+
+def saturation_reasons(
+    step: Dict[str, Any],
+    previous: Optional[Dict[str, Any]],
+    slo_ms: float,
+    max_error_rate: float
+) -> List[str]:
+    """
+    Returns why a step is past the saturation point (empty if it is not).
+    """
+    reasons = []
+    if step["error_rate"] > max_error_rate:
+        reasons.append(f"error rate {step['error_rate']:.1%}")
+    if step["p99_ms"] > slo_ms:
+        reasons.append(f"p99 {step['p99_ms']:.0f} ms over the {slo_ms:.0f} ms SLO")
+    if step["mode"] == "rps" and step["throughput_rps"] < 0.9 * step["target"]:
+        reasons.append(f"throughput {step['throughput_rps']:.1f} req/s under the {step['target']:g} req/s target")
+    if step["mode"] == "concurrency" and previous and step["throughput_rps"] < 1.05 * previous["throughput_rps"]:
+        reasons.append(
+            f"throughput stopped growing ({previous['throughput_rps']:.1f} -> {step['throughput_rps']:.1f} req/s)"
+        )
+    return reasons
+
+
+def run_steps(
+    target: Any,
+    traffic: Traffic,
+    mode: str,
+    targets: List[float],
+    duration: float,
+    client: Any = None,
+    max_in_flight: int = 256,
+    slo_ms: float = 500.0,
+    max_error_rate: float = 0.01,
+    warmup: float = WARMUP_SECONDS,
+    report: Callable[[Dict[str, Any]], None] = lambda step: None
+) -> List[Dict[str, Any]]:
+    """
+    Runs one step per concurrency level or request rate.
+
+    Args:
+        client: MongoDB client whose server opcounters are recorded, if any
+
+    Returns:
+        The summary of each step, with its saturation reasons
+    """
+    if warmup > 0:
+        run_closed(target, traffic, 1, warmup)
+
+    steps: List[Dict[str, Any]] = []
+    for value in targets:
+        before = opcounters(client) if client is not None else None
+        if mode == "rps":
+            recorder, elapsed = run_open(target, traffic, value, duration, max_in_flight)
+        else:
+            recorder, elapsed = run_closed(target, traffic, int(value), duration)
+        after = opcounters(client) if client is not None else None
+
+        step = {"mode": mode, "target": value, **recorder.summary(elapsed)}
+        if before is not None and after is not None:
+            operations = {name: after[name] - before.get(name, 0) for name in after}
+            step["mongo_ops"] = operations
+            step["mongo_ops_per_request"] = sum(operations.values()) / step["completed"] if step["completed"] else 0.0
+        else:
+            step["mongo_ops"] = None
+        step["saturated"] = saturation_reasons(step, steps[-1] if steps else None, slo_ms, max_error_rate)
+        steps.append(step)
+        report(step)
+    return steps
+
+
+def mint_users(count: int, rng: random.Random) -> List[User]:
+    """
+    Synthesizes users with unsigned id tokens.
+    """
+    from jose import jwt
+
+    users = []
+    expires = int(time.time()) + 24 * 3600
+    for number in range(count):
+        user_id = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+        email = f"load+{user_id[:8]}-{number}@example.com"
+        token = jwt.encode({
+            "sub": user_id, "email": email, "name": f"Load User {number}", "token_use": "id", "exp": expires
+        }, MINT_SECRET, algorithm="HS256")
+        users.append(User(user_id, email, token))
+    return users
+
+
+def login_users(target: HttpTarget, users: List[User]) -> None:
+    """
+    Registers the users through the API and replaces their tokens with the
+    id tokens of their logins.
+    """
+    from jose import jwt
+
+    for user in users:
+        credentials = {"email": user.email, "password": PASSWORD}
+        register = Operation(ROUTES_BY_NAME["register"], "/auth/register", None, None, {
+            **credentials, "name": "Load User"
+        }, user)
+        target.send(register)
+        status, payload = target.send(Operation(ROUTES_BY_NAME["login"], "/auth/login", None, None, credentials, user))
+        if status != 200:
+            raise RuntimeError(f"Could not log {user.email} in (status {status})")
+        user.token = payload()["id_token"]
+        user.user_id = jwt.get_unverified_claims(user.token)["sub"]
+
+
+def seed_users(database: Any, users: List[User], tasks_per_user: int, rng: random.Random) -> None:
+    """
+    Writes the tasks of the users straight into the database.
+    """
+    for user in users:
+        user.task_ids = seed(database, tasks_per_user, rng, user.user_id, indexes=False)
+        user.sequence = tasks_per_user
+    create_indexes(database)
+
+
+def seed_users_through_api(target: Any, users: List[User], tasks_per_user: int, rng: random.Random) -> None:
+    """
+    Creates the tasks of the users with POST /tasks/batch.
+    """
+    route = ROUTES_BY_NAME["batchTasks"]
+    for user in users:
+        for start in range(0, tasks_per_user, SEED_BATCH_SIZE):
+            count = min(SEED_BATCH_SIZE, tasks_per_user - start)
+            operations = [{"op": "create", "data": new_task(rng)} for _ in range(count)]
+            status, payload = target.send(Operation(route, "/tasks/batch", None, None, {"operations": operations}, user))
+            if status != 200:
+                raise RuntimeError(f"Could not seed the tasks of {user.email} (status {status})")
+            user.task_ids += [result["task"]["id"] for result in payload()["results"] if result["status"] == 201]
+        user.sequence = len(user.task_ids)
+
+
+def delete_users(database: Any, users: List[User]) -> None:
+    user_ids = [user.user_id for user in users]
+    database["tasks"].delete_many({"user_id": {"$in": user_ids}})
+    database["task_tombstones"].delete_many({"user_id": {"$in": user_ids}})
+    database["task_stats"].delete_many({"_id": {"$in": user_ids}})
+
+
+def run_in_process(
+    users: int,
+    tasks_per_user: int,
+    mix: Dict[str, float],
+    mode: str,
+    targets: List[float],
+    duration: float,
+    mongodb_uri: Optional[str] = None,
+    seed_value: int = 42,
+    **options: Any
+) -> List[Dict[str, Any]]:
+    """
+    Runs the steps against the handlers in this process, on the scratch database.
+    """
+    rng = random.Random(seed_value)
+    client = MongoClient(mongodb_uri) if mongodb_uri else FakeMongoClient()
+    try:
+        client.drop_database(DATABASE)
+        synthetic = mint_users(users, rng)
+        seed_users(client[DATABASE], synthetic, tasks_per_user, rng)
+        # The read cache stays on, as in the deployed handlers
+        with patched_handlers(client, DATABASE, read_cache=True):
+            traffic = Traffic(synthetic, mix, rng)
+            return run_steps(InProcessTarget(), traffic, mode, targets, duration, client, **options)
+    finally:
+        client.drop_database(DATABASE)
+        client.close()
+
+
+def run_http(
+    base_url: str,
+    users: int,
+    tasks_per_user: int,
+    mix: Dict[str, float],
+    mode: str,
+    targets: List[float],
+    duration: float,
+    auth: str = "mint",
+    mongodb_uri: Optional[str] = None,
+    database: str = "task_management",
+    keep: bool = False,
+    seed_value: int = 42,
+    **options: Any
+) -> List[Dict[str, Any]]:
+    """
+    Runs the steps against a running stack.
+    """
+    rng = random.Random(seed_value)
+    target = HttpTarget(base_url)
+    synthetic = mint_users(users, rng)
+    if auth == "login":
+        login_users(target, synthetic)
+
+    client = MongoClient(mongodb_uri) if mongodb_uri else None
+    try:
+        if client is not None:
+            seed_users(client[database], synthetic, tasks_per_user, rng)
+        else:
+            seed_users_through_api(target, synthetic, tasks_per_user, rng)
+        traffic = Traffic(synthetic, mix, rng)
+        return run_steps(target, traffic, mode, targets, duration, client, **options)
+    finally:
+        if client is not None:
+            if not keep:
+                delete_users(client[database], synthetic)
+            client.close()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--tasks-per-user", type=int, default=200)
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help="Route weights, name=weight,...")
+    steps = parser.add_mutually_exclusive_group()
+    steps.add_argument("--concurrency", type=int, nargs="+", help="Closed-loop clients of each step")
+    steps.add_argument("--rps", type=float, nargs="+", help="Open-loop request rate of each step")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per step")
+    parser.add_argument("--max-in-flight", type=int, default=256, help="Threads of the open-loop steps")
+    parser.add_argument("--slo-ms", type=float, default=500.0, help="p99 latency past which a step is saturated")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--base-url", help="Running stack to load, e.g. http://localhost:3000/dev")
+    parser.add_argument("--auth", choices=("mint", "login"), default="mint")
+    parser.add_argument("--mongodb-uri", help="mongod the target uses (seeding and opcounters)")
+    parser.add_argument("--database", default=os.environ.get("MONGODB_DB_NAME", "task_management"),
+                        help="Database of the running stack")
+    parser.add_argument("--keep", action="store_true", help="Keep the seeded tasks of a running stack")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/load-<target>-<time>.json)")
+    args = parser.parse_args()
+
+    mode = "rps" if args.rps else "concurrency"
+    targets = args.rps or args.concurrency or [1, 2, 4, 8, 16, 32]
+    options = {"max_in_flight": args.max_in_flight, "slo_ms": args.slo_ms, "max_error_rate": args.max_error_rate}
+    if args.base_url and args.auth == "mint" and {"login", "refresh"} & set(args.mix):
+        print("WARNING login/refresh requests fail for users that were not registered; use --auth login")
+
+    def report(step: Dict[str, Any]) -> None:
+        label = f"{step['target']:g} {'req/s' if mode == 'rps' else 'clients'}"
+        ops = f"{step['mongo_ops_per_request']:.2f}" if step["mongo_ops"] is not None else "-"
+        print(
+            f"{label:>14} {step['completed']:>9} {step['throughput_rps']:>9.1f} {step['error_rate']:>7.1%}"
+            f" {step['p50_ms']:>8.1f} {step['p90_ms']:>8.1f} {step['p99_ms']:>8.1f} {step['max_ms']:>8.1f}"
+            f" {step['in_flight']:>9.1f} {ops:>8}  {'; '.join(step['saturated'])}"
+        )
+
+    if args.base_url:
+        description = args.base_url
+    else:
+        description = f"in-process handlers, MongoDB: {args.mongodb_uri or 'in-memory stand-in'}"
+    print(f"Target: {description}")
+    print(f"Users: {args.users} x {args.tasks_per_user} tasks; mix: "
+          + ", ".join(f"{name} {weight:g}" for name, weight in args.mix.items()))
+    print(f"{'step':>14} {'completed':>9} {'req/s':>9} {'errors':>7} {'p50 ms':>8} {'p90 ms':>8}"
+          f" {'p99 ms':>8} {'max ms':>8} {'in flight':>9} {'ops/req':>8}")
+
+    if args.base_url:
+        results = run_http(
+            args.base_url, args.users, args.tasks_per_user, args.mix, mode, targets, args.duration, args.auth,
+            args.mongodb_uri, args.database, args.keep, args.seed, report=report, **options
+        )
+    else:
+        # Before the handler modules are imported, they read it at import
+        os.environ.update({
+            **ENVIRONMENT, "POWERTOOLS_LOG_LEVEL": "CRITICAL", "LOG_LEVEL": "CRITICAL", "METRICS_SINK": "memory",
+            "MONGODB_DB_NAME": DATABASE,
+        })
+        results = run_in_process(
+            args.users, args.tasks_per_user, args.mix, mode, targets, args.duration, args.mongodb_uri,
+            args.seed, report=report, **options
+        )
+
+    saturated = next((index for index, step in enumerate(results) if step["saturated"]), None)
+    if saturated is None:
+        print("No step saturated; raise the load to find the saturation point")
+        detail = results[-1]
+    else:
+        print(f"Saturated at {results[saturated]['target']:g}: {'; '.join(results[saturated]['saturated'])}")
+        if saturated > 0:
+            sustainable = results[saturated - 1]
+            print(f"Highest sustainable step: {sustainable['target']:g} ({sustainable['throughput_rps']:.1f} req/s)")
+        detail = results[max(0, saturated - 1)]
+
+    print(f"\nStep {detail['target']:g} per route:")
+    for name, operation in detail["operations"].items():
+        print(f"  {name:<16} {operation['completed']:>8} {operation['error_rate']:>7.1%}"
+              f" p50 {operation['p50_ms']:>8.1f}  p99 {operation['p99_ms']:>8.1f} ms")
+    print("Latency histogram (ms):")
+    width = max(detail["histogram"].values()) or 1
+    for bound, count in detail["histogram"].items():
+        print(f"  <= {bound:>5} {count:>8} {'#' * round(40 * count / width)}")
+    if detail["mongo_ops"]:
+        print("MongoDB opcounters: " + ", ".join(f"{name} {count}" for name, count in detail["mongo_ops"].items()))
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"load-{'http' if args.base_url else 'inprocess'}-{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as results_file:
+        json.dump({
+            "target": description,
+            "created_at": datetime.utcnow().isoformat(),
+            "users": args.users,
+            "tasks_per_user": args.tasks_per_user,
+            "mix": args.mix,
+            "duration_s": args.duration,
+            "steps": results,
+        }, results_file, indent=2)
+    print(f"Results saved to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1 @@
+# Este archivo está intencionalmente vacío para que Python reconozca el directorio como un paquete 
\ No newline at end of file
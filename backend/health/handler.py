@@ -0,0 +1,96 @@
+import os
+import time
+from typing import Dict, Any, List, Optional, Tuple
+from aws_lambda_powertools import Logger
+from utils.metrics import HandlerMetrics
+from utils.http import success_response, error_response
+from utils.db import check_indexes, get_command_stats, get_pool_stats, warm_up
+from utils.cache import get_cache_stats
+
+# Configure logger and phase metrics
+logger = Logger(service="health-service")
+metrics = HandlerMetrics(service="health-service")
+
+# The index audit runs listIndexes and $indexStats on every collection, so
+# /health/details reuses its last result for this long
+HEALTH_INDEXES_TTL_SECONDS = float(os.environ.get("HEALTH_INDEXES_TTL_SECONDS", "300"))
+_index_report: Optional[Tuple[float, Dict[str, Dict[str, List[str]]]]] = None
+
+# Open the MongoDB connection during the Lambda init phase
+if os.environ.get("MONGODB_WARM_UP", "").lower() == "true":
+    try:
+        warm_up()
+    except Exception:
+        logger.exception("MongoDB warm-up failed")
+
+
+@logger.inject_lambda_context
+@metrics.measure
+def health(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Liveness probe: pings MongoDB and nothing else, so load balancers and
+    uptime checks can call it often without loading the database.
+    
+    Args:
+        event: API Gateway event
+        context: Lambda context
+        
+    Returns:
+        HTTP response with status "ok", or 503 when MongoDB does not answer
+    """
+    try:
+        warm_up()
+        return success_response({"status": "ok"})
+        
+    except Exception as e:
+        logger.exception("Error checking service health")
+        return error_response("Error checking service health", 503, "unhealthy")
+
+
+def get_index_report() -> Dict[str, Dict[str, List[str]]]:
+    """
+    Gets the index audit of check_indexes, cached for HEALTH_INDEXES_TTL_SECONDS.
+    """
+    global _index_report
+    now = time.monotonic()
+    if _index_report is None or now - _index_report[0] >= HEALTH_INDEXES_TTL_SECONDS:
+        _index_report = (now, check_indexes())
+    return _index_report[1]
+
+
+@logger.inject_lambda_context
+@metrics.measure
+def health_details(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Reports the state of the MongoDB indexes declared in utils/db.py, the
+    connection pool and command statistics and the statistics of the
+    in-process caches loaded in this process. Requires authentication.
+    
+    Args:
+        event: API Gateway event
+        context: Lambda context
+        
+    Returns:
+        HTTP response with status "ok", or "degraded" when a declared index is missing
+    """
+    try:
+        indexes = get_index_report()
+        missing = any(collection["missing"] for collection in indexes.values())
+        unused = any(collection["unused"] for collection in indexes.values())
+        
+        if missing:
+            logger.warning("Missing MongoDB indexes", extra={"indexes": indexes})
+        elif unused:
+            logger.info("Unused MongoDB indexes", extra={"indexes": indexes})
+        
+        return success_response({
+            "status": "degraded" if missing else "ok",
+            "indexes": indexes,
+            "pool": get_pool_stats(),
+            "commands": get_command_stats(),
+            "caches": get_cache_stats()
+        })
+        
+    except Exception as e:
+        logger.exception("Error checking service health")
+        return error_response("Error checking service health", 503, "unhealthy")
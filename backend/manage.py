@@ -0,0 +1,116 @@
+"""
+Maintenance commands for the task management backend.
+
+Usage:
+    python manage.py ensure-indexes
+    python manage.py check-indexes
+    python manage.py rebuild-stats [--user-id USER_ID]
+    python manage.py backfill-sequence [--user-id USER_ID]
+    python manage.py slow-queries [--hours HOURS] [--limit LIMIT] [--sort {total_ms,count,max_ms}]
+"""
+import argparse
+import json
+import os
+import sys
+from typing import List, Optional
+
+from dotenv import load_dotenv
+
+from utils.db import ensure_indexes, check_indexes, slow_query_report
+from tasks.stats import rebuild_stats, backfill_sequence
+
+
+def ensure_indexes_command(args: argparse.Namespace) -> int:
+    """
+    Creates the declared MongoDB indexes. Meant to run once per deployment.
+    """
+    created = ensure_indexes(args.db_name)
+    print(json.dumps(created, indent=2))
+    return 0
+
+
+def check_indexes_command(args: argparse.Namespace) -> int:
+    """
+    Reports missing, unused and undeclared indexes.
+    Exits with status 1 when a declared index is missing.
+    """
+    report = check_indexes(args.db_name)
+    print(json.dumps(report, indent=2))
+    missing = any(collection["missing"] for collection in report.values())
+    return 1 if missing else 0
+
+
+def rebuild_stats_command(args: argparse.Namespace) -> int:
+    """
+    Recomputes the per-user task counters from the tasks collection.
+    """
+    reset = rebuild_stats(args.user_id)
+    print(json.dumps({"rebuilt": args.user_id or "all", "reset": reset}))
+    return 0
+
+
+def backfill_sequence_command(args: argparse.Namespace) -> int:
+    """
+    Numbers the tasks created before delta sync so GET /tasks/changes returns them.
+    """
+    numbered = backfill_sequence(args.user_id)
+    print(json.dumps({"numbered": numbered}))
+    return 0
+
+
+def slow_queries_command(args: argparse.Namespace) -> int:
+    """
+    Reports the query shapes with the most time spent in slow commands, with
+    their last plan. Exits with status 1 when one of them scans the whole
+    collection or sorts in memory.
+    """
+    report = slow_query_report(args.db_name, hours=args.hours, limit=args.limit, sort=args.sort)
+    print(json.dumps(report, indent=2))
+    flagged = any(shape["collscan"] or shape["in_memory_sort"] for shape in report)
+    return 1 if flagged else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Task management maintenance commands")
+    parser.add_argument("--db-name", default=None, help="Database name (defaults to MONGODB_DB_NAME)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser(
+        "ensure-indexes", help="Create the declared indexes"
+    ).set_defaults(func=ensure_indexes_command)
+    subparsers.add_parser(
+        "check-indexes", help="Report missing and unused indexes"
+    ).set_defaults(func=check_indexes_command)
+    rebuild_parser = subparsers.add_parser(
+        "rebuild-stats", help="Recompute the task counters with an aggregation pipeline"
+    )
+    rebuild_parser.add_argument("--user-id", default=None, help="Only rebuild this user's counters")
+    rebuild_parser.set_defaults(func=rebuild_stats_command)
+    backfill_parser = subparsers.add_parser(
+        "backfill-sequence", help="Number the tasks written before delta sync"
+    )
+    backfill_parser.add_argument("--user-id", default=None, help="Only number this user's tasks")
+    backfill_parser.set_defaults(func=backfill_sequence_command)
+    slow_parser = subparsers.add_parser(
+        "slow-queries", help="Report the slowest query shapes and their plans"
+    )
+    slow_parser.add_argument("--hours", type=float, default=24, help="Only samples of the last hours")
+    slow_parser.add_argument("--limit", type=int, default=10, help="Number of shapes reported")
+    slow_parser.add_argument(
+        "--sort", choices=["total_ms", "count", "max_ms"], default="total_ms", help="Ranking of the shapes"
+    )
+    slow_parser.set_defaults(func=slow_queries_command)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    load_dotenv()
+    args = build_parser().parse_args(argv)
+    if args.db_name:
+        os.environ["MONGODB_DB_NAME"] = args.db_name
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,35 @@
+"""
+Runs the ASGI server:
+
+    python -m server
+
+Host, port and log level come from SERVER_HOST, SERVER_PORT and
+SERVER_LOG_LEVEL. Requires uvicorn (requirements-server.txt).
+"""
+import os
+import sys
+
+
+def main() -> int:
+    try:
+        import uvicorn
+    except ImportError:
+        print("uvicorn is not installed; run: pip install -r requirements-server.txt", file=sys.stderr)
+        return 1
+
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    uvicorn.run(
+        "server.app:create_app",
+        factory=True,
+        host=os.environ.get("SERVER_HOST", "0.0.0.0"),
+        port=int(os.environ.get("SERVER_PORT", "3000")),
+        log_level=os.environ.get("SERVER_LOG_LEVEL", "info"),
+        lifespan="on",
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
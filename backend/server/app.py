@@ -0,0 +1,326 @@
+"""
+ASGI application that serves the Lambda handlers from one long-running process.
+
+Each request is translated into an API Gateway (REST) proxy event, the handler
+runs on a bounded thread pool (the handlers and pymongo are blocking) and its
+response dict is written back. The MongoDB pool is opened once at startup and
+shared by all requests.
+
+The server also streams task change notifications at EVENTS_PATH as
+server-sent events (server/notifications.py), which Lambda cannot do.
+"""
+import asyncio
+import base64
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from aws_lambda_powertools import Logger
+
+from server.log_context import isolate_log_keys, run_in_request_context
+from server.notifications import Broker, ChangeWatcher, format_event
+from server.routes import ROUTES, Route, Router, load_handler
+
+logger = Logger(service="server")
+
+# Stage prefix stripped from request paths, so clients configured for
+# serverless-offline (http://host:3000/dev) work unchanged
+BASE_PATH = os.environ.get("SERVER_BASE_PATH", "/dev").rstrip("/")
+
+# Threads running handlers concurrently; keep it at or below MONGODB_MAX_POOL_SIZE
+WORKERS = int(os.environ.get("SERVER_WORKERS", "32"))
+
+# How protected routes get their claims: "jwks" verifies the Bearer id token
+# against the user pool keys (utils/jwt_auth.py); "unverified" decodes it
+# without checking it, like serverless-offline, for development only.
+AUTH_MODE = os.environ.get("SERVER_AUTH_MODE", "jwks")
+
+# Server-sent events stream of the user's task changes, and the interval of
+# the comments that keep idle connections (and proxies) open
+EVENTS_PATH = "/tasks/events"
+EVENTS_HEARTBEAT_SECONDS = float(os.environ.get("SERVER_EVENTS_HEARTBEAT_SECONDS", "15"))
+
+CORS_HEADERS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Credentials": "true",
+    "Access-Control-Allow-Headers": "Content-Type,Authorization,If-Match,If-None-Match,Last-Event-ID",
+    "Access-Control-Expose-Headers": "ETag",
+}
+
+
+class ServerContext:
+    """
+    Minimal Lambda context for handlers running inside the server.
+    """
+
+    memory_limit_in_mb = 0
+
+    def __init__(self, route: Route, request_id: str, deadline: float):
+        self.function_name = route.name
+        self.invoked_function_arn = f"arn:aws:lambda:local:000000000000:function:{route.name}"
+        self.aws_request_id = request_id
+        self._deadline = deadline
+
+    def get_remaining_time_in_millis(self) -> int:
+        return max(int((self._deadline - time.monotonic()) * 1000), 0)
+
+
+def _authorizer_claims(headers: Dict[str, str]) -> Optional[Dict[str, Any]]:
+    """
+    Gets the claims API Gateway's Cognito authorizer would have added.
+    """
+    authorization = headers.get("authorization", "")
+    if AUTH_MODE == "jwks":
+        from utils.jwt_auth import verify_authorization
+        return verify_authorization(authorization)
+
+    scheme, _, token = authorization.partition(" ")
+    if not token:
+        token = scheme
+    if not token:
+        return None
+
+    if AUTH_MODE == "unverified":
+        from jose import jwt
+        try:
+            return jwt.get_unverified_claims(token)
+        except Exception:
+            return None
+    return None
+
+
+def build_event(
+    scope: Dict[str, Any],
+    body: bytes,
+    route: Route,
+    path_parameters: Dict[str, str],
+    claims: Optional[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """
+    Translates an ASGI HTTP request into an API Gateway REST proxy event.
+    """
+    headers: Dict[str, str] = {}
+    multi_headers: Dict[str, List[str]] = {}
+    for raw_name, raw_value in scope.get("headers", []):
+        name, value = raw_name.decode("latin-1"), raw_value.decode("latin-1")
+        multi_headers.setdefault(name, []).append(value)
+        headers[name] = ",".join(multi_headers[name])
+
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"), keep_blank_values=True)
+
+    try:
+        event_body, is_base64 = (body.decode("utf-8"), False) if body else (None, False)
+    except UnicodeDecodeError:
+        event_body, is_base64 = base64.b64encode(body).decode("ascii"), True
+
+    request_context = {
+        "requestId": str(uuid.uuid4()),
+        "stage": BASE_PATH.strip("/") or "$default",
+        "httpMethod": route.method,
+        "resourcePath": route.path,
+        "identity": {"sourceIp": (scope.get("client") or ("", 0))[0]},
+    }
+    if claims is not None:
+        request_context["authorizer"] = {"claims": claims}
+
+    return {
+        "resource": route.path,
+        "path": scope["path"],
+        "httpMethod": route.method,
+        "headers": headers,
+        "multiValueHeaders": multi_headers,
+        "queryStringParameters": {name: values[-1] for name, values in query.items()} or None,
+        "multiValueQueryStringParameters": query or None,
+        "pathParameters": path_parameters or None,
+        "requestContext": request_context,
+        "body": event_body,
+        "isBase64Encoded": is_base64,
+    }
+
+
+async def _read_body(receive: Callable[[], Awaitable[Dict[str, Any]]]) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+async def _send_response(send: Callable, status: int, headers: Dict[str, str], body: bytes) -> None:
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(name.lower().encode("latin-1"), str(value).encode("latin-1")) for name, value in headers.items()],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+def _lambda_response(response: Dict[str, Any]) -> Tuple[int, Dict[str, str], bytes]:
+    """
+    Translates a handler response dict into status, headers and raw body.
+    """
+    body = response.get("body") or ""
+    raw = base64.b64decode(body) if response.get("isBase64Encoded") else body.encode("utf-8")
+    return response.get("statusCode", 200), dict(response.get("headers") or {}), raw
+
+
+class Server:
+    """
+    ASGI application routing serverless.yml paths to the Lambda handlers.
+    """
+
+    def __init__(
+        self,
+        routes: List[Route] = ROUTES,
+        workers: int = WORKERS,
+        watcher: Optional[ChangeWatcher] = None
+    ):
+        self.router = Router(routes)
+        self.handlers = {route.name: load_handler(route.handler) for route in routes}
+        # The handlers run concurrently, so the log keys they append must not be shared
+        isolate_log_keys()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="handler")
+        self.watcher = watcher or ChangeWatcher(Broker())
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive: Callable, send: Callable) -> None:
+        from utils.db import warm_up, close_mongodb_connection
+
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    await asyncio.get_running_loop().run_in_executor(self.executor, warm_up)
+                except Exception:
+                    logger.exception("MongoDB warm-up failed")
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.watcher.stop(timeout=5)
+                self.executor.shutdown(wait=True)
+                close_mongodb_connection()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _claims(self, headers: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        """
+        Verifies the request token on the handler thread pool: with
+        SERVER_AUTH_MODE=jwks it may fetch the JWKS and check an RSA
+        signature, which must not stall the event loop and the open streams.
+        """
+        return await asyncio.get_running_loop().run_in_executor(self.executor, _authorizer_claims, headers)
+
+    async def _http(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        path = scope["path"]
+        if BASE_PATH and (path == BASE_PATH or path.startswith(BASE_PATH + "/")):
+            path = path[len(BASE_PATH):] or "/"
+        method = scope["method"].upper()
+
+        if path == EVENTS_PATH:
+            await self._events(scope, receive, send, method)
+            return
+
+        route, path_parameters, allowed = self.router.match(method, path)
+        body = await _read_body(receive)
+
+        if method == "OPTIONS" and allowed:
+            headers = {**CORS_HEADERS, "Access-Control-Allow-Methods": ",".join(allowed + ["OPTIONS"])}
+            await _send_response(send, 204, headers, b"")
+            return
+        if route is None:
+            status = 405 if allowed else 404
+            await _send_response(send, status, {**CORS_HEADERS, "Content-Type": "application/json"},
+                                 b'{"message":"Not found"}' if status == 404 else b'{"message":"Method not allowed"}')
+            return
+
+        headers = {name.decode("latin-1").lower(): value.decode("latin-1") for name, value in scope.get("headers", [])}
+        claims = await self._claims(headers) if route.authorized else None
+        if route.authorized and not claims:
+            await _send_response(send, 401, {**CORS_HEADERS, "Content-Type": "application/json"},
+                                 b'{"message":"Unauthorized"}')
+            return
+
+        event = build_event(scope, body, route, path_parameters, claims)
+        context = ServerContext(route, event["requestContext"]["requestId"], time.monotonic() + 30)
+        handler = self.handlers[route.name]
+
+        response = await asyncio.get_running_loop().run_in_executor(
+            self.executor, run_in_request_context, handler, event, context
+        )
+        status, response_headers, raw = _lambda_response(response)
+        await _send_response(send, status, response_headers, raw)
+
+    async def _events(self, scope: Dict[str, Any], receive: Callable, send: Callable, method: str) -> None:
+        """
+        Streams the authenticated user's task changes as server-sent events
+        until the client disconnects.
+        """
+        await _read_body(receive)
+        if method == "OPTIONS":
+            await _send_response(send, 204, {**CORS_HEADERS, "Access-Control-Allow-Methods": "GET,OPTIONS"}, b"")
+            return
+        if method != "GET":
+            await _send_response(send, 405, {**CORS_HEADERS, "Content-Type": "application/json"},
+                                 b'{"message":"Method not allowed"}')
+            return
+
+        headers = {name.decode("latin-1").lower(): value.decode("latin-1") for name, value in scope.get("headers", [])}
+        claims = await self._claims(headers)
+        if not claims or not claims.get("sub"):
+            await _send_response(send, 401, {**CORS_HEADERS, "Content-Type": "application/json"},
+                                 b'{"message":"Unauthorized"}')
+            return
+
+        self.watcher.start()
+        broker = self.watcher.broker
+        subscription = broker.subscribe(claims["sub"], asyncio.get_running_loop(), headers.get("last-event-id"))
+        disconnected = asyncio.ensure_future(receive())
+        next_item = asyncio.ensure_future(subscription.get())
+        try:
+            await send({
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in {
+                        **CORS_HEADERS,
+                        "Content-Type": "text/event-stream",
+                        "Cache-Control": "no-cache",
+                        "X-Accel-Buffering": "no",
+                    }.items()
+                ],
+            })
+            await send({"type": "http.response.body", "body": b"retry: 3000\n\n", "more_body": True})
+
+            while True:
+                done, _ = await asyncio.wait(
+                    {disconnected, next_item}, timeout=EVENTS_HEARTBEAT_SECONDS, return_when=asyncio.FIRST_COMPLETED
+                )
+                if disconnected in done:
+                    break
+                if next_item in done:
+                    chunk = format_event(next_item.result())
+                    next_item = asyncio.ensure_future(subscription.get())
+                else:
+                    chunk = b": ping\n\n"
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        finally:
+            broker.unsubscribe(subscription)
+            next_item.cancel()
+            disconnected.cancel()
+
+
+def create_app() -> Server:
+    """
+    Creates the ASGI application. The server defaults the MongoDB client to
+    the "server" runtime profile (larger, pre-warmed pool).
+    """
+    os.environ.setdefault("MONGODB_RUNTIME", "server")
+    return Server()
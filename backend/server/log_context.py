@@ -0,0 +1,101 @@
+"""
+Per-request log keys for the handlers running in the server.
+
+Powertools keeps the keys appended to a logger (`inject_lambda_context` adds
+the Lambda context, e.g. `function_request_id`) in its formatter, which every
+thread shares. In Lambda one invocation runs at a time, but the server runs
+many handlers at once, so a log line could show another request's keys.
+`isolate_log_keys` gives every Powertools logger a formatter that keeps the
+keys per request, and the server runs each handler through
+`run_in_request_context`.
+"""
+import contextvars
+import logging
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar
+
+from aws_lambda_powertools.logging.formatter import LambdaPowertoolsFormatter
+
+T = TypeVar("T")
+
+
+# Whether the current context runs a request, see run_in_request_context
+_in_request: ContextVar[bool] = ContextVar("in_request", default=False)
+
+
+class RequestLogFormatter(LambdaPowertoolsFormatter):
+    """
+    Powertools formatter whose appended keys belong to the current request.
+    Outside requests the keys are shared, as in LambdaPowertoolsFormatter;
+    each request starts with a copy of them and its changes stay in it.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        self._init_keys({})
+        super().__init__(*args, **kwargs)
+
+    @classmethod
+    def from_formatter(cls, formatter: LambdaPowertoolsFormatter) -> "RequestLogFormatter":
+        """
+        Builds a request formatter with the options and keys of a registered one.
+        """
+        request_formatter = cls.__new__(cls)
+        state = dict(vars(formatter))
+        log_format = state.pop("log_format")
+        request_formatter.__dict__.update(state)
+        request_formatter._init_keys(dict(log_format))
+        request_formatter.update_formatter = request_formatter.append_keys
+        return request_formatter
+
+    def _init_keys(self, log_format: Dict[str, Any]) -> None:
+        self._base_format = log_format
+        self._request_format: ContextVar[Optional[Dict[str, Any]]] = ContextVar(
+            f"log_format_{id(self)}", default=None
+        )
+
+    @property
+    def log_format(self) -> Dict[str, Any]:
+        if not _in_request.get():
+            return self._base_format
+        log_format = self._request_format.get()
+        if log_format is None:
+            log_format = dict(self._base_format)
+            self._request_format.set(log_format)
+        return log_format
+
+    @log_format.setter
+    def log_format(self, value: Dict[str, Any]) -> None:
+        if _in_request.get():
+            self._request_format.set(value)
+        else:
+            self._base_format = value
+
+
+def _run_request(function: Callable[..., T], args: Tuple[Any, ...]) -> T:
+    _in_request.set(True)
+    return function(*args)
+
+
+def run_in_request_context(function: Callable[..., T], *args: Any) -> T:
+    """
+    Calls a handler in a new context, so the log keys it appends are its own.
+    """
+    return contextvars.Context().run(_run_request, function, args)
+
+
+def isolate_log_keys() -> int:
+    """
+    Replaces the formatter of every Powertools logger created so far with a
+    RequestLogFormatter.
+
+    Returns:
+        Number of formatters replaced
+    """
+    replaced = 0
+    for stdlib_logger in list(logging.Logger.manager.loggerDict.values()):
+        for handler in getattr(stdlib_logger, "handlers", []):
+            formatter = handler.formatter
+            if isinstance(formatter, LambdaPowertoolsFormatter) and not isinstance(formatter, RequestLogFormatter):
+                handler.setFormatter(RequestLogFormatter.from_formatter(formatter))
+                replaced += 1
+    return replaced
@@ -0,0 +1,293 @@
+"""
+Push notifications of task changes for the server mode.
+
+One ChangeWatcher per process tails a MongoDB change stream on the tasks and
+task_tombstones collections (deletions are observed through their tombstones,
+which carry the owner) and the Broker fans every change out to the open
+streams of its user. Events only name the task and its sequence number;
+clients fetch the data with GET /tasks/changes, so a notification never
+carries more than the user may read and the delta sync stays the single
+source of truth.
+
+Each event id is the change stream resume token. The watcher resumes from
+its last token after errors, and a client reconnecting with Last-Event-ID is
+replayed the events it missed from a ring buffer of recent events. When the
+id is no longer buffered (or the client fell behind) it gets a `resync`
+event and should run a delta sync instead.
+
+Change streams require a replica set (docker-compose runs a single-node one).
+"""
+import asyncio
+import json
+import os
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, NamedTuple, Optional, Set
+
+from aws_lambda_powertools import Logger
+from pymongo.errors import OperationFailure, PyMongoError
+
+logger = Logger(service="notifications")
+
+# Collections watched and the change types that produce events
+WATCHED_COLLECTIONS = ("tasks", "task_tombstones")
+
+# Recent events kept for clients reconnecting with Last-Event-ID
+BUFFER_SIZE = int(os.environ.get("SERVER_EVENTS_BUFFER_SIZE", "1000"))
+
+# Events queued per stream before the client is considered too slow and told to resync
+QUEUE_SIZE = int(os.environ.get("SERVER_EVENTS_QUEUE_SIZE", "100"))
+
+# Wait before reopening the change stream after an error
+RETRY_SECONDS = float(os.environ.get("SERVER_EVENTS_RETRY_SECONDS", "5"))
+
+# Error code of a resume token that is no longer in the oplog
+CHANGE_STREAM_HISTORY_LOST = 286
+
+# Only the fields needed to route and describe the change are read. A task
+# update is written before its sequence number is allocated and stamped, so
+# only the updates that set `seq` are delta sync changes.
+WATCH_PIPELINE = [
+    {"$match": {
+        "ns.coll": {"$in": list(WATCHED_COLLECTIONS)},
+        "$or": [
+            {"operationType": {"$in": ["insert", "replace"]}},
+            {"operationType": "update", "updateDescription.updatedFields.seq": {"$exists": True}},
+        ],
+    }},
+    {"$project": {
+        "ns.coll": 1,
+        "fullDocument.user_id": 1,
+        "fullDocument.id": 1,
+        "fullDocument.seq": 1,
+    }},
+]
+
+
+class TaskEvent(NamedTuple):
+    id: str
+    user_id: str
+    type: str
+    task_id: str
+    seq: Optional[int]
+
+    def payload(self) -> Dict[str, Any]:
+        return {"type": self.type, "id": self.task_id, "seq": self.seq}
+
+
+def change_to_event(change: Dict[str, Any]) -> Optional[TaskEvent]:
+    """
+    Translates a change stream document into a task event, or None when the
+    change does not concern a user's task (e.g. an update whose task was
+    deleted before the lookup; its tombstone produces the event).
+    """
+    document = change.get("fullDocument") or {}
+    if not document.get("user_id") or not document.get("id"):
+        return None
+    deleted = change["ns"]["coll"] == "task_tombstones"
+    return TaskEvent(
+        change["_id"]["_data"],
+        document["user_id"],
+        "deleted" if deleted else "changed",
+        document["id"],
+        document.get("seq")
+    )
+
+
+class Subscription:
+    """
+    Event queue of one open stream. Events are pushed from the watcher
+    thread and consumed on the event loop of the request.
+    """
+
+    RESYNC = "resync"
+
+    def __init__(self, user_id: str, loop: asyncio.AbstractEventLoop, queue_size: int = QUEUE_SIZE):
+        self.user_id = user_id
+        self.loop = loop
+        self.queue: "asyncio.Queue[Any]" = asyncio.Queue(maxsize=queue_size)
+
+    def _put(self, item: Any) -> None:
+        if self.queue.full():
+            # Too slow: drop the backlog, the client catches up with a delta sync
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            item = self.RESYNC
+        self.queue.put_nowait(item)
+
+    def push(self, item: Any) -> None:
+        """
+        Queues an event or RESYNC; safe to call from any thread.
+        """
+        try:
+            self.loop.call_soon_threadsafe(self._put, item)
+        except RuntimeError:
+            # The loop of a disconnected request is already closed
+            pass
+
+    async def get(self) -> Any:
+        return await self.queue.get()
+
+
+class Broker:
+    """
+    Per-user fan-out of task events, with a ring buffer of recent events for
+    reconnecting clients.
+    """
+
+    def __init__(self, buffer_size: int = BUFFER_SIZE, queue_size: int = QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._buffer: Deque[TaskEvent] = deque(maxlen=buffer_size)
+        self._published = 0
+
+    def subscribe(
+        self,
+        user_id: str,
+        loop: asyncio.AbstractEventLoop,
+        last_event_id: Optional[str] = None
+    ) -> Subscription:
+        """
+        Opens a subscription to the user's events. With `last_event_id`, the
+        buffered events of the user after it are queued first, or RESYNC if
+        the id is no longer buffered.
+        """
+        subscription = Subscription(user_id, loop, self.queue_size)
+        with self._lock:
+            if last_event_id:
+                missed = self._events_after(last_event_id)
+                if missed is None:
+                    subscription.push(Subscription.RESYNC)
+                else:
+                    for event in missed:
+                        if event.user_id == user_id:
+                            subscription.push(event)
+            self._subscribers.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def _events_after(self, event_id: str) -> Optional[List[TaskEvent]]:
+        events = list(self._buffer)
+        for position in range(len(events) - 1, -1, -1):
+            if events[position].id == event_id:
+                return events[position + 1:]
+        return None
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscriptions = self._subscribers.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscribers[subscription.user_id]
+
+    def publish(self, event: TaskEvent) -> None:
+        """
+        Buffers an event and queues it on the streams of its user.
+        """
+        with self._lock:
+            self._buffer.append(event)
+            self._published += 1
+            subscriptions = list(self._subscribers.get(event.user_id, ()))
+        for subscription in subscriptions:
+            subscription.push(event)
+
+    def reset(self) -> None:
+        """
+        Forgets the buffered events and tells every stream to resync, for
+        when the watcher could not resume and events may have been lost.
+        """
+        with self._lock:
+            self._buffer.clear()
+            subscriptions = [s for user_subscriptions in self._subscribers.values() for s in user_subscriptions]
+        for subscription in subscriptions:
+            subscription.push(Subscription.RESYNC)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "users": len(self._subscribers),
+                "streams": sum(len(subscriptions) for subscriptions in self._subscribers.values()),
+                "buffered": len(self._buffer),
+                "published": self._published,
+            }
+
+
+def _watch_database(resume_token: Optional[Dict[str, Any]]) -> Any:
+    from utils.db import get_database
+    return get_database().watch(
+        WATCH_PIPELINE,
+        full_document="updateLookup",
+        resume_after=resume_token,
+        max_await_time_ms=1000
+    )
+
+
+class ChangeWatcher:
+    """
+    Background thread tailing the change stream and publishing its events.
+    Started on the first subscription, so processes that never serve a
+    stream do not hold a change stream open.
+    """
+
+    def __init__(
+        self,
+        broker: Broker,
+        watch: Callable[[Optional[Dict[str, Any]]], Any] = _watch_database,
+        retry_seconds: float = RETRY_SECONDS
+    ):
+        self.broker = broker
+        self.resume_token: Optional[Dict[str, Any]] = None
+        self._watch = watch
+        self._retry_seconds = retry_seconds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    def start(self) -> None:
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="task-change-watcher", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                with self._watch(self.resume_token) as stream:
+                    logger.info("Watching task changes", extra={"resumed": self.resume_token is not None})
+                    while not self._stop.is_set() and stream.alive:
+                        # Returns None every max_await_time_ms so stop() is noticed
+                        change = stream.try_next()
+                        if change is None:
+                            continue
+                        event = change_to_event(change)
+                        if event is not None:
+                            self.broker.publish(event)
+                        self.resume_token = change["_id"]
+            except OperationFailure as e:
+                if e.code == CHANGE_STREAM_HISTORY_LOST:
+                    logger.warning("Change stream history lost, clients must resync")
+                    self.resume_token = None
+                    self.broker.reset()
+                else:
+                    logger.exception("Change stream failed")
+                self._stop.wait(self._retry_seconds)
+            except PyMongoError:
+                logger.exception("Change stream failed")
+                self._stop.wait(self._retry_seconds)
+
+
+def format_event(item: Any) -> bytes:
+    """
+    Encodes a queued item as a server-sent event.
+    """
+    if item == Subscription.RESYNC:
+        return b"event: resync\ndata: {}\n\n"
+    data = json.dumps(item.payload(), separators=(",", ":"))
+    return f"id: {item.id}\nevent: task\ndata: {data}\n\n".encode("utf-8")
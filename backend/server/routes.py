@@ -0,0 +1,75 @@
+import re
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+
+class Route(NamedTuple):
+    name: str
+    method: str
+    path: str
+    handler: str
+    authorized: bool
+
+
+# Same functions, paths and methods as serverless.yml
+ROUTES: List[Route] = [
+    Route("register", "POST", "/auth/register", "auth/handler.register", False),
+    Route("login", "POST", "/auth/login", "auth/handler.login", False),
+    Route("refresh", "POST", "/auth/refresh", "auth/handler.refresh", False),
+    Route("health", "GET", "/health", "health/handler.health", False),
+    Route("healthDetails", "GET", "/health/details", "health/handler.health_details", True),
+    Route("getTasks", "GET", "/tasks", "tasks/handler.get_tasks", True),
+    Route("getTaskStats", "GET", "/tasks/stats", "tasks/handler.get_task_stats", True),
+    Route("getTaskChanges", "GET", "/tasks/changes", "tasks/handler.get_task_changes", True),
+    Route("searchTasks", "GET", "/tasks/search", "tasks/handler.search_tasks", True),
+    Route("getTaskOverview", "GET", "/tasks/overview", "tasks/handler.get_task_overview", True),
+    Route("getTask", "GET", "/tasks/{taskId}", "tasks/handler.get_task", True),
+    Route("createTask", "POST", "/tasks", "tasks/handler.create_task", True),
+    Route("batchTasks", "POST", "/tasks/batch", "tasks/handler.batch_tasks", True),
+    Route("updateTask", "PUT", "/tasks/{taskId}", "tasks/handler.update_task", True),
+    Route("deleteTask", "DELETE", "/tasks/{taskId}", "tasks/handler.delete_task", True),
+]
+
+
+def load_handler(reference: str) -> Callable:
+    """
+    Imports a handler from its serverless.yml reference ("tasks/handler.get_tasks").
+    """
+    import importlib
+    module_path, function_name = reference.rsplit(".", 1)
+    module = importlib.import_module(module_path.replace("/", "."))
+    return getattr(module, function_name)
+
+
+class Router:
+    """
+    Matches request paths against the route templates. As in API Gateway, the
+    most specific resource wins (/tasks/stats before /tasks/{taskId}) and the
+    method is then looked up on that resource only.
+    """
+
+    def __init__(self, routes: List[Route]):
+        resources: Dict[str, Dict[str, Route]] = {}
+        for route in routes:
+            resources.setdefault(route.path, {})[route.method] = route
+
+        compiled = []
+        for path, methods in resources.items():
+            pattern = re.sub(r"\{(\w+)\}", r"(?P<\1>[^/]+)", path)
+            parameters = path.count("{")
+            compiled.append((parameters, re.compile(f"^{pattern}$"), methods))
+        compiled.sort(key=lambda item: item[0])
+        self._resources = [(regex, methods) for _, regex, methods in compiled]
+
+    def match(self, method: str, path: str) -> Tuple[Optional[Route], Dict[str, str], List[str]]:
+        """
+        Finds the route of a request.
+
+        Returns:
+            Tuple with the route (None if there is none for the method), the
+            path parameters and the methods allowed on the matched resource
+        """
+        for regex, methods in self._resources:
+            found = regex.match(path)
+            if found:
+                return methods.get(method), found.groupdict(), sorted(methods)
+        return None, {}, []
@@ -1,31 +1,153 @@
 import os
 import json
-from typing import Dict, Any, List, Optional
-from datetime import datetime
-import uuid
+import time
+from typing import Dict, Any, List, Optional, Tuple
+from datetime import datetime, timedelta
+import hashlib
+from collections import Counter
+from pymongo import InsertOne, UpdateOne, DeleteOne
 from aws_lambda_powertools import Logger
-from utils.http import success_response, error_response, parse_body, get_user_from_event
-from utils.db import get_collection, serialize_mongodb_doc
-from utils.models import Task, TaskCreate, TaskUpdate, TaskStatus
+from utils.metrics import HandlerMetrics
+from utils.http import (
+    success_response, error_response, parse_body, get_user_from_event, get_query_params,
+    get_header, make_etag, parse_etags, etag_matches, not_modified_response, negotiate_compression
+)
+from utils.db import serialize_mongodb_doc, warm_up, TOMBSTONE_TTL_SECONDS
+from utils.enums import TaskStatus, BatchOperationType
+from utils.pagination import parse_limit, decode_cursor, encode_sync_token, decode_sync_token
+from utils.serialization import close_page, dumps_bytes
+from utils.cache import LRUCache
+from tasks.repository import repository, async_repository
+from tasks.query import parse_list_query, parse_fields
+from tasks.records import TaskRecord, update_fields, parse_batch_operation
 
-# Configure logger
+# Configure logger and phase metrics
 logger = Logger(service="tasks-service")
+metrics = HandlerMetrics(service="tasks-service")
 
-# MongoDB collection
-TASKS_COLLECTION = "tasks"
+# Open the MongoDB connection during the Lambda init phase
+if os.environ.get("MONGODB_WARM_UP", "").lower() == "true":
+    try:
+        warm_up()
+    except Exception:
+        logger.exception("MongoDB warm-up failed")
+
+# Largest page of tasks returned by a single list request
+MAX_PAGE_SIZE = int(os.environ.get("TASKS_MAX_PAGE_SIZE", "100"))
+
+# Largest number of operations accepted by a batch request
+MAX_BATCH_SIZE = int(os.environ.get("TASKS_MAX_BATCH_SIZE", "200"))
+
+# Most changes returned by one delta sync response
+MAX_CHANGES_PAGE_SIZE = int(os.environ.get("TASKS_MAX_CHANGES_PAGE_SIZE", "500"))
+
+# Longest time a write can take between allocating its sequence number and
+# becoming visible. Sync tokens never move past changes younger than this,
+# so a slower write with a lower number is not skipped.
+SYNC_SETTLE_SECONDS = int(os.environ.get("TASKS_SYNC_SETTLE_SECONDS", "30"))
+
+# Longest accepted search query
+MAX_SEARCH_LENGTH = int(os.environ.get("TASKS_MAX_SEARCH_LENGTH", "200"))
+
+# Task reads are private to the user and must be revalidated with the ETag
+CACHE_HEADERS = {"Cache-Control": "private, no-cache", "Vary": "Authorization"}
+
+# Serialized task reads kept by this container, namespaced by user. Writes
+# invalidate the user's entries here, and a task read that overlapped such a
+# write is not cached; writes handled by other containers are only seen once
+# the entry expires (list pages are keyed by the collection version, so they
+# are never stale). TASKS_CACHE_TTL_SECONDS=0 disables it.
+read_cache = LRUCache(
+    "tasks",
+    max_entries=int(os.environ.get("TASKS_CACHE_MAX_ENTRIES", "1000")),
+    max_bytes=int(os.environ.get("TASKS_CACHE_MAX_BYTES", str(8 * 1024 * 1024))),
+    ttl=float(os.environ.get("TASKS_CACHE_TTL_SECONDS", "10"))
+)
+
+
+def _task_etag(task: Dict[str, Any]) -> str:
+    """
+    Builds the ETag of a task from its version (0 for tasks created before versioning).
+    """
+    return make_etag(task.get("version", 0))
+
+
+def _list_etag(
+    user_id: str,
+    collection_version: int,
+    limit: int,
+    cursor: Optional[str],
+    query: Any = None
+) -> str:
+    """
+    Builds the ETag of a task list page from the user's collection version
+    and the page parameters. `query` tells apart the listings that share
+    the other parameters: the query plan, the search terms or the endpoint.
+    """
+    key = f"{user_id}:{collection_version}:{limit}:{cursor or ''}"
+    if query is not None:
+        key += ":" + json.dumps(query, sort_keys=True, default=str)
+    return make_etag(hashlib.sha256(key.encode("utf-8")).hexdigest()[:32])
+
+
+def _if_match_filter(event: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Translates the If-Match header into a condition on the task version.
+    Weak tags never match, so a header with only weak tags fails with 412.
+    
+    Returns:
+        Query condition, or None when the request has no precondition
+    """
+    etags = parse_etags(get_header(event, "If-Match"), strong=True)
+    if etags is None or "*" in etags:
+        return None
+    
+    versions: List[Optional[int]] = [int(tag) for tag in etags if tag.isdigit()]
+    if 0 in versions:
+        # Tasks created before versioning have no version field
+        versions.append(None)
+    return {"version": {"$in": versions}}
+
+
+def _conditional_write_failed(
+    task_id: str,
+    user_id: str,
+    precondition: Optional[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """
+    Builds the response of a write that matched no task. Only when the write
+    carried a precondition is an extra read needed to tell 412 from 404.
+    """
+    if precondition and repository.exists(user_id, task_id):
+        return error_response("Task was modified by another request", 412, "precondition_failed")
+    return error_response("Task not found", 404, "task_not_found")
 
 
 @logger.inject_lambda_context
+@metrics.measure
+@negotiate_compression
 def get_tasks(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """
-    Retrieves all tasks of the authenticated user.
+    Retrieves a page of tasks of the authenticated user.
+    
+    Pages are ordered by creation date unless `sort` says otherwise, and can
+    be filtered by `status`, `created_after`/`created_before` or
+    `updated_since` (see TaskListQuery); combinations no index supports are
+    rejected with 400. The `limit` query parameter sets the page size
+    (capped at MAX_PAGE_SIZE) and `cursor` continues from the `next_cursor`
+    returned by the previous page. `fields` (e.g. `title,status`) limits the
+    task fields read from MongoDB and returned; `id` is always included.
+    
+    The response carries an ETag derived from the user's collection version,
+    so a poll with a matching If-None-Match costs one point read and returns
+    304 without querying or serializing the tasks.
     
     Args:
         event: API Gateway event
         context: Lambda context
         
     Returns:
-        HTTP response with task list
+        HTTP response with the task page and the cursor of the next page
     """
     try:
         # Get user information
@@ -35,14 +157,44 @@ def get_tasks(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         
         user_id = user["user_id"]
         
-        # Get tasks from MongoDB
-        collection = get_collection(TASKS_COLLECTION)
-        tasks = list(collection.find({"user_id": user_id}))
-        
-        # Serialize documents for JSON
-        serialized_tasks = [serialize_mongodb_doc(task) for task in tasks]
-        
-        return success_response(serialized_tasks)
+        # Get pagination parameters
+        params = get_query_params(event)
+        try:
+            limit = parse_limit(params.get("limit"), MAX_PAGE_SIZE)
+        except ValueError as e:
+            return error_response(str(e), 400, "invalid_limit")
+        
+        try:
+            plan = parse_list_query(params)
+        except ValueError as e:
+            return error_response(str(e), 400, "invalid_query")
+        
+        try:
+            fields = parse_fields(params.get("fields"))
+        except ValueError as e:
+            return error_response(str(e), 400, "invalid_fields")
+        
+        cursor = params.get("cursor")
+        if cursor:
+            try:
+                decode_cursor(cursor, plan.sort_field)
+            except ValueError as e:
+                return error_response(str(e), 400, "invalid_cursor")
+        
+        # Answer unchanged polls without reading the tasks
+        etag = _list_etag(user_id, repository.version(user_id), limit, cursor, plan if fields is None else (plan, fields))
+        if etag_matches(event, etag):
+            return not_modified_response(etag)
+        
+        # The ETag identifies the page contents, so it is also the cache key
+        body = read_cache.get(user_id, etag)
+        if body is None:
+            # Encode the tasks straight from the cursor into the response body
+            page, next_cursor = repository.list_page(user_id, limit, cursor, plan, fields)
+            body = bytes(close_page(page, {"next_cursor": next_cursor}))
+            read_cache.set(user_id, etag, body, len(body))
+        
+        return success_response(body, headers={"ETag": etag, **CACHE_HEADERS})
         
     except Exception as e:
         logger.exception("Error retrieving tasks")
@@ -50,10 +202,247 @@ def get_tasks(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
 
 
 @logger.inject_lambda_context
+@metrics.measure
+@negotiate_compression
+def search_tasks(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Searches the tasks of the authenticated user by title and description.
+    
+    `q` holds the search terms; results are ranked by relevance and carry
+    their `score`. The text index is prefixed by user_id, so the cost depends
+    on the number of matching tasks, not on the user's total. `limit` and
+    `cursor` paginate as in get_tasks, and the ETag is derived from the
+    collection version.
+    
+    Args:
+        event: API Gateway event
+        context: Lambda context
+        
+    Returns:
+        HTTP response with the page of matching tasks and the cursor of the next page
+    """
+    try:
+        # Get user information
+        user = get_user_from_event(event)
+        if not user:
+            return error_response("User not authenticated", 401, "unauthorized")
+        
+        user_id = user["user_id"]
+        
+        params = get_query_params(event)
+        text = (params.get("q") or "").strip()
+        if not text or len(text) > MAX_SEARCH_LENGTH:
+            return error_response(
+                f"q must contain between 1 and {MAX_SEARCH_LENGTH} characters", 400, "invalid_query"
+            )
+        
+        try:
+            limit = parse_limit(params.get("limit"), MAX_PAGE_SIZE)
+        except ValueError as e:
+            return error_response(str(e), 400, "invalid_limit")
+        
+        cursor = params.get("cursor")
+        if cursor:
+            try:
+                decode_cursor(cursor, "score")
+            except ValueError as e:
+                return error_response(str(e), 400, "invalid_cursor")
+        
+        # Answer unchanged polls without searching
+        etag = _list_etag(user_id, repository.version(user_id), limit, cursor, ("search", text))
+        if etag_matches(event, etag):
+            return not_modified_response(etag)
+        
+        body = read_cache.get(user_id, etag)
+        if body is None:
+            page, next_cursor = repository.search_page(user_id, text, limit, cursor)
+            body = bytes(close_page(page, {"next_cursor": next_cursor}))
+            read_cache.set(user_id, etag, body, len(body))
+        
+        return success_response(body, headers={"ETag": etag, **CACHE_HEADERS})
+        
+    except Exception as e:
+        logger.exception("Error searching tasks")
+        return error_response("Error searching tasks", 500, "server_error")
+
+
+def _sync_position(changes: List[Dict[str, Any]], since: int, has_more: bool) -> int:
+    """
+    Computes the position of the next sync token: the last change older than
+    SYNC_SETTLE_SECONDS, since a write still in flight may commit a lower
+    sequence number than younger changes. Those are sent again next time,
+    which clients handle by applying changes idempotently. Full pages always
+    advance, so a burst of writes cannot stall the sync.
+    """
+    if has_more:
+        return changes[-1]["seq"]
+    horizon = datetime.utcnow() - timedelta(seconds=SYNC_SETTLE_SECONDS)
+    position = since
+    for change in changes:
+        if change["changed_at"] >= horizon:
+            break
+        position = change["seq"]
+    return position
+
+
+@logger.inject_lambda_context
+@metrics.measure
+@negotiate_compression
+def get_task_changes(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Returns the changes to the authenticated user's tasks since a sync token.
+    
+    Without `since` every task is returned. The response holds the tasks
+    created or updated since the token, the ids of the tasks deleted since,
+    and `next_token` for the next call; `has_more` asks the client to call
+    again right away. Tokens older than the tombstone retention are rejected
+    with 410, after which the client must reload its tasks.
+    
+    Args:
+        event: API Gateway event
+        context: Lambda context
+        
+    Returns:
+        HTTP response with the changed tasks, the deleted ids and the next token
+    """
+    try:
+        # Get user information
+        user = get_user_from_event(event)
+        if not user:
+            return error_response("User not authenticated", 401, "unauthorized")
+        
+        user_id = user["user_id"]
+        
+        params = get_query_params(event)
+        try:
+            limit = parse_limit(params.get("limit"), MAX_CHANGES_PAGE_SIZE, MAX_CHANGES_PAGE_SIZE)
+        except ValueError as e:
+            return error_response(str(e), 400, "invalid_limit")
+        
+        since = 0
+        now = time.time()
+        if params.get("since"):
+            try:
+                since, issued_at = decode_sync_token(params["since"])
+            except ValueError as e:
+                return error_response(str(e), 400, "invalid_sync_token")
+            # Deletions older than the retention may already have been forgotten
+            if now - issued_at > TOMBSTONE_TTL_SECONDS - SYNC_SETTLE_SECONDS:
+                return error_response("Sync token expired, reload the tasks", 410, "sync_token_expired")
+        
+        changes, has_more = repository.changes(user_id, since, limit)
+        
+        changed, deleted = [], []
+        for change in changes:
+            if change.get("deleted"):
+                deleted.append(change["id"])
+            else:
+                changed.append({key: value for key, value in change.items() if key not in ("seq", "changed_at")})
+        
+        return success_response({
+            "changed": changed,
+            "deleted": deleted,
+            "next_token": encode_sync_token(_sync_position(changes, since, has_more), now),
+            "has_more": has_more
+        })
+        
+    except Exception as e:
+        logger.exception("Error retrieving task changes")
+        return error_response("Error retrieving task changes", 500, "server_error")
+
+
+@logger.inject_lambda_context
+@metrics.measure
+@negotiate_compression
+def get_task_stats(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Retrieves the number of tasks per status of the authenticated user.
+    
+    The counts come from a per-user counter document maintained by the write
+    handlers, so the cost does not depend on the number of tasks.
+    
+    Args:
+        event: API Gateway event
+        context: Lambda context
+        
+    Returns:
+        HTTP response with the total and the count per status
+    """
+    try:
+        # Get user information
+        user = get_user_from_event(event)
+        if not user:
+            return error_response("User not authenticated", 401, "unauthorized")
+        
+        stats, _ = repository.stats(user["user_id"])
+        return success_response(stats)
+        
+    except Exception as e:
+        logger.exception("Error retrieving task statistics")
+        return error_response("Error retrieving task statistics", 500, "server_error")
+
+
+@logger.inject_lambda_context
+@metrics.measure
+@negotiate_compression
+def get_task_overview(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Retrieves the task statistics and the first page of tasks of the
+    authenticated user in one request.
+
+    The ETag is derived from the collection version read with the statistics.
+    The statistics are read before the page, so the ETag is never newer than
+    the page, and a poll with a matching If-None-Match does not read the tasks.
+
+    Args:
+        event: API Gateway event
+        context: Lambda context
+
+    Returns:
+        HTTP response with the first page of tasks, its next cursor and the statistics
+    """
+    try:
+        # Get user information
+        user = get_user_from_event(event)
+        if not user:
+            return error_response("User not authenticated", 401, "unauthorized")
+
+        user_id = user["user_id"]
+
+        try:
+            limit = parse_limit(get_query_params(event).get("limit"), MAX_PAGE_SIZE)
+        except ValueError as e:
+            return error_response(str(e), 400, "invalid_limit")
+
+        # The version is read first, as in get_tasks: a write landing between
+        # the two reads makes the ETag older than the page, never newer
+        stats, version = repository.stats(user_id)
+        etag = _list_etag(user_id, version, limit, None, ("overview",))
+        if etag_matches(event, etag):
+            return not_modified_response(etag)
+
+        body, next_cursor = repository.list_page(user_id, limit)
+        close_page(body, {"next_cursor": next_cursor, "stats": stats})
+
+        return success_response(body, headers={"ETag": etag, **CACHE_HEADERS})
+
+    except Exception as e:
+        logger.exception("Error retrieving task overview")
+        return error_response("Error retrieving task overview", 500, "server_error")
+
+
+@logger.inject_lambda_context
+@metrics.measure
+@negotiate_compression
 def get_task(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """
     Retrieves a specific task of the authenticated user.
     
+    The ETag is the task version; a matching If-None-Match returns 304
+    without serializing the task. Serialized tasks are kept in the read cache.
+    `fields` (e.g. `title,status`) limits the fields read and returned;
+    `id` is always included, as in get_tasks.
+    
     Args:
         event: API Gateway event
         context: Lambda context
@@ -74,17 +463,41 @@ def get_task(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         if not task_id:
             return error_response("Task ID not provided", 400, "missing_task_id")
         
-        # Find the task in MongoDB
-        collection = get_collection(TASKS_COLLECTION)
-        task = collection.find_one({"id": task_id, "user_id": user_id})
-        
-        if not task:
-            return error_response("Task not found", 404, "task_not_found")
-        
-        # Serialize document for JSON
-        serialized_task = serialize_mongodb_doc(task)
-        
-        return success_response(serialized_task)
+        try:
+            fields = parse_fields(get_query_params(event).get("fields"))
+        except ValueError as e:
+            return error_response(str(e), 400, "invalid_fields")
+        
+        cache_key = ("task", task_id) if fields is None else ("task", task_id, fields)
+        cached = read_cache.get(user_id, cache_key)
+        if cached is not None:
+            etag, body = cached
+        else:
+            # A write invalidating the user's entries during the read keeps
+            # this version of the task out of the cache
+            generation = read_cache.generation()
+            
+            # Find the task in MongoDB
+            task = repository.get(user_id, task_id, fields)
+            
+            if not task:
+                return error_response("Task not found", 404, "task_not_found")
+            
+            etag, body = _task_etag(task), None
+        
+        if etag_matches(event, etag):
+            return not_modified_response(etag)
+        
+        if body is None:
+            # The version is always read for the ETag
+            if fields is not None and "version" not in fields:
+                task.pop("version", None)
+            
+            # Serialize document for JSON
+            body = dumps_bytes(serialize_mongodb_doc(task))
+            read_cache.set(user_id, cache_key, (etag, body), len(body), generation=generation)
+        
+        return success_response(body, headers={"ETag": etag, **CACHE_HEADERS})
         
     except Exception as e:
         logger.exception("Error retrieving task")
@@ -92,6 +505,7 @@ def get_task(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
 
 
 @logger.inject_lambda_context
+@metrics.measure
 def create_task(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """
     Creates a new task for the authenticated user.
@@ -114,24 +528,15 @@ def create_task(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         # Parse body
         body = parse_body(event)
         
-        # Validate data with Pydantic
-        task_data = TaskCreate(**body)
-        
-        # Create new task
-        task = Task(
-            id=str(uuid.uuid4()),
-            title=task_data.title,
-            description=task_data.description,
-            status=task_data.status,
-            user_id=user_id,
-            created_at=datetime.utcnow()
-        )
+        # Validate data and create the new task. The document is built once
+        # and is both stored and returned.
+        task = TaskRecord.new(body, user_id).to_document()
         
         # Save to MongoDB
-        collection = get_collection(TASKS_COLLECTION)
-        collection.insert_one(task.to_dict())
+        repository.create(task)
+        read_cache.invalidate(user_id)
         
-        return success_response(task.to_dict(), 201)
+        return success_response(task, 201, {"ETag": _task_etag(task)})
         
     except ValueError as e:
         # Data validation error
@@ -145,10 +550,15 @@ def create_task(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
 
 
 @logger.inject_lambda_context
+@metrics.measure
 def update_task(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """
     Updates an existing task of the authenticated user.
     
+    The update is a single atomic find_one_and_update that also increments
+    the task version. When the request sends If-Match with the task ETag, the
+    update only applies if the version still matches (412 otherwise).
+    
     Args:
         event: API Gateway event
         context: Lambda context
@@ -172,38 +582,22 @@ def update_task(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         # Parse body
         body = parse_body(event)
         
-        # Validate data with Pydantic
-        task_update = TaskUpdate(**body)
-        
-        # Verify that the task exists and belongs to the user
-        collection = get_collection(TASKS_COLLECTION)
-        existing_task = collection.find_one({"id": task_id, "user_id": user_id})
-        
-        if not existing_task:
-            return error_response("Task not found", 404, "task_not_found")
+        # Validate data and build the update
+        update_data = update_fields(body)
         
-        # Build update
-        update_data = {}
-        if task_update.title is not None:
-            update_data["title"] = task_update.title
-        if task_update.description is not None:
-            update_data["description"] = task_update.description
-        if task_update.status is not None:
-            update_data["status"] = task_update.status
+        # Update in MongoDB. The previous document is returned and the new
+        # one is derived from it.
+        precondition = _if_match_filter(event)
+        previous_task = repository.update(user_id, task_id, update_data, precondition)
+        read_cache.invalidate(user_id)
         
-        update_data["updated_at"] = datetime.utcnow()
+        if not previous_task:
+            return _conditional_write_failed(task_id, user_id, precondition)
         
-        # Update in MongoDB
-        collection.update_one(
-            {"id": task_id, "user_id": user_id},
-            {"$set": update_data}
-        )
-        
-        # Get updated task
-        updated_task = collection.find_one({"id": task_id, "user_id": user_id})
+        updated_task = {**previous_task, **update_data, "version": previous_task.get("version", 0) + 1}
         serialized_task = serialize_mongodb_doc(updated_task)
         
-        return success_response(serialized_task)
+        return success_response(serialized_task, headers={"ETag": _task_etag(updated_task)})
         
     except ValueError as e:
         # Data validation error
@@ -217,10 +611,14 @@ def update_task(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
 
 
 @logger.inject_lambda_context
+@metrics.measure
 def delete_task(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """
     Deletes a task of the authenticated user.
     
+    The task is removed with a single find_one_and_delete, which also returns
+    its status for the counters. If-Match is honoured as in update_task.
+    
     Args:
         event: API Gateway event
         context: Lambda context
@@ -241,19 +639,240 @@ def delete_task(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         if not task_id:
             return error_response("Task ID not provided", 400, "missing_task_id")
         
-        # Verify that the task exists and belongs to the user
-        collection = get_collection(TASKS_COLLECTION)
-        existing_task = collection.find_one({"id": task_id, "user_id": user_id})
-        
-        if not existing_task:
-            return error_response("Task not found", 404, "task_not_found")
-        
         # Delete from MongoDB
-        collection.delete_one({"id": task_id, "user_id": user_id})
+        precondition = _if_match_filter(event)
+        deleted_task = repository.delete(user_id, task_id, precondition)
+        read_cache.invalidate(user_id)
+        
+        if not deleted_task:
+            return _conditional_write_failed(task_id, user_id, precondition)
         
         return success_response({"message": "Task successfully deleted"})
         
     except Exception as e:
         # General error
         logger.exception("Error deleting task")
-        return error_response("Error deleting task", 500, "server_error") 
\ No newline at end of file
+        return error_response("Error deleting task", 500, "server_error")
+
+
+def _batch_error(index: int, status: int, message: str, error_code: str) -> Dict[str, Any]:
+    return {"index": index, "status": status, "message": message, "error_code": error_code}
+
+
+def _lost_races(
+    user_id: str,
+    pending: List[Tuple[int, Any, Any, Any, Optional[int]]],
+    failed: Dict[int, Dict[str, Any]],
+    counts: Dict[str, int]
+) -> Dict[int, Dict[str, Any]]:
+    """
+    Finds the updates and deletes of a batch that matched no task because
+    another request changed or deleted it after it was read.
+    
+    The bulk write only reports how many documents the updates matched and
+    the deletes removed, so when fewer than expected applied the targeted
+    tasks are read again: an update applied if the task carries the change
+    sequence number it set, a delete if the task is gone. When a concurrent
+    delete removed some of the same tasks, the deletes this batch did not
+    perform are told apart by count only.
+    
+    Returns:
+        Errors keyed by request index, with the status to report
+    """
+    updates = [
+        (request_index, entry) for request_index, entry in enumerate(pending)
+        if request_index not in failed and entry[1].op == BatchOperationType.UPDATE
+    ]
+    deletes = [
+        (request_index, entry) for request_index, entry in enumerate(pending)
+        if request_index not in failed and entry[1].op == BatchOperationType.DELETE
+    ]
+    if counts["matched"] >= len(updates) and counts["deleted"] >= len(deletes):
+        return {}
+    
+    changed = {
+        "status": 412, "errmsg": "Task was modified by another request", "error_code": "precondition_failed"
+    }
+    gone = {"status": 409, "errmsg": "Task was deleted by another request", "error_code": "conflict"}
+    current = repository.find_by_ids(
+        user_id, [entry[1].id for _, entry in updates + deletes], {"_id": 0, "id": 1, "seq": 1}
+    )
+    
+    lost: Dict[int, Dict[str, Any]] = {}
+    for request_index, (_, operation, _, _, seq) in updates:
+        task = current.get(operation.id)
+        if task is None:
+            lost[request_index] = gone
+        elif task.get("seq") != seq:
+            lost[request_index] = changed
+    
+    removed = []
+    for request_index, (_, operation, _, _, _) in deletes:
+        if operation.id in current:
+            lost[request_index] = changed
+        else:
+            removed.append(request_index)
+    extra = len(removed) - counts["deleted"]
+    if extra > 0:
+        logger.warning("Batch deletes raced with other deletes", extra={"user_id": user_id, "tasks": extra})
+        for request_index in removed[-extra:]:
+            lost[request_index] = gone
+    return lost
+
+
+@logger.inject_lambda_context
+@metrics.measure
+@negotiate_compression
+def batch_tasks(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Creates, updates and deletes several tasks of the authenticated user
+    with a single unordered bulk write.
+    
+    The body is {"operations": [...]} where each operation is
+    {"op": "create", "data": {...}}, {"op": "update", "id": ..., "data": {...}}
+    or {"op": "delete", "id": ...}. Every operation is validated on its own,
+    so an invalid operation does not prevent the others from running.
+    
+    Args:
+        event: API Gateway event
+        context: Lambda context
+        
+    Returns:
+        HTTP response with one result per operation, in request order
+    """
+    try:
+        # Get user information
+        user = get_user_from_event(event)
+        if not user:
+            return error_response("User not authenticated", 401, "unauthorized")
+        
+        user_id = user["user_id"]
+        
+        # Parse body
+        body = parse_body(event)
+        operations = body.get("operations") if isinstance(body, dict) else None
+        if not isinstance(operations, list):
+            return error_response("operations must be a list", 422, "validation_error")
+        if len(operations) > MAX_BATCH_SIZE:
+            return error_response(
+                f"A batch can contain at most {MAX_BATCH_SIZE} operations", 413, "batch_too_large"
+            )
+        
+        # Validate every operation with the same rules as the single-task handlers
+        results: List[Optional[Dict[str, Any]]] = [None] * len(operations)
+        validated = []
+        seen_ids = set()
+        for index, raw_operation in enumerate(operations):
+            try:
+                operation = parse_batch_operation(raw_operation)
+                if operation.op == BatchOperationType.CREATE:
+                    payload = TaskRecord.new(operation.data, user_id)
+                else:
+                    if not operation.id:
+                        raise ValueError("Task ID not provided")
+                    payload = update_fields(operation.data) if operation.op == BatchOperationType.UPDATE else None
+            except (ValueError, TypeError) as e:
+                results[index] = _batch_error(index, 422, str(e), "validation_error")
+                continue
+            
+            if operation.id:
+                if operation.id in seen_ids:
+                    results[index] = _batch_error(
+                        index, 409, "Task appears more than once in the batch", "duplicate_task_id"
+                    )
+                    continue
+                seen_ids.add(operation.id)
+            
+            validated.append((index, operation, payload))
+        
+        # Read the tasks targeted by updates and deletes in one query
+        existing = repository.find_by_ids(user_id, seen_ids) if seen_ids else {}
+        
+        # Every created or updated task gets a number of the change sequence
+        stamped = sum(
+            1 for _, operation, _ in validated
+            if operation.op == BatchOperationType.CREATE
+            or (operation.op == BatchOperationType.UPDATE and operation.id in existing)
+        )
+        stamps = iter(repository.change_stamps(user_id, stamped) if stamped else [])
+        
+        # Build the bulk write requests. Updates and deletes only apply to the
+        # version read above, so a task changed in between is not overwritten
+        # and its counters are not moved twice.
+        requests = []
+        pending = []
+        for index, operation, payload in validated:
+            if operation.op == BatchOperationType.CREATE:
+                task = payload.to_document()
+                requests.append(InsertOne({**task, **next(stamps)}))
+                pending.append((index, operation, None, task, None))
+                continue
+            
+            current = existing.get(operation.id)
+            if not current:
+                results[index] = _batch_error(index, 404, "Task not found", "task_not_found")
+                continue
+            
+            task_filter = {"id": operation.id, "user_id": user_id, "version": current.get("version")}
+            if operation.op == BatchOperationType.UPDATE:
+                stamp = next(stamps)
+                requests.append(UpdateOne(
+                    task_filter, {"$set": {**payload, **stamp}, "$inc": {"version": 1}}
+                ))
+                pending.append((
+                    index, operation, current,
+                    {**current, **payload, "version": current.get("version", 0) + 1}, stamp["seq"]
+                ))
+            else:
+                requests.append(DeleteOne(task_filter))
+                pending.append((index, operation, current, None, None))
+        
+        # Execute all writes in one round trip
+        failed, counts = repository.bulk_write(requests)
+        if requests:
+            read_cache.invalidate(user_id)
+        failed.update(_lost_races(user_id, pending, failed, counts))
+        
+        # Collect per-operation results and the net change of the counters
+        status_deltas = Counter()
+        total_delta = 0
+        deleted_ids = []
+        for request_index, (index, operation, before, after, _) in enumerate(pending):
+            if request_index in failed:
+                error = failed[request_index]
+                results[index] = _batch_error(
+                    index, error.get("status", 409), error.get("errmsg", "Write failed"),
+                    error.get("error_code", "write_error")
+                )
+                continue
+            
+            if operation.op == BatchOperationType.CREATE:
+                status_deltas[TaskStatus(after["status"]).value] += 1
+                total_delta += 1
+                results[index] = {"index": index, "status": 201, "task": after}
+            elif operation.op == BatchOperationType.UPDATE:
+                status_deltas[TaskStatus(before["status"]).value] -= 1
+                status_deltas[TaskStatus(after["status"]).value] += 1
+                results[index] = {"index": index, "status": 200, "task": serialize_mongodb_doc(after)}
+            else:
+                status_deltas[TaskStatus(before["status"]).value] -= 1
+                total_delta -= 1
+                deleted_ids.append(operation.id)
+                results[index] = {"index": index, "status": 200, "id": operation.id}
+        
+        repository.add_tombstones(user_id, deleted_ids)
+        
+        succeeded = sum(1 for result in results if result["status"] < 400)
+        if succeeded:
+            repository.record_changes(user_id, status_deltas, total_delta)
+        
+        return success_response({
+            "results": results,
+            "succeeded": succeeded,
+            "failed": len(results) - succeeded
+        })
+        
+    except Exception as e:
+        # General error
+        logger.exception("Error processing task batch")
+        return error_response("Error processing task batch", 500, "server_error")
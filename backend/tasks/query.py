@@ -0,0 +1,123 @@
+"""
+Translates task listing parameters into MongoDB queries.
+
+Every plan names the compound index that serves it and the query is sent
+with that index as hint, so an accepted listing can never degrade into a
+collection scan. Combinations no index supports are rejected by
+utils.models.TaskListQuery before they get here.
+"""
+from datetime import datetime, timezone
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, TYPE_CHECKING
+
+from tasks.records import TaskRecord
+
+if TYPE_CHECKING:
+    from utils.models import TaskListQuery
+
+# Query string parameters handled by TaskListQuery
+FILTER_PARAMS = ("status", "created_after", "created_before", "updated_since", "sort")
+
+
+class QueryPlan(NamedTuple):
+    filter: Dict[str, Any]
+    sort_field: str
+    descending: bool
+    index: str
+
+    @property
+    def sort(self) -> List[tuple]:
+        direction = -1 if self.descending else 1
+        return [(self.sort_field, direction), ("id", direction)]
+
+
+# Index serving each sort field, without and with a status filter.
+# Both directions use the same index (walked backwards for descending sorts).
+SORT_INDEXES = {
+    "created_at": ("user_id_created_at_id", "user_id_status_created_at_id"),
+    "updated_at": ("user_id_updated_at_id", "user_id_status_updated_at_id"),
+}
+
+# Plain "all my tasks, oldest first" listing
+DEFAULT_PLAN = QueryPlan({}, "created_at", False, SORT_INDEXES["created_at"][0])
+
+
+def _naive_utc(value: datetime) -> datetime:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def plan_query(params: Optional["TaskListQuery"]) -> QueryPlan:
+    """
+    Builds the query plan of a validated listing request.
+
+    Args:
+        params: Validated parameters, or None for the default listing
+
+    Returns:
+        Filter (without user_id and keyset conditions), sort and index hint
+    """
+    if params is None:
+        return DEFAULT_PLAN
+
+    sort_field = params.sort.value.lstrip("-")
+    descending = params.sort.value.startswith("-")
+    query: Dict[str, Any] = {}
+
+    if params.status:
+        statuses = sorted({status.value for status in params.status})
+        query["status"] = statuses[0] if len(statuses) == 1 else {"$in": statuses}
+
+    # created_at is stored as an ISO 8601 string, which sorts chronologically
+    created_range = {}
+    if params.created_after:
+        created_range["$gte"] = _naive_utc(params.created_after).isoformat()
+    if params.created_before:
+        created_range["$lt"] = _naive_utc(params.created_before).isoformat()
+    if created_range:
+        query["created_at"] = created_range
+
+    # updated_at is stored as a BSON date
+    if params.updated_since:
+        query["updated_at"] = {"$gte": _naive_utc(params.updated_since)}
+
+    index = SORT_INDEXES[sort_field][1 if params.status else 0]
+    return QueryPlan(query, sort_field, descending, index)
+
+
+def parse_list_query(query_params: Dict[str, str]) -> QueryPlan:
+    """
+    Validates the filter and sort parameters of a listing request and plans
+    the query. pydantic is only loaded when the request has any of them.
+
+    Raises:
+        ValueError: If a parameter is invalid or the combination is not supported
+    """
+    raw = {name: query_params[name] for name in FILTER_PARAMS if query_params.get(name)}
+    if not raw:
+        return DEFAULT_PLAN
+
+    from utils.models import TaskListQuery
+    return plan_query(TaskListQuery(**raw))
+
+
+def parse_fields(value: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """
+    Validates a sparse fieldset (`fields=id,title,status`) against the task
+    fields.
+
+    Returns:
+        The requested fields, sorted and without duplicates, or None when the
+        parameter is missing (whole tasks)
+
+    Raises:
+        ValueError: If the list is empty or names a field tasks do not have
+    """
+    if value is None:
+        return None
+
+    fields = tuple(sorted({field.strip() for field in value.split(",") if field.strip()}))
+    unknown = [field for field in fields if field not in TaskRecord.__slots__]
+    if not fields or unknown:
+        raise ValueError(f"fields must be a comma separated list of: {', '.join(TaskRecord.__slots__)}")
+    return fields
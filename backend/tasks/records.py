@@ -0,0 +1,203 @@
+"""
+Lightweight task records for the write handlers.
+
+The pydantic models in utils/models.py remain the reference schema of the
+API, but building a TaskCreate and then a Task for every request (and calling
+to_dict() twice) dominates the CPU of create_task. TaskRecord is a
+__slots__ class whose payload validators are compiled once at import from
+the field specs below, and to_document() builds the single dict that is both
+inserted and returned. The specs mirror the models; tests/test_records.py
+checks that both accept and reject the same payloads.
+"""
+import uuid
+from datetime import datetime
+from decimal import Decimal
+from enum import Enum
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+from utils.enums import TaskStatus, BatchOperationType
+from utils.metrics import timed
+
+_MISSING = object()
+
+_STATUSES = {status.value: status.value for status in TaskStatus}
+_OPERATIONS = {operation.value: operation for operation in BatchOperationType}
+
+
+class TaskValidationError(ValueError):
+    """
+    Raised when a payload does not match the task schema.
+    """
+
+
+def _text(value: Any) -> str:
+    # Same coercion as pydantic's str fields
+    if isinstance(value, str):
+        return value.value if isinstance(value, Enum) else value
+    if isinstance(value, (int, float, Decimal)):
+        return str(value)
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode()
+    raise ValueError("str type expected")
+
+
+def _status(value: Any) -> str:
+    try:
+        return _STATUSES[value.value if isinstance(value, TaskStatus) else value]
+    except (KeyError, TypeError):
+        raise ValueError(f"value is not a valid enumeration member; permitted: {', '.join(_STATUSES)}")
+
+
+def _operation(value: Any) -> BatchOperationType:
+    try:
+        return _OPERATIONS[value.value if isinstance(value, BatchOperationType) else value]
+    except (KeyError, TypeError):
+        raise ValueError(f"value is not a valid enumeration member; permitted: {', '.join(_OPERATIONS)}")
+
+
+def _mapping(value: Any) -> Dict[str, Any]:
+    if not isinstance(value, dict):
+        raise ValueError("value is not a valid dict")
+    return value
+
+
+class FieldSpec(NamedTuple):
+    name: str
+    check: Callable[[Any], Any]
+    default: Any = _MISSING
+    optional: bool = False
+
+
+def compile_validator(model: str, fields: Tuple[FieldSpec, ...]) -> Callable[[Any], Dict[str, Any]]:
+    """
+    Builds the validator of a payload schema. Like pydantic, unknown keys
+    are ignored and all the field errors are reported together; optional
+    fields that are missing or None are left out of the result.
+    """
+    def validate(data: Any) -> Dict[str, Any]:
+        if not isinstance(data, dict):
+            raise TaskValidationError(f"{model}: value is not a valid dict")
+        values = {}
+        errors = []
+        for name, check, default, optional in fields:
+            value = data.get(name, _MISSING)
+            if value is _MISSING or (value is None and optional):
+                if default is not _MISSING:
+                    values[name] = default
+                elif not optional:
+                    errors.append(f"{name}: field required")
+                continue
+            if value is None:
+                errors.append(f"{name}: none is not an allowed value")
+                continue
+            try:
+                values[name] = check(value)
+            except ValueError as e:
+                errors.append(f"{name}: {e}")
+        if errors:
+            raise TaskValidationError(f"{model}: " + "; ".join(errors))
+        return values
+
+    return timed("validation")(validate)
+
+
+# utils.models.TaskCreate
+validate_task_create = compile_validator("TaskCreate", (
+    FieldSpec("title", _text),
+    FieldSpec("description", _text),
+    FieldSpec("status", _status, TaskStatus.TODO.value),
+))
+
+# utils.models.TaskUpdate
+validate_task_update = compile_validator("TaskUpdate", (
+    FieldSpec("title", _text, optional=True),
+    FieldSpec("description", _text, optional=True),
+    FieldSpec("status", _status, optional=True),
+))
+
+# utils.models.BatchOperation
+_validate_batch_operation = compile_validator("BatchOperation", (
+    FieldSpec("op", _operation),
+    FieldSpec("id", _text, optional=True),
+    FieldSpec("data", _mapping, {}),
+))
+
+
+class BatchOperationRecord(NamedTuple):
+    op: BatchOperationType
+    id: Optional[str]
+    data: Dict[str, Any]
+
+
+def parse_batch_operation(data: Any) -> BatchOperationRecord:
+    """
+    Validates one operation of a batch request.
+    """
+    values = _validate_batch_operation(data)
+    return BatchOperationRecord(values["op"], values.get("id"), values["data"])
+
+
+def update_fields(data: Any) -> Dict[str, Any]:
+    """
+    Validates a TaskUpdate payload and builds the $set document of the update.
+    """
+    fields = validate_task_update(data)
+    fields["updated_at"] = datetime.utcnow()
+    return fields
+
+
+class TaskRecord:
+    """
+    A task as stored in MongoDB. Same fields as utils.models.Task.
+    """
+
+    __slots__ = ("title", "description", "status", "id", "user_id", "created_at", "updated_at", "version")
+
+    def __init__(
+        self,
+        id: str,
+        title: str,
+        description: str,
+        status: str,
+        user_id: str,
+        created_at: datetime,
+        updated_at: Optional[datetime] = None,
+        version: int = 1
+    ):
+        self.id = id
+        self.title = title
+        self.description = description
+        self.status = status
+        self.user_id = user_id
+        self.created_at = created_at
+        self.updated_at = updated_at
+        self.version = version
+
+    @classmethod
+    def new(cls, data: Any, user_id: str) -> "TaskRecord":
+        """
+        Validates a TaskCreate payload and builds a new task of the user.
+
+        Raises:
+            TaskValidationError: If the payload is invalid
+        """
+        values = validate_task_create(data)
+        return cls(
+            str(uuid.uuid4()), values["title"], values["description"], values["status"], user_id, datetime.utcnow()
+        )
+
+    def to_document(self) -> Dict[str, Any]:
+        """
+        Builds the document stored in MongoDB, which is also the task's API
+        representation (dates as ISO 8601 strings).
+        """
+        return {
+            "id": self.id,
+            "title": self.title,
+            "description": self.description,
+            "status": self.status,
+            "user_id": self.user_id,
+            "created_at": self.created_at.isoformat(),
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+            "version": self.version
+        }
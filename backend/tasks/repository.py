@@ -0,0 +1,458 @@
+"""
+Data access for tasks.
+
+`TaskRepository` is the synchronous implementation on pymongo, used directly
+by the Lambda handlers. `AsyncTaskRepository` exposes the same operations as
+coroutines that run on a bounded thread pool, so the server mode and
+composite endpoints can issue independent queries concurrently:
+
+    task, changes = await asyncio.gather(
+        async_repository.get(user_id, task_id),
+        async_repository.changes(user_id, since, limit)
+    )
+"""
+import asyncio
+import contextvars
+import heapq
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, TypeVar
+
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
+
+from utils.db import get_collection
+from utils.pagination import encode_cursor, keyset_filter
+from utils.serialization import encode_page
+from tasks.query import QueryPlan, DEFAULT_PLAN
+from tasks.stats import (
+    read_stats, get_collection_version, next_sequence, record_created, record_updated, record_deleted, record_changes
+)
+
+# MongoDB collections
+TASKS_COLLECTION = "tasks"
+TOMBSTONES_COLLECTION = "task_tombstones"
+
+# Tasks carry their own "id", so Mongo's internal _id is never read. The
+# change stamps (`seq`, `changed_at`) are only read by delta sync.
+TASK_PROJECTION = {"_id": 0, "seq": 0, "changed_at": 0}
+CHANGE_PROJECTION = {"_id": 0}
+
+# Threads available to AsyncTaskRepository; there is no point in more threads
+# than connections in the MongoDB pool
+MAX_WORKERS = int(os.environ.get("TASKS_REPOSITORY_WORKERS", "8"))
+
+T = TypeVar("T")
+
+
+def task_projection(fields: Optional[Sequence[str]], *required: str) -> Dict[str, int]:
+    """
+    Builds the projection of a sparse fieldset (see tasks.query.parse_fields),
+    adding the fields the caller needs itself. None reads whole tasks.
+    """
+    if fields is None:
+        return TASK_PROJECTION
+    return {"_id": 0, **{field: 1 for field in (*fields, *required)}}
+
+
+class TaskRepository:
+    """
+    Synchronous task queries and writes. Writes also maintain the per-user
+    counters of tasks.stats.
+    """
+
+    def list_page(
+        self,
+        user_id: str,
+        limit: int,
+        cursor: Optional[str] = None,
+        plan: QueryPlan = DEFAULT_PLAN,
+        fields: Optional[Sequence[str]] = None
+    ) -> Tuple[bytearray, Optional[str]]:
+        """
+        Reads a page of tasks in keyset order and encodes it straight from the
+        MongoDB cursor.
+
+        Args:
+            user_id: Owner of the tasks
+            limit: Page size
+            cursor: `next_cursor` of the previous page
+            plan: Filters, sort and index of the listing (tasks/query.py)
+            fields: Fields to read and return (`id` is always included), or None for whole tasks
+
+        Returns:
+            Tuple with the open {"items": [...] JSON buffer (see
+            utils.serialization.close_page) and the cursor of the next page
+
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        query = {"user_id": user_id, **plan.filter, **keyset_filter(cursor, plan.sort_field, plan.descending)}
+
+        # The sort field is read for the next cursor even if it was not requested
+        projection = task_projection(fields, "id", plan.sort_field)
+        omit = () if fields is None or plan.sort_field in fields else (plan.sort_field,)
+
+        # Get one extra task to know whether there is a next page
+        documents = get_collection(TASKS_COLLECTION).find(
+            query, projection, hint=plan.index
+        ).sort(plan.sort).limit(limit + 1)
+        body, last_task, has_more = encode_page(documents, limit, omit)
+        return body, encode_cursor(last_task, plan.sort_field) if has_more else None
+
+    def search_page(
+        self,
+        user_id: str,
+        text: str,
+        limit: int,
+        cursor: Optional[str] = None
+    ) -> Tuple[bytearray, Optional[str]]:
+        """
+        Searches the user's tasks by title and description with the text
+        index, most relevant first. Each task carries its relevance `score`,
+        which together with the id is the keyset of the pagination.
+
+        Args:
+            user_id: Owner of the tasks
+            text: Search terms (MongoDB $text syntax: words, "phrases", -negations)
+            limit: Page size
+            cursor: `next_cursor` of the previous page
+
+        Returns:
+            Tuple with the open {"items": [...] JSON buffer and the cursor of the next page
+
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        pipeline = [
+            {"$match": {"user_id": user_id, "$text": {"$search": text}}},
+            {"$addFields": {"score": {"$meta": "textScore"}}},
+        ]
+        keyset = keyset_filter(cursor, "score", descending=True)
+        if keyset:
+            pipeline.append({"$match": keyset})
+        pipeline += [
+            {"$sort": {"score": -1, "id": -1}},
+            {"$limit": limit + 1},
+            {"$project": TASK_PROJECTION},
+        ]
+
+        documents = get_collection(TASKS_COLLECTION).aggregate(pipeline)
+        body, last_task, has_more = encode_page(documents, limit)
+        return body, encode_cursor(last_task, "score") if has_more else None
+
+    def get(
+        self,
+        user_id: str,
+        task_id: str,
+        fields: Optional[Sequence[str]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Reads a task of the user, or None if it does not exist. `id` is
+        always read, as in list_page, and so is `version`, since it is the
+        ETag of the task.
+        """
+        return get_collection(TASKS_COLLECTION).find_one(
+            {"id": task_id, "user_id": user_id}, task_projection(fields, "id", "version")
+        )
+
+    def changes(self, user_id: str, since: int, limit: int) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        Reads the user's task changes after a position of the change sequence:
+        the current version of every task created or updated since, and the
+        tombstones of the tasks deleted since, merged in sequence order.
+
+        Args:
+            user_id: Owner of the tasks
+            since: Last sequence number the client has seen (0 for everything)
+            limit: Maximum number of changes
+
+        Returns:
+            Tuple with the changes (tombstones have `deleted: True`) and whether there are more
+        """
+        query = {"user_id": user_id, "seq": {"$gt": since}}
+        tasks = get_collection(TASKS_COLLECTION).find(
+            query, CHANGE_PROJECTION, hint="user_id_seq"
+        ).sort("seq", 1).limit(limit + 1)
+        tombstones = get_collection(TOMBSTONES_COLLECTION).find(
+            query, {"_id": 0, "user_id": 0}, hint="user_id_seq"
+        ).sort("seq", 1).limit(limit + 1)
+
+        changes = list(heapq.merge(
+            tasks, ({**tombstone, "deleted": True} for tombstone in tombstones), key=lambda change: change["seq"]
+        ))
+        return changes[:limit], len(changes) > limit
+
+    def exists(self, user_id: str, task_id: str) -> bool:
+        """
+        Checks whether the user has the task, reading only its _id.
+        """
+        return get_collection(TASKS_COLLECTION).find_one({"id": task_id, "user_id": user_id}, {"_id": 1}) is not None
+
+    def find_by_ids(
+        self,
+        user_id: str,
+        task_ids: Iterable[str],
+        projection: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Reads several tasks of the user with one query, keyed by task id.
+        """
+        documents = get_collection(TASKS_COLLECTION).find(
+            {"user_id": user_id, "id": {"$in": list(task_ids)}}, projection or TASK_PROJECTION
+        )
+        return {task["id"]: task for task in documents}
+
+    def change_stamps(self, user_id: str, count: int) -> List[Dict[str, Any]]:
+        """
+        Allocates `count` numbers of the user's change sequence.
+
+        Returns:
+            The `seq`/`changed_at` fields to set on each changed task or tombstone
+        """
+        last = next_sequence(user_id, count)
+        changed_at = datetime.utcnow()
+        return [{"seq": seq, "changed_at": changed_at} for seq in range(last - count + 1, last + 1)]
+
+    def add_tombstones(self, user_id: str, task_ids: List[str]) -> None:
+        """
+        Records the deletion of tasks for delta sync. The markers expire after
+        utils.db.TOMBSTONE_TTL_SECONDS.
+        """
+        if not task_ids:
+            return
+        stamps = self.change_stamps(user_id, len(task_ids))
+        get_collection(TOMBSTONES_COLLECTION).insert_many(
+            [{"user_id": user_id, "id": task_id, **stamp} for task_id, stamp in zip(task_ids, stamps)],
+            ordered=False
+        )
+
+    def create(self, task: Dict[str, Any]) -> None:
+        """
+        Inserts a task and counts it.
+        """
+        # insert_one adds _id to the document it is given, so pass a copy
+        stamp, = self.change_stamps(task["user_id"], 1)
+        get_collection(TASKS_COLLECTION).insert_one({**task, **stamp})
+        record_created(task["user_id"], task["status"])
+
+    def update(
+        self,
+        user_id: str,
+        task_id: str,
+        fields: Dict[str, Any],
+        precondition: Optional[Dict[str, Any]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Sets fields of a task and increments its version atomically. Once the
+        write succeeded, one update of the user's counters also bumps the
+        collection version and allocates the change sequence number, which
+        is then stamped on the task. A write that matches nothing costs one
+        round trip and uses no sequence number.
+
+        Args:
+            user_id: Owner of the task
+            task_id: ID of the task
+            fields: $set document
+            precondition: Extra filter conditions (e.g. on the version)
+
+        Returns:
+            The task as it was before the update, or None if nothing matched
+        """
+        task_filter = {"id": task_id, "user_id": user_id, **(precondition or {})}
+        tasks = get_collection(TASKS_COLLECTION)
+
+        # The previous document is returned so the status counters know the old status
+        previous_task = tasks.find_one_and_update(
+            task_filter,
+            {"$set": fields, "$inc": {"version": 1}},
+            projection=TASK_PROJECTION,
+            return_document=ReturnDocument.BEFORE
+        )
+        if previous_task:
+            seq = record_updated(user_id, previous_task["status"], fields.get("status"))
+            # $max keeps the number of a concurrent update stamped first
+            tasks.update_one(
+                {"id": task_id, "user_id": user_id},
+                {"$max": {"seq": seq, "changed_at": datetime.utcnow()}}
+            )
+        return previous_task
+
+    def delete(
+        self,
+        user_id: str,
+        task_id: str,
+        precondition: Optional[Dict[str, Any]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Deletes a task, discounts it and leaves a tombstone for delta sync.
+        The counters, the collection version and the sequence number of the
+        tombstone are updated together once the delete succeeded.
+
+        Returns:
+            The status of the deleted task, or None if nothing matched
+        """
+        task_filter = {"id": task_id, "user_id": user_id, **(precondition or {})}
+        deleted_task = get_collection(TASKS_COLLECTION).find_one_and_delete(task_filter, projection={"status": 1})
+        if deleted_task:
+            seq = record_deleted(user_id, deleted_task["status"])
+            get_collection(TOMBSTONES_COLLECTION).insert_one(
+                {"user_id": user_id, "id": task_id, "seq": seq, "changed_at": datetime.utcnow()}
+            )
+        return deleted_task
+
+    def bulk_write(self, requests: List[Any]) -> Tuple[Dict[int, Dict[str, Any]], Dict[str, int]]:
+        """
+        Executes write requests with one unordered bulk write.
+
+        Returns:
+            The write errors keyed by request index (empty if all succeeded),
+            and the number of documents the updates matched and the deletes removed
+        """
+        if not requests:
+            return {}, {"matched": 0, "deleted": 0}
+        try:
+            result = get_collection(TASKS_COLLECTION).bulk_write(requests, ordered=False)
+        except BulkWriteError as e:
+            errors = {error["index"]: error for error in e.details.get("writeErrors", [])}
+            return errors, {"matched": e.details.get("nMatched", 0), "deleted": e.details.get("nRemoved", 0)}
+        return {}, {"matched": result.matched_count, "deleted": result.deleted_count}
+
+    def record_changes(self, user_id: str, status_deltas: Dict[Any, int], total_delta: int) -> None:
+        """
+        Applies the net counter changes of a bulk write.
+        """
+        record_changes(user_id, status_deltas, total_delta)
+
+    def stats(self, user_id: str) -> Tuple[Dict[str, Any], int]:
+        """
+        Reads the task counters and the collection version of the user.
+        """
+        return read_stats(user_id)
+
+    def version(self, user_id: str) -> int:
+        """
+        Reads the version of the user's task collection.
+        """
+        return get_collection_version(user_id)
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """
+    Gets the thread pool shared by the async repositories, created on first use.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="tasks-repository")
+    return _executor
+
+
+class AsyncTaskRepository:
+    """
+    Asyncio interface of TaskRepository. pymongo is blocking, so every
+    operation runs on a bounded thread pool; awaiting several of them with
+    asyncio.gather runs the queries concurrently.
+    """
+
+    def __init__(self, repository: Optional[TaskRepository] = None, executor: Optional[ThreadPoolExecutor] = None):
+        self.sync = repository or TaskRepository()
+        self._executor = executor
+
+    async def _run(self, function: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        loop = asyncio.get_running_loop()
+        # Copies the context, so the commands count as phases of the current handler
+        call = partial(contextvars.copy_context().run, function, *args, **kwargs)
+        return await loop.run_in_executor(self._executor or get_executor(), call)
+
+    async def list_page(
+        self,
+        user_id: str,
+        limit: int,
+        cursor: Optional[str] = None,
+        plan: QueryPlan = DEFAULT_PLAN,
+        fields: Optional[Sequence[str]] = None
+    ) -> Tuple[bytearray, Optional[str]]:
+        return await self._run(self.sync.list_page, user_id, limit, cursor, plan, fields)
+
+    async def search_page(
+        self,
+        user_id: str,
+        text: str,
+        limit: int,
+        cursor: Optional[str] = None
+    ) -> Tuple[bytearray, Optional[str]]:
+        return await self._run(self.sync.search_page, user_id, text, limit, cursor)
+
+    async def get(
+        self,
+        user_id: str,
+        task_id: str,
+        fields: Optional[Sequence[str]] = None
+    ) -> Optional[Dict[str, Any]]:
+        return await self._run(self.sync.get, user_id, task_id, fields)
+
+    async def exists(self, user_id: str, task_id: str) -> bool:
+        return await self._run(self.sync.exists, user_id, task_id)
+
+    async def changes(self, user_id: str, since: int, limit: int) -> Tuple[List[Dict[str, Any]], bool]:
+        return await self._run(self.sync.changes, user_id, since, limit)
+
+    async def change_stamps(self, user_id: str, count: int) -> List[Dict[str, Any]]:
+        return await self._run(self.sync.change_stamps, user_id, count)
+
+    async def add_tombstones(self, user_id: str, task_ids: List[str]) -> None:
+        return await self._run(self.sync.add_tombstones, user_id, list(task_ids))
+
+    async def find_by_ids(
+        self,
+        user_id: str,
+        task_ids: Iterable[str],
+        projection: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        return await self._run(self.sync.find_by_ids, user_id, list(task_ids), projection)
+
+    async def create(self, task: Dict[str, Any]) -> None:
+        return await self._run(self.sync.create, task)
+
+    async def update(
+        self,
+        user_id: str,
+        task_id: str,
+        fields: Dict[str, Any],
+        precondition: Optional[Dict[str, Any]] = None
+    ) -> Optional[Dict[str, Any]]:
+        return await self._run(self.sync.update, user_id, task_id, fields, precondition)
+
+    async def delete(
+        self,
+        user_id: str,
+        task_id: str,
+        precondition: Optional[Dict[str, Any]] = None
+    ) -> Optional[Dict[str, Any]]:
+        return await self._run(self.sync.delete, user_id, task_id, precondition)
+
+    async def bulk_write(self, requests: List[Any]) -> Tuple[Dict[int, Dict[str, Any]], Dict[str, int]]:
+        return await self._run(self.sync.bulk_write, requests)
+
+    async def record_changes(self, user_id: str, status_deltas: Dict[Any, int], total_delta: int) -> None:
+        return await self._run(self.sync.record_changes, user_id, status_deltas, total_delta)
+
+    async def stats(self, user_id: str) -> Tuple[Dict[str, Any], int]:
+        return await self._run(self.sync.stats, user_id)
+
+    async def version(self, user_id: str) -> int:
+        return await self._run(self.sync.version, user_id)
+
+
+# Shared instances; the sync one is the facade used by the Lambda handlers
+repository = TaskRepository()
+async_repository = AsyncTaskRepository(repository)
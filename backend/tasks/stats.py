@@ -0,0 +1,249 @@
+import uuid
+from typing import Dict, Any, Optional, Tuple
+from datetime import datetime
+from pymongo import ReturnDocument, UpdateOne
+from utils.db import get_collection
+from utils.enums import TaskStatus
+
+# MongoDB collection with one counter document per user (_id = user_id).
+# Besides the status counters, each document holds a `version` that every
+# write increments, used as the version of the user's task collection, and
+# the `sequence` that numbers the user's task changes for delta sync.
+STATS_COLLECTION = "task_stats"
+
+# MongoDB collection with the tasks the counters are computed from
+TASKS_COLLECTION = "tasks"
+
+
+def _status_key(status: Any) -> str:
+    return TaskStatus(status).value
+
+
+def record_created(user_id: str, status: Any) -> None:
+    """
+    Counts a newly created task.
+    """
+    get_collection(STATS_COLLECTION).update_one(
+        {"_id": user_id},
+        {"$inc": {f"counts.{_status_key(status)}": 1, "total": 1, "version": 1}},
+        upsert=True
+    )
+
+
+def record_changes(user_id: str, status_deltas: Dict[Any, int], total_delta: int) -> None:
+    """
+    Applies the net counter changes of several writes with one update.
+    Must only be called when at least one write succeeded.
+    
+    Args:
+        user_id: Owner of the tasks
+        status_deltas: Net change per status
+        total_delta: Net change of the total
+    """
+    increments = {
+        f"counts.{_status_key(status)}": delta
+        for status, delta in status_deltas.items() if delta
+    }
+    if total_delta:
+        increments["total"] = total_delta
+    increments["version"] = 1
+    
+    get_collection(STATS_COLLECTION).update_one(
+        {"_id": user_id},
+        {"$inc": increments},
+        upsert=True
+    )
+
+
+def _record_sequenced(user_id: str, increments: Dict[str, int]) -> int:
+    """
+    Applies counter increments, bumps the collection version and allocates
+    the next number of the change sequence with one atomic update.
+    
+    Returns:
+        The allocated sequence number
+    """
+    doc = get_collection(STATS_COLLECTION).find_one_and_update(
+        {"_id": user_id},
+        {"$inc": {**increments, "version": 1, "sequence": 1}},
+        projection={"sequence": 1},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return doc["sequence"]
+
+
+def record_updated(user_id: str, old_status: Any, new_status: Optional[Any] = None) -> int:
+    """
+    Records a task update, moving it between status counters if the status
+    changed, and allocates its number of the change sequence.
+    
+    Returns:
+        The sequence number of the update
+    """
+    increments = {}
+    if new_status is not None:
+        old_key, new_key = _status_key(old_status), _status_key(new_status)
+        if old_key != new_key:
+            increments[f"counts.{old_key}"] = -1
+            increments[f"counts.{new_key}"] = 1
+    return _record_sequenced(user_id, increments)
+
+
+def record_deleted(user_id: str, status: Any) -> int:
+    """
+    Discounts a deleted task and allocates the sequence number of its tombstone.
+    
+    Returns:
+        The sequence number of the deletion
+    """
+    return _record_sequenced(user_id, {f"counts.{_status_key(status)}": -1, "total": -1})
+
+
+def next_sequence(user_id: str, count: int = 1) -> int:
+    """
+    Allocates `count` consecutive numbers of the user's change sequence with
+    one atomic increment.
+    
+    Returns:
+        The last allocated number (the block is last - count + 1 .. last)
+    """
+    doc = get_collection(STATS_COLLECTION).find_one_and_update(
+        {"_id": user_id},
+        {"$inc": {"sequence": count}},
+        projection={"sequence": 1},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return doc["sequence"]
+
+
+def get_collection_version(user_id: str) -> int:
+    """
+    Reads the version of the user's task collection with an indexed point read.
+    """
+    doc = get_collection(STATS_COLLECTION).find_one({"_id": user_id}, {"version": 1}) or {}
+    return doc.get("version", 0)
+
+
+def read_stats(user_id: str) -> Tuple[Dict[str, Any], int]:
+    """
+    Reads the task counters and the collection version of a user with a
+    single point lookup.
+
+    Returns:
+        Tuple with the total and the count per TaskStatus, and the version
+    """
+    doc = get_collection(STATS_COLLECTION).find_one({"_id": user_id}) or {}
+    counts = doc.get("counts", {})
+    by_status = {status.value: max(counts.get(status.value, 0), 0) for status in TaskStatus}
+    stats = {
+        "total": max(doc.get("total", 0), 0),
+        "by_status": by_status
+    }
+    return stats, doc.get("version", 0)
+
+
+def get_stats(user_id: str) -> Dict[str, Any]:
+    """
+    Reads the task counters of a user with a single point lookup.
+
+    Returns:
+        Dictionary with the total and the count per TaskStatus
+    """
+    return read_stats(user_id)[0]
+
+
+def rebuild_stats(user_id: Optional[str] = None) -> int:
+    """
+    Recomputes the counters from the tasks collection with an aggregation
+    pipeline that writes its result with $merge.
+
+    Counter updates made while the rebuild runs may be overwritten, so it
+    should run while writes are quiesced.
+
+    Args:
+        user_id: Rebuild only this user's counters (all users if None)
+
+    Returns:
+        Number of counter documents reset because their user has no tasks
+    """
+    rebuild_id = str(uuid.uuid4())
+    match = {"user_id": user_id} if user_id else {}
+
+    pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": {"user_id": "$user_id", "status": "$status"},
+            "count": {"$sum": 1}
+        }},
+        {"$group": {
+            "_id": "$_id.user_id",
+            "counts": {"$push": {"k": "$_id.status", "v": "$count"}},
+            "total": {"$sum": "$count"}
+        }},
+        {"$project": {
+            "counts": {"$arrayToObject": "$counts"},
+            "total": 1,
+            "rebuild_id": {"$literal": rebuild_id}
+        }},
+        # Replace the counters but keep the collection version, which must
+        # never go back or clients could see a stale ETag match again
+        {"$merge": {
+            "into": STATS_COLLECTION,
+            "on": "_id",
+            "whenMatched": [{"$set": {
+                "counts": "$$new.counts",
+                "total": "$$new.total",
+                "rebuild_id": "$$new.rebuild_id"
+            }}],
+            "whenNotMatched": "insert"
+        }}
+    ]
+    list(get_collection(TASKS_COLLECTION).aggregate(pipeline))
+
+    # Counters of users without tasks are not produced by the pipeline
+    stale = {"rebuild_id": {"$ne": rebuild_id}}
+    if user_id:
+        stale["_id"] = user_id
+    return get_collection(STATS_COLLECTION).update_many(
+        stale,
+        {"$set": {"counts": {}, "total": 0, "rebuild_id": rebuild_id}}
+    ).modified_count
+
+
+def backfill_sequence(user_id: Optional[str] = None) -> int:
+    """
+    Numbers the tasks written before delta sync existed, oldest first, so
+    they are returned by GET /tasks/changes. Tasks that already have a
+    sequence number are left alone, so the command can be repeated.
+
+    Args:
+        user_id: Only number this user's tasks (all users if None)
+
+    Returns:
+        Number of tasks numbered
+    """
+    tasks = get_collection(TASKS_COLLECTION)
+    unnumbered = {"seq": {"$exists": False}}
+    user_ids = [user_id] if user_id else tasks.distinct("user_id", unnumbered)
+
+    numbered = 0
+    for owner in user_ids:
+        task_ids = [
+            task["id"] for task in
+            tasks.find({"user_id": owner, **unnumbered}, {"_id": 0, "id": 1}).sort("created_at", 1)
+        ]
+        if not task_ids:
+            continue
+        last = next_sequence(owner, len(task_ids))
+        changed_at = datetime.utcnow()
+        tasks.bulk_write([
+            UpdateOne(
+                {"user_id": owner, "id": task_id, **unnumbered},
+                {"$set": {"seq": seq, "changed_at": changed_at}}
+            )
+            for seq, task_id in enumerate(task_ids, start=last - len(task_ids) + 1)
+        ], ordered=False)
+        numbered += len(task_ids)
+    return numbered
@@ -20,4 +20,16 @@ def setup_test_environment():
         "COGNITO_CLIENT_ID": "test-client-id",
         "REGION": "us-east-1"
     }):
-        yield 
\ No newline at end of file
+        yield
+
+
+# Contexto de Lambda mínimo para los handlers decorados con inject_lambda_context
+@pytest.fixture
+def lambda_context():
+    class LambdaContext:
+        function_name = "test-function"
+        memory_limit_in_mb = 128
+        invoked_function_arn = "arn:aws:lambda:us-east-1:123456789012:function:test-function"
+        aws_request_id = "test-request-id"
+
+    return LambdaContext()
@@ -1,7 +1,7 @@
 import json
 import pytest
 from unittest.mock import patch, MagicMock
-from auth.handler import register, login
+from auth.handler import register, login, refresh, get_cognito_client, get_secret_hash
 from botocore.exceptions import ClientError
 
 # Mock del evento de API Gateway
@@ -24,33 +24,43 @@ def mock_login_event():
         })
     }
 
+@pytest.fixture
+def mock_refresh_event():
+    return {
+        "body": json.dumps({
+            "email": "test@example.com",
+            "refresh_token": "refresh-token-value"
+        })
+    }
+
 # Test para el registro exitoso
-def test_register_success(mock_register_event):
+def test_register_success(mock_register_event, lambda_context):
     # Mock de la respuesta de Cognito
-    cognito_response = {
+    cognito = MagicMock()
+    cognito.sign_up.return_value = {
         "UserSub": "user123",
         "UserConfirmed": False
     }
     
     # Configurar mocks
-    with patch("auth.handler.cognito.sign_up", return_value=cognito_response) as mock_sign_up, \
-         patch("auth.handler.cognito.admin_confirm_sign_up") as mock_confirm:
+    with patch("auth.handler.get_cognito_client", return_value=cognito), \
+         patch("auth.handler.CLIENT_ID", "test-client-id"):
         
         # Llamar a la función
-        response = register(mock_register_event, {})
+        response = register(mock_register_event, lambda_context)
         
         # Verificar resultado
         assert response["statusCode"] == 201
         body = json.loads(response["body"])
-        assert body["message"] == "Usuario registrado exitosamente"
+        assert body["message"] == "User registered successfully"
         assert body["user_id"] == "user123"
         
         # Verificar que se llamó a Cognito con los parámetros correctos
-        mock_sign_up.assert_called_once()
-        mock_confirm.assert_called_once()
+        cognito.sign_up.assert_called_once()
+        cognito.admin_confirm_sign_up.assert_called_once()
 
 # Test para el registro con error de usuario existente
-def test_register_user_exists(mock_register_event):
+def test_register_user_exists(mock_register_event, lambda_context):
     # Crear un error de ClientError para usuario existente
     error_response = {
         "Error": {
@@ -61,17 +71,20 @@ def test_register_user_exists(mock_register_event):
     exception = ClientError(error_response, "SignUp")
     
     # Configurar mock para lanzar la excepción
-    with patch("auth.handler.cognito.sign_up", side_effect=exception):
+    cognito = MagicMock()
+    cognito.sign_up.side_effect = exception
+    with patch("auth.handler.get_cognito_client", return_value=cognito), \
+         patch("auth.handler.CLIENT_ID", "test-client-id"):
         # Llamar a la función
-        response = register(mock_register_event, {})
+        response = register(mock_register_event, lambda_context)
         
         # Verificar resultado
         assert response["statusCode"] == 409
         body = json.loads(response["body"])
-        assert "ya está registrado" in body["message"]
+        assert "already registered" in body["message"]
 
 # Test para login exitoso
-def test_login_success(mock_login_event):
+def test_login_success(mock_login_event, lambda_context):
     # Mock de la respuesta de Cognito
     cognito_response = {
         "AuthenticationResult": {
@@ -83,9 +96,12 @@ def test_login_success(mock_login_event):
     }
     
     # Configurar mock
-    with patch("auth.handler.cognito.initiate_auth", return_value=cognito_response) as mock_auth:
+    cognito = MagicMock()
+    cognito.admin_initiate_auth.return_value = cognito_response
+    with patch("auth.handler.get_cognito_client", return_value=cognito), \
+         patch("auth.handler.CLIENT_ID", "test-client-id"):
         # Llamar a la función
-        response = login(mock_login_event, {})
+        response = login(mock_login_event, lambda_context)
         
         # Verificar resultado
         assert response["statusCode"] == 200
@@ -95,10 +111,10 @@ def test_login_success(mock_login_event):
         assert body["refresh_token"] == "refresh-token-value"
         
         # Verificar que se llamó a Cognito con los parámetros correctos
-        mock_auth.assert_called_once()
+        cognito.admin_initiate_auth.assert_called_once()
 
 # Test para login con credenciales inválidas
-def test_login_invalid_credentials(mock_login_event):
+def test_login_invalid_credentials(mock_login_event, lambda_context):
     # Crear un error de ClientError para credenciales inválidas
     error_response = {
         "Error": {
@@ -106,14 +122,71 @@ def test_login_invalid_credentials(mock_login_event):
             "Message": "Incorrect username or password."
         }
     }
-    exception = ClientError(error_response, "InitiateAuth")
+    exception = ClientError(error_response, "AdminInitiateAuth")
     
     # Configurar mock para lanzar la excepción
-    with patch("auth.handler.cognito.initiate_auth", side_effect=exception):
+    cognito = MagicMock()
+    cognito.admin_initiate_auth.side_effect = exception
+    with patch("auth.handler.get_cognito_client", return_value=cognito), \
+         patch("auth.handler.CLIENT_ID", "test-client-id"):
         # Llamar a la función
-        response = login(mock_login_event, {})
+        response = login(mock_login_event, lambda_context)
         
         # Verificar resultado
         assert response["statusCode"] == 401
         body = json.loads(response["body"])
-        assert "Credenciales inválidas" in body["message"] 
\ No newline at end of file
+        assert "Invalid credentials" in body["message"]
+
+# Test para renovar los tokens con el refresh token
+def test_refresh_success(mock_refresh_event, lambda_context):
+    cognito_response = {
+        "AuthenticationResult": {
+            "IdToken": "new-id-token",
+            "AccessToken": "new-access-token",
+            "ExpiresIn": 3600
+        }
+    }
+    cognito = MagicMock()
+    cognito.admin_initiate_auth.return_value = cognito_response
+
+    with patch("auth.handler.get_cognito_client", return_value=cognito), \
+         patch("auth.handler.CLIENT_ID", "test-client-id"):
+        response = refresh(mock_refresh_event, lambda_context)
+
+    assert response["statusCode"] == 200
+    body = json.loads(response["body"])
+    assert body["id_token"] == "new-id-token"
+    # Sin rotación, Cognito no devuelve un refresh token nuevo
+    assert body["refresh_token"] == "refresh-token-value"
+
+    kwargs = cognito.admin_initiate_auth.call_args.kwargs
+    assert kwargs["AuthFlow"] == "REFRESH_TOKEN_AUTH"
+    assert kwargs["AuthParameters"]["REFRESH_TOKEN"] == "refresh-token-value"
+    with patch("auth.handler.CLIENT_ID", "test-client-id"):
+        assert kwargs["AuthParameters"]["SECRET_HASH"] == get_secret_hash("test@example.com")
+
+# Test para un refresh token inválido o caducado
+def test_refresh_invalid_token(mock_refresh_event, lambda_context):
+    exception = ClientError(
+        {"Error": {"Code": "NotAuthorizedException", "Message": "Refresh Token has expired"}},
+        "AdminInitiateAuth"
+    )
+    cognito = MagicMock()
+    cognito.admin_initiate_auth.side_effect = exception
+
+    with patch("auth.handler.get_cognito_client", return_value=cognito), \
+         patch("auth.handler.CLIENT_ID", "test-client-id"):
+        response = refresh(mock_refresh_event, lambda_context)
+
+    assert response["statusCode"] == 401
+    assert json.loads(response["body"])["error_code"] == "invalid_refresh_token"
+
+# Test para la configuración del cliente de Cognito
+def test_cognito_client_config():
+    with patch("auth.handler._cognito", None), patch("boto3.client") as client:
+        get_cognito_client()
+
+    config = client.call_args.kwargs["config"]
+    assert config.tcp_keepalive is True
+    assert config.retries["mode"] == "adaptive"
+    assert config.max_pool_connections == 10
@@ -0,0 +1,30 @@
+from benchmarks.bench_handlers import BENCHMARKED, compare, run
+
+# Test para ejecutar la suite con un conjunto pequeño: todas las respuestas 2xx y los viajes a MongoDB contados
+def test_handlers_benchmark_smoke():
+    results = run([100], BENCHMARKED, iterations=3)["100"]
+
+    assert list(results) == BENCHMARKED
+    assert all(result["errors"] == 0 for result in results.values())
+    assert results["getTask"]["round_trips"] >= 1
+    # Sin caché cada lectura consulta MongoDB; los casos ":cached" solo leen la versión de la colección
+    assert results["getTasks"]["round_trips"] >= 1
+    assert results["searchTasks"]["round_trips"] >= 1
+    assert results["getTask:cached"]["round_trips"] == 0
+    assert results["getTasks:cached"]["round_trips"] < results["getTasks"]["round_trips"]
+    assert results["searchTasks:cached"]["round_trips"] < results["searchTasks"]["round_trips"]
+    assert results["createTask"]["round_trips"] >= 1
+    assert results["login"]["round_trips"] == 0
+
+
+# Test para detectar regresiones respecto a una ejecución anterior
+def test_compare_flags_regressions():
+    result = {"p50_ms": 1.0, "p99_ms": 2.0, "alloc_kib": 10.0, "round_trips": 1.0, "errors": 0}
+    baseline = {"results": {"100": {"getTask": result}}}
+    slower = {"results": {"100": {"getTask": {**result, "p50_ms": 1.5, "round_trips": 2.0}}}}
+
+    assert compare(baseline, baseline, 0.25) == []
+    assert compare(slower, baseline, 0.25) == [
+        "getTask @ 100: p50_ms 1.00 -> 1.50",
+        "getTask @ 100: round_trips 1.00 -> 2.00",
+    ]
@@ -0,0 +1,103 @@
+from utils.cache import LRUCache, ENTRY_OVERHEAD, get_cache_stats
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+# Test para aciertos, fallos y expiración por TTL
+def test_hit_miss_and_expiration():
+    clock = FakeClock()
+    cache = LRUCache("test-ttl", max_entries=10, max_bytes=10_000, ttl=5, clock=clock)
+
+    assert cache.get("user1", "a") is None
+    cache.set("user1", "a", b"value", 5)
+    assert cache.get("user1", "a") == b"value"
+
+    clock.now = 5
+    assert cache.get("user1", "a") is None
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["expirations"]) == (1, 2, 1)
+    assert stats["entries"] == 0 and stats["bytes"] == 0
+
+
+# Test para el desalojo LRU por número de entradas
+def test_evicts_least_recently_used():
+    cache = LRUCache("test-lru", max_entries=2, max_bytes=10_000, ttl=60)
+    cache.set("user1", "a", 1, 1)
+    cache.set("user1", "b", 2, 1)
+    cache.get("user1", "a")
+    cache.set("user1", "c", 3, 1)
+
+    assert cache.get("user1", "b") is None
+    assert cache.get("user1", "a") == 1
+    assert cache.get("user1", "c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+# Test para el límite de memoria
+def test_memory_cap():
+    cache = LRUCache("test-bytes", max_entries=100, max_bytes=4 * (ENTRY_OVERHEAD + 100), ttl=60)
+    for key in range(6):
+        cache.set("user1", key, b"x" * 100, 100)
+
+    stats = cache.stats()
+    assert stats["bytes"] <= stats["max_bytes"]
+    assert stats["entries"] == 4 and stats["evictions"] == 2
+
+    # Los valores que superan un cuarto del límite no se guardan
+    cache.set("user1", "big", b"x" * 1000, 1000)
+    assert cache.get("user1", "big") is None
+
+
+# Test para invalidar todas las entradas de un usuario
+def test_invalidate_namespace():
+    cache = LRUCache("test-invalidate", max_entries=10, max_bytes=10_000, ttl=60)
+    cache.set("user1", "a", 1, 1)
+    cache.set("user1", ("task", "t1"), 2, 1)
+    cache.set("user2", "a", 3, 1)
+
+    cache.invalidate("user1")
+
+    assert cache.get("user1", "a") is None
+    assert cache.get("user1", ("task", "t1")) is None
+    assert cache.get("user2", "a") == 3
+    assert cache.stats()["invalidations"] == 1
+    assert "test-invalidate" in get_cache_stats()
+
+
+# Test para no guardar un valor leído antes de una invalidación concurrente
+def test_set_after_invalidation_is_dropped():
+    cache = LRUCache("test-generation", max_entries=2, max_bytes=10_000, ttl=60)
+
+    generation = cache.generation()
+    cache.invalidate("user1")
+    cache.set("user1", "a", "old", 1, generation=generation)
+    assert cache.get("user1", "a") is None
+    assert cache.stats()["stale_sets"] == 1
+
+    # Otros usuarios y las lecturas posteriores a la invalidación sí se guardan
+    cache.set("user2", "a", "value", 1, generation=generation)
+    cache.set("user1", "a", "new", 1, generation=cache.generation())
+    assert (cache.get("user1", "a"), cache.get("user2", "a")) == ("new", "value")
+
+    # Un usuario olvidado cuenta como invalidado en la última generación olvidada
+    generation = cache.generation()
+    cache.invalidate("user3")
+    cache.invalidate("user4")
+    cache.invalidate("user5")
+    cache.set("user1", "b", "old", 1, generation=generation)
+    assert cache.get("user1", "b") is None
+
+
+# Test para la caché desactivada con TTL 0
+def test_disabled_cache():
+    cache = LRUCache("test-disabled", max_entries=10, max_bytes=10_000, ttl=0)
+    cache.set("user1", "a", 1, 1)
+    assert cache.get("user1", "a") is None
+    assert cache.stats()["misses"] == 0
@@ -0,0 +1,10 @@
+import pytest
+from benchmarks.bench_cold_start import HANDLERS, run_handler, load_budget, check_budget
+
+# Test para el presupuesto de arranque en frío de cada handler (intérprete nuevo por handler)
+@pytest.mark.parametrize("name", list(HANDLERS))
+def test_cold_start_budget(name):
+    result = run_handler(name)
+    
+    assert result["status_code"] < 500
+    assert check_budget(name, result, load_budget()) == []
@@ -0,0 +1,91 @@
+import pytest
+from unittest.mock import patch, MagicMock
+from utils.db import COLLECTION_INDEXES, RUNTIME_DEFAULTS, check_indexes, ensure_indexes, get_client_options
+from utils.monitoring import PoolStatsListener
+
+# Mock de la base de datos con una colección por nombre
+@pytest.fixture
+def mock_database():
+    collections = {}
+    database = MagicMock()
+    database.__getitem__.side_effect = lambda name: collections.setdefault(name, MagicMock())
+    with patch("utils.db.get_database", return_value=database):
+        yield collections
+
+# Test para crear los índices declarados
+def test_ensure_indexes(mock_database):
+    ensure_indexes()
+    
+    for collection_name, indexes in COLLECTION_INDEXES.items():
+        mock_database[collection_name].create_indexes.assert_called_once_with(indexes)
+
+# Test para reportar índices faltantes, sin uso y no declarados
+def test_check_indexes(mock_database):
+    tasks = mock_database.setdefault("tasks", MagicMock())
+    tasks.list_indexes.return_value = [
+        {"name": "_id_", "key": {"_id": 1}},
+        {"name": "user_id_id", "key": {"user_id": 1, "id": 1}, "unique": True},
+        {"name": "user_id_created_at_id", "key": {"user_id": 1, "created_at": 1, "id": 1}},
+        {
+            "name": "user_id_text",
+            "key": {"user_id": 1, "_fts": "text", "_ftsx": 1},
+            "weights": {"title": 3, "description": 1},
+            "default_language": "none"
+        },
+        {"name": "legacy", "key": {"title": 1}}
+    ]
+    tasks.aggregate.return_value = [
+        {"name": "_id_", "accesses": {"ops": 0}},
+        {"name": "user_id_id", "accesses": {"ops": 10}},
+        {"name": "user_id_created_at_id", "accesses": {"ops": 3}},
+        {"name": "user_id_text", "accesses": {"ops": 1}},
+        {"name": "legacy", "accesses": {"ops": 0}}
+    ]
+    
+    report = check_indexes()["tasks"]
+    
+    assert report["missing"] == [
+        "user_id_updated_at_id", "user_id_status_created_at_id", "user_id_status_updated_at_id", "user_id_seq"
+    ]
+    assert report["unused"] == ["legacy"]
+    assert report["undeclared"] == ["legacy"]
+    
+    # Un índice de texto con otros pesos no coincide con el declarado
+    tasks.list_indexes.return_value[3]["weights"] = {"title": 1, "description": 1}
+    assert "user_id_text" in check_indexes()["tasks"]["missing"]
+
+# Test para las opciones del cliente según el runtime y las variables de entorno
+def test_client_options(monkeypatch):
+    monkeypatch.setenv("AWS_LAMBDA_FUNCTION_NAME", "getTasks")
+    options = get_client_options()
+    assert options["maxPoolSize"] == RUNTIME_DEFAULTS["lambda"]["maxPoolSize"]
+    
+    monkeypatch.delenv("AWS_LAMBDA_FUNCTION_NAME")
+    monkeypatch.setenv("MONGODB_MAX_POOL_SIZE", "20")
+    monkeypatch.setenv("MONGODB_RETRY_WRITES", "false")
+    monkeypatch.setenv("MONGODB_COMPRESSORS", "zlib")
+    options = get_client_options()
+    assert options["maxPoolSize"] == 20
+    assert options["minPoolSize"] == RUNTIME_DEFAULTS["server"]["minPoolSize"]
+    assert options["retryWrites"] is False
+    assert options["compressors"] == "zlib"
+
+# Test para los contadores del pool de conexiones
+def test_pool_stats_listener():
+    listener = PoolStatsListener()
+    event = MagicMock(address=("localhost", 27017))
+    
+    listener.connection_created(event)
+    listener.connection_checked_out(event)
+    listener.connection_checked_in(event)
+    listener.connection_checked_out(event)
+    
+    assert listener.stats()["localhost:27017"] == {
+        "open": 1,
+        "checked_out": 1,
+        "created": 1,
+        "closed": 0,
+        "checkouts": 2,
+        "checkout_failures": 0,
+        "pool_cleared": 0
+    }
@@ -0,0 +1,183 @@
+import random
+import pytest
+from datetime import datetime, timedelta
+from pymongo import DeleteOne, InsertOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from benchmarks import fake_mongo
+from benchmarks.fake_mongo import FakeMongoClient, matches
+from utils.db import COLLECTION_INDEXES
+from utils.pagination import encode_cursor, keyset_filter
+
+
+@pytest.fixture
+def tasks(monkeypatch):
+    # Buckets pequeños para que las pruebas crucen varios
+    monkeypatch.setattr(fake_mongo, "BUCKET_SIZE", 4)
+    collection = FakeMongoClient()["test_db"]["tasks"]
+    collection.create_indexes(COLLECTION_INDEXES["tasks"])
+    return collection
+
+
+def make_tasks(count, user_id="user123", seed=7):
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    return [{
+        "id": f"task{i:03d}",
+        "user_id": user_id,
+        "title": f"Task {i}",
+        "description": "Report" if i % 4 == 0 else "Other",
+        "status": rng.choice(["to_do", "in_progress", "completed"]),
+        "created_at": (start + timedelta(minutes=rng.randrange(50))).isoformat(),
+        "updated_at": None if i % 3 == 0 else start + timedelta(hours=rng.randrange(30)),
+        "version": 1,
+        "seq": i + 1,
+    } for i in range(count)]
+
+
+def naive(documents, query, sort, limit=0):
+    result = [doc for doc in documents if matches(doc, query)]
+    fake_mongo.sort_documents(result, sort, lambda doc: doc)
+    return [doc["id"] for doc in result[:limit or None]]
+
+
+# Test para recorrer páginas con el índice (incluido el orden descendente y los nulos) igual que sin él
+@pytest.mark.parametrize("field,descending,status", [
+    ("created_at", False, None),
+    ("created_at", True, None),
+    ("updated_at", False, None),
+    ("updated_at", True, None),
+    ("created_at", False, "to_do"),
+    ("updated_at", True, ["to_do", "completed"]),
+])
+def test_keyset_pages_match_naive_scan(tasks, field, descending, status):
+    documents = make_tasks(60) + make_tasks(5, user_id="user456")
+    tasks.insert_many(documents[:30])
+    for document in documents[30:]:
+        tasks.insert_one(document)
+
+    # Cambios que mueven filas dentro de los índices
+    rng = random.Random(3)
+    for i in rng.sample(range(60), 20):
+        tasks.update_one({"id": f"task{i:03d}", "user_id": "user123"}, {"$set": {
+            "status": rng.choice(["to_do", "completed"]),
+            "updated_at": datetime(2024, 3, 1) + timedelta(hours=rng.randrange(5))
+        }})
+    for i in rng.sample(range(60), 5):
+        tasks.delete_one({"id": f"task{i:03d}", "user_id": "user123"})
+    documents = list(tasks.find({}, {"_id": 0}))
+    index = f"user_id_{field}_id" if status is None else f"user_id_status_{field}_id"
+    direction = -1 if descending else 1
+    sort = [(field, direction), ("id", direction)]
+    base = {"user_id": "user123"}
+    if status is not None:
+        base["status"] = status if isinstance(status, str) else {"$in": status}
+
+    seen, cursor = [], None
+    while True:
+        query = {**base, **keyset_filter(cursor, field, descending)}
+        page = list(tasks.find(query, {"_id": 0}, hint=index).sort(sort).limit(7))
+        assert [doc["id"] for doc in page] == naive(documents, query, sort, 7)
+        seen += [doc["id"] for doc in page]
+        if len(page) < 7:
+            break
+        cursor = encode_cursor(page[-1], field)
+
+    assert seen == naive(documents, base, sort)
+
+
+# Test para un hint que no corresponde a ningún índice
+def test_unknown_hint(tasks):
+    with pytest.raises(OperationFailure):
+        list(tasks.find({"user_id": "user123"}, hint="missing_index"))
+
+
+# Test para el índice único y las escrituras con errores
+def test_unique_index_and_bulk_write(tasks):
+    tasks.insert_many(make_tasks(3))
+    with pytest.raises(DuplicateKeyError):
+        tasks.insert_one({"id": "task001", "user_id": "user123"})
+
+    with pytest.raises(BulkWriteError) as error:
+        tasks.bulk_write([
+            InsertOne({"id": "task009", "user_id": "user123", "seq": 9}),
+            InsertOne({"id": "task000", "user_id": "user123"}),
+            UpdateOne({"id": "task001", "user_id": "user123"}, {"$set": {"status": "completed"}}),
+            DeleteOne({"id": "task002", "user_id": "user123"}),
+        ], ordered=False)
+    assert [e["index"] for e in error.value.details["writeErrors"]] == [1]
+    assert error.value.details["nInserted"] == 1
+    assert tasks.find_one({"id": "task001"})["status"] == "completed"
+    assert tasks.find_one({"id": "task002"}) is None
+    assert [doc["id"] for doc in tasks.find({"user_id": "user123"}).sort("seq", 1)] == ["task000", "task001", "task009"]
+
+
+# Test para find_one_and_update con upsert, $inc anidado y proyección
+def test_find_one_and_update():
+    stats = FakeMongoClient()["test_db"]["task_stats"]
+    doc = stats.find_one_and_update(
+        {"_id": "user123"}, {"$inc": {"sequence": 3}},
+        projection={"sequence": 1}, upsert=True, return_document=ReturnDocument.AFTER
+    )
+    assert doc == {"_id": "user123", "sequence": 3}
+
+    stats.update_one({"_id": "user123"}, {"$inc": {"counts.to_do": 1, "total": 1}}, upsert=True)
+    before = stats.find_one_and_update({"_id": "user123"}, {"$set": {"counts.to_do": 5}})
+    assert before["counts"] == {"to_do": 1}
+    assert stats.find_one({"_id": "user123"}, {"_id": 0, "sequence": 0}) == {"counts": {"to_do": 5}, "total": 1}
+    assert stats.find_one_and_update({"_id": "other"}, {"$inc": {"total": 1}}) is None
+
+
+# Test para la búsqueda de texto con frases y negaciones
+def test_text_search(tasks):
+    tasks.insert_many([
+        {"id": "a", "user_id": "user123", "title": "Quarterly report", "description": "Finance"},
+        {"id": "b", "user_id": "user123", "title": "Groceries", "description": "Report the receipts"},
+        {"id": "c", "user_id": "user123", "title": "Report draft", "description": "Quarterly numbers"},
+        {"id": "d", "user_id": "user456", "title": "Report", "description": ""},
+    ])
+
+    def search(text):
+        pipeline = [
+            {"$match": {"user_id": "user123", "$text": {"$search": text}}},
+            {"$addFields": {"score": {"$meta": "textScore"}}},
+            {"$sort": {"score": -1, "id": -1}},
+            {"$project": {"_id": 0, "id": 1, "score": 1}},
+        ]
+        return [doc["id"] for doc in tasks.aggregate(pipeline)]
+
+    # El título pesa más que la descripción
+    assert search("report")[-1] == "b"
+    assert set(search("report")) == {"a", "b", "c"}
+    assert search('"quarterly report"') == ["a"]
+    assert search("report -draft") == ["a", "b"]
+
+    with pytest.raises(OperationFailure):
+        FakeMongoClient()["test_db"]["tasks"].aggregate([{"$match": {"$text": {"$search": "report"}}}])
+
+
+# Test para contar los viajes al servidor, incluido el getMore de los cursores largos
+def test_round_trips(tasks):
+    tasks.insert_many(make_tasks(150))
+    client = tasks.database.client
+    client.commands.clear()
+
+    list(tasks.find({"user_id": "user123"}, hint="user_id_seq").sort("seq", 1).limit(101))
+    assert client.round_trips == 1
+    list(tasks.find({"user_id": "user123"}, hint="user_id_seq").sort("seq", 1))
+    assert client.commands == {"find": 2, "getMore": 1}
+
+
+# Test para $indexStats y los opcounters de serverStatus
+def test_index_stats_and_server_status(tasks):
+    tasks.insert_many(make_tasks(10))
+    list(tasks.find({"user_id": "user123"}, hint="user_id_seq").sort("seq", 1))
+    tasks.find_one({"user_id": "user123", "id": "task001"})
+
+    usage = {stats["name"]: stats["accesses"]["ops"] for stats in tasks.aggregate([{"$indexStats": {}}])}
+    assert usage["user_id_seq"] == 1
+    assert usage["user_id_id"] == 1
+    assert usage["user_id_created_at_id"] == 0
+
+    opcounters = tasks.database.command("serverStatus")["opcounters"]
+    assert opcounters["query"] == 2
+    assert opcounters["insert"] == 1
@@ -0,0 +1,40 @@
+import json
+import pytest
+from unittest.mock import patch, MagicMock
+from health import handler as health_handler
+from health.handler import health, health_details
+
+# Evento de API Gateway mínimo
+@pytest.fixture
+def mock_event():
+    return {"httpMethod": "GET", "headers": {}, "requestContext": {"authorizer": {"claims": {"sub": "user123"}}}}
+
+# Test para el health check público: solo un ping, sin auditoría de índices
+def test_health_only_pings(mock_event, lambda_context):
+    client = MagicMock()
+    with patch("utils.db.get_mongodb_client", return_value=client), \
+         patch("health.handler.check_indexes") as check_indexes:
+        response = health(mock_event, lambda_context)
+        
+        assert response["statusCode"] == 200
+        assert json.loads(response["body"]) == {"status": "ok"}
+        client.admin.command.assert_called_once_with("ping")
+        check_indexes.assert_not_called()
+        
+        client.admin.command.side_effect = Exception("No servers available")
+        assert health(mock_event, lambda_context)["statusCode"] == 503
+
+# Test para los detalles del servicio con la auditoría de índices en caché
+def test_health_details_caches_index_report(mock_event, lambda_context, monkeypatch):
+    monkeypatch.setattr(health_handler, "_index_report", None)
+    report = {"tasks": {"missing": ["user_id_seq"], "unused": [], "undeclared": []}}
+    with patch("health.handler.check_indexes", return_value=report) as check_indexes, \
+         patch("health.handler.get_pool_stats", return_value={}), \
+         patch("health.handler.get_command_stats", return_value={}):
+        first = health_details(mock_event, lambda_context)
+        health_details(mock_event, lambda_context)
+    
+    body = json.loads(first["body"])
+    assert body["status"] == "degraded"
+    assert body["indexes"] == report
+    check_indexes.assert_called_once()
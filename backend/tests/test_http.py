@@ -0,0 +1,116 @@
+import gzip
+import json
+import base64
+from unittest.mock import patch
+from utils import http
+from utils.http import (
+    create_response, etag_matches, make_etag, negotiate_encoding, negotiate_compression, not_modified_response,
+    parse_body, parse_etags, register_codec
+)
+
+LARGE_BODY = {"items": [{"title": "Task", "description": "x" * 100} for _ in range(50)]}
+
+# Handler de prueba con compresión negociada
+@negotiate_compression
+def compressed_handler(event, context):
+    return create_response(200, LARGE_BODY)
+
+# Test para negociar el códec según Accept-Encoding
+def test_negotiate_encoding():
+    assert negotiate_encoding(None) is None
+    assert negotiate_encoding("identity") is None
+    assert negotiate_encoding("gzip") == "gzip"
+    assert negotiate_encoding("deflate, gzip;q=0.5") == "deflate"
+    assert negotiate_encoding("gzip;q=0, deflate;q=0") is None
+    assert negotiate_encoding("*;q=0.1, deflate;q=0") in ("br", "gzip")
+
+# Test para comprimir respuestas grandes en handlers con compresión
+def test_compressed_response():
+    response = compressed_handler({"headers": {"Accept-Encoding": "gzip"}}, None)
+    
+    assert response["isBase64Encoded"] is True
+    assert response["headers"]["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response["headers"]["Vary"]
+    body = json.loads(gzip.decompress(base64.b64decode(response["body"])))
+    assert body == LARGE_BODY
+
+# Test para no comprimir cuando no aplica
+def test_uncompressed_responses():
+    # Sin Accept-Encoding
+    response = compressed_handler({"headers": {}}, None)
+    assert "isBase64Encoded" not in response
+    assert json.loads(response["body"]) == LARGE_BODY
+    
+    # Por debajo del umbral
+    @negotiate_compression
+    def small_handler(event, context):
+        return create_response(200, {"ok": True})
+    response = small_handler({"headers": {"Accept-Encoding": "gzip"}}, None)
+    assert response["body"] == '{"ok":true}'
+    
+    # Handler sin el decorador (opt-out)
+    response = create_response(200, LARGE_BODY)
+    assert "Content-Encoding" not in response["headers"]
+    
+    # Respuesta con compress=False dentro de un handler con compresión
+    @negotiate_compression
+    def opt_out_handler(event, context):
+        return create_response(200, LARGE_BODY, compress=False)
+    response = opt_out_handler({"headers": {"Accept-Encoding": "gzip"}}, None)
+    assert "Content-Encoding" not in response["headers"]
+
+# Test para registrar un códec adicional
+def test_register_codec():
+    with patch.object(http, "COMPRESSION_CODECS", dict(http.COMPRESSION_CODECS)):
+        register_codec("custom", lambda data: b"custom:" + bytes(data))
+        response = compressed_handler({"headers": {"Accept-Encoding": "custom"}}, None)
+    
+    assert response["headers"]["Content-Encoding"] == "custom"
+    assert base64.b64decode(response["body"]).startswith(b"custom:")
+    assert "custom" not in http.COMPRESSION_CODECS
+
+# Test para leer cuerpos codificados en base64
+def test_parse_base64_body():
+    event = {"body": base64.b64encode(b'{"title": "Task"}').decode(), "isBase64Encoded": True}
+    assert parse_body(event) == {"title": "Task"}
+
+# Test para el ETag de las respuestas comprimidas, distinto del de la identidad
+def test_etag_per_content_coding():
+    @negotiate_compression
+    def handler(event, context):
+        return create_response(200, LARGE_BODY, headers={"ETag": make_etag(7)})
+    
+    assert handler({"headers": {"Accept-Encoding": "gzip"}}, None)["headers"]["ETag"] == '"7-gzip"'
+    assert handler({"headers": {}}, None)["headers"]["ETag"] == '"7"'
+    
+    # El 304 lleva el mismo validador que el 200, también con cuerpos demasiado pequeños para comprimir
+    @negotiate_compression
+    def conditional(event, context):
+        if etag_matches(event, make_etag(7)):
+            return not_modified_response(make_etag(7))
+        return create_response(200, {"id": "task1"}, headers={"ETag": make_etag(7)})
+    
+    small = conditional({"headers": {"Accept-Encoding": "gzip"}}, None)
+    assert "Content-Encoding" not in small["headers"]
+    assert small["headers"]["ETag"] == '"7-gzip"'
+    revalidated = conditional({"headers": {"Accept-Encoding": "gzip", "If-None-Match": '"7-gzip"'}}, None)
+    assert revalidated["statusCode"] == 304
+    assert revalidated["headers"]["ETag"] == '"7-gzip"'
+    
+    # Los validadores recibidos se comparan sin el sufijo de la codificación
+    assert parse_etags('"7-gzip", W/"8", "9-deflate"') == ["7", "8", "9"]
+    assert parse_etags('"7-gzip", W/"8"', strong=True) == ["7"]
+    assert etag_matches({"headers": {"If-None-Match": '"7-gzip"'}}, make_etag(7))
+
+# Test para no comprimir cuando API Gateway no decodificaría el cuerpo
+def test_compression_requires_binary_accept(monkeypatch):
+    monkeypatch.setattr(http, "BINARY_MEDIA_TYPES", {"application/json"})
+    
+    response = compressed_handler({"headers": {"Accept-Encoding": "gzip", "Accept": "*/*"}}, None)
+    assert "Content-Encoding" not in response["headers"]
+    assert response["headers"]["Vary"] == "Accept, Accept-Encoding"
+    
+    response = compressed_handler({"headers": {
+        "Accept-Encoding": "gzip", "Accept": "application/json, text/plain, */*"
+    }}, None)
+    assert response["headers"]["Content-Encoding"] == "gzip"
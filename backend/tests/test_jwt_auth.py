@@ -0,0 +1,120 @@
+import json
+import time
+import pytest
+import rsa
+from unittest.mock import patch
+from jose import jwk, jwt
+from utils.cache import LRUCache
+from utils.jwt_auth import JWKSCache, TokenVerifier, InvalidToken
+from utils.http import get_user_from_event
+
+ISSUER = "https://cognito-idp.us-east-1.amazonaws.com/us-east-1_testpool"
+AUDIENCE = "test-client-id"
+
+
+# Par de claves RSA y JWKS para firmar tokens de prueba
+@pytest.fixture(scope="module")
+def signing_key():
+    public_key, private_key = rsa.newkeys(1024)
+    public_jwk = jwk.construct(public_key.save_pkcs1().decode(), "RS256").to_dict()
+    return private_key.save_pkcs1().decode(), {"keys": [{**public_jwk, "kid": "key-1", "use": "sig"}]}
+
+
+@pytest.fixture
+def jwks_file(tmp_path, signing_key):
+    path = tmp_path / "jwks.json"
+    path.write_text(json.dumps(signing_key[1]))
+    return str(path)
+
+
+@pytest.fixture
+def verifier(jwks_file):
+    cache = LRUCache("test-jwt", max_entries=100, max_bytes=1_000_000, ttl=3600)
+    return TokenVerifier(JWKSCache(path=jwks_file), issuer=ISSUER, audience=AUDIENCE, cache=cache)
+
+
+def make_token(private_key, kid="key-1", **overrides):
+    claims = {
+        "sub": "user123",
+        "email": "test@example.com",
+        "aud": AUDIENCE,
+        "iss": ISSUER,
+        "token_use": "id",
+        "exp": int(time.time()) + 3600,
+        **overrides
+    }
+    return jwt.encode(claims, private_key, algorithm="RS256", headers={"kid": kid})
+
+
+# Test para verificar un token válido y reutilizar los claims en caché
+def test_verify_valid_token(verifier, signing_key):
+    token = make_token(signing_key[0])
+
+    claims = verifier.verify(token)
+    assert claims["sub"] == "user123"
+
+    with patch("utils.jwt_auth.jwt.decode") as decode:
+        assert verifier.verify(token) == claims
+        decode.assert_not_called()
+    assert verifier.cache.stats()["hits"] == 1
+
+
+# Test para rechazar tokens inválidos
+@pytest.mark.parametrize("overrides", [
+    {"exp": int(time.time()) - 60},
+    {"aud": "other-client"},
+    {"iss": "https://example.com"},
+    {"token_use": "access"},
+])
+def test_reject_invalid_claims(verifier, signing_key, overrides):
+    with pytest.raises(InvalidToken):
+        verifier.verify(make_token(signing_key[0], **overrides))
+    assert verifier.cache.stats()["entries"] == 0
+
+
+# Test para rechazar firmas con otra clave o algoritmo
+def test_reject_bad_signature(verifier):
+    other_private = rsa.newkeys(1024)[1].save_pkcs1().decode()
+    with pytest.raises(InvalidToken):
+        verifier.verify(make_token(other_private))
+    with pytest.raises(InvalidToken):
+        verifier.verify(jwt.encode({"sub": "user123"}, "secret", algorithm="HS256"))
+
+
+# Test para recargar el JWKS cuando aparece una clave desconocida, como máximo una vez por intervalo
+def test_jwks_refresh_on_unknown_key(signing_key):
+    clock = [0.0]
+    keys = JWKSCache(url="https://example.com/jwks.json", min_refresh_seconds=60, clock=lambda: clock[0])
+
+    with patch.object(JWKSCache, "_fetch", return_value=signing_key[1]) as fetch:
+        assert keys.get("key-1") is not None
+        assert keys.get("key-2") is None
+        assert fetch.call_count == 1
+
+        clock[0] = 61
+        assert keys.get("key-2") is None
+        assert fetch.call_count == 2
+
+
+# Test para conservar las claves si falla la recarga periódica
+def test_jwks_keeps_keys_when_refresh_fails(signing_key):
+    clock = [0.0]
+    keys = JWKSCache(url="https://example.com/jwks.json", refresh_seconds=10, clock=lambda: clock[0])
+
+    with patch.object(JWKSCache, "_fetch", return_value=signing_key[1]):
+        keys.get("key-1")
+    clock[0] = 11
+    with patch.object(JWKSCache, "_fetch", side_effect=OSError("unreachable")):
+        assert keys.get("key-1") is not None
+
+
+# Test para autenticar eventos sin authorizer verificando el token Bearer
+def test_get_user_from_bearer_token(verifier, signing_key):
+    event = {"headers": {"Authorization": "Bearer " + make_token(signing_key[0])}}
+
+    with patch("utils.http.VERIFY_BEARER_TOKENS", True), patch("utils.jwt_auth.get_verifier", return_value=verifier):
+        assert get_user_from_event(event)["user_id"] == "user123"
+        assert get_user_from_event({"headers": {"Authorization": "Bearer not-a-token"}}) is None
+
+    # Sin verificación local, solo se usan los claims del authorizer
+    assert get_user_from_event(event) is None
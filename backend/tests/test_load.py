@@ -0,0 +1,81 @@
+import gzip
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from benchmarks.load import (
+    ROUTES_BY_NAME, HttpTarget, Operation, User, histogram, parse_mix, run_in_process, saturation_reasons
+)
+
+MIX = {"getTasks": 3, "getTask": 3, "createTask": 2, "updateTask": 2, "deleteTask": 1, "login": 1}
+
+
+# Test para una ejecución en proceso con la base de datos en memoria: pasos cerrados y abiertos
+def test_run_in_process():
+    closed = run_in_process(3, 20, MIX, "concurrency", [1, 2], 0.3, warmup=0.1)
+    opened = run_in_process(3, 20, MIX, "rps", [40], 0.5, warmup=0)
+
+    for step in closed + opened:
+        assert step["completed"] > 0
+        assert step["error_rate"] == 0
+        assert sum(step["histogram"].values()) == step["completed"]
+        assert set(step["operations"]) <= set(MIX)
+        assert step["mongo_ops"]["query"] > 0
+        assert step["mongo_ops_per_request"] > 0
+    assert opened[0]["completed"] == 20
+
+
+# Test para los criterios de saturación
+def test_saturation_reasons():
+    step = {"mode": "rps", "target": 100, "throughput_rps": 80.0, "error_rate": 0.0, "p99_ms": 50.0}
+    assert saturation_reasons(step, None, 500, 0.01) == ["throughput 80.0 req/s under the 100 req/s target"]
+    assert saturation_reasons({**step, "throughput_rps": 99.0}, None, 500, 0.01) == []
+
+    step = {"mode": "concurrency", "target": 8, "throughput_rps": 102.0, "error_rate": 0.05, "p99_ms": 900.0}
+    assert saturation_reasons(step, {"throughput_rps": 100.0}, 500, 0.01) == [
+        "error rate 5.0%",
+        "p99 900 ms over the 500 ms SLO",
+        "throughput stopped growing (100.0 -> 102.0 req/s)",
+    ]
+
+
+# Test para el formato de la mezcla de rutas y el histograma
+def test_parse_mix_and_histogram():
+    assert parse_mix("getTasks=3, login=1") == {"getTasks": 3.0, "login": 1.0}
+    assert histogram([0.0005, 0.003, 9.0]) == {
+        **dict.fromkeys(["1", "2", "5", "10", "20", "50", "100", "200", "500", "1000", "2000", "5000", "+Inf"], 0),
+        "1": 1, "5": 1, "+Inf": 1
+    }
+
+
+# Test para el cliente HTTP: token Bearer, ruta base y cuerpo comprimido
+def test_http_target():
+    requests = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests.append((self.path, self.headers["Authorization"]))
+            body = gzip.compress(json.dumps({"tasks": [], "next_cursor": None}).encode())
+            self.send_response(200)
+            self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        target = HttpTarget(f"http://127.0.0.1:{server.server_port}/dev")
+        user = User("user123", "test@example.com", "token")
+        operation = Operation(ROUTES_BY_NAME["getTasks"], "/tasks", None, {"limit": "50"}, None, user)
+        for _ in range(2):
+            status, payload = target.send(operation)
+            assert status == 200
+            assert payload() == {"tasks": [], "next_cursor": None}
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert requests == [("/dev/tasks?limit=50", "Bearer token")] * 2
@@ -0,0 +1,150 @@
+import asyncio
+import base64
+import json
+import pytest
+from types import SimpleNamespace
+from unittest.mock import patch
+from benchmarks.fake_mongo import FakeMongoClient
+from utils import metrics
+from utils.db import COLLECTION_INDEXES
+from utils.metrics import HandlerMetrics, body_size, phase, record_phase, timed
+from utils.monitoring import CommandTimingListener
+from tasks.repository import AsyncTaskRepository
+
+
+@pytest.fixture
+def sink(monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_SINK", "memory")
+    monkeypatch.setattr(metrics, "_cold_start", False)
+    metrics.memory_sink.clear()
+    return metrics.memory_sink
+
+
+@pytest.fixture
+def fake_db():
+    client = FakeMongoClient()
+    for collection, indexes in COLLECTION_INDEXES.items():
+        client["test_db"][collection].create_indexes(indexes)
+    with patch("utils.db.get_mongodb_client", return_value=client):
+        yield client
+
+
+def api_event(method, body=None, query=None, headers=None):
+    return {
+        "httpMethod": method,
+        "headers": headers or {},
+        "queryStringParameters": query,
+        "pathParameters": None,
+        "body": json.dumps(body) if body is not None else None,
+        "requestContext": {"authorizer": {"claims": {"sub": "user123", "email": "test@example.com"}}},
+    }
+
+
+def check_definitions(record):
+    # Cada métrica declarada tiene su valor en el registro y las dimensiones existen
+    directive, = record["_aws"]["CloudWatchMetrics"]
+    assert directive["Dimensions"] == [["service", "handler"]]
+    for definition in directive["Metrics"]:
+        assert isinstance(record[definition["Name"]], (int, float))
+    return {definition["Name"] for definition in directive["Metrics"]}
+
+
+# Test para las fases de create_task y el registro EMF que emite
+def test_create_task_phases(sink, fake_db, lambda_context):
+    from tasks.handler import create_task
+
+    event = api_event("POST", {"title": "Task", "description": "Description"})
+    response = create_task(event, lambda_context)
+
+    assert response["statusCode"] == 201
+    record, = sink
+    assert (record["service"], record["handler"], record["status_code"]) == ("tasks-service", "create_task", 201)
+    assert {"parse_body", "validation", "create_response", "json_dumps", "duration"} <= check_definitions(record)
+    assert record["request_bytes"] == len(event["body"])
+    assert record["response_bytes"] == len(response["body"])
+    assert record["calls"]["validation"] == 1
+    assert record["request_id"] == "test-request-id"
+    assert record["cold_start"] is False and "ColdStart" not in record
+
+
+# Test para las fases de una lista comprimida
+def test_get_tasks_phases(sink, fake_db, lambda_context):
+    from tasks.handler import create_task, get_tasks, read_cache
+
+    read_cache.clear()
+    for number in range(20):
+        create_task(api_event("POST", {"title": f"Task {number}", "description": "x" * 100}), lambda_context)
+    sink.clear()
+
+    response = get_tasks(api_event("GET", query={"limit": "20"}, headers={"Accept-Encoding": "gzip"}), lambda_context)
+
+    assert response["headers"]["Content-Encoding"] == "gzip"
+    record, = sink
+    assert {"encode_page", "create_response", "compress"} <= check_definitions(record)
+    # Los bytes de un cuerpo comprimido son los decodificados, no los del base64
+    assert record["response_bytes"] == len(base64.b64decode(response["body"]))
+
+
+# Test para medir en bytes UTF-8 los cuerpos de texto y en bytes decodificados los base64
+def test_body_size():
+    assert body_size({"body": "año"}) == 4
+    assert body_size({"body": base64.b64encode(b"12345").decode("ascii"), "isBase64Encoded": True}) == 5
+    assert body_size({"body": base64.b64encode(b"123456").decode("ascii"), "isBase64Encoded": True}) == 6
+    assert body_size({"body": None}) == body_size(None) == 0
+
+
+# Test para las órdenes de MongoDB registradas como fases, también desde otros hilos
+def test_mongo_command_phases(sink, lambda_context):
+    listener = CommandTimingListener()
+
+    @HandlerMetrics(service="test-service").measure
+    def handler(event, context):
+        listener.succeeded(SimpleNamespace(command_name="find", duration_micros=1500))
+        listener.failed(SimpleNamespace(command_name="find", duration_micros=500))
+        asyncio.run(AsyncTaskRepository(executor=None)._run(record_phase, "mongo.insert", 0.004))
+        return {"statusCode": 200, "body": "{}"}
+
+    handler({}, lambda_context)
+
+    record, = sink
+    assert record["mongo.find"] == pytest.approx(2.0)
+    assert record["calls"]["mongo.find"] == 2
+    assert record["mongo.insert"] == pytest.approx(4.0)
+
+
+# Test para la marca de arranque en frío, solo en la primera invocación
+def test_cold_start_flag(sink, monkeypatch, lambda_context):
+    monkeypatch.setattr(metrics, "_cold_start", True)
+    handler = HandlerMetrics(service="test-service").measure(lambda event, context: {"statusCode": 200})
+
+    handler({}, lambda_context)
+    handler({}, lambda_context)
+
+    first, second = sink
+    assert first["cold_start"] is True and first["ColdStart"] == 1
+    assert "ColdStart" in check_definitions(first)
+    assert second["cold_start"] is False and "ColdStart" not in check_definitions(second)
+
+
+# Test para la salida estándar, el sink desactivado y las fases fuera de un handler medido
+def test_sinks_and_unmeasured_phases(monkeypatch, capsys, lambda_context):
+    monkeypatch.setattr(metrics, "_cold_start", False)
+    handler = HandlerMetrics(service="test-service", namespace="Tests").measure(
+        lambda event, context: {"statusCode": 204}
+    )
+
+    monkeypatch.setattr(metrics, "METRICS_SINK", "stdout")
+    handler({}, lambda_context)
+    record = json.loads(capsys.readouterr().out)
+    assert record["_aws"]["CloudWatchMetrics"][0]["Namespace"] == "Tests"
+    assert record["status_code"] == 204
+
+    monkeypatch.setattr(metrics, "METRICS_SINK", "off")
+    handler({}, lambda_context)
+    assert capsys.readouterr().out == ""
+
+    # Sin handler medido las fases no registran nada
+    with phase("validation"):
+        pass
+    assert timed("validation")(lambda value: value * 2)(21) == 42
+    record_phase("mongo.find", 1.0)
@@ -0,0 +1,164 @@
+import json
+from datetime import datetime, timezone
+from unittest.mock import patch, MagicMock
+import manage
+from utils.db import slow_query_report
+from utils.monitoring import SlowQueryListener, explain_command, query_shape, shape_id, summarize_plan
+
+FIND = {
+    "find": "tasks",
+    "filter": {"user_id": "user123", "status": {"$in": ["to_do", "completed"]}},
+    "sort": {"created_at": -1, "id": -1},
+    "limit": 20,
+    "lsid": {"id": "session"},
+    "$db": "test_db",
+    "$clusterTime": {"clusterTime": 1},
+}
+
+FIND_EXPLAIN = {
+    "queryPlanner": {
+        "winningPlan": {
+            "stage": "SORT",
+            "inputStage": {"stage": "COLLSCAN", "filter": {"user_id": {"$eq": "user123"}}}
+        },
+        "rejectedPlans": [{"stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": "user_id_seq"}}]
+    }
+}
+
+
+def command_events(request_id, command, reply, duration_ms, command_name=None):
+    common = {
+        "command_name": command_name or next(iter(command)),
+        "connection_id": ("localhost", 27017),
+        "request_id": request_id,
+        "database_name": "test_db",
+    }
+    started = MagicMock(command=command, **common)
+    succeeded = MagicMock(reply=reply, duration_micros=int(duration_ms * 1000), **common)
+    return started, succeeded
+
+
+# Test para la forma de una consulta: sin valores, con el orden y el hint
+def test_query_shape():
+    shape = query_shape("find", FIND)
+    assert shape == {
+        "collection": "tasks",
+        "command": "find",
+        "filter": {"user_id": "?", "status": {"$in": "?"}},
+        "sort": {"created_at": -1, "id": -1},
+    }
+    other = dict(FIND, filter={"user_id": "user456", "status": {"$in": ["to_do"]}})
+    assert shape_id(query_shape("find", other)) == shape_id(shape)
+
+    pipeline = [
+        {"$match": {"user_id": "user123", "$text": {"$search": "report"}}},
+        {"$sort": {"score": -1, "id": -1}},
+        {"$limit": 20},
+    ]
+    assert query_shape("aggregate", {"aggregate": "tasks", "pipeline": pipeline})["pipeline"] == [
+        {"$match": {"user_id": "?", "$text": {"$search": "?"}}},
+        {"$sort": {"score": -1, "id": -1}},
+        {"$limit": "?"},
+    ]
+    assert explain_command(FIND) == {"find": "tasks", "filter": FIND["filter"], "sort": FIND["sort"], "limit": 20}
+
+# Test para resumir el plan ganador de find, de aggregate y del motor SBE
+def test_summarize_plan():
+    assert summarize_plan(FIND_EXPLAIN) == {
+        "stages": ["SORT", "COLLSCAN"],
+        "indexes": [],
+        "collscan": True,
+        "in_memory_sort": True,
+    }
+
+    aggregate_explain = {
+        "stages": [
+            {"$cursor": {"queryPlanner": {"winningPlan": {
+                "stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": "user_id_created_at_id"}
+            }}}},
+            {"$sort": {"sortKey": {"title": 1}}},
+        ]
+    }
+    plan = summarize_plan(aggregate_explain)
+    assert plan["indexes"] == ["user_id_created_at_id"]
+    assert (plan["collscan"], plan["in_memory_sort"]) == (False, True)
+
+    sbe_explain = {"queryPlanner": {"winningPlan": {"queryPlan": {
+        "stage": "LIMIT", "inputStage": {"stage": "IXSCAN", "indexName": "user_id_id"}
+    }}}}
+    assert summarize_plan(sbe_explain)["stages"] == ["LIMIT", "IXSCAN"]
+
+# Test para las estadísticas por comando y la captura de los comandos lentos
+def test_slow_query_listener():
+    client = MagicMock()
+    database = client["test_db"]
+    database.command.return_value = FIND_EXPLAIN
+    listener = SlowQueryListener(lambda: client, threshold_ms=100, sample_rate=1, background=False)
+    reply = {"cursor": {"firstBatch": [{"id": "task1"}, {"id": "task2"}], "id": 0}, "ok": 1}
+
+    # Un comando rápido solo cuenta en las estadísticas
+    started, succeeded = command_events(1, FIND, reply, 5)
+    listener.started(started)
+    listener.succeeded(succeeded)
+    database.command.assert_not_called()
+
+    started, succeeded = command_events(2, FIND, reply, 250)
+    listener.started(started)
+    listener.succeeded(succeeded)
+    database.command.assert_called_once_with("explain", explain_command(FIND), verbosity="queryPlanner")
+    sample = database["slow_queries"].insert_one.call_args[0][0]
+    assert sample["shape_id"] == shape_id(query_shape("find", FIND))
+    assert "user123" not in sample["shape"]
+    assert (sample["duration_ms"], sample["docs"]) == (250, 2)
+    assert sample["plan"]["collscan"] is True
+
+    # La misma forma no se vuelve a explicar dentro del intervalo, pero conserva su plan
+    other = dict(FIND, filter={"user_id": "user456", "status": {"$in": ["to_do"]}})
+    started, succeeded = command_events(3, other, reply, 300)
+    listener.started(started)
+    listener.succeeded(succeeded)
+    assert database.command.call_count == 1
+    assert database["slow_queries"].insert_one.call_args[0][0]["plan"]["collscan"] is True
+
+    # Los comandos de la propia captura se ignoran
+    started, succeeded = command_events(4, {"insert": "slow_queries", "documents": [{}]}, {"n": 1, "ok": 1}, 500)
+    listener.started(started)
+    listener.succeeded(succeeded)
+
+    stats = listener.stats()["commands"]
+    assert list(stats) == ["tasks.find"]
+    assert stats["tasks.find"]["count"] == 3
+    assert stats["tasks.find"]["slow"] == 2
+    assert stats["tasks.find"]["docs"] == 6
+    assert stats["tasks.find"]["max_ms"] == 300
+    # Solo se miden los bytes de las respuestas muestreadas
+    assert stats["tasks.find"]["bytes"] == 2 * sample["bytes"] > 0
+
+# Test para el informe de las formas más lentas y el código de salida del comando
+def test_slow_query_report():
+    shape = {"collection": "tasks", "command": "find", "filter": {"title": "?"}}
+    collection = MagicMock()
+    collection.aggregate.return_value = [{
+        "_id": shape_id(shape),
+        "shape": json.dumps(shape),
+        "count": 3,
+        "total_ms": 900.0,
+        "avg_ms": 300.0,
+        "max_ms": 450.5,
+        "avg_docs": 12.0,
+        "avg_bytes": 2048.0,
+        "plan": {"stages": ["COLLSCAN"], "indexes": [], "collscan": True, "in_memory_sort": False},
+        "last_seen": datetime(2024, 1, 1, tzinfo=timezone.utc),
+    }]
+    database = MagicMock()
+    database.__getitem__.return_value = collection
+
+    with patch("utils.db.get_database", return_value=database):
+        report = slow_query_report(limit=5, sort="count")
+        assert manage.main(["slow-queries"]) == 1
+
+    pipeline = collection.aggregate.call_args_list[0][0][0]
+    assert pipeline[-2:] == [{"$sort": {"count": -1}}, {"$limit": 5}]
+    assert report[0]["shape"] == shape
+    assert report[0]["collscan"] is True
+    assert report[0]["last_seen"] == "2024-01-01T00:00:00+00:00"
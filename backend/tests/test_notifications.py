@@ -0,0 +1,284 @@
+import asyncio
+import os
+import queue
+import time
+import uuid
+import pytest
+from unittest.mock import patch
+from pymongo.errors import OperationFailure
+from server.app import Server
+from server.notifications import (
+    WATCH_PIPELINE, Broker, ChangeWatcher, Subscription, TaskEvent, change_to_event, format_event
+)
+
+REPLICA_SET_URI = os.environ.get("MONGODB_REPLICA_SET_URI")
+
+# Cierra el stream de prueba, como un error de red o una elección en el replica set
+CLOSE = object()
+
+
+class FakeStream:
+    """
+    Change stream de prueba alimentado desde una cola.
+    """
+
+    def __init__(self, changes, error=None):
+        self.changes = changes
+        self.error = error
+        self.alive = True
+
+    def __enter__(self):
+        if self.error:
+            raise self.error
+        return self
+
+    def __exit__(self, *args):
+        self.alive = False
+
+    def try_next(self):
+        try:
+            item = self.changes.get(timeout=0.01)
+        except queue.Empty:
+            return None
+        if item is CLOSE:
+            self.alive = False
+            return None
+        return item
+
+
+class RecordingBroker(Broker):
+    def __init__(self):
+        super().__init__()
+        self.events = []
+        self.resets = 0
+
+    def publish(self, event):
+        self.events.append(event)
+        super().publish(event)
+
+    def reset(self):
+        self.resets += 1
+        super().reset()
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timeout"
+        time.sleep(0.01)
+
+
+def change(coll, document, token="t1"):
+    return {"_id": {"_data": token}, "ns": {"coll": coll}, "fullDocument": document}
+
+
+# Test para traducir los cambios de tareas y marcas de borrado a eventos
+def test_change_to_event():
+    event = change_to_event(change("tasks", {"user_id": "user123", "id": "task1", "seq": 4}))
+    assert event == TaskEvent("t1", "user123", "changed", "task1", 4)
+
+    event = change_to_event(change("task_tombstones", {"user_id": "user123", "id": "task1", "seq": 5}))
+    assert event.type == "deleted"
+
+    # Actualización de una tarea borrada antes de leerla
+    assert change_to_event(change("tasks", None)) is None
+
+
+# Test para repartir los eventos solo a los streams del usuario y reenviar los perdidos
+def test_broker_fan_out_and_replay():
+    async def scenario():
+        broker = Broker(buffer_size=10)
+        loop = asyncio.get_running_loop()
+        mine = broker.subscribe("user123", loop)
+        other = broker.subscribe("user456", loop)
+
+        broker.publish(TaskEvent("t1", "user123", "changed", "task1", 1))
+        broker.publish(TaskEvent("t2", "user456", "changed", "task2", 1))
+        broker.publish(TaskEvent("t3", "user123", "deleted", "task1", 2))
+        await asyncio.sleep(0)
+
+        assert [(await mine.get()).id, (await mine.get()).id] == ["t1", "t3"]
+        assert (await other.get()).id == "t2"
+
+        # Reconexión con Last-Event-ID: solo los eventos posteriores del usuario
+        replayed = broker.subscribe("user123", loop, "t1")
+        await asyncio.sleep(0)
+        assert (await replayed.get()).id == "t3"
+        assert replayed.queue.empty()
+
+        # Un id que ya no está en el buffer obliga a resincronizar
+        expired = broker.subscribe("user123", loop, "t0")
+        assert await expired.get() == Subscription.RESYNC
+
+        broker.unsubscribe(mine)
+        broker.unsubscribe(other)
+        assert broker.stats()["streams"] == 2
+
+    asyncio.run(scenario())
+
+
+# Test para un cliente lento: se descarta su cola y se le pide resincronizar
+def test_slow_subscriber_resyncs():
+    async def scenario():
+        broker = Broker(queue_size=2)
+        subscription = broker.subscribe("user123", asyncio.get_running_loop())
+        for number in range(3):
+            broker.publish(TaskEvent(f"t{number}", "user123", "changed", "task1", number))
+        await asyncio.sleep(0)
+
+        assert await subscription.get() == Subscription.RESYNC
+        assert subscription.queue.empty()
+
+    asyncio.run(scenario())
+
+
+# Test para el watcher: publica los cambios y reanuda desde el último token
+def test_watcher_publishes_and_resumes():
+    streams = [queue.Queue(), queue.Queue()]
+    opened = []
+
+    def watch(resume_token):
+        opened.append(resume_token)
+        return FakeStream(streams[min(len(opened), 2) - 1])
+
+    broker = RecordingBroker()
+    watcher = ChangeWatcher(broker, watch, retry_seconds=0.01)
+    watcher.start()
+    streams[0].put(change("tasks", {"user_id": "user123", "id": "task1", "seq": 1}, "t1"))
+    streams[0].put(change("tasks", None, "t2"))
+    streams[0].put(CLOSE)
+
+    # Si el stream se cierra, se vuelve a abrir desde el último token
+    streams[1].put(change("tasks", {"user_id": "user123", "id": "task1", "seq": 2}, "t3"))
+    wait_for(lambda: len(broker.events) == 2)
+    watcher.stop(timeout=1)
+
+    assert [event.id for event in broker.events] == ["t1", "t3"]
+    assert opened[:2] == [None, {"_data": "t2"}]
+
+
+# Test para un token de reanudación que ya no está en el oplog
+def test_watcher_history_lost():
+    attempts = []
+
+    def watch(resume_token):
+        attempts.append(resume_token)
+        if len(attempts) == 1:
+            return FakeStream(None, OperationFailure("history lost", code=286))
+        return FakeStream(queue.Queue())
+
+    broker = RecordingBroker()
+    watcher = ChangeWatcher(broker, watch, retry_seconds=0.01)
+    watcher.resume_token = {"_data": "old"}
+    watcher.start()
+    wait_for(lambda: len(attempts) >= 2)
+    watcher.stop(timeout=1)
+
+    assert broker.resets == 1
+    assert attempts[1] is None
+
+
+# Test para el stream de eventos del servidor
+def test_events_stream():
+    changes = queue.Queue()
+    broker = Broker()
+    app = Server(watcher=ChangeWatcher(broker, lambda token: FakeStream(changes)))
+    sent = []
+
+    async def scenario():
+        disconnected = asyncio.Event()
+        messages = [{"type": "http.request", "body": b"", "more_body": False}]
+
+        async def receive():
+            if messages:
+                return messages.pop(0)
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            sent.append(message)
+            if b"event: task" in message.get("body", b""):
+                disconnected.set()
+
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "path": "/dev/tasks/events",
+            "query_string": b"",
+            "headers": [(b"authorization", b"Bearer token")],
+        }
+        with patch("server.app._authorizer_claims", return_value={"sub": "user123"}):
+            request = asyncio.ensure_future(app(scope, receive, send))
+            while broker.stats()["streams"] == 0:
+                await asyncio.sleep(0.01)
+            changes.put(change("tasks", {"user_id": "user456", "id": "task2", "seq": 1}, "t1"))
+            changes.put(change("tasks", {"user_id": "user123", "id": "task1", "seq": 3}, "t2"))
+            await asyncio.wait_for(request, 5)
+
+    asyncio.run(scenario())
+    app.watcher.stop(timeout=1)
+
+    start = sent[0]
+    assert start["status"] == 200
+    assert (b"content-type", b"text/event-stream") in start["headers"]
+    body = b"".join(message.get("body", b"") for message in sent[1:])
+    assert body == b"retry: 3000\n\n" + format_event(TaskEvent("t2", "user123", "changed", "task1", 3))
+    assert broker.stats()["streams"] == 0
+
+
+# Test para el stream sin autenticación
+def test_events_stream_unauthorized():
+    app = Server(watcher=ChangeWatcher(Broker(), lambda token: FakeStream(queue.Queue())))
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": "/tasks/events", "query_string": b"", "headers": []}
+    asyncio.run(app(scope, receive, send))
+
+    assert sent[0]["status"] == 401
+
+
+# Test de integración contra un replica set local (docker compose up mongodb)
+@pytest.mark.skipif(not REPLICA_SET_URI, reason="MONGODB_REPLICA_SET_URI is not set")
+def test_watcher_against_replica_set():
+    from pymongo import MongoClient
+
+    client = MongoClient(REPLICA_SET_URI)
+    database = client[f"task_events_{uuid.uuid4().hex[:8]}"]
+
+    def watch(resume_token):
+        return database.watch(
+            WATCH_PIPELINE, full_document="updateLookup", resume_after=resume_token, max_await_time_ms=100
+        )
+
+    try:
+        broker = RecordingBroker()
+        watcher = ChangeWatcher(broker, watch, retry_seconds=0.1)
+        watcher.start()
+        # Esperar a que el stream esté abierto antes de escribir
+        time.sleep(1)
+        database.tasks.insert_one({"id": "task1", "user_id": "user123", "title": "A", "seq": 1})
+        database.tasks.update_one({"id": "task1"}, {"$set": {"title": "B", "seq": 2}})
+        wait_for(lambda: len(broker.events) == 2)
+        watcher.stop(timeout=5)
+
+        # Un cambio mientras el watcher está parado se recibe al reanudar
+        database.tasks.delete_one({"id": "task1"})
+        database.task_tombstones.insert_one({"id": "task1", "user_id": "user123", "seq": 3})
+        resumed = ChangeWatcher(broker, watch, retry_seconds=0.1)
+        resumed.resume_token = watcher.resume_token
+        resumed.start()
+        wait_for(lambda: len(broker.events) == 3)
+        resumed.stop(timeout=5)
+
+        assert [(event.type, event.seq) for event in broker.events] == [
+            ("changed", 1), ("changed", 2), ("deleted", 3)
+        ]
+    finally:
+        client.drop_database(database.name)
+        client.close()
@@ -0,0 +1,95 @@
+import pytest
+from datetime import datetime
+from utils.db import COLLECTION_INDEXES
+from utils.models import TaskListQuery
+from utils.pagination import encode_cursor, keyset_filter
+from tasks.query import DEFAULT_PLAN, parse_fields, parse_list_query, plan_query
+
+DECLARED_INDEXES = {index.document["name"]: list(index.document["key"]) for index in COLLECTION_INDEXES["tasks"]}
+
+
+# Test para comprobar que cada combinación aceptada usa un índice declarado que la cubre
+@pytest.mark.parametrize("params", [
+    {},
+    {"sort": "-created_at"},
+    {"status": "to_do"},
+    {"status": "to_do,completed", "sort": "-created_at"},
+    {"created_after": "2024-01-01T00:00:00", "created_before": "2024-02-01T00:00:00"},
+    {"status": "in_progress", "created_after": "2024-01-01T00:00:00Z"},
+    {"sort": "updated_at", "updated_since": "2024-01-01T00:00:00"},
+    {"sort": "-updated_at", "status": "completed"},
+])
+def test_plan_uses_supporting_index(params):
+    plan = parse_list_query(params)
+
+    # Igualdad (user_id, status), después la clave de orden y el desempate por id
+    expected_keys = ["user_id"] + (["status"] if "status" in plan.filter else []) + [plan.sort_field, "id"]
+    assert DECLARED_INDEXES[plan.index] == expected_keys
+    assert set(plan.filter) <= {"status", plan.sort_field}
+
+
+# Test para los filtros traducidos a la consulta
+def test_plan_filters():
+    plan = parse_list_query({
+        "status": "to_do,completed",
+        "created_after": "2024-01-01T01:00:00+01:00",
+        "created_before": "2024-02-01T00:00:00"
+    })
+    assert plan.filter == {
+        "status": {"$in": ["completed", "to_do"]},
+        "created_at": {"$gte": "2024-01-01T00:00:00", "$lt": "2024-02-01T00:00:00"}
+    }
+    assert plan.sort == [("created_at", 1), ("id", 1)]
+
+    plan = parse_list_query({"sort": "-updated_at", "updated_since": "2024-01-01T00:00:00"})
+    assert plan.filter == {"updated_at": {"$gte": datetime(2024, 1, 1)}}
+    assert plan.sort == [("updated_at", -1), ("id", -1)]
+
+
+# Test para rechazar combinaciones sin índice y valores inválidos
+@pytest.mark.parametrize("params", [
+    {"updated_since": "2024-01-01T00:00:00"},
+    {"sort": "updated_at", "created_after": "2024-01-01T00:00:00"},
+    {"sort": "title"},
+    {"status": "archived"},
+    {"created_after": "yesterday"},
+])
+def test_rejects_unsupported_queries(params):
+    with pytest.raises(ValueError):
+        parse_list_query(params)
+
+
+# Test para el listado por defecto, que no carga pydantic
+def test_default_plan():
+    assert parse_list_query({"limit": "10", "cursor": ""}) is DEFAULT_PLAN
+    assert plan_query(None) is DEFAULT_PLAN
+    assert plan_query(TaskListQuery()) == DEFAULT_PLAN
+
+
+# Test para validar los campos pedidos contra el modelo Task
+def test_parse_fields():
+    assert parse_fields(None) is None
+    assert parse_fields("title, status,id,title") == ("id", "status", "title")
+    for value in ("", ",", "title,_id", "password"):
+        with pytest.raises(ValueError):
+            parse_fields(value)
+
+
+# Test para la paginación descendente y con valores nulos
+def test_keyset_filter_directions():
+    cursor = encode_cursor({"id": "task2", "updated_at": datetime(2024, 1, 2)}, "updated_at")
+    assert keyset_filter(cursor, "updated_at", descending=True) == {"$or": [
+        {"updated_at": {"$lt": datetime(2024, 1, 2)}},
+        {"updated_at": datetime(2024, 1, 2), "id": {"$lt": "task2"}},
+        {"updated_at": None}
+    ]}
+
+    cursor = encode_cursor({"id": "task1", "updated_at": None}, "updated_at")
+    assert keyset_filter(cursor, "updated_at") == {"$or": [
+        {"updated_at": None, "id": {"$gt": "task1"}},
+        {"updated_at": {"$ne": None}}
+    ]}
+
+    # Un cursor de otro orden no es válido
+    with pytest.raises(ValueError):
+        keyset_filter(cursor, "created_at")
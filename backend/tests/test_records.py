@@ -0,0 +1,106 @@
+import pytest
+from datetime import datetime
+from pydantic import ValidationError
+from utils.enums import BatchOperationType, TaskStatus
+from utils.models import BatchOperation, Task, TaskCreate, TaskUpdate
+from tasks.records import (
+    TaskRecord, TaskValidationError, parse_batch_operation, update_fields, validate_task_create, validate_task_update
+)
+
+PAYLOADS = [
+    {"title": "Task", "description": "Description"},
+    {"title": "Task", "description": "Description", "status": "completed"},
+    {"title": "Task", "description": "Description", "status": TaskStatus.IN_PROGRESS},
+    {"title": "Task", "description": "Description", "extra": "ignored"},
+    {"title": 7, "description": 1.5},
+    {"title": b"Task", "description": "Description"},
+    {"title": "Task"},
+    {"description": "Description"},
+    {"title": None, "description": "Description"},
+    {"title": "Task", "description": "Description", "status": None},
+    {"title": "Task", "description": "Description", "status": "done"},
+    {"title": "Task", "description": "Description", "status": ["to_do"]},
+    {"title": ["Task"], "description": {"a": 1}},
+    {},
+]
+
+
+def model_values(model, payload):
+    try:
+        instance = model(**payload)
+    except ValidationError:
+        return None
+    values = {name: value for name, value in instance.dict().items() if value is not None}
+    return {name: getattr(value, "value", value) for name, value in values.items()}
+
+
+def record_values(validate, payload):
+    try:
+        return validate(payload)
+    except TaskValidationError:
+        return None
+
+
+# Test para comprobar que los registros aceptan y rechazan lo mismo que los modelos
+@pytest.mark.parametrize("payload", PAYLOADS)
+def test_validators_match_models(payload):
+    assert record_values(validate_task_create, payload) == model_values(TaskCreate, payload)
+    assert record_values(validate_task_update, payload) == model_values(TaskUpdate, payload)
+
+
+# Test para comprobar que el registro tiene los mismos campos que el modelo Task
+def test_record_fields_match_model():
+    assert TaskRecord.__slots__ == tuple(Task.__fields__)
+
+
+# Test para el documento de una tarea nueva, igual al que producía el modelo
+def test_new_record_document():
+    document = TaskRecord.new({"title": "Task", "description": "Description"}, "user123").to_document()
+    task = Task(**{**document, "created_at": datetime.fromisoformat(document["created_at"])})
+
+    assert document == {**task.to_dict(), "status": "to_do"}
+    assert document["user_id"] == "user123"
+    assert document["updated_at"] is None
+    assert document["version"] == 1
+
+
+# Test para los errores de validación, todos en un solo mensaje
+def test_validation_error_message():
+    with pytest.raises(TaskValidationError) as error:
+        TaskRecord.new({"status": "done"}, "user123")
+    assert str(error.value) == (
+        "TaskCreate: title: field required; description: field required; "
+        "status: value is not a valid enumeration member; permitted: to_do, in_progress, completed"
+    )
+    assert isinstance(error.value, ValueError)
+
+    with pytest.raises(TaskValidationError):
+        TaskRecord.new(["not", "a", "dict"], "user123")
+
+
+# Test para el documento $set de una actualización
+def test_update_fields():
+    fields = update_fields({"title": "New", "description": None})
+    assert set(fields) == {"title", "updated_at"}
+    assert isinstance(fields["updated_at"], datetime)
+
+
+# Test para las operaciones de un lote
+@pytest.mark.parametrize("raw", [
+    {"op": "create", "data": {"title": "Task"}},
+    {"op": "update", "id": 5},
+    {"op": "delete", "id": "task1", "data": None},
+    {"op": "archive", "id": "task1"},
+    {"id": "task1"},
+    {"op": "update", "id": "task1", "data": "text"},
+])
+def test_batch_operation_matches_model(raw):
+    try:
+        expected = BatchOperation(**raw)
+    except ValidationError:
+        with pytest.raises(TaskValidationError):
+            parse_batch_operation(raw)
+        return
+    operation = parse_batch_operation(raw)
+    assert (operation.op, operation.id, operation.data) == (expected.op, expected.id, expected.data)
+    assert isinstance(operation.op, BatchOperationType)
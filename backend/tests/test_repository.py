@@ -0,0 +1,202 @@
+import asyncio
+import threading
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch, MagicMock
+from pymongo import InsertOne
+from pymongo.errors import BulkWriteError
+from utils.pagination import encode_cursor
+from tasks.repository import TASK_PROJECTION, TaskRepository, AsyncTaskRepository
+
+
+# Mock de la colección de tareas
+@pytest.fixture
+def mock_db():
+    with patch("tasks.repository.get_collection") as mock_get_collection:
+        mock_collection = MagicMock()
+        mock_get_collection.return_value = mock_collection
+        yield mock_collection
+
+
+# Mock de la colección de contadores de estadísticas
+@pytest.fixture(autouse=True)
+def mock_stats():
+    with patch("tasks.stats.get_collection") as mock_get_collection:
+        mock_collection = MagicMock()
+        mock_collection.find_one.return_value = None
+        mock_collection.find_one_and_update.return_value = {"sequence": 1}
+        mock_get_collection.return_value = mock_collection
+        yield mock_collection
+
+
+# Test para leer una página y su cursor siguiente
+def test_list_page(mock_db):
+    mock_db.find.return_value.sort.return_value.limit.return_value = [
+        {"id": "task1", "created_at": "2023-01-01T00:00:00"},
+        {"id": "task2", "created_at": "2023-01-02T00:00:00"},
+    ]
+
+    body, next_cursor = TaskRepository().list_page("user123", 1)
+
+    assert bytes(body) == b'{"items":[{"id":"task1","created_at":"2023-01-01T00:00:00"}]'
+    assert next_cursor is not None
+    mock_db.find.return_value.sort.return_value.limit.assert_called_once_with(2)
+
+
+# Test para leer solo los campos pedidos, más los que necesita el cursor
+def test_list_page_fields(mock_db):
+    mock_db.find.return_value.sort.return_value.limit.return_value = [
+        {"id": "task1", "title": "A", "created_at": "2023-01-01T00:00:00"},
+        {"id": "task2", "title": "B", "created_at": "2023-01-02T00:00:00"},
+    ]
+
+    body, next_cursor = TaskRepository().list_page("user123", 1, fields=("title",))
+
+    assert bytes(body) == b'{"items":[{"id":"task1","title":"A"}]'
+    assert mock_db.find.call_args[0][1] == {"_id": 0, "title": 1, "id": 1, "created_at": 1}
+    assert next_cursor == encode_cursor({"id": "task1", "created_at": "2023-01-01T00:00:00"})
+
+
+# Test para un cursor inválido
+def test_list_page_invalid_cursor(mock_db):
+    with pytest.raises(ValueError):
+        TaskRepository().list_page("user123", 10, "not-a-cursor")
+    mock_db.find.assert_not_called()
+
+
+# Test para buscar por texto ordenando por relevancia
+def test_search_page(mock_db):
+    mock_db.aggregate.return_value = [
+        {"id": "task2", "title": "Comprar pan", "score": 1.5},
+        {"id": "task1", "title": "Pan integral", "score": 0.75},
+    ]
+
+    body, next_cursor = TaskRepository().search_page("user123", "pan", 1)
+
+    assert bytes(body) == b'{"items":[{"id":"task2","title":"Comprar pan","score":1.5}]'
+    pipeline = mock_db.aggregate.call_args[0][0]
+    assert pipeline[0] == {"$match": {"user_id": "user123", "$text": {"$search": "pan"}}}
+    assert {"$sort": {"score": -1, "id": -1}} in pipeline
+    assert {"$limit": 2} in pipeline
+
+    # La página siguiente continúa tras la puntuación e id de la última tarea
+    TaskRepository().search_page("user123", "pan", 1, next_cursor)
+    keyset = mock_db.aggregate.call_args[0][0][2]["$match"]["$or"]
+    assert keyset[:2] == [{"score": {"$lt": 1.5}}, {"score": 1.5, "id": {"$lt": "task2"}}]
+
+
+# Test para crear una tarea, que también actualiza los contadores
+def test_create_counts_task(mock_db, mock_stats):
+    task = {"id": "task1", "user_id": "user123", "status": "to_do"}
+
+    TaskRepository().create(task)
+
+    inserted = mock_db.insert_one.call_args[0][0]
+    assert inserted == {**task, "seq": 1, "changed_at": inserted["changed_at"]}
+    assert "_id" not in task
+    mock_stats.update_one.assert_called_once()
+
+
+# Test para dejar una marca de borrado con su número de secuencia
+def test_delete_leaves_tombstone(mock_db, mock_stats):
+    mock_db.find_one_and_delete.return_value = {"status": "to_do"}
+    mock_stats.find_one_and_update.return_value = {"sequence": 8}
+
+    TaskRepository().delete("user123", "task1")
+
+    tombstone = mock_db.insert_one.call_args[0][0]
+    assert tombstone["user_id"] == "user123" and tombstone["id"] == "task1" and tombstone["seq"] == 8
+    # Una sola actualización de los contadores asigna también el número de secuencia
+    mock_stats.find_one_and_update.assert_called_once()
+    assert mock_stats.find_one_and_update.call_args[0][1] == {
+        "$inc": {"counts.to_do": -1, "total": -1, "version": 1, "sequence": 1}
+    }
+    mock_stats.update_one.assert_not_called()
+
+
+# Test para marcar una actualización con el número asignado tras escribirla
+def test_update_stamps_sequence_after_write(mock_db, mock_stats):
+    mock_db.find_one_and_update.return_value = {"id": "task1", "status": "to_do", "version": 2}
+    mock_stats.find_one_and_update.return_value = {"sequence": 5}
+
+    TaskRepository().update("user123", "task1", {"title": "New"})
+
+    assert "seq" not in mock_db.find_one_and_update.call_args[0][1]["$set"]
+    mock_stats.find_one_and_update.assert_called_once()
+    stamp = mock_db.update_one.call_args[0][1]["$max"]
+    assert stamp["seq"] == 5
+
+
+# Test para mezclar tareas y marcas de borrado en orden de secuencia
+def test_changes_in_sequence_order(mock_db):
+    mock_db.find.return_value.sort.return_value.limit.side_effect = [
+        iter([{"id": "task1", "seq": 3}, {"id": "task3", "seq": 6}]),
+        iter([{"id": "task2", "seq": 4}]),
+    ]
+
+    changes, has_more = TaskRepository().changes("user123", 2, 2)
+
+    assert changes == [{"id": "task1", "seq": 3}, {"id": "task2", "seq": 4, "deleted": True}]
+    assert has_more
+    mock_db.find.assert_any_call({"user_id": "user123", "seq": {"$gt": 2}}, {"_id": 0}, hint="user_id_seq")
+
+
+# Test para una actualización que no encuentra la tarea
+def test_update_not_found_does_not_count(mock_db, mock_stats):
+    mock_db.find_one_and_update.return_value = None
+
+    result = TaskRepository().update("user123", "task1", {"title": "New"}, {"version": {"$in": [3]}})
+
+    assert result is None
+    task_filter = mock_db.find_one_and_update.call_args[0][0]
+    assert task_filter == {"id": "task1", "user_id": "user123", "version": {"$in": [3]}}
+    mock_stats.update_one.assert_not_called()
+    # Sin escritura no se gasta ningún número de secuencia
+    mock_stats.find_one_and_update.assert_not_called()
+    mock_db.update_one.assert_not_called()
+
+
+# Test para los errores de una escritura masiva
+def test_bulk_write_errors(mock_db):
+    mock_db.bulk_write.side_effect = BulkWriteError({
+        "writeErrors": [{"index": 1, "errmsg": "duplicate"}], "nMatched": 0, "nRemoved": 0
+    })
+
+    failed, counts = TaskRepository().bulk_write([InsertOne({}), InsertOne({})])
+
+    assert list(failed) == [1]
+    assert counts == {"matched": 0, "deleted": 0}
+    assert TaskRepository().bulk_write([]) == ({}, {"matched": 0, "deleted": 0})
+
+
+# Test para comprobar que el repositorio asíncrono ejecuta las consultas en paralelo
+def test_async_repository_runs_queries_concurrently():
+    barrier = threading.Barrier(2, timeout=2)
+
+    class SlowRepository(TaskRepository):
+        def stats(self, user_id):
+            barrier.wait()
+            return {"total": 1}, 7
+
+        def list_page(self, user_id, limit, cursor=None, plan=None, fields=None):
+            barrier.wait()
+            return bytearray(b'{"items":[]'), None
+
+    repository = AsyncTaskRepository(SlowRepository(), ThreadPoolExecutor(max_workers=2))
+
+    async def load():
+        return await asyncio.gather(repository.stats("user123"), repository.list_page("user123", 10))
+
+    # Si las consultas se ejecutasen una tras otra, la barrera no se liberaría
+    (stats, version), (body, next_cursor) = asyncio.run(load())
+    assert stats == {"total": 1} and version == 7
+    assert next_cursor is None
+
+
+# Test para comprobar que el repositorio asíncrono delega en el síncrono
+def test_async_repository_delegates(mock_db):
+    mock_db.find_one.return_value = {"id": "task1"}
+    repository = AsyncTaskRepository(TaskRepository(), ThreadPoolExecutor(max_workers=1))
+
+    assert asyncio.run(repository.get("user123", "task1")) == {"id": "task1"}
+    mock_db.find_one.assert_called_once_with({"id": "task1", "user_id": "user123"}, TASK_PROJECTION)
@@ -0,0 +1,59 @@
+import json
+import sys
+import importlib
+from datetime import datetime
+from unittest.mock import patch
+from bson import ObjectId
+from utils import serialization
+from utils.models import TaskStatus
+
+DOCUMENTS = [
+    {
+        "_id": ObjectId("64b7f0c2a1b2c3d4e5f60718"),
+        "id": f"task{i}",
+        "status": TaskStatus.COMPLETED,
+        "created_at": datetime(2023, 1, 1, 12, 30, 0, 123456),
+        "description": "Descripción con acentos"
+    }
+    for i in range(3)
+]
+
+# Test para codificar tipos de MongoDB
+def test_dumps_mongodb_types():
+    result = json.loads(serialization.dumps(DOCUMENTS[0]))
+    
+    assert result == {
+        "_id": "64b7f0c2a1b2c3d4e5f60718",
+        "id": "task0",
+        "status": "completed",
+        "created_at": "2023-01-01T12:30:00.123456",
+        "description": "Descripción con acentos"
+    }
+
+# Test para codificar una página directamente desde el cursor
+def test_encode_page():
+    buffer, last, has_more = serialization.encode_page(iter(DOCUMENTS), 2)
+    serialization.close_page(buffer, {"next_cursor": "abc"})
+    
+    body = json.loads(bytes(buffer))
+    assert [item["id"] for item in body["items"]] == ["task0", "task1"]
+    assert body["next_cursor"] == "abc"
+    assert last["id"] == "task1"
+    assert has_more
+
+# Test para el códec de la librería estándar cuando orjson no está instalado
+def test_stdlib_fallback():
+    try:
+        with patch.dict(sys.modules, {"orjson": None}):
+            fallback = importlib.reload(serialization)
+        assert fallback.orjson is None
+        buffer, _, has_more = fallback.encode_page(iter(DOCUMENTS), 5)
+        fallback.close_page(buffer, {"next_cursor": None})
+    finally:
+        importlib.reload(serialization)
+    
+    body = json.loads(bytes(buffer))
+    assert len(body["items"]) == 3
+    assert body["items"][0]["created_at"] == "2023-01-01T12:30:00.123456"
+    assert body["next_cursor"] is None
+    assert not has_more
@@ -0,0 +1,249 @@
+import asyncio
+import gzip
+import io
+import json
+import logging
+import os
+import threading
+import re
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch, MagicMock
+from aws_lambda_powertools import Logger
+from jose import jwt
+from server.app import Server, build_event
+from server.log_context import isolate_log_keys, run_in_request_context
+from tasks.handler import read_cache
+from tasks.repository import TASK_PROJECTION
+from server.routes import ROUTES, Router
+
+SERVERLESS_YML = os.path.join(os.path.dirname(__file__), "..", "serverless.yml")
+
+
+def call(app, method, path, headers=None, body=b"", query=b""):
+    """
+    Ejecuta una petición HTTP contra la aplicación ASGI sin servidor.
+    """
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "query_string": query,
+        "headers": [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()],
+        "client": ("127.0.0.1", 50000),
+    }
+    asyncio.run(app(scope, receive, send))
+    start, body_message = sent
+    return start["status"], {k.decode(): v.decode() for k, v in start["headers"]}, body_message["body"]
+
+
+def token(sub="user123"):
+    return "Bearer " + jwt.encode({"sub": sub, "email": "test@example.com"}, "secret", algorithm="HS256")
+
+
+@pytest.fixture(scope="module")
+def app():
+    return Server()
+
+
+@pytest.fixture
+def mock_db():
+    with patch("tasks.repository.get_collection") as mock_get_collection, \
+            patch("tasks.stats.get_collection") as mock_stats_collection:
+        mock_collection = MagicMock()
+        mock_get_collection.return_value = mock_collection
+        mock_stats_collection.return_value.find_one.return_value = None
+        mock_stats_collection.return_value.find_one_and_update.return_value = {"sequence": 1}
+        read_cache.clear()
+        yield mock_collection
+
+
+@pytest.fixture
+def unverified_auth():
+    with patch("server.app.AUTH_MODE", "unverified"):
+        yield
+
+
+# Test para comprobar que las rutas coinciden con serverless.yml
+def test_routes_match_serverless_yml():
+    with open(SERVERLESS_YML) as config:
+        content = config.read()
+    declared = set(re.findall(
+        r"handler: (\S+)\s+events:\s+- http:\s+path: (\S+)\s+method: (\w+)", content
+    ))
+    routes = {(route.handler, route.path, route.method.lower()) for route in ROUTES}
+    assert routes == declared
+
+
+# Test para la prioridad de rutas estáticas sobre rutas con parámetros
+def test_router_prefers_static_paths():
+    router = Router(ROUTES)
+    route, params, _ = router.match("GET", "/tasks/stats")
+    assert route.name == "getTaskStats" and params == {}
+    route, params, _ = router.match("GET", "/tasks/abc")
+    assert route.name == "getTask" and params == {"taskId": "abc"}
+    route, _, allowed = router.match("PATCH", "/tasks/abc")
+    assert route is None and allowed == ["DELETE", "GET", "PUT"]
+
+
+# Test para la traducción de la petición a un evento de API Gateway
+def test_build_event():
+    route = Router(ROUTES).match("GET", "/tasks")[0]
+    scope = {
+        "path": "/dev/tasks",
+        "query_string": b"limit=10&cursor=",
+        "headers": [(b"accept", b"application/json"), (b"x-tag", b"a"), (b"x-tag", b"b")],
+    }
+    event = build_event(scope, b"", route, {}, {"sub": "user123"})
+
+    assert event["httpMethod"] == "GET"
+    assert event["resource"] == "/tasks"
+    assert event["queryStringParameters"] == {"limit": "10", "cursor": ""}
+    assert event["headers"]["x-tag"] == "a,b"
+    assert event["multiValueHeaders"]["x-tag"] == ["a", "b"]
+    assert event["pathParameters"] is None
+    assert event["body"] is None and event["isBase64Encoded"] is False
+    assert event["requestContext"]["authorizer"]["claims"]["sub"] == "user123"
+
+
+# Test para el cuerpo binario, que se pasa en base64
+def test_build_event_binary_body():
+    route = Router(ROUTES).match("POST", "/tasks")[0]
+    event = build_event({"path": "/tasks", "headers": []}, b"\xff\xfe", route, {}, None)
+    assert event["isBase64Encoded"] is True
+    assert event["body"] == "//4="
+    assert "authorizer" not in event["requestContext"]
+
+
+# Test para obtener tareas a través del servidor
+def test_get_tasks_through_server(app, mock_db, unverified_auth):
+    mock_db.find.return_value.sort.return_value.limit.return_value = [
+        {"id": "task123", "title": "Test Task", "user_id": "user123", "created_at": "2023-01-01T00:00:00"}
+    ]
+
+    status, headers, body = call(app, "GET", "/dev/tasks", {"Authorization": token()}, query=b"limit=5")
+
+    assert status == 200
+    assert headers["content-type"] == "application/json"
+    assert json.loads(body)["items"][0]["id"] == "task123"
+    mock_db.find.assert_called_once_with({"user_id": "user123"}, TASK_PROJECTION, hint="user_id_created_at_id")
+    mock_db.find.return_value.sort.return_value.limit.assert_called_once_with(6)
+
+
+# Test para las respuestas comprimidas, que se devuelven decodificadas de base64
+def test_compressed_response_through_server(app, mock_db, unverified_auth):
+    mock_db.find.return_value.sort.return_value.limit.return_value = [
+        {"id": f"task{i}", "title": "Task " * 50, "user_id": "user123", "created_at": "2023-01-01T00:00:00"}
+        for i in range(20)
+    ]
+
+    status, headers, body = call(app, "GET", "/tasks", {"Authorization": token(), "Accept-Encoding": "gzip"})
+
+    assert status == 200
+    assert headers["content-encoding"] == "gzip"
+    assert len(json.loads(gzip.decompress(body))["items"]) == 20
+
+
+# Test para las rutas protegidas sin token
+def test_protected_route_requires_token(app, mock_db, unverified_auth):
+    status, _, body = call(app, "GET", "/dev/tasks")
+    assert status == 401
+    mock_db.find.assert_not_called()
+
+
+# Test para el modo por defecto, que verifica el token contra el JWKS
+def test_protected_route_verifies_token(app, mock_db):
+    mock_db.find.return_value.sort.return_value.limit.return_value = []
+
+    # Token firmado con HS256: se rechaza sin consultar el JWKS
+    status, _, _ = call(app, "GET", "/dev/tasks", {"Authorization": token()})
+    assert status == 401
+    mock_db.find.assert_not_called()
+
+    with patch("utils.jwt_auth.verify_authorization", return_value={"sub": "user123"}) as verify:
+        status, _, _ = call(app, "GET", "/dev/tasks", {"Authorization": "Bearer valid"})
+    assert status == 200
+    verify.assert_called_once_with("Bearer valid")
+
+
+# Test para verificar el token en el pool de hilos y no en el bucle de eventos
+def test_token_verified_off_event_loop(app, mock_db):
+    mock_db.find.return_value.sort.return_value.limit.return_value = []
+    threads = []
+
+    def verify(authorization):
+        threads.append(threading.current_thread().name)
+        return {"sub": "user123"}
+
+    with patch("utils.jwt_auth.verify_authorization", side_effect=verify):
+        status, _, _ = call(app, "GET", "/dev/tasks", {"Authorization": "Bearer valid"})
+    assert status == 200
+    assert threads[0].startswith("handler")
+
+
+# Test para que cada petición concurrente registre solo sus propias claves de log
+def test_log_keys_isolated_per_request():
+    stream = io.StringIO()
+    logger = Logger(service="test-log-context", logger_handler=logging.StreamHandler(stream))
+    assert isolate_log_keys() >= 1
+    barrier = threading.Barrier(2, timeout=2)
+
+    def handler(request_id):
+        logger.append_keys(function_request_id=request_id)
+        # Ambas peticiones han añadido su clave antes de escribir
+        barrier.wait()
+        logger.info("handled")
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        list(executor.map(lambda request_id: run_in_request_context(handler, request_id), ["req-1", "req-2"]))
+
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert sorted(line["function_request_id"] for line in lines) == ["req-1", "req-2"]
+    # Fuera de las peticiones no queda ninguna clave de ellas
+    logger.info("idle")
+    assert "function_request_id" not in json.loads(stream.getvalue().splitlines()[-1])
+
+
+# Test para rutas y métodos inexistentes
+def test_not_found_and_method_not_allowed(app):
+    assert call(app, "GET", "/dev/unknown")[0] == 404
+    status, _, _ = call(app, "PATCH", "/dev/tasks/task123")
+    assert status == 405
+
+
+# Test para las peticiones preflight de CORS
+def test_cors_preflight(app):
+    status, headers, body = call(app, "OPTIONS", "/dev/tasks/task123")
+    assert status == 204
+    assert headers["access-control-allow-methods"] == "DELETE,GET,PUT,OPTIONS"
+    assert "If-Match" in headers["access-control-allow-headers"]
+    assert body == b""
+
+
+# Test para el ciclo de vida: el pool se calienta al arrancar y se cierra al parar
+def test_lifespan_warms_up_and_closes_pool():
+    app = Server(workers=1)
+    messages = [{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message["type"])
+
+    with patch("utils.db.warm_up") as warm_up, patch("utils.db.close_mongodb_connection") as close:
+        asyncio.run(app({"type": "lifespan"}, receive, send))
+
+    warm_up.assert_called_once()
+    close.assert_called_once()
+    assert sent == ["lifespan.startup.complete", "lifespan.shutdown.complete"]
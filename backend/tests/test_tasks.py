@@ -1,7 +1,11 @@
 import json
+import time
 import pytest
-from unittest.mock import patch, MagicMock
-from tasks.handler import get_tasks, get_task, create_task, update_task, delete_task
+from datetime import datetime, timedelta
+from unittest.mock import ANY, patch, MagicMock
+from tasks.handler import read_cache, get_tasks, get_task, get_task_stats, get_task_overview, get_task_changes, search_tasks, create_task, update_task, delete_task, batch_tasks
+from tasks.repository import TASK_PROJECTION
+from utils.pagination import encode_sync_token, decode_sync_token
 from utils.models import TaskStatus
 
 # Mock del evento de API Gateway con datos de usuario autenticado
@@ -30,39 +34,148 @@ def mock_event():
 # Mock de la base de datos
 @pytest.fixture
 def mock_db():
-    with patch("tasks.handler.get_collection") as mock_get_collection:
+    with patch("tasks.repository.get_collection") as mock_get_collection:
         mock_collection = MagicMock()
         mock_get_collection.return_value = mock_collection
         yield mock_collection
 
-# Test para obtener todas las tareas
-def test_get_tasks(mock_event, mock_db):
+# Mock de la colección de contadores de estadísticas
+@pytest.fixture(autouse=True)
+def mock_stats():
+    with patch("tasks.stats.get_collection") as mock_get_collection:
+        mock_collection = MagicMock()
+        mock_collection.find_one.return_value = None
+        mock_collection.find_one_and_update.return_value = {"sequence": 1}
+        mock_get_collection.return_value = mock_collection
+        yield mock_collection
+
+# Vaciar la caché de lecturas entre tests
+@pytest.fixture(autouse=True)
+def clear_read_cache():
+    read_cache.clear()
+    yield
+    read_cache.clear()
+
+# Test para obtener la primera página de tareas
+def test_get_tasks(mock_event, mock_db, lambda_context):
     # Configurar mock
-    mock_db.find.return_value = [
+    mock_db.find.return_value.sort.return_value.limit.return_value = [
         {
             "id": "task123",
             "title": "Test Task",
             "description": "This is a test task",
-            "status": "por_hacer",
+            "status": "to_do",
             "user_id": "user123",
             "created_at": "2023-01-01T00:00:00"
         }
     ]
     
     # Llamar a la función
-    response = get_tasks(mock_event, {})
+    response = get_tasks(mock_event, lambda_context)
     
     # Verificar resultado
     assert response["statusCode"] == 200
     body = json.loads(response["body"])
-    assert len(body) == 1
-    assert body[0]["title"] == "Test Task"
+    assert len(body["items"]) == 1
+    assert body["items"][0]["title"] == "Test Task"
+    assert body["next_cursor"] is None
     
     # Verificar que se llamó a la base de datos con los parámetros correctos
-    mock_db.find.assert_called_once_with({"user_id": "user123"})
+    mock_db.find.assert_called_once_with({"user_id": "user123"}, TASK_PROJECTION, hint="user_id_created_at_id")
+    mock_db.find.return_value.sort.assert_called_once_with([("created_at", 1), ("id", 1)])
+    mock_db.find.return_value.sort.return_value.limit.assert_called_once_with(51)
+
+# Test para paginar con cursor
+def test_get_tasks_next_page(mock_event, mock_db, lambda_context):
+    tasks = [
+        {"id": f"task{i}", "title": f"Task {i}", "user_id": "user123", "created_at": f"2023-01-0{i}T00:00:00"}
+        for i in range(1, 4)
+    ]
+    mock_db.find.return_value.sort.return_value.limit.return_value = tasks
+    mock_event["queryStringParameters"] = {"limit": "2"}
+    
+    # Primera página: hay más tareas, se devuelve un cursor
+    response = get_tasks(mock_event, lambda_context)
+    body = json.loads(response["body"])
+    assert [task["id"] for task in body["items"]] == ["task1", "task2"]
+    assert body["next_cursor"]
+    
+    # Segunda página: el filtro continúa después de la última tarea devuelta
+    mock_db.find.reset_mock()
+    mock_db.find.return_value.sort.return_value.limit.return_value = tasks[2:]
+    mock_event["queryStringParameters"] = {"limit": "2", "cursor": body["next_cursor"]}
+    response = get_tasks(mock_event, lambda_context)
+    body = json.loads(response["body"])
+    assert [task["id"] for task in body["items"]] == ["task3"]
+    assert body["next_cursor"] is None
+    mock_db.find.assert_called_once_with({
+        "user_id": "user123",
+        "$or": [
+            {"created_at": {"$gt": "2023-01-02T00:00:00"}},
+            {"created_at": "2023-01-02T00:00:00", "id": {"$gt": "task2"}}
+        ]
+    }, TASK_PROJECTION, hint="user_id_created_at_id")
+
+# Test para el tamaño máximo de página y parámetros inválidos
+def test_get_tasks_limit_validation(mock_event, mock_db, lambda_context):
+    mock_db.find.return_value.sort.return_value.limit.return_value = []
+    
+    # Un límite mayor al máximo se recorta
+    mock_event["queryStringParameters"] = {"limit": "100000"}
+    response = get_tasks(mock_event, lambda_context)
+    assert response["statusCode"] == 200
+    mock_db.find.return_value.sort.return_value.limit.assert_called_once_with(101)
+    
+    mock_event["queryStringParameters"] = {"limit": "0"}
+    response = get_tasks(mock_event, lambda_context)
+    assert response["statusCode"] == 400
+    assert json.loads(response["body"])["error_code"] == "invalid_limit"
+    
+    mock_event["queryStringParameters"] = {"cursor": "not-a-cursor"}
+    response = get_tasks(mock_event, lambda_context)
+    assert response["statusCode"] == 400
+    assert json.loads(response["body"])["error_code"] == "invalid_cursor"
+
+# Test para responder 304 cuando la colección del usuario no cambió
+def test_get_tasks_not_modified(mock_event, mock_db, mock_stats, lambda_context):
+    mock_stats.find_one.return_value = {"_id": "user123", "version": 7}
+    mock_db.find.return_value.sort.return_value.limit.return_value = []
+    
+    response = get_tasks(mock_event, lambda_context)
+    etag = response["headers"]["ETag"]
+    assert response["statusCode"] == 200
+    
+    # Misma versión: 304 sin consultar las tareas
+    mock_db.find.reset_mock()
+    mock_event["headers"] = {"If-None-Match": etag}
+    response = get_tasks(mock_event, lambda_context)
+    assert response["statusCode"] == 304
+    assert "body" not in response
+    mock_db.find.assert_not_called()
+    
+    # La versión avanzó tras una escritura: respuesta completa con otro ETag
+    mock_stats.find_one.return_value = {"_id": "user123", "version": 8}
+    response = get_tasks(mock_event, lambda_context)
+    assert response["statusCode"] == 200
+    assert response["headers"]["ETag"] != etag
+
+# Test para responder 304 cuando la tarea no cambió
+def test_get_task_not_modified(mock_event, mock_db, lambda_context):
+    mock_db.find_one.return_value = {"id": "task123", "user_id": "user123", "version": 2}
+    mock_event["headers"] = {"If-None-Match": '"2"'}
+    
+    # Sin entrada en la caché, la tarea leída no se serializa ni se guarda
+    with patch("tasks.handler.serialize_mongodb_doc") as serialize, patch("tasks.handler.dumps_bytes") as dumps:
+        response = get_task(mock_event, lambda_context)
+    
+    assert response["statusCode"] == 304
+    assert response["headers"]["ETag"] == '"2"'
+    serialize.assert_not_called()
+    dumps.assert_not_called()
+    assert read_cache.stats()["entries"] == 0
 
 # Test para obtener una tarea específica
-def test_get_task(mock_event, mock_db):
+def test_get_task(mock_event, mock_db, lambda_context):
     # Configurar mock
     mock_db.find_one.return_value = {
         "id": "task123",
@@ -74,7 +187,7 @@ def test_get_task(mock_event, mock_db):
     }
     
     # Llamar a la función
-    response = get_task(mock_event, {})
+    response = get_task(mock_event, lambda_context)
     
     # Verificar resultado
     assert response["statusCode"] == 200
@@ -83,20 +196,27 @@ def test_get_task(mock_event, mock_db):
     assert body["title"] == "Test Task"
     
     # Verificar que se llamó a la base de datos con los parámetros correctos
-    mock_db.find_one.assert_called_once_with({"id": "task123", "user_id": "user123"})
+    mock_db.find_one.assert_called_once_with({"id": "task123", "user_id": "user123"}, TASK_PROJECTION)
 
 # Test para crear una tarea
-def test_create_task(mock_event, mock_db):
+def test_create_task(mock_event, mock_db, lambda_context):
+    # Estado válido de TaskStatus
+    mock_event["body"] = json.dumps({
+        "title": "Test Task",
+        "description": "This is a test task",
+        "status": "to_do"
+    })
+    
     # Llamar a la función
     with patch("uuid.uuid4", return_value="new-task-id"):
-        response = create_task(mock_event, {})
+        response = create_task(mock_event, lambda_context)
     
     # Verificar resultado
     assert response["statusCode"] == 201
     body = json.loads(response["body"])
     assert body["id"] == "new-task-id"
     assert body["title"] == "Test Task"
-    assert body["status"] == "por_hacer"
+    assert body["status"] == "to_do"
     
     # Verificar que se llamó a la base de datos para insertar
     mock_db.insert_one.assert_called_once()
@@ -104,30 +224,18 @@ def test_create_task(mock_event, mock_db):
     assert inserted_doc["title"] == "Test Task"
     assert inserted_doc["user_id"] == "user123"
 
-# Test para actualizar una tarea
-def test_update_task(mock_event, mock_db):
-    # Configurar mocks
-    mock_db.find_one.side_effect = [
-        # Primera llamada: verificar que la tarea existe
-        {
-            "id": "task123",
-            "title": "Test Task",
-            "description": "This is a test task",
-            "status": "por_hacer",
-            "user_id": "user123",
-            "created_at": "2023-01-01T00:00:00"
-        },
-        # Segunda llamada: obtener la tarea actualizada
-        {
-            "id": "task123",
-            "title": "Updated Task",
-            "description": "This is a test task",
-            "status": "in_progress",
-            "user_id": "user123",
-            "created_at": "2023-01-01T00:00:00",
-            "updated_at": "2023-01-02T00:00:00"
-        }
-    ]
+# Test para actualizar una tarea con un único find_one_and_update
+def test_update_task(mock_event, mock_db, lambda_context):
+    # Configurar mock: documento anterior a la actualización
+    mock_db.find_one_and_update.return_value = {
+        "id": "task123",
+        "title": "Test Task",
+        "description": "This is a test task",
+        "status": "to_do",
+        "user_id": "user123",
+        "created_at": "2023-01-01T00:00:00",
+        "version": 3
+    }
     
     # Modificar el body del evento
     mock_event["body"] = json.dumps({
@@ -136,42 +244,428 @@ def test_update_task(mock_event, mock_db):
     })
     
     # Llamar a la función
-    response = update_task(mock_event, {})
+    response = update_task(mock_event, lambda_context)
     
     # Verificar resultado
     assert response["statusCode"] == 200
+    assert response["headers"]["ETag"] == '"4"'
     body = json.loads(response["body"])
     assert body["title"] == "Updated Task"
     assert body["status"] == "in_progress"
+    assert body["version"] == 4
     
-    # Verificar que se llamó a la base de datos para actualizar
-    mock_db.update_one.assert_called_once()
-    filter_arg = mock_db.update_one.call_args[0][0]
-    update_arg = mock_db.update_one.call_args[0][1]["$set"]
+    # Verificar que se actualizó con una sola llamada a la base de datos
+    mock_db.find_one_and_update.assert_called_once()
+    filter_arg = mock_db.find_one_and_update.call_args[0][0]
+    update_arg = mock_db.find_one_and_update.call_args[0][1]
     assert filter_arg == {"id": "task123", "user_id": "user123"}
-    assert update_arg["title"] == "Updated Task"
-    assert update_arg["status"] == "in_progress"
+    assert update_arg["$set"]["title"] == "Updated Task"
+    assert update_arg["$set"]["status"] == "in_progress"
+    assert update_arg["$inc"] == {"version": 1}
+    mock_db.find_one.assert_not_called()
+    # Tras la escritura solo se marca el número de secuencia asignado con los contadores
+    mock_db.update_one.assert_called_once_with(
+        {"id": "task123", "user_id": "user123"}, {"$max": {"seq": 1, "changed_at": ANY}}
+    )
+
+# Test para actualizar con If-Match: la versión forma parte del filtro
+def test_update_task_if_match(mock_event, mock_db, lambda_context):
+    mock_event["headers"] = {"if-match": '"3"'}
+    mock_event["body"] = json.dumps({"title": "Updated Task"})
+    
+    # Otra petición modificó la tarea: no coincide la versión pero la tarea existe
+    mock_db.find_one_and_update.return_value = None
+    mock_db.find_one.return_value = {"_id": "object-id"}
+    
+    response = update_task(mock_event, lambda_context)
+    
+    assert response["statusCode"] == 412
+    filter_arg = mock_db.find_one_and_update.call_args[0][0]
+    assert filter_arg == {"id": "task123", "user_id": "user123", "version": {"$in": [3]}}
+    
+    # La tarea no existe
+    mock_db.find_one.return_value = None
+    response = update_task(mock_event, lambda_context)
+    assert response["statusCode"] == 404
+
+# Test para rechazar con 412 un If-Match débil: exige la comparación fuerte
+def test_update_task_weak_if_match(mock_event, mock_db, lambda_context):
+    mock_event["headers"] = {"If-Match": 'W/"3"'}
+    mock_event["body"] = json.dumps({"title": "Updated Task"})
+    mock_db.find_one_and_update.return_value = None
+    mock_db.find_one.return_value = {"_id": "object-id"}
+    
+    response = update_task(mock_event, lambda_context)
+    
+    assert response["statusCode"] == 412
+    filter_arg = mock_db.find_one_and_update.call_args[0][0]
+    assert filter_arg["version"] == {"$in": []}
 
 # Test para eliminar una tarea
-def test_delete_task(mock_event, mock_db):
+def test_delete_task(mock_event, mock_db, lambda_context):
     # Configurar mock
-    mock_db.find_one.return_value = {
-        "id": "task123",
-        "title": "Test Task",
-        "description": "This is a test task",
-        "status": "por_hacer",
-        "user_id": "user123",
-        "created_at": "2023-01-01T00:00:00"
-    }
+    mock_db.find_one_and_delete.return_value = {"_id": "object-id", "status": "to_do"}
     
     # Llamar a la función
-    response = delete_task(mock_event, {})
+    response = delete_task(mock_event, lambda_context)
     
     # Verificar resultado
     assert response["statusCode"] == 200
     body = json.loads(response["body"])
     assert "message" in body
-    assert "eliminada" in body["message"]
+    assert "deleted" in body["message"]
+    
+    # Verificar que se eliminó con una sola llamada a la base de datos
+    mock_db.find_one_and_delete.assert_called_once_with(
+        {"id": "task123", "user_id": "user123"}, projection={"status": 1}
+    )
+    mock_db.find_one.assert_not_called()
+
+# Test para eliminar una tarea inexistente
+def test_delete_task_not_found(mock_event, mock_db, lambda_context):
+    mock_db.find_one_and_delete.return_value = None
+    
+    response = delete_task(mock_event, lambda_context)
+    
+    assert response["statusCode"] == 404
+    mock_db.find_one.assert_not_called()
+
+# Test para obtener las estadísticas desde el documento de contadores
+def test_get_task_stats(mock_event, mock_stats, lambda_context):
+    mock_stats.find_one.return_value = {
+        "_id": "user123",
+        "counts": {"to_do": 2, "completed": 1},
+        "total": 3
+    }
+    
+    response = get_task_stats(mock_event, lambda_context)
+    
+    assert response["statusCode"] == 200
+    body = json.loads(response["body"])
+    assert body == {
+        "total": 3,
+        "by_status": {"to_do": 2, "in_progress": 0, "completed": 1}
+    }
+    mock_stats.find_one.assert_called_once_with({"_id": "user123"})
+
+# Test para mantener los contadores al crear, actualizar y eliminar
+def test_stats_counters_updated_by_writes(mock_event, mock_db, mock_stats, lambda_context):
+    mock_event["body"] = json.dumps({"title": "Test Task", "description": "Desc", "status": "to_do"})
+    create_task(mock_event, lambda_context)
+    mock_stats.update_one.assert_called_with(
+        {"_id": "user123"}, {"$inc": {"counts.to_do": 1, "total": 1, "version": 1}}, upsert=True
+    )
+    
+    mock_db.find_one_and_update.return_value = {"id": "task123", "user_id": "user123", "status": "to_do"}
+    mock_event["body"] = json.dumps({"status": "completed"})
+    update_task(mock_event, lambda_context)
+    # Contadores, versión y número de secuencia en una sola actualización
+    assert mock_stats.find_one_and_update.call_args[0][1] == {
+        "$inc": {"counts.to_do": -1, "counts.completed": 1, "version": 1, "sequence": 1}
+    }
     
-    # Verificar que se llamó a la base de datos para eliminar
-    mock_db.delete_one.assert_called_once_with({"id": "task123", "user_id": "user123"}) 
\ No newline at end of file
+    mock_db.find_one_and_delete.return_value = {"status": "completed"}
+    delete_task(mock_event, lambda_context)
+    assert mock_stats.find_one_and_update.call_args[0][1] == {
+        "$inc": {"counts.completed": -1, "total": -1, "version": 1, "sequence": 1}
+    }
+
+# Test para ejecutar un lote de operaciones con un único bulk_write
+def test_batch_tasks(mock_event, mock_db, mock_stats, lambda_context):
+    mock_db.find.return_value = [
+        {"id": "task1", "title": "Task 1", "description": "Desc", "status": "to_do", "user_id": "user123"},
+        {"id": "task2", "title": "Task 2", "description": "Desc", "status": "completed", "user_id": "user123"}
+    ]
+    mock_event["body"] = json.dumps({"operations": [
+        {"op": "create", "data": {"title": "New", "description": "Desc"}},
+        {"op": "update", "id": "task1", "data": {"status": "completed"}},
+        {"op": "delete", "id": "task2"},
+        {"op": "update", "id": "missing", "data": {"title": "Nope"}},
+        {"op": "create", "data": {"title": "Without description"}},
+        {"op": "delete", "id": "task2"}
+    ]})
+    mock_db.bulk_write.return_value = MagicMock(matched_count=1, deleted_count=1)
+    
+    response = batch_tasks(mock_event, lambda_context)
+    
+    assert response["statusCode"] == 200
+    body = json.loads(response["body"])
+    assert [result["status"] for result in body["results"]] == [201, 200, 200, 404, 422, 409]
+    assert body["succeeded"] == 3
+    assert body["failed"] == 3
+    assert body["results"][1]["task"]["status"] == "completed"
+    
+    # Todas las escrituras válidas van en un único bulk_write no ordenado
+    mock_db.bulk_write.assert_called_once()
+    requests = mock_db.bulk_write.call_args[0][0]
+    assert len(requests) == 3
+    assert mock_db.bulk_write.call_args[1] == {"ordered": False}
+    
+    # Los contadores reciben el cambio neto (nulo en este lote) y la versión avanza
+    mock_stats.update_one.assert_called_once_with(
+        {"_id": "user123"}, {"$inc": {"version": 1}}, upsert=True
+    )
+
+# Test para las operaciones de un lote que pierden la carrera con otra petición
+def test_batch_tasks_lost_races(mock_event, mock_db, mock_stats, lambda_context):
+    mock_db.find.side_effect = [
+        [
+            {"id": "task1", "status": "to_do", "user_id": "user123", "version": 1},
+            {"id": "task2", "status": "to_do", "user_id": "user123", "version": 1},
+            {"id": "task3", "status": "completed", "user_id": "user123", "version": 2}
+        ],
+        # Al releer: task1 cambió, task2 sigue y task3 ya no existe
+        [{"id": "task1", "seq": 99}, {"id": "task2", "seq": 2}]
+    ]
+    mock_stats.find_one_and_update.return_value = {"sequence": 2}
+    mock_event["body"] = json.dumps({"operations": [
+        {"op": "update", "id": "task1", "data": {"status": "completed"}},
+        {"op": "update", "id": "task2", "data": {"status": "completed"}},
+        {"op": "delete", "id": "task3"}
+    ]})
+    mock_db.bulk_write.return_value = MagicMock(matched_count=1, deleted_count=0)
+    
+    response = batch_tasks(mock_event, lambda_context)
+    
+    body = json.loads(response["body"])
+    assert [result["status"] for result in body["results"]] == [412, 200, 409]
+    
+    # Los filtros llevan la versión leída
+    requests = mock_db.bulk_write.call_args[0][0]
+    assert requests[0]._filter == {"id": "task1", "user_id": "user123", "version": 1}
+    assert requests[2]._filter == {"id": "task3", "user_id": "user123", "version": 2}
+    
+    # Solo la actualización aplicada mueve los contadores; el borrado ajeno no se descuenta
+    mock_stats.update_one.assert_called_once_with(
+        {"_id": "user123"}, {"$inc": {"counts.to_do": -1, "counts.completed": 1, "version": 1}}, upsert=True
+    )
+    mock_db.insert_many.assert_not_called()
+
+# Test para un cuerpo JSON válido que no es un objeto
+@pytest.mark.parametrize("body", ["[]", '"x"', "3", '{"operations": {}}'])
+def test_batch_tasks_invalid_body(mock_event, mock_db, lambda_context, body):
+    mock_event["body"] = body
+    
+    response = batch_tasks(mock_event, lambda_context)
+    
+    assert response["statusCode"] == 422
+    assert json.loads(response["body"])["error_code"] == "validation_error"
+    mock_db.bulk_write.assert_not_called()
+
+# Test para el tamaño máximo de lote
+def test_batch_tasks_too_large(mock_event, mock_db, lambda_context):
+    mock_event["body"] = json.dumps({"operations": [{"op": "delete", "id": "x"}] * 201})
+    
+    response = batch_tasks(mock_event, lambda_context)
+    
+    assert response["statusCode"] == 413
+    mock_db.bulk_write.assert_not_called()
+
+# Test para obtener estadísticas y primera página en una sola petición
+def test_get_task_overview(mock_event, mock_db, mock_stats, lambda_context):
+    mock_stats.find_one.return_value = {"_id": "user123", "counts": {"to_do": 1}, "total": 1, "version": 4}
+    mock_db.find.return_value.sort.return_value.limit.return_value = [
+        {"id": "task123", "title": "Test Task", "user_id": "user123", "created_at": "2023-01-01T00:00:00"}
+    ]
+
+    response = get_task_overview(mock_event, lambda_context)
+
+    assert response["statusCode"] == 200
+    body = json.loads(response["body"])
+    assert body["items"][0]["id"] == "task123"
+    assert body["next_cursor"] is None
+    assert body["stats"] == {"total": 1, "by_status": {"to_do": 1, "in_progress": 0, "completed": 0}}
+
+    # La misma versión de la colección devuelve 304 sin leer la página
+    mock_db.find.reset_mock()
+    mock_event["headers"] = {"If-None-Match": response["headers"]["ETag"]}
+    assert get_task_overview(mock_event, lambda_context)["statusCode"] == 304
+    mock_db.find.assert_not_called()
+
+    # La versión se lee antes que la página: un ETag nunca es más nuevo que su página
+    calls = []
+    mock_stats.find_one.side_effect = lambda *args, **kwargs: calls.append("version") or {"version": 5}
+    mock_db.find.side_effect = lambda *args, **kwargs: calls.append("page") or MagicMock()
+    mock_event["headers"] = {}
+    get_task_overview(mock_event, lambda_context)
+    assert calls == ["version", "page"]
+
+# Test para servir una tarea desde la caché e invalidarla al escribir
+def test_get_task_cached_until_write(mock_event, mock_db, lambda_context):
+    mock_db.find_one.return_value = {
+        "id": "task123", "title": "Test Task", "status": "to_do", "user_id": "user123", "version": 2
+    }
+
+    first = get_task(mock_event, lambda_context)
+    second = get_task(mock_event, lambda_context)
+
+    assert first["statusCode"] == second["statusCode"] == 200
+    assert first["body"] == second["body"]
+    assert second["headers"]["ETag"] == '"2"'
+    mock_db.find_one.assert_called_once()
+
+    # Una actualización invalida las entradas del usuario
+    mock_db.find_one_and_update.return_value = dict(mock_db.find_one.return_value)
+    mock_event["body"] = json.dumps({"title": "Updated Task"})
+    update_task(mock_event, lambda_context)
+
+    get_task(mock_event, lambda_context)
+    assert mock_db.find_one.call_count == 2
+
+
+# Test para no guardar en la caché una tarea leída mientras otra petición la escribía
+def test_get_task_not_cached_across_concurrent_write(mock_event, mock_db, lambda_context):
+    task = {"id": "task123", "title": "Test Task", "status": "to_do", "user_id": "user123", "version": 2}
+
+    def read_during_write(*args, **kwargs):
+        # La escritura concurrente invalida la caché después de esta lectura
+        read_cache.invalidate("user123")
+        return dict(task)
+    mock_db.find_one.side_effect = read_during_write
+
+    assert get_task(mock_event, lambda_context)["statusCode"] == 200
+    get_task(mock_event, lambda_context)
+    assert mock_db.find_one.call_count == 2
+
+
+# Test para servir una página desde la caché mientras no cambie la versión
+def test_get_tasks_cached_by_version(mock_event, mock_db, mock_stats, lambda_context):
+    mock_db.find.return_value.sort.return_value.limit.side_effect = lambda limit: iter([
+        {"id": "task123", "title": "Test Task", "user_id": "user123", "created_at": "2023-01-01T00:00:00"}
+    ])
+    mock_stats.find_one.return_value = {"version": 1}
+
+    first = get_tasks(mock_event, lambda_context)
+    second = get_tasks(mock_event, lambda_context)
+    assert first["body"] == second["body"]
+    assert mock_db.find.call_count == 1
+
+    # Otra instancia escribió: la versión cambia y la página se vuelve a leer
+    mock_stats.find_one.return_value = {"version": 2}
+    third = get_tasks(mock_event, lambda_context)
+    assert third["headers"]["ETag"] != first["headers"]["ETag"]
+    assert mock_db.find.call_count == 2
+
+# Test para filtrar y ordenar en el servidor
+def test_get_tasks_filtered(mock_event, mock_db, lambda_context):
+    mock_db.find.return_value.sort.return_value.limit.return_value = []
+    mock_event["queryStringParameters"] = {"status": "completed", "sort": "-created_at"}
+
+    response = get_tasks(mock_event, lambda_context)
+
+    assert response["statusCode"] == 200
+    mock_db.find.assert_called_once_with(
+        {"user_id": "user123", "status": "completed"}, TASK_PROJECTION, hint="user_id_status_created_at_id"
+    )
+    mock_db.find.return_value.sort.assert_called_once_with([("created_at", -1), ("id", -1)])
+
+# Test para rechazar combinaciones de filtros sin índice
+def test_get_tasks_unsupported_filter(mock_event, mock_db, lambda_context):
+    mock_event["queryStringParameters"] = {"updated_since": "2024-01-01T00:00:00"}
+
+    response = get_tasks(mock_event, lambda_context)
+
+    assert response["statusCode"] == 400
+    assert json.loads(response["body"])["error_code"] == "invalid_query"
+    mock_db.find.assert_not_called()
+
+# Test para buscar tareas por texto
+def test_search_tasks(mock_event, mock_db, lambda_context):
+    mock_db.aggregate.return_value = [{"id": "task1", "title": "Comprar pan", "score": 1.5}]
+    mock_event["queryStringParameters"] = {"q": " pan "}
+
+    response = search_tasks(mock_event, lambda_context)
+
+    assert response["statusCode"] == 200
+    body = json.loads(response["body"])
+    assert body["items"] == [{"id": "task1", "title": "Comprar pan", "score": 1.5}]
+    assert body["next_cursor"] is None
+    pipeline = mock_db.aggregate.call_args[0][0]
+    assert pipeline[0]["$match"] == {"user_id": "user123", "$text": {"$search": "pan"}}
+
+    # Otra búsqueda no reutiliza la página cacheada
+    mock_event["queryStringParameters"] = {"q": "leche"}
+    second = search_tasks(mock_event, lambda_context)
+    assert second["headers"]["ETag"] != response["headers"]["ETag"]
+    assert mock_db.aggregate.call_count == 2
+
+# Test para rechazar una búsqueda vacía o con un cursor de otro orden
+def test_search_tasks_validation(mock_event, mock_db, lambda_context):
+    mock_event["queryStringParameters"] = {"q": "  "}
+    response = search_tasks(mock_event, lambda_context)
+    assert response["statusCode"] == 400
+    assert json.loads(response["body"])["error_code"] == "invalid_query"
+
+    mock_event["queryStringParameters"] = {"q": "pan", "cursor": "eyJpIjoidGFzazEiLCJjIjoiMjAyMyJ9"}
+    response = search_tasks(mock_event, lambda_context)
+    assert response["statusCode"] == 400
+    assert json.loads(response["body"])["error_code"] == "invalid_cursor"
+    mock_db.aggregate.assert_not_called()
+
+# Test para devolver solo los campos pedidos
+def test_get_tasks_fields(mock_event, mock_db, lambda_context):
+    mock_db.find.return_value.sort.return_value.limit.return_value = [
+        {"id": "task1", "title": "Test Task", "status": "to_do", "created_at": "2023-01-01T00:00:00"}
+    ]
+    mock_event["queryStringParameters"] = {"fields": "title,status"}
+
+    response = get_tasks(mock_event, lambda_context)
+
+    assert response["statusCode"] == 200
+    assert json.loads(response["body"])["items"] == [{"id": "task1", "title": "Test Task", "status": "to_do"}]
+    assert mock_db.find.call_args[0][1] == {"_id": 0, "status": 1, "title": 1, "id": 1, "created_at": 1}
+
+    mock_event["queryStringParameters"] = {"fields": "title,password"}
+    response = get_tasks(mock_event, lambda_context)
+    assert response["statusCode"] == 400
+    assert json.loads(response["body"])["error_code"] == "invalid_fields"
+
+# Test para leer una tarea con proyección sin perder su ETag
+def test_get_task_fields(mock_event, mock_db, lambda_context):
+    mock_db.find_one.return_value = {"id": "task123", "title": "Test Task", "version": 3}
+    mock_event["queryStringParameters"] = {"fields": "title"}
+
+    response = get_task(mock_event, lambda_context)
+
+    # El id siempre se incluye, como en get_tasks
+    assert response["statusCode"] == 200
+    assert json.loads(response["body"]) == {"id": "task123", "title": "Test Task"}
+    assert response["headers"]["ETag"] == '"3"'
+    mock_db.find_one.assert_called_once_with(
+        {"id": "task123", "user_id": "user123"}, {"_id": 0, "title": 1, "id": 1, "version": 1}
+    )
+
+# Test para la sincronización incremental con marcas de borrado
+def test_get_task_changes(mock_event, mock_db, lambda_context):
+    settled = datetime.utcnow() - timedelta(minutes=5)
+    mock_db.find.return_value.sort.return_value.limit.side_effect = [
+        iter([
+            {"id": "task1", "title": "A", "seq": 5, "changed_at": settled},
+            {"id": "task3", "title": "C", "seq": 7, "changed_at": datetime.utcnow()},
+        ]),
+        iter([{"id": "task2", "seq": 6, "changed_at": settled}]),
+    ]
+    mock_event["queryStringParameters"] = {"since": encode_sync_token(4, time.time())}
+
+    response = get_task_changes(mock_event, lambda_context)
+
+    assert response["statusCode"] == 200
+    body = json.loads(response["body"])
+    assert body["changed"] == [{"id": "task1", "title": "A"}, {"id": "task3", "title": "C"}]
+    assert body["deleted"] == ["task2"]
+    assert body["has_more"] is False
+    # El cambio más reciente se volverá a enviar por si una escritura anterior sigue en curso
+    assert decode_sync_token(body["next_token"])[0] == 6
+
+# Test para rechazar tokens inválidos o caducados
+def test_get_task_changes_invalid_token(mock_event, mock_db, lambda_context):
+    mock_event["queryStringParameters"] = {"since": "not-a-token"}
+    response = get_task_changes(mock_event, lambda_context)
+    assert response["statusCode"] == 400
+    assert json.loads(response["body"])["error_code"] == "invalid_sync_token"
+
+    mock_event["queryStringParameters"] = {"since": encode_sync_token(4, time.time() - 90 * 24 * 3600)}
+    response = get_task_changes(mock_event, lambda_context)
+    assert response["statusCode"] == 410
+    assert json.loads(response["body"])["error_code"] == "sync_token_expired"
+    mock_db.find.assert_not_called()
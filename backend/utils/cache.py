@@ -0,0 +1,181 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Set, Tuple
+
+# Caches by name, reported by GET /health
+CACHES: Dict[str, "LRUCache"] = {}
+
+# Bytes charged per entry on top of its value, for the key and bookkeeping
+ENTRY_OVERHEAD = 200
+
+
+class LRUCache:
+    """
+    Thread-safe in-process cache bounded by number of entries, total size and
+    time to live. Entries belong to a namespace (e.g. a user id) so all the
+    entries of a namespace can be invalidated at once.
+
+    A value read while a concurrent write invalidates its namespace must not
+    be stored afterwards. Readers take the `generation()` before reading and
+    pass it to `set`, which drops the value if the namespace was invalidated
+    in between.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_entries: int,
+        max_bytes: int,
+        ttl: float,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        # (namespace, key) -> (value, size, expires_at), least recently used first
+        self._entries: "OrderedDict[Tuple[str, Hashable], Tuple[Any, int, float]]" = OrderedDict()
+        self._namespaces: Dict[str, Set[Hashable]] = {}
+        self._bytes = 0
+        # Generation of the last invalidation per namespace, most recent last.
+        # Only max_entries namespaces are remembered; the forgotten ones count
+        # as invalidated at the newest generation forgotten.
+        self._generation = 0
+        self._invalidated: "OrderedDict[str, int]" = OrderedDict()
+        self._forgotten = 0
+        self._counters = {
+            "hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0, "stale_sets": 0
+        }
+        CACHES[name] = self
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.max_bytes > 0 and self.ttl > 0
+
+    def _remove(self, entry_key: Tuple[str, Hashable]) -> None:
+        _, size, _ = self._entries.pop(entry_key)
+        self._bytes -= size
+        namespace, key = entry_key
+        keys = self._namespaces.get(namespace)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._namespaces[namespace]
+
+    def get(self, namespace: str, key: Hashable) -> Optional[Any]:
+        """
+        Gets a cached value, or None when it is missing or expired.
+        """
+        if not self.enabled:
+            return None
+        entry_key = (namespace, key)
+        with self._lock:
+            entry = self._entries.get(entry_key)
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+            if entry[2] <= self._clock():
+                self._remove(entry_key)
+                self._counters["expirations"] += 1
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(entry_key)
+            self._counters["hits"] += 1
+            return entry[0]
+
+    def generation(self) -> int:
+        """
+        Gets the current invalidation generation, to pass to `set`.
+        """
+        with self._lock:
+            return self._generation
+
+    def set(
+        self,
+        namespace: str,
+        key: Hashable,
+        value: Any,
+        size: int,
+        ttl: Optional[float] = None,
+        generation: Optional[int] = None
+    ) -> None:
+        """
+        Stores a value, evicting the least recently used entries to stay
+        within the limits. Values larger than a quarter of the memory cap
+        are not cached.
+
+        Args:
+            namespace: Group of the entry, see `invalidate`
+            key: Key of the entry within the namespace
+            value: Value to cache
+            size: Approximate memory of the value in bytes
+            ttl: Time to live of this entry, capped at the cache TTL
+            generation: `generation()` taken before the value was read; the
+                value is dropped if the namespace was invalidated since
+        """
+        size += ENTRY_OVERHEAD
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if not self.enabled or ttl <= 0 or size > self.max_bytes // 4:
+            return
+        entry_key = (namespace, key)
+        with self._lock:
+            if generation is not None and self._invalidated.get(namespace, self._forgotten) > generation:
+                self._counters["stale_sets"] += 1
+                return
+            if entry_key in self._entries:
+                self._remove(entry_key)
+            self._entries[entry_key] = (value, size, self._clock() + ttl)
+            self._namespaces.setdefault(namespace, set()).add(key)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._counters["evictions"] += 1
+
+    def invalidate(self, namespace: str) -> None:
+        """
+        Removes all the entries of a namespace.
+        """
+        with self._lock:
+            self._generation += 1
+            self._invalidated[namespace] = self._generation
+            self._invalidated.move_to_end(namespace)
+            while len(self._invalidated) > max(self.max_entries, 1):
+                _, forgotten = self._invalidated.popitem(last=False)
+                self._forgotten = max(self._forgotten, forgotten)
+
+            keys = self._namespaces.get(namespace)
+            if not keys:
+                return
+            for key in list(keys):
+                self._remove((namespace, key))
+            self._counters["invalidations"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._namespaces.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns a snapshot of the counters, size and limits.
+        """
+        with self._lock:
+            return {
+                **self._counters,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+            }
+
+
+def get_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Gets the statistics of every cache created in this process.
+    """
+    return {name: cache.stats() for name, cache in CACHES.items()}
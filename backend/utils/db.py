@@ -1,13 +1,156 @@
 import os
 import json
+import threading
 import pymongo
-from pymongo import MongoClient
+from pymongo import MongoClient, IndexModel, ASCENDING, TEXT
 from typing import Optional, Dict, List, Any
-from botocore.exceptions import ClientError
-from datetime import datetime, date
+from datetime import datetime, date, timedelta, timezone
+from utils.monitoring import SLOW_QUERIES_COLLECTION, CommandTimingListener, PoolStatsListener, SlowQueryListener
+from utils.metrics import timed
 
 # Singleton for MongoDB connection
 client: Optional[MongoClient] = None
+_client_lock = threading.Lock()
+
+# Connection pool events of the singleton client, its command durations as
+# phases of the handler being measured, and its command statistics and slow
+# command samples
+pool_stats = PoolStatsListener()
+command_timings = CommandTimingListener()
+command_stats = SlowQueryListener(lambda: get_mongodb_client())
+
+# Client defaults per runtime. A Lambda instance serves one request at a
+# time, so it keeps a tiny pool; the long-running server shares one pool
+# between concurrent requests.
+RUNTIME_DEFAULTS: Dict[str, Dict[str, Any]] = {
+    "lambda": {
+        "maxPoolSize": 2,
+        "minPoolSize": 0,
+        "maxIdleTimeMS": 60000,
+        "serverSelectionTimeoutMS": 5000,
+        "connectTimeoutMS": 5000,
+        "socketTimeoutMS": 10000,
+        "waitQueueTimeoutMS": 5000,
+    },
+    "server": {
+        "maxPoolSize": 50,
+        "minPoolSize": 5,
+        "maxIdleTimeMS": 300000,
+        "serverSelectionTimeoutMS": 5000,
+        "connectTimeoutMS": 5000,
+        "socketTimeoutMS": 30000,
+        "waitQueueTimeoutMS": 2000,
+    },
+}
+
+# Environment variables that override the client options
+INT_OPTIONS = {
+    "MONGODB_MAX_POOL_SIZE": "maxPoolSize",
+    "MONGODB_MIN_POOL_SIZE": "minPoolSize",
+    "MONGODB_MAX_IDLE_TIME_MS": "maxIdleTimeMS",
+    "MONGODB_SERVER_SELECTION_TIMEOUT_MS": "serverSelectionTimeoutMS",
+    "MONGODB_CONNECT_TIMEOUT_MS": "connectTimeoutMS",
+    "MONGODB_SOCKET_TIMEOUT_MS": "socketTimeoutMS",
+    "MONGODB_WAIT_QUEUE_TIMEOUT_MS": "waitQueueTimeoutMS",
+}
+BOOL_OPTIONS = {
+    "MONGODB_RETRY_READS": "retryReads",
+    "MONGODB_RETRY_WRITES": "retryWrites",
+}
+
+# How long the markers of deleted tasks are kept for delta sync (30 days).
+# Clients that have not synced for longer must reload their tasks.
+TOMBSTONE_TTL_SECONDS = int(os.environ.get("TASKS_TOMBSTONE_TTL_SECONDS", str(30 * 24 * 3600)))
+
+# How long the slow command samples are kept for `manage.py slow-queries` (7 days)
+SLOW_QUERY_TTL_SECONDS = int(os.environ.get("MONGODB_SLOW_QUERY_TTL_SECONDS", str(7 * 24 * 3600)))
+
+# Indexes required by the query paths of each collection.
+# Applied by `python manage.py ensure-indexes`, never at cold start.
+COLLECTION_INDEXES: Dict[str, List[IndexModel]] = {
+    "tasks": [
+        # get_task, update_task, delete_task
+        IndexModel([("user_id", ASCENDING), ("id", ASCENDING)], name="user_id_id", unique=True),
+        # get_tasks keyset pagination, one index per sort field (tasks/query.py)
+        IndexModel(
+            [("user_id", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)],
+            name="user_id_created_at_id"
+        ),
+        IndexModel(
+            [("user_id", ASCENDING), ("updated_at", ASCENDING), ("id", ASCENDING)],
+            name="user_id_updated_at_id"
+        ),
+        # Status filtered listings: equality on status, then the sort key
+        IndexModel(
+            [("user_id", ASCENDING), ("status", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)],
+            name="user_id_status_created_at_id"
+        ),
+        IndexModel(
+            [("user_id", ASCENDING), ("status", ASCENDING), ("updated_at", ASCENDING), ("id", ASCENDING)],
+            name="user_id_status_updated_at_id"
+        ),
+        # search_tasks: user_id prefix, so a search only reads the user's entries.
+        # No language, so titles in any language are matched word by word.
+        IndexModel(
+            [("user_id", ASCENDING), ("title", TEXT), ("description", TEXT)],
+            name="user_id_text",
+            weights={"title": 3, "description": 1},
+            default_language="none"
+        ),
+        # get_task_changes: the user's changes in sequence order
+        IndexModel([("user_id", ASCENDING), ("seq", ASCENDING)], name="user_id_seq"),
+    ],
+    "task_tombstones": [
+        # get_task_changes: the user's deletions in sequence order
+        IndexModel([("user_id", ASCENDING), ("seq", ASCENDING)], name="user_id_seq"),
+        # Markers expire TOMBSTONE_TTL_SECONDS after the deletion
+        IndexModel(
+            [("changed_at", ASCENDING)], name="changed_at_ttl", expireAfterSeconds=TOMBSTONE_TTL_SECONDS
+        ),
+    ],
+    SLOW_QUERIES_COLLECTION: [
+        # Samples expire SLOW_QUERY_TTL_SECONDS after they are recorded
+        IndexModel(
+            [("recorded_at", ASCENDING)], name="recorded_at_ttl", expireAfterSeconds=SLOW_QUERY_TTL_SECONDS
+        ),
+    ],
+}
+
+
+def get_runtime() -> str:
+    """
+    Gets the runtime the code is running in: "lambda" or "server".
+    MONGODB_RUNTIME overrides the detection.
+    """
+    runtime = os.environ.get("MONGODB_RUNTIME")
+    if runtime:
+        return runtime
+    return "lambda" if os.environ.get("AWS_LAMBDA_FUNCTION_NAME") else "server"
+
+
+def get_client_options() -> Dict[str, Any]:
+    """
+    Builds the MongoClient options from the runtime defaults and the
+    MONGODB_* environment variables.
+    """
+    options = dict(RUNTIME_DEFAULTS.get(get_runtime(), RUNTIME_DEFAULTS["lambda"]))
+    
+    for variable, option in INT_OPTIONS.items():
+        value = os.environ.get(variable)
+        if value:
+            options[option] = int(value)
+    
+    for variable, option in BOOL_OPTIONS.items():
+        value = os.environ.get(variable)
+        if value:
+            options[option] = value.lower() in ("1", "true", "yes")
+    
+    # Wire compression, e.g. "zstd,snappy,zlib" (zstd and snappy need extra packages)
+    compressors = os.environ.get("MONGODB_COMPRESSORS")
+    if compressors:
+        options["compressors"] = compressors
+    
+    return options
 
 
 def get_mongodb_client() -> MongoClient:
@@ -16,20 +159,49 @@ def get_mongodb_client() -> MongoClient:
     """
     global client
     if client is None:
-        mongodb_uri = os.environ.get("MONGODB_URI")
-        if not mongodb_uri:
-            raise ValueError("MONGODB_URI environment variable is not set")
-        
-        # Connection configuration with connection pool for Lambda
-        client = MongoClient(
-            mongodb_uri,
-            maxPoolSize=1,
-            serverSelectionTimeoutMS=5000,
-            connectTimeoutMS=5000
-        )
+        with _client_lock:
+            if client is None:
+                mongodb_uri = os.environ.get("MONGODB_URI")
+                if not mongodb_uri:
+                    raise ValueError("MONGODB_URI environment variable is not set")
+                
+                client = MongoClient(
+                    mongodb_uri,
+                    event_listeners=[pool_stats, command_timings, command_stats],
+                    **get_client_options()
+                )
     return client
 
 
+def warm_up() -> None:
+    """
+    Opens the connection and checks it with a ping, so the first request
+    does not pay for server selection and the TCP/TLS handshake.
+    """
+    get_mongodb_client().admin.command("ping")
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    """
+    Gets the connection pool configuration and counters for monitoring.
+    """
+    options = get_client_options()
+    return {
+        "runtime": get_runtime(),
+        "max_pool_size": options["maxPoolSize"],
+        "min_pool_size": options["minPoolSize"],
+        "servers": pool_stats.stats()
+    }
+
+
+def get_command_stats() -> Dict[str, Any]:
+    """
+    Gets the count, duration, documents and reply bytes of the commands run
+    by this process, per collection and command.
+    """
+    return command_stats.stats()
+
+
 def get_database(db_name: Optional[str] = None) -> pymongo.database.Database:
     """
     Gets a MongoDB database.
@@ -47,6 +219,150 @@ def get_collection(collection_name: str, db_name: Optional[str] = None) -> pymon
     return db[collection_name]
 
 
+def ensure_indexes(db_name: Optional[str] = None) -> Dict[str, List[str]]:
+    """
+    Creates the declared indexes of every collection.
+    Existing indexes with the same specification are left untouched, so it is
+    safe to run on every deployment.
+    
+    Returns:
+        Names of the indexes ensured per collection
+    """
+    db = get_database(db_name)
+    return {
+        collection_name: db[collection_name].create_indexes(indexes)
+        for collection_name, indexes in COLLECTION_INDEXES.items()
+    }
+
+
+def _index_key(declared: Dict[str, Any]) -> List[Any]:
+    """
+    Returns the key of a declared index as listIndexes reports it: the text
+    fields of a text index are replaced by the internal _fts/_ftsx fields.
+    """
+    key = []
+    for field, kind in declared["key"].items():
+        if kind == TEXT:
+            if ("_fts", TEXT) not in key:
+                key += [("_fts", TEXT), ("_ftsx", 1)]
+        else:
+            key.append((field, kind))
+    return key
+
+
+def _index_matches(declared: Dict[str, Any], existing: Dict[str, Any]) -> bool:
+    """
+    Compares a declared index document with one returned by listIndexes.
+    """
+    options = ("unique", "sparse", "expireAfterSeconds", "partialFilterExpression")
+    if _index_key(declared) != list(existing["key"].items()) or not all(
+        declared.get(option) == existing.get(option) for option in options
+    ):
+        return False
+    
+    text_fields = [field for field, kind in declared["key"].items() if kind == TEXT]
+    if text_fields:
+        weights = declared.get("weights") or {field: 1 for field in text_fields}
+        return existing.get("weights") == weights and \
+            existing.get("default_language", "english") == declared.get("default_language", "english")
+    return True
+
+
+def check_indexes(db_name: Optional[str] = None) -> Dict[str, Dict[str, List[str]]]:
+    """
+    Compares the indexes of each collection against the declared specification.
+    
+    Returns:
+        Per collection report with the names of the indexes that are missing
+        (or differ from the specification), the indexes that have not been used
+        since the server started, and the indexes that exist but are not declared
+    """
+    db = get_database(db_name)
+    report = {}
+    for collection_name, indexes in COLLECTION_INDEXES.items():
+        collection = db[collection_name]
+        existing = {index["name"]: index for index in collection.list_indexes()}
+        usage = {
+            stats["name"]: stats["accesses"]["ops"]
+            for stats in collection.aggregate([{"$indexStats": {}}])
+        }
+        
+        declared = {index.document["name"]: index.document for index in indexes}
+        report[collection_name] = {
+            "missing": [
+                name for name, document in declared.items()
+                if name not in existing or not _index_matches(document, existing[name])
+            ],
+            "unused": [
+                name for name in existing
+                if name != "_id_" and usage.get(name, 0) == 0
+            ],
+            "undeclared": [
+                name for name in existing
+                if name != "_id_" and name not in declared
+            ]
+        }
+    return report
+
+
+def slow_query_report(
+    db_name: Optional[str] = None,
+    hours: float = 24,
+    limit: int = 10,
+    sort: str = "total_ms"
+) -> List[Dict[str, Any]]:
+    """
+    Aggregates the slow command samples of every process by query shape.
+    
+    Args:
+        db_name: Database name (defaults to MONGODB_DB_NAME)
+        hours: Only samples recorded in the last hours
+        limit: Number of shapes returned
+        sort: Field the shapes are ranked by: "total_ms", "count" or "max_ms"
+        
+    Returns:
+        The top shapes, with their number of samples, total, average and
+        maximum duration, average documents and bytes, and their last plan
+    """
+    since = datetime.now(timezone.utc) - timedelta(hours=hours)
+    pipeline = [
+        {"$match": {"recorded_at": {"$gte": since}}},
+        {"$sort": {"recorded_at": ASCENDING}},
+        {"$group": {
+            "_id": "$shape_id",
+            "shape": {"$last": "$shape"},
+            "count": {"$sum": 1},
+            "total_ms": {"$sum": "$duration_ms"},
+            "avg_ms": {"$avg": "$duration_ms"},
+            "max_ms": {"$max": "$duration_ms"},
+            "avg_docs": {"$avg": "$docs"},
+            "avg_bytes": {"$avg": "$bytes"},
+            "plan": {"$last": "$plan"},
+            "last_seen": {"$last": "$recorded_at"},
+        }},
+        {"$sort": {sort: -1}},
+        {"$limit": limit},
+    ]
+    report = []
+    for row in get_database(db_name)[SLOW_QUERIES_COLLECTION].aggregate(pipeline):
+        plan = row["plan"] or {}
+        report.append({
+            "shape_id": row["_id"],
+            "shape": json.loads(row["shape"]),
+            "count": row["count"],
+            "total_ms": round(row["total_ms"], 3),
+            "avg_ms": round(row["avg_ms"], 3),
+            "max_ms": round(row["max_ms"], 3),
+            "avg_docs": round(row["avg_docs"], 1),
+            "avg_bytes": round(row["avg_bytes"]),
+            "collscan": plan.get("collscan", False),
+            "in_memory_sort": plan.get("in_memory_sort", False),
+            "plan": row["plan"],
+            "last_seen": row["last_seen"].isoformat(),
+        })
+    return report
+
+
 def close_mongodb_connection():
     """
     Closes the MongoDB connection.
@@ -57,6 +373,7 @@ def close_mongodb_connection():
         client = None
 
 
+@timed("serialize_mongodb_doc")
 def serialize_mongodb_doc(doc: Dict[str, Any]) -> Dict[str, Any]:
     """
     Serializes a MongoDB document to be JSON-compatible.
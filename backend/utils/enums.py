@@ -0,0 +1,20 @@
+from enum import Enum
+
+
+class TaskStatus(str, Enum):
+    TODO = "to_do"
+    IN_PROGRESS = "in_progress"
+    COMPLETED = "completed"
+
+
+class BatchOperationType(str, Enum):
+    CREATE = "create"
+    UPDATE = "update"
+    DELETE = "delete"
+
+
+class TaskSort(str, Enum):
+    CREATED_AT = "created_at"
+    CREATED_AT_DESC = "-created_at"
+    UPDATED_AT = "updated_at"
+    UPDATED_AT_DESC = "-updated_at"
@@ -1,20 +1,144 @@
+import os
 import json
-from typing import Dict, Any, Optional, Union, List
-from aws_lambda_powertools.utilities.typing import LambdaContext
+import gzip
+import zlib
+import base64
+import functools
+from contextvars import ContextVar
+from typing import Dict, Any, Optional, Union, List, Callable
+from utils.serialization import dumps_bytes
+from utils.metrics import phase, timed
 
+# Response codecs by Content-Encoding token, in order of preference
+COMPRESSION_CODECS: Dict[str, Callable[[bytes], bytes]] = {
+    "gzip": lambda data: gzip.compress(data, compresslevel=6, mtime=0),
+    "deflate": lambda data: zlib.compress(data, 6),
+}
 
+try:
+    import brotli
+    COMPRESSION_CODECS = {"br": lambda data: brotli.compress(bytes(data), quality=5), **COMPRESSION_CODECS}
+except ImportError:
+    pass
+
+# Bodies smaller than this many bytes are not worth compressing
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", "1024"))
+
+# Media types declared as apiGateway.binaryMediaTypes in serverless.yml.
+# API Gateway only decodes a base64 (compressed) body when the first media
+# type of the request's Accept header is one of them, so other requests get
+# uncompressed bodies. Empty outside Lambda: server mode decodes every body.
+BINARY_MEDIA_TYPES = {
+    media_type.strip().lower()
+    for media_type in os.environ.get(
+        "COMPRESSION_BINARY_MEDIA_TYPES",
+        "application/json" if os.environ.get("AWS_LAMBDA_FUNCTION_NAME") else ""
+    ).split(",")
+    if media_type.strip()
+}
+
+# Verify the Authorization bearer token in process when the event carries no
+# authorizer claims (deployments without API Gateway's Cognito authorizer)
+VERIFY_BEARER_TOKENS = os.environ.get("AUTH_VERIFY_TOKENS", "").lower() == "true"
+
+# Accept-Encoding of the request being handled, set by @negotiate_compression
+_accept_encoding: ContextVar[Optional[str]] = ContextVar("accept_encoding", default=None)
+
+
+def register_codec(name: str, compress: Callable[[bytes], bytes]) -> None:
+    """
+    Adds (or replaces) a response codec. Registered codecs take precedence
+    over the built-in ones when the client accepts them with the same quality.
+    """
+    global COMPRESSION_CODECS
+    COMPRESSION_CODECS = {name: compress, **{k: v for k, v in COMPRESSION_CODECS.items() if k != name}}
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Picks the response codec for an Accept-Encoding header.
+    
+    Args:
+        accept_encoding: Raw header value
+        
+    Returns:
+        Name of the codec to use, or None to send the body uncompressed
+    """
+    if not accept_encoding:
+        return None
+    
+    qualities = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        qualities[token.strip().lower()] = quality
+    
+    wildcard = qualities.get("*", 0.0)
+    best, best_quality = None, 0.0
+    for name in COMPRESSION_CODECS:
+        quality = qualities.get(name, wildcard)
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+
+def accepts_binary(event: Dict[str, Any]) -> bool:
+    """
+    Checks whether API Gateway will decode a base64 response to the request:
+    the first media type of its Accept header must be in BINARY_MEDIA_TYPES.
+    """
+    if not BINARY_MEDIA_TYPES:
+        return True
+    accept = get_header(event, "Accept") or ""
+    first = accept.split(",", 1)[0].split(";", 1)[0].strip().lower()
+    return first in BINARY_MEDIA_TYPES
+
+
+def negotiate_compression(handler: Callable) -> Callable:
+    """
+    Enables compression of the responses of a handler according to the
+    request's Accept-Encoding. Handlers without this decorator (or responses
+    created with compress=False) are always sent uncompressed, and so are
+    responses API Gateway would not decode (see BINARY_MEDIA_TYPES).
+    """
+    @functools.wraps(handler)
+    def wrapper(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+        accept_encoding = (get_header(event, "Accept-Encoding") or "") if accepts_binary(event) else ""
+        token = _accept_encoding.set(accept_encoding)
+        try:
+            return handler(event, context)
+        finally:
+            _accept_encoding.reset(token)
+    return wrapper
+
+
+@timed("create_response")
 def create_response(
     status_code: int, 
-    body: Union[Dict[str, Any], List[Dict[str, Any]], str] = None,
-    headers: Optional[Dict[str, str]] = None
+    body: Union[Dict[str, Any], List[Dict[str, Any]], str, bytes, bytearray] = None,
+    headers: Optional[Dict[str, str]] = None,
+    compress: bool = True
 ) -> Dict[str, Any]:
     """
     Creates an HTTP response for API Gateway.
     
+    Inside a handler decorated with @negotiate_compression, bodies of at least
+    COMPRESSION_MIN_SIZE bytes are compressed with the codec negotiated from
+    Accept-Encoding and returned base64-encoded. A strong ETag gets the
+    negotiated coding whenever one is negotiated, whatever the body size, so
+    a 304 (which has no body) carries the validator the 200 would.
+    
     Args:
         status_code: HTTP status code
-        body: Response body (can be a dictionary, list or string)
+        body: Response body (can be a dictionary, list, string or already encoded JSON bytes)
         headers: Additional HTTP headers
+        compress: Set to False to never compress this response
         
     Returns:
         Dictionary formatted for API Gateway
@@ -22,7 +146,8 @@ def create_response(
     default_headers = {
         "Content-Type": "application/json",
         "Access-Control-Allow-Origin": "*",
-        "Access-Control-Allow-Credentials": "true"
+        "Access-Control-Allow-Credentials": "true",
+        "Access-Control-Expose-Headers": "ETag"
     }
     
     if headers:
@@ -33,20 +158,56 @@ def create_response(
         "headers": default_headers
     }
     
+    accept_encoding = _accept_encoding.get() if compress else None
+    if accept_encoding is not None:
+        vary = default_headers.get("Vary")
+        negotiated = "Accept, Accept-Encoding" if BINARY_MEDIA_TYPES else "Accept-Encoding"
+        default_headers["Vary"] = f"{vary}, {negotiated}" if vary else negotiated
+    
+    encoding = negotiate_encoding(accept_encoding) if accept_encoding else None
+    etag = default_headers.get("ETag")
+    if encoding and etag and not etag.startswith("W/"):
+        # Strong validators must differ between content-codings
+        value = etag.strip('"')
+        default_headers["ETag"] = f'"{value}-{encoding}"'
+    
     if body is not None:
-        if isinstance(body, str):
-            response["body"] = body
+        if isinstance(body, (bytes, bytearray)):
+            data = body
+        elif isinstance(body, str):
+            data = body.encode("utf-8")
         else:
-            response["body"] = json.dumps(body)
+            with phase("json_dumps"):
+                data = dumps_bytes(body)
+        
+        if encoding and len(data) >= COMPRESSION_MIN_SIZE:
+            with phase("compress"):
+                response["body"] = base64.b64encode(COMPRESSION_CODECS[encoding](data)).decode("ascii")
+            response["isBase64Encoded"] = True
+            default_headers["Content-Encoding"] = encoding
+        else:
+            response["body"] = body if isinstance(body, str) else data.decode("utf-8")
     
     return response
 
 
-def success_response(data: Union[Dict[str, Any], List[Dict[str, Any]], str] = None, status_code: int = 200) -> Dict[str, Any]:
+def success_response(
+    data: Union[Dict[str, Any], List[Dict[str, Any]], str, bytes, bytearray] = None,
+    status_code: int = 200,
+    headers: Optional[Dict[str, str]] = None
+) -> Dict[str, Any]:
     """
     Creates a successful HTTP response.
     """
-    return create_response(status_code, data)
+    return create_response(status_code, data, headers)
+
+
+def not_modified_response(etag: str) -> Dict[str, Any]:
+    """
+    Creates an HTTP 304 response (no body) for a conditional GET. Inside
+    @negotiate_compression the ETag gets the negotiated coding, as in the 200.
+    """
+    return create_response(304, headers={"ETag": etag})
 
 
 def error_response(
@@ -68,6 +229,10 @@ def get_user_from_event(event: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     """
     Extracts user information from the API Gateway event.
     
+    The claims added by API Gateway's Cognito authorizer are used when
+    present. Otherwise, with AUTH_VERIFY_TOKENS=true, the Authorization
+    bearer token is verified locally (see utils/jwt_auth.py).
+    
     Args:
         event: API Gateway event
         
@@ -75,18 +240,26 @@ def get_user_from_event(event: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         User information or None if not found
     """
     # Get user from JWT token payload
+    claims = None
     if "requestContext" in event and "authorizer" in event["requestContext"]:
         claims = event["requestContext"]["authorizer"].get("claims", {})
-        if claims:
-            return {
-                "user_id": claims.get("sub"),
-                "email": claims.get("email"),
-                "name": claims.get("name", "")
-            }
+    
+    if not claims and VERIFY_BEARER_TOKENS:
+        # Loaded on demand so API Gateway deployments never import jose
+        from utils.jwt_auth import verify_authorization
+        claims = verify_authorization(get_header(event, "Authorization"))
+    
+    if claims:
+        return {
+            "user_id": claims.get("sub"),
+            "email": claims.get("email"),
+            "name": claims.get("name", "")
+        }
     
     return None
 
 
+@timed("parse_body")
 def parse_body(event: Dict[str, Any]) -> Dict[str, Any]:
     """
     Parses the HTTP request body.
@@ -105,6 +278,91 @@ def parse_body(event: Dict[str, Any]) -> Dict[str, Any]:
         return {}
     
     try:
+        if event.get("isBase64Encoded"):
+            body = base64.b64decode(body)
         return json.loads(body)
-    except json.JSONDecodeError:
-        return {} 
\ No newline at end of file
+    except (json.JSONDecodeError, ValueError):
+        return {}
+
+
+def get_query_params(event: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Extracts the query string parameters from the API Gateway event.
+    
+    Args:
+        event: API Gateway event
+        
+    Returns:
+        Query string parameters (empty dictionary if there are none)
+    """
+    return event.get("queryStringParameters") or {}
+
+
+def get_header(event: Dict[str, Any], name: str) -> Optional[str]:
+    """
+    Gets a request header from the API Gateway event (case-insensitive).
+    
+    Args:
+        event: API Gateway event
+        name: Header name
+        
+    Returns:
+        Header value or None if not present
+    """
+    headers = event.get("headers") or {}
+    name = name.lower()
+    for key, value in headers.items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def make_etag(value: Any) -> str:
+    """
+    Builds a strong ETag from a version value. create_response appends the
+    content-coding to it when the body is compressed.
+    """
+    return f'"{value}"'
+
+
+def parse_etags(header: Optional[str], strong: bool = False) -> Optional[List[str]]:
+    """
+    Parses an If-Match / If-None-Match header.
+    
+    Args:
+        header: Raw header value
+        strong: Drop the weak tags (W/"..."), as the strong comparison of
+            If-Match requires (RFC 7232 section 3.1)
+        
+    Returns:
+        List of entity tags without quotes and without the content-coding
+        suffix added by create_response, ["*"] for the wildcard, or None if
+        the header is absent
+    """
+    if header is None:
+        return None
+    
+    etags = []
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            if strong:
+                continue
+            tag = tag[2:]
+        tag = tag.strip('"')
+        value, _, encoding = tag.rpartition("-")
+        if value and encoding in COMPRESSION_CODECS:
+            tag = value
+        if tag:
+            etags.append(tag)
+    return etags
+
+
+def etag_matches(event: Dict[str, Any], etag: str) -> bool:
+    """
+    Checks whether the If-None-Match header of the request matches an ETag.
+    """
+    etags = parse_etags(get_header(event, "If-None-Match"))
+    if not etags:
+        return False
+    return "*" in etags or etag.strip('"') in etags
@@ -0,0 +1,228 @@
+"""
+In-process verification of Cognito id tokens, for deployments without API
+Gateway's Cognito authorizer (server mode, containers).
+
+The signing keys (JWKS) are loaded from JWKS_FILE or JWKS_URL (by default the
+user pool's well-known URL), kept in memory and refreshed every
+JWKS_REFRESH_SECONDS, or earlier when a token names an unknown key. Verified
+claims are cached by token hash until the token expires, so the steady-state
+cost of authenticating a request is one hash and one dictionary lookup.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import urllib.request
+from typing import Any, Callable, Dict, Optional
+
+from aws_lambda_powertools import Logger
+from jose import jwk, jwt
+from jose.exceptions import JOSEError
+
+from utils.cache import LRUCache
+
+logger = Logger(service="jwt-auth")
+
+REGION = os.environ.get("REGION", "us-east-1")
+USER_POOL_ID = os.environ.get("COGNITO_USER_POOL_ID", "")
+
+# Expected issuer and audience of the id tokens
+ISSUER = os.environ.get("JWT_ISSUER", f"https://cognito-idp.{REGION}.amazonaws.com/{USER_POOL_ID}")
+AUDIENCE = os.environ.get("JWT_AUDIENCE", os.environ.get("COGNITO_CLIENT_ID", ""))
+
+# Where the signing keys come from; JWKS_FILE takes precedence
+JWKS_URL = os.environ.get("JWKS_URL", f"{ISSUER}/.well-known/jwks.json")
+JWKS_FILE = os.environ.get("JWKS_FILE", "")
+
+# Periodic refresh, and the minimum time between refreshes triggered by unknown keys
+JWKS_REFRESH_SECONDS = float(os.environ.get("JWKS_REFRESH_SECONDS", "3600"))
+JWKS_MIN_REFRESH_SECONDS = float(os.environ.get("JWKS_MIN_REFRESH_SECONDS", "60"))
+JWKS_TIMEOUT_SECONDS = float(os.environ.get("JWKS_TIMEOUT_SECONDS", "3"))
+
+# Clock skew tolerated on exp/iat/nbf
+LEEWAY_SECONDS = int(os.environ.get("JWT_LEEWAY_SECONDS", "5"))
+
+# Cognito signs with RS256; anything else is rejected before looking at keys
+ALGORITHMS = ["RS256"]
+
+# Already verified claims, keyed by token hash until the token expires
+claims_cache = LRUCache(
+    "jwt_claims",
+    max_entries=int(os.environ.get("JWT_CLAIMS_CACHE_SIZE", "10000")),
+    max_bytes=int(os.environ.get("JWT_CLAIMS_CACHE_MAX_BYTES", str(16 * 1024 * 1024))),
+    ttl=float(os.environ.get("JWT_CLAIMS_CACHE_TTL_SECONDS", "3600"))
+)
+
+
+class InvalidToken(Exception):
+    """
+    Raised when a token cannot be verified.
+    """
+
+
+class JWKSCache:
+    """
+    Signing keys by key id, loaded from a URL or a local file and refreshed
+    periodically. Keys are parsed once, not on every verification.
+    """
+
+    def __init__(
+        self,
+        url: str = JWKS_URL,
+        path: str = JWKS_FILE,
+        refresh_seconds: float = JWKS_REFRESH_SECONDS,
+        min_refresh_seconds: float = JWKS_MIN_REFRESH_SECONDS,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.url = url
+        self.path = path
+        self.refresh_seconds = refresh_seconds
+        self.min_refresh_seconds = min_refresh_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._keys: Dict[str, Any] = {}
+        self._loaded_at: Optional[float] = None
+
+    def _fetch(self) -> Dict[str, Any]:
+        if self.path:
+            with open(self.path) as jwks_file:
+                return json.load(jwks_file)
+        with urllib.request.urlopen(self.url, timeout=JWKS_TIMEOUT_SECONDS) as response:
+            return json.loads(response.read())
+
+    def refresh(self) -> None:
+        """
+        Reloads the key set.
+        """
+        document = self._fetch()
+        keys = {}
+        for key in document.get("keys", []):
+            if key.get("kid") and key.get("kty") == "RSA":
+                keys[key["kid"]] = jwk.construct(key, algorithm=key.get("alg", "RS256"))
+        self._keys = keys
+        logger.debug("JWKS loaded", extra={"keys": list(keys)})
+
+    def _refresh_due(self, kid: str) -> bool:
+        if self._loaded_at is None:
+            return True
+        age = self._clock() - self._loaded_at
+        return age >= self.refresh_seconds or (kid not in self._keys and age >= self.min_refresh_seconds)
+
+    def get(self, kid: str) -> Optional[Any]:
+        """
+        Gets the key with the given id. The set is reloaded when it is due, or
+        when the key is unknown (key rotation) at most once per
+        min_refresh_seconds. If a reload fails the previous keys are kept.
+        """
+        if self._refresh_due(kid):
+            with self._lock:
+                # Another thread may have refreshed while we waited
+                if self._refresh_due(kid):
+                    try:
+                        self.refresh()
+                    except Exception:
+                        logger.exception("JWKS refresh failed")
+                    self._loaded_at = self._clock()
+        return self._keys.get(kid)
+
+
+class TokenVerifier:
+    """
+    Verifies Cognito id tokens against the JWKS and caches their claims.
+    """
+
+    def __init__(
+        self,
+        keys: Optional[JWKSCache] = None,
+        issuer: str = ISSUER,
+        audience: str = AUDIENCE,
+        cache: LRUCache = claims_cache
+    ):
+        self.keys = keys or JWKSCache()
+        self.issuer = issuer
+        self.audience = audience
+        self.cache = cache
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        """
+        Verifies the signature, issuer, audience and expiry of an id token.
+
+        Args:
+            token: Encoded JWT
+
+        Returns:
+            The token claims
+
+        Raises:
+            InvalidToken: If the token is not a valid id token of the user pool
+        """
+        token_hash = hashlib.sha256(token.encode("utf-8")).hexdigest()
+        claims = self.cache.get("", token_hash)
+        if claims is not None:
+            return claims
+
+        try:
+            header = jwt.get_unverified_header(token)
+        except JOSEError as e:
+            raise InvalidToken(str(e))
+        if header.get("alg") not in ALGORITHMS:
+            raise InvalidToken("Unsupported signing algorithm")
+
+        key = self.keys.get(header.get("kid", ""))
+        if key is None:
+            raise InvalidToken("Unknown signing key")
+
+        try:
+            claims = jwt.decode(
+                token,
+                key,
+                algorithms=ALGORITHMS,
+                audience=self.audience,
+                issuer=self.issuer,
+                options={"require_exp": True, "leeway": LEEWAY_SECONDS}
+            )
+        except JOSEError as e:
+            raise InvalidToken(str(e))
+        if claims.get("token_use", "id") != "id":
+            raise InvalidToken("Not an id token")
+
+        self.cache.set("", token_hash, claims, len(token), ttl=claims["exp"] - time.time())
+        return claims
+
+
+_verifier: Optional[TokenVerifier] = None
+_verifier_lock = threading.Lock()
+
+
+def get_verifier() -> TokenVerifier:
+    """
+    Gets the token verifier (Singleton pattern).
+    """
+    global _verifier
+    if _verifier is None:
+        with _verifier_lock:
+            if _verifier is None:
+                _verifier = TokenVerifier()
+    return _verifier
+
+
+def verify_authorization(authorization: Optional[str]) -> Optional[Dict[str, Any]]:
+    """
+    Verifies the token of an `Authorization: Bearer <token>` header.
+
+    Returns:
+        The token claims, or None when the header is missing or the token is invalid
+    """
+    if not authorization:
+        return None
+    scheme, _, token = authorization.strip().partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return get_verifier().verify(token.strip())
+    except InvalidToken as e:
+        logger.info("Rejected bearer token", extra={"reason": str(e)})
+    except Exception:
+        logger.exception("Error verifying bearer token")
+    return None
@@ -0,0 +1,217 @@
+"""
+Phase timings of each handler invocation, emitted as CloudWatch Embedded
+Metric Format (EMF) records.
+
+A handler decorated with `HandlerMetrics.measure` adds up, while it runs, the
+time spent in each phase marked with `phase` or `timed` (parse_body,
+validation, every MongoDB command, serialize_mongodb_doc, json_dumps,
+create_response...) and emits one record when it returns, with the total
+duration, the request and response sizes and the cold start flag. Phases can
+nest and concurrent MongoDB commands overlap, so they do not add up to the
+duration. Outside a measured handler, marking a phase costs one context
+variable lookup.
+"""
+import os
+import sys
+import json
+import time
+import threading
+import functools
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Callable, Deque, Dict, Optional
+
+# CloudWatch namespace of the metrics, as for Powertools' Metrics
+NAMESPACE = os.environ.get("POWERTOOLS_METRICS_NAMESPACE", "TaskManagement")
+
+# Where the records go: "stdout" (CloudWatch Logs extracts the metrics from the
+# function output), "memory" (kept in `memory_sink`, for tests and benchmarks)
+# or "off". Powertools' Metrics is not used because it keeps one metric set per
+# process, which mixes up concurrent requests in server mode.
+METRICS_SINK = os.environ.get("METRICS_SINK", "stdout")
+
+# Records kept by the "memory" sink, newest last
+MEMORY_SINK_SIZE = 1000
+memory_sink: Deque[Dict[str, Any]] = deque(maxlen=MEMORY_SINK_SIZE)
+
+# Phase recorder of the invocation being measured, set by HandlerMetrics.measure
+_recorder: ContextVar[Optional["PhaseRecorder"]] = ContextVar("phase_recorder", default=None)
+
+# Only the first invocation of a container is a cold start
+_cold_start = True
+
+
+class PhaseRecorder:
+    """
+    Adds up the time and calls of each phase of one invocation. Phases may be
+    recorded from other threads (MongoDB commands run on an executor).
+    """
+
+    __slots__ = ("durations", "calls", "_lock")
+
+    def __init__(self):
+        self.durations: Dict[str, float] = {}
+        self.calls: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.durations[name] = self.durations.get(name, 0.0) + seconds
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+
+class _Phase:
+    __slots__ = ("name", "_recorder", "_start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self) -> "_Phase":
+        self._recorder = _recorder.get()
+        if self._recorder is not None:
+            self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        if self._recorder is not None:
+            self._recorder.add(self.name, time.perf_counter() - self._start)
+
+
+def phase(name: str) -> _Phase:
+    """
+    Context manager that records the time of its block as the phase `name`
+    of the invocation being measured (if any).
+    """
+    return _Phase(name)
+
+
+def timed(name: str) -> Callable[[Callable], Callable]:
+    """
+    Records every call of the decorated function as the phase `name`.
+    """
+    def decorator(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            recorder = _recorder.get()
+            if recorder is None:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                recorder.add(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def record_phase(name: str, seconds: float) -> None:
+    """
+    Records a phase timed elsewhere (e.g. by pymongo's command monitoring).
+    """
+    recorder = _recorder.get()
+    if recorder is not None:
+        recorder.add(name, seconds)
+
+
+def body_size(message: Optional[Dict[str, Any]]) -> int:
+    """
+    Gets the size in bytes of the body of an event or response: the decoded
+    size of a base64 body and the UTF-8 size of a text body.
+    """
+    message = message or {}
+    body = message.get("body") or ""
+    if isinstance(body, (bytes, bytearray)):
+        return len(body)
+    if message.get("isBase64Encoded"):
+        # Every 4 characters encode 3 bytes, minus the padding
+        return len(body) // 4 * 3 - body[-2:].count("=")
+    return len(body) if body.isascii() else len(body.encode("utf-8"))
+
+
+def emit(record: Dict[str, Any]) -> None:
+    """
+    Sends a record to the configured sink.
+    """
+    if METRICS_SINK == "memory":
+        memory_sink.append(record)
+    elif METRICS_SINK == "stdout":
+        sys.stdout.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+
+class HandlerMetrics:
+    """
+    Measures the phases of the handlers of a service, with the service and
+    the handler name as dimensions.
+    """
+
+    def __init__(self, service: str, namespace: Optional[str] = None):
+        self.service = service
+        self.namespace = namespace or NAMESPACE
+
+    def measure(self, handler: Callable) -> Callable:
+        """
+        Decorator that measures every invocation of a handler and emits its
+        record. Apply it outside @negotiate_compression, so the response
+        size is the size of the body actually returned.
+        """
+        @functools.wraps(handler)
+        def wrapper(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+            global _cold_start
+            if METRICS_SINK == "off":
+                return handler(event, context)
+
+            recorder = PhaseRecorder()
+            token = _recorder.set(recorder)
+            cold_start, _cold_start = _cold_start, False
+            response = None
+            start = time.perf_counter()
+            try:
+                response = handler(event, context)
+                return response
+            finally:
+                duration = time.perf_counter() - start
+                _recorder.reset(token)
+                emit(self.record(handler.__name__, event, context, response, recorder, duration, cold_start))
+        return wrapper
+
+    def record(
+        self,
+        handler_name: str,
+        event: Dict[str, Any],
+        context: Any,
+        response: Optional[Dict[str, Any]],
+        recorder: PhaseRecorder,
+        duration: float,
+        cold_start: bool
+    ) -> Dict[str, Any]:
+        """
+        Builds the EMF record of an invocation.
+        """
+        values: Dict[str, Any] = {name: seconds * 1000 for name, seconds in recorder.durations.items()}
+        values["duration"] = duration * 1000
+        definitions = [{"Name": name, "Unit": "Milliseconds"} for name in values]
+
+        values["request_bytes"] = body_size(event)
+        values["response_bytes"] = body_size(response)
+        definitions += [{"Name": "request_bytes", "Unit": "Bytes"}, {"Name": "response_bytes", "Unit": "Bytes"}]
+        if cold_start:
+            values["ColdStart"] = 1
+            definitions.append({"Name": "ColdStart", "Unit": "Count"})
+
+        return {
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [{
+                    "Namespace": self.namespace,
+                    "Dimensions": [["service", "handler"]],
+                    "Metrics": definitions,
+                }],
+            },
+            "service": self.service,
+            "handler": handler_name,
+            **values,
+            "cold_start": cold_start,
+            "status_code": (response or {}).get("statusCode"),
+            "calls": dict(recorder.calls),
+            "request_id": getattr(context, "aws_request_id", None),
+        }
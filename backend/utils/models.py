@@ -1,14 +1,8 @@
-from pydantic import BaseModel, Field, EmailStr
-from typing import Optional, List
+from pydantic import BaseModel, Field, EmailStr, validator, root_validator
+from typing import Optional, List, Dict, Any
 from datetime import datetime
-from enum import Enum
 import uuid
-
-
-class TaskStatus(str, Enum):
-    TODO = "to_do"
-    IN_PROGRESS = "in_progress"
-    COMPLETED = "completed"
+from utils.enums import TaskStatus, BatchOperationType, TaskSort
 
 
 class TaskBase(BaseModel):
@@ -27,11 +21,52 @@ class TaskUpdate(BaseModel):
     status: Optional[TaskStatus] = None
 
 
+class TaskListQuery(BaseModel):
+    """
+    Filters and sort order of a task listing (GET /tasks query parameters).
+    
+    created_after/created_before only apply to the created_at sorts and
+    updated_since only to the updated_at sorts, so that every accepted
+    combination is served by one of the indexes in utils/db.py.
+    """
+    status: Optional[List[TaskStatus]] = None
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+    updated_since: Optional[datetime] = None
+    sort: TaskSort = TaskSort.CREATED_AT
+
+    class Config:
+        extra = "forbid"
+
+    @validator("status", pre=True)
+    def split_status(cls, value):
+        # ?status=to_do,in_progress
+        if isinstance(value, str):
+            return [status for status in value.split(",") if status]
+        return value
+
+    @root_validator(skip_on_failure=True)
+    def check_index_support(cls, values):
+        by_update = values["sort"] in (TaskSort.UPDATED_AT, TaskSort.UPDATED_AT_DESC)
+        if by_update and (values.get("created_after") or values.get("created_before")):
+            raise ValueError("created_after and created_before require sorting by created_at")
+        if not by_update and values.get("updated_since"):
+            raise ValueError("updated_since requires sort=updated_at or sort=-updated_at")
+        return values
+
+
+class BatchOperation(BaseModel):
+    op: BatchOperationType
+    id: Optional[str] = None
+    data: Dict[str, Any] = {}
+
+
 class Task(TaskBase):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     user_id: str
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: Optional[datetime] = None
+    version: int = 1
 
     class Config:
         json_encoders = {
@@ -46,7 +81,8 @@ class Task(TaskBase):
             "status": self.status,
             "user_id": self.user_id,
             "created_at": self.created_at.isoformat() if self.created_at else None,
-            "updated_at": self.updated_at.isoformat() if self.updated_at else None
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+            "version": self.version
         }
         
     @classmethod
@@ -62,4 +98,9 @@ class UserCreate(BaseModel):
 
 class UserLogin(BaseModel):
     email: EmailStr
-    password: str 
\ No newline at end of file
+    password: str 
+
+
+class TokenRefresh(BaseModel):
+    email: EmailStr
+    refresh_token: str
@@ -0,0 +1,447 @@
+import os
+import json
+import time
+import queue
+import random
+import hashlib
+import threading
+from collections import defaultdict
+from functools import partial
+from datetime import datetime, timezone
+from typing import Dict, Any, Callable, List, Optional, Tuple
+import bson
+from aws_lambda_powertools import Logger
+from pymongo import monitoring
+from pymongo.errors import PyMongoError
+from utils.metrics import record_phase
+
+logger = Logger(service="mongodb")
+
+# Commands slower than this are captured; 0 disables the capture
+SLOW_QUERY_MS = float(os.environ.get("MONGODB_SLOW_QUERY_MS", "100"))
+
+# Fraction of the slow commands that are captured
+SLOW_QUERY_SAMPLE_RATE = float(os.environ.get("MONGODB_SLOW_QUERY_SAMPLE_RATE", "1"))
+
+# A query shape is explained at most once per interval and process; the
+# samples in between reuse its last plan
+EXPLAIN_INTERVAL_SECONDS = float(os.environ.get("MONGODB_EXPLAIN_INTERVAL_SECONDS", "300"))
+
+# Collection the samples are written to, in the database of the command
+SLOW_QUERIES_COLLECTION = "slow_queries"
+
+# Samples waiting for the capture thread. When it is full new samples are
+# dropped, so a burst of slow commands never blocks the requests.
+CAPTURE_QUEUE_SIZE = 100
+
+# Commands whose plan can be explained
+EXPLAINABLE_COMMANDS = {"find", "aggregate", "count", "distinct", "findAndModify", "update", "delete"}
+
+# Fields of a sent command that explain does not accept
+SESSION_FIELDS = {
+    "lsid", "txnNumber", "startTransaction", "autocommit", "readConcern", "writeConcern",
+    "apiVersion", "apiStrict", "apiDeprecationErrors",
+}
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """
+    Keeps connection pool counters per server, fed by pymongo's CMAP events.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._servers: Dict[str, Dict[str, int]] = defaultdict(lambda: {
+            "open": 0,
+            "checked_out": 0,
+            "created": 0,
+            "closed": 0,
+            "checkouts": 0,
+            "checkout_failures": 0,
+            "pool_cleared": 0,
+        })
+
+    def _update(self, event: Any, **changes: int) -> None:
+        address = "%s:%s" % event.address
+        with self._lock:
+            counters = self._servers[address]
+            for name, delta in changes.items():
+                counters[name] += delta
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        Returns a snapshot of the counters per server address.
+        """
+        with self._lock:
+            return {address: dict(counters) for address, counters in self._servers.items()}
+
+    def pool_created(self, event):
+        self._update(event)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._update(event, pool_cleared=1)
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._update(event, open=1, created=1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._update(event, open=-1, closed=1)
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self._update(event, checkout_failures=1)
+
+    def connection_checked_out(self, event):
+        self._update(event, checked_out=1, checkouts=1)
+
+    def connection_checked_in(self, event):
+        self._update(event, checked_out=-1)
+
+
+class CommandTimingListener(monitoring.CommandListener):
+    """
+    Records the duration of every MongoDB command as a `mongo.<command>`
+    phase of the handler invocation being measured (utils/metrics.py).
+    """
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        record_phase(f"mongo.{event.command_name}", event.duration_micros / 1_000_000)
+
+    def failed(self, event):
+        record_phase(f"mongo.{event.command_name}", event.duration_micros / 1_000_000)
+
+
+def _collection_name(command_name: str, command: Dict[str, Any]) -> Optional[str]:
+    """
+    Returns the collection a command runs on, or None for database commands.
+    """
+    if command_name == "getMore":
+        return command.get("collection")
+    value = command.get(command_name)
+    return value if isinstance(value, str) else None
+
+
+def _reply_docs(reply: Dict[str, Any]) -> int:
+    """
+    Returns the number of documents a reply carries (cursor batches, or the
+    documents written or counted).
+    """
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        return len(cursor.get("firstBatch") or cursor.get("nextBatch") or ())
+    if "values" in reply:
+        return len(reply["values"])
+    if "value" in reply:
+        return 0 if reply["value"] is None else 1
+    n = reply.get("n")
+    return n if isinstance(n, int) else 0
+
+
+def shape_of(value: Any) -> Any:
+    """
+    Replaces the values of a filter or pipeline stage with "?", keeping the
+    field names and operators, so queries that differ only in their values
+    have the same shape. Sort specifications are kept as they are.
+    """
+    if isinstance(value, dict):
+        return {
+            key: dict(item) if key == "$sort" and isinstance(item, dict) else shape_of(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple)) and value and all(isinstance(item, dict) for item in value):
+        return [shape_of(item) for item in value]
+    return "?"
+
+
+def query_shape(command_name: str, command: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Builds the shape of an explainable command: its collection, filter,
+    sort, hint or pipeline, without the values.
+    """
+    shape: Dict[str, Any] = {"collection": _collection_name(command_name, command), "command": command_name}
+    if command_name in ("update", "delete"):
+        statements = command.get("updates" if command_name == "update" else "deletes") or [{}]
+        shape["filter"] = shape_of(statements[0].get("q", {}))
+    elif command_name == "aggregate":
+        shape["pipeline"] = shape_of(command.get("pipeline", []))
+    else:
+        shape["filter"] = shape_of(command.get("filter", command.get("query", {})))
+    if "key" in command:
+        shape["key"] = command["key"]
+    for option in ("sort", "hint"):
+        if command.get(option):
+            shape[option] = command[option] if isinstance(command[option], str) else dict(command[option])
+    return shape
+
+
+def shape_id(shape: Dict[str, Any]) -> str:
+    """
+    Returns a short stable identifier of a query shape.
+    """
+    encoded = json.dumps(shape, separators=(",", ":"), default=str).encode()
+    return hashlib.sha1(encoded).hexdigest()[:16]
+
+
+def explain_command(command: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Returns a copy of a sent command that can be wrapped in explain: without
+    the fields added by the driver ($db, $clusterTime...) and the session and
+    concern fields.
+    """
+    return {
+        key: value for key, value in command.items()
+        if not key.startswith("$") and key not in SESSION_FIELDS
+    }
+
+
+def _plan_nodes(node: Any, stages: List[str], indexes: List[str]) -> None:
+    if isinstance(node, dict):
+        if isinstance(node.get("stage"), str):
+            stages.append(node["stage"])
+        if isinstance(node.get("indexName"), str):
+            indexes.append(node["indexName"])
+        for value in node.values():
+            _plan_nodes(value, stages, indexes)
+    elif isinstance(node, list):
+        for value in node:
+            _plan_nodes(value, stages, indexes)
+
+
+def _winning_plans(node: Any) -> List[Any]:
+    if isinstance(node, dict):
+        if "winningPlan" in node:
+            return [node["winningPlan"]]
+        return [plan for value in node.values() for plan in _winning_plans(value)]
+    if isinstance(node, list):
+        return [plan for value in node for plan in _winning_plans(value)]
+    return []
+
+
+def summarize_plan(explain: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Summarizes the winning plan of an explain result (find, aggregate,
+    sharded or not): its stages, the indexes it uses, whether it scans the
+    whole collection (COLLSCAN) and whether it sorts in memory (a SORT
+    stage, or a $sort the pipeline could not push down to an index).
+    """
+    stages: List[str] = []
+    indexes: List[str] = []
+    for plan in _winning_plans(explain):
+        _plan_nodes(plan, stages, indexes)
+    pipeline_sort = any("$sort" in stage for stage in explain.get("stages", []) if isinstance(stage, dict))
+    return {
+        "stages": stages,
+        "indexes": sorted(set(indexes)),
+        "collscan": "COLLSCAN" in stages,
+        "in_memory_sort": "SORT" in stages or pipeline_sort,
+    }
+
+
+class SlowQueryListener(monitoring.CommandListener):
+    """
+    Keeps the count, duration, documents and slow count of the MongoDB
+    commands per collection and command, and captures the slow ones. The
+    reply bytes are only measured, and added up, for the sampled commands.
+    
+    A sample of the commands slower than `threshold_ms` is handed to a
+    background thread, which explains its plan (once per query shape and
+    `explain_interval`), logs it and writes the sample, with the shape and
+    the plan but not the queried values, to the `slow_queries` collection
+    that `python manage.py slow-queries` reports on. The listener ignores
+    the commands of the capture itself.
+    
+    Args:
+        client_factory: Returns the client that runs the explains and writes
+        threshold_ms: Slowest duration that is not captured; 0 disables the capture
+        sample_rate: Fraction of the slow commands that are captured
+        explain_interval: Seconds between two explains of the same shape
+        background: Capture in a background thread (False runs it inline)
+    """
+
+    def __init__(
+        self,
+        client_factory: Callable[[], Any],
+        threshold_ms: float = SLOW_QUERY_MS,
+        sample_rate: float = SLOW_QUERY_SAMPLE_RATE,
+        explain_interval: float = EXPLAIN_INTERVAL_SECONDS,
+        collection: str = SLOW_QUERIES_COLLECTION,
+        background: bool = True
+    ):
+        self.client_factory = client_factory
+        self.threshold_ms = threshold_ms
+        self.sample_rate = sample_rate
+        self.explain_interval = explain_interval
+        self.collection = collection
+        self.background = background
+        self._lock = threading.Lock()
+        self._started: Dict[Tuple[Any, int], Tuple[Optional[str], Dict[str, Any]]] = {}
+        self._commands: Dict[str, Dict[str, float]] = defaultdict(lambda: {
+            "count": 0,
+            "failed": 0,
+            "total_ms": 0.0,
+            "max_ms": 0.0,
+            "docs": 0,
+            "bytes": 0,
+            "slow": 0,
+        })
+        self._explained: Dict[str, float] = {}
+        self._plans: Dict[str, Dict[str, Any]] = {}
+        self._dropped = 0
+        self._queue: "queue.Queue[Callable[[], None]]" = queue.Queue(CAPTURE_QUEUE_SIZE)
+        self._worker: Optional[threading.Thread] = None
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns a snapshot of the counters per `<collection>.<command>`, and
+        the number of samples dropped because the capture queue was full.
+        """
+        with self._lock:
+            commands = {
+                name: {**counters, "total_ms": round(counters["total_ms"], 3), "max_ms": round(counters["max_ms"], 3)}
+                for name, counters in self._commands.items()
+            }
+            return {"commands": commands, "dropped_samples": self._dropped}
+
+    def flush(self) -> None:
+        """
+        Waits until the captured samples have been written.
+        """
+        self._queue.join()
+
+    def started(self, event):
+        if event.command_name == "explain":
+            return
+        collection = _collection_name(event.command_name, event.command)
+        if collection == self.collection:
+            return
+        with self._lock:
+            self._started[(event.connection_id, event.request_id)] = (collection, event.command)
+
+    def succeeded(self, event):
+        self._finish(event, event.reply)
+
+    def failed(self, event):
+        self._finish(event, None)
+
+    def _finish(self, event: Any, reply: Optional[Dict[str, Any]]) -> None:
+        with self._lock:
+            started = self._started.pop((event.connection_id, event.request_id), None)
+        if started is None:
+            return
+        collection, command = started
+        duration_ms = event.duration_micros / 1000
+        docs = _reply_docs(reply) if reply is not None else 0
+        slow = 0 < self.threshold_ms < duration_ms
+        # Encoding the reply again is only paid for the commands that are sampled
+        sampled = slow and random.random() < self.sample_rate
+        size = len(bson.encode(reply)) if sampled and reply else 0
+        
+        name = f"{collection}.{event.command_name}" if collection else event.command_name
+        with self._lock:
+            counters = self._commands[name]
+            counters["count"] += 1
+            counters["failed"] += reply is None
+            counters["total_ms"] += duration_ms
+            counters["max_ms"] = max(counters["max_ms"], duration_ms)
+            counters["docs"] += docs
+            counters["bytes"] += size
+            counters["slow"] += slow
+        
+        if sampled:
+            self._sample(event, collection, command, duration_ms, docs, size, failed=reply is None)
+
+    def _sample(
+        self,
+        event: Any,
+        collection: Optional[str],
+        command: Dict[str, Any],
+        duration_ms: float,
+        docs: int,
+        size: int,
+        failed: bool
+    ) -> None:
+        explainable = event.command_name in EXPLAINABLE_COMMANDS and collection is not None
+        shape = query_shape(event.command_name, command) if explainable else \
+            {"collection": collection, "command": event.command_name}
+        sample = {
+            "shape_id": shape_id(shape),
+            "shape": json.dumps(shape, default=str),
+            "collection": collection,
+            "command": event.command_name,
+            "duration_ms": round(duration_ms, 3),
+            "docs": docs,
+            "bytes": size,
+            "failed": failed,
+        }
+        
+        explain = False
+        if explainable:
+            now = time.monotonic()
+            with self._lock:
+                last = self._explained.get(sample["shape_id"])
+                if last is None or now - last >= self.explain_interval:
+                    self._explained[sample["shape_id"]] = now
+                    explain = True
+        
+        job = partial(self._capture, event.database_name, command, sample, explain)
+        if not self.background:
+            job()
+            return
+        self._start_worker()
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                self._dropped += 1
+
+    def _start_worker(self) -> None:
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._work, name="slow-query-capture", daemon=True)
+                    self._worker.start()
+
+    def _work(self) -> None:
+        while True:
+            job = self._queue.get()
+            try:
+                job()
+            except Exception:
+                logger.exception("Slow MongoDB command capture failed")
+            finally:
+                self._queue.task_done()
+
+    def _capture(self, database_name: str, command: Dict[str, Any], sample: Dict[str, Any], explain: bool) -> None:
+        """
+        Explains the plan of a sampled command if its shape is due, logs it
+        and writes the sample.
+        """
+        database = self.client_factory()[database_name]
+        if explain:
+            try:
+                result = database.command("explain", explain_command(command), verbosity="queryPlanner")
+                plan = summarize_plan(result)
+            except PyMongoError as e:
+                plan = {"error": str(e)}
+            with self._lock:
+                self._plans[sample["shape_id"]] = plan
+            
+            logger.warning("Slow MongoDB command", extra={**sample, "plan": plan})
+        
+        with self._lock:
+            plan = self._plans.get(sample["shape_id"])
+        database[self.collection].insert_one({**sample, "plan": plan, "recorded_at": datetime.now(timezone.utc)})
@@ -0,0 +1,142 @@
+import base64
+import json
+from datetime import datetime
+from typing import Dict, Any, Optional, Tuple
+
+# Page size used when the client does not send a limit
+DEFAULT_PAGE_SIZE = 50
+
+
+def parse_limit(value: Optional[str], max_page_size: int, default: int = DEFAULT_PAGE_SIZE) -> int:
+    """
+    Parses the requested page size and caps it at the server-side maximum.
+
+    Args:
+        value: Raw `limit` query string parameter
+        max_page_size: Largest page the server will return
+        default: Page size used when no limit is given
+
+    Returns:
+        Page size to use
+
+    Raises:
+        ValueError: If the limit is not a positive integer
+    """
+    if value is None or value == "":
+        return min(default, max_page_size)
+
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("limit must be a positive integer")
+
+    if limit < 1:
+        raise ValueError("limit must be a positive integer")
+
+    return min(limit, max_page_size)
+
+
+def encode_cursor(doc: Dict[str, Any], field: str = "created_at") -> str:
+    """
+    Builds an opaque cursor pointing just after the given document.
+    The cursor captures the (field, id) sort key of the document.
+    """
+    value = doc.get(field)
+    payload = {"i": doc.get("id")}
+    if field != "created_at":
+        payload["f"] = field
+    if isinstance(value, datetime):
+        payload["d"] = value.isoformat()
+    else:
+        payload["c"] = value
+
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, field: str = "created_at") -> Tuple[Any, str]:
+    """
+    Decodes a cursor produced by `encode_cursor` for the same sort field.
+
+    Returns:
+        Tuple with the sort field value and the id of the last document of the previous page
+
+    Raises:
+        ValueError: If the cursor is malformed or belongs to another sort field
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        task_id = payload["i"]
+        if "d" in payload:
+            value = datetime.fromisoformat(payload["d"])
+        else:
+            value = payload["c"]
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid cursor")
+
+    if not isinstance(task_id, str) or payload.get("f", "created_at") != field:
+        raise ValueError("Invalid cursor")
+
+    return value, task_id
+
+
+def keyset_filter(cursor: Optional[str], field: str = "created_at", descending: bool = False) -> Dict[str, Any]:
+    """
+    Translates a cursor into the query condition that selects the next page
+    for a (field, id) sort in the given direction.
+
+    Null (or missing) values sort before any other value, so they need their
+    own branches: after a null, an ascending sort continues with every
+    non-null value, and a descending sort with the remaining nulls only.
+    """
+    if not cursor:
+        return {}
+
+    value, task_id = decode_cursor(cursor, field)
+    after = "$lt" if descending else "$gt"
+    if value is None:
+        branches = [{field: None, "id": {after: task_id}}]
+        if not descending:
+            branches.append({field: {"$ne": None}})
+        return {"$or": branches}
+
+    branches = [
+        {field: {after: value}},
+        {field: value, "id": {after: task_id}}
+    ]
+    if descending:
+        branches.append({field: None})
+    return {"$or": branches}
+
+
+def encode_sync_token(sequence: int, issued_at: float) -> str:
+    """
+    Builds the opaque delta sync token: the position in the user's change
+    sequence and the time it was issued at.
+    """
+    raw = json.dumps({"s": sequence, "t": int(issued_at)}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_sync_token(token: str) -> Tuple[int, int]:
+    """
+    Decodes a token produced by `encode_sync_token`.
+
+    Returns:
+        Tuple with the sequence position and the issue time (Unix seconds)
+
+    Raises:
+        ValueError: If the token is malformed
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        sequence, issued_at = payload["s"], payload["t"]
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid sync token")
+
+    if not isinstance(sequence, int) or not isinstance(issued_at, int) or sequence < 0:
+        raise ValueError("Invalid sync token")
+
+    return sequence, issued_at
@@ -0,0 +1,102 @@
+import sys
+import json
+from datetime import datetime, date
+from enum import Enum
+from typing import Any, Collection, Dict, Iterable, Optional, Tuple
+from utils.metrics import timed
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    """
+    Encodes the MongoDB and Python types the JSON codecs do not support natively.
+    """
+    # bson is only loaded by handlers that talk to MongoDB; if it was never
+    # imported, the value cannot be an ObjectId
+    bson = sys.modules.get("bson")
+    if bson is not None and isinstance(value, bson.ObjectId):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    def dumps_bytes(value: Any) -> bytes:
+        """
+        Encodes a value as compact JSON bytes (orjson).
+        """
+        return orjson.dumps(value, default=_default)
+else:
+    _encoder = json.JSONEncoder(default=_default, separators=(",", ":"), ensure_ascii=False)
+
+    def dumps_bytes(value: Any) -> bytes:
+        """
+        Encodes a value as compact JSON bytes (standard library).
+        """
+        return _encoder.encode(value).encode("utf-8")
+
+
+def dumps(value: Any) -> str:
+    """
+    Encodes a value as a JSON string with the fastest available codec.
+    """
+    return dumps_bytes(value).decode("utf-8")
+
+
+@timed("encode_page")
+def encode_page(
+    documents: Iterable[Dict[str, Any]],
+    limit: int,
+    omit: Collection[str] = ()
+) -> Tuple[bytearray, Optional[Dict[str, Any]], bool]:
+    """
+    Encodes up to `limit` documents straight from a cursor into a
+    {"items": [...] JSON buffer, without building intermediate lists.
+
+    Args:
+        documents: MongoDB cursor (or any iterable of documents)
+        limit: Maximum number of documents to encode
+        omit: Fields read only for the cursor, left out of the output
+
+    Returns:
+        Tuple with the JSON buffer (still open, see `close_page`), the last
+        encoded document and whether the iterable had more documents
+    """
+    buffer = bytearray(b'{"items":[')
+    last = None
+    count = 0
+    has_more = False
+
+    for document in documents:
+        if count == limit:
+            has_more = True
+            break
+        if count:
+            buffer += b","
+        if omit:
+            buffer += dumps_bytes({key: value for key, value in document.items() if key not in omit})
+        else:
+            buffer += dumps_bytes(document)
+        last = document
+        count += 1
+
+    buffer += b"]"
+    return buffer, last, has_more
+
+
+def close_page(buffer: bytearray, fields: Optional[Dict[str, Any]] = None) -> bytearray:
+    """
+    Appends the remaining top level fields to a buffer from `encode_page`
+    and closes the JSON object.
+    """
+    for key, value in (fields or {}).items():
+        buffer += b"," + dumps_bytes(key) + b":" + dumps_bytes(value)
+    buffer += b"}"
+    return buffer
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { 
   Container, 
   Typography, 
@@ -14,7 +14,8 @@ import AddIcon from '@mui/icons-material/Add';
 import TaskCard from '../components/TaskCard';
 import TaskForm from '../components/TaskForm';
 import { Task } from '../types/task';
-import { getTasks } from '../services/taskService';
+import { syncTasks } from '../services/taskService';
+import { subscribeToTaskEvents } from '../services/taskEvents';
 
 const Dashboard: React.FC = () => {
   const [tasks, setTasks] = useState<Task[]>([]);
@@ -22,14 +23,19 @@ const Dashboard: React.FC = () => {
   const [error, setError] = useState<string>('');
   const [refreshTrigger, setRefreshTrigger] = useState<number>(0);
   const [openTaskForm, setOpenTaskForm] = useState<boolean>(false);
+  // Delta sync position: after the first load only the changes are fetched
+  const syncToken = useRef<string | null>(null);
+  const tasksRef = useRef<Task[]>([]);
   const theme = useTheme();
 
   useEffect(() => {
     const fetchTasks = async () => {
       try {
-        setLoading(true);
-        const taskData = await getTasks();
-        setTasks(taskData);
+        setLoading(syncToken.current === null);
+        const synced = await syncTasks(tasksRef.current, syncToken.current);
+        syncToken.current = synced.token;
+        tasksRef.current = synced.tasks;
+        setTasks(synced.tasks);
         setError('');
       } catch (error) {
         console.error('Error fetching tasks:', error);
@@ -42,6 +48,9 @@ const Dashboard: React.FC = () => {
     fetchTasks();
   }, [refreshTrigger]);
 
+  // Changes made elsewhere (other tabs, devices) trigger a delta sync
+  useEffect(() => subscribeToTaskEvents(() => setRefreshTrigger(prev => prev + 1)), []);
+
   const handleTaskCreated = () => {
     // Trigger a refresh of the task list
     setRefreshTrigger(prev => prev + 1);
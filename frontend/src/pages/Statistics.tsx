@@ -32,8 +32,8 @@ import PlaylistAddCheckIcon from '@mui/icons-material/PlaylistAddCheck';
 import HourglassEmptyIcon from '@mui/icons-material/HourglassEmpty';
 import CheckCircleIcon from '@mui/icons-material/CheckCircle';
 import TrendingUpIcon from '@mui/icons-material/TrendingUp';
-import { getTasks } from '../services/taskService';
-import { Task, TaskStatus } from '../types/task';
+import { getTaskStats } from '../services/taskService';
+import { TaskStats, TaskStatus } from '../types/task';
 
 interface StatusCount {
   name: string;
@@ -43,7 +43,7 @@ interface StatusCount {
 }
 
 const Statistics: React.FC = () => {
-  const [tasks, setTasks] = useState<Task[]>([]);
+  const [stats, setStats] = useState<TaskStats | null>(null);
   const [loading, setLoading] = useState<boolean>(true);
   const [error, setError] = useState<string>('');
   const theme = useTheme();
@@ -56,37 +56,29 @@ const Statistics: React.FC = () => {
   }), [theme.palette.info.main, theme.palette.warning.main, theme.palette.success.main]);
 
   useEffect(() => {
-    const fetchTasks = async () => {
+    const fetchStats = async () => {
       try {
         setLoading(true);
-        const taskData = await getTasks();
-        setTasks(taskData);
+        const statsData = await getTaskStats();
+        setStats(statsData);
         setError('');
       } catch (error) {
-        console.error('Error fetching tasks:', error);
+        console.error('Error fetching task statistics:', error);
         setError('Failed to load tasks. Please try again later.');
       } finally {
         setLoading(false);
       }
     };
 
-    fetchTasks();
+    fetchStats();
   }, []);
 
   // Use useMemo to calculate statusData instead of using a state and useEffect
   const statusData = useMemo<StatusCount[]>(() => {
-    if (tasks.length === 0) return [];
+    if (!stats || stats.total === 0) return [];
     
-    // Count tasks by status
-    const statusCounts: Record<TaskStatus, number> = {
-      [TaskStatus.TODO]: 0,
-      [TaskStatus.IN_PROGRESS]: 0,
-      [TaskStatus.COMPLETED]: 0,
-    };
-
-    tasks.forEach(task => {
-      statusCounts[task.status] = (statusCounts[task.status] || 0) + 1;
-    });
+    // Task counts by status, computed by the server
+    const statusCounts = stats.by_status;
 
     // Format data for the charts
     return [
@@ -109,14 +101,14 @@ const Statistics: React.FC = () => {
         icon: <CheckCircleIcon />
       }
     ];
-  }, [tasks, statusColors]);
+  }, [stats, statusColors]);
 
   // Use useMemo for completion rate calculation
   const completionRate = useMemo(() => {
-    if (tasks.length === 0) return 0;
-    const completedTasks = tasks.filter(task => task.status === TaskStatus.COMPLETED).length;
-    return Math.round((completedTasks / tasks.length) * 100);
-  }, [tasks]);
+    if (!stats || stats.total === 0) return 0;
+    const completedTasks = stats.by_status[TaskStatus.COMPLETED];
+    return Math.round((completedTasks / stats.total) * 100);
+  }, [stats]);
 
   // Memoize the getProgressColor function
   const getProgressColor = useMemo(() => {
@@ -180,7 +172,7 @@ const Statistics: React.FC = () => {
         <Box display="flex" justifyContent="center" mt={4}>
           <CircularProgress />
         </Box>
-      ) : tasks.length === 0 ? (
+      ) : !stats || stats.total === 0 ? (
         <Alert severity="info" sx={{ borderRadius: 2 }}>
           You don't have any tasks yet. Create some tasks to see statistics!
         </Alert>
@@ -191,7 +183,7 @@ const Statistics: React.FC = () => {
             <Grid item xs={12} md={6} lg={3}>
               {renderStatCard(
                 'Total Tasks', 
-                tasks.length, 
+                stats.total, 
                 <AssignmentIcon />, 
                 theme.palette.primary.main
               )}
@@ -25,4 +25,52 @@ api.interceptors.request.use(
   }
 );
 
+// Renewal in progress, shared by all the requests that failed with 401
+let refreshPromise: Promise<string | null> | null = null;
+
+// Exchange the stored refresh token for new tokens (POST /auth/refresh)
+const refreshIdToken = async (): Promise<string | null> => {
+  const refreshToken = localStorage.getItem('refresh_token');
+  const user = localStorage.getItem('user');
+  const email = user ? JSON.parse(user).email : null;
+  if (!refreshToken || !email) return null;
+
+  try {
+    const response = await axios.post(`${API_BASE_URL}/auth/refresh`, {
+      email,
+      refresh_token: refreshToken,
+    });
+    localStorage.setItem('id_token', response.data.id_token);
+    localStorage.setItem('access_token', response.data.access_token);
+    localStorage.setItem('refresh_token', response.data.refresh_token);
+    return response.data.id_token;
+  } catch (error) {
+    return null;
+  }
+};
+
+// Retry a request once with renewed tokens when the id token has expired
+api.interceptors.response.use(
+  (response) => response,
+  async (error) => {
+    const original = error.config;
+    if (error.response?.status !== 401 || !original || original._retried) {
+      return Promise.reject(error);
+    }
+
+    refreshPromise = refreshPromise || refreshIdToken().finally(() => {
+      refreshPromise = null;
+    });
+    const token = await refreshPromise;
+    if (!token) {
+      return Promise.reject(error);
+    }
+
+    original._retried = true;
+    original.headers.Authorization = `Bearer ${token}`;
+    return api(original);
+  }
+);
+
+export { API_BASE_URL };
 export default api; 
\ No newline at end of file
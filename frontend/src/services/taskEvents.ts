@@ -0,0 +1,53 @@
+import { API_BASE_URL } from './api';
+
+// Server mode streams task change notifications (GET /tasks/events, server-sent
+// events). A notification only says that something changed; the caller syncs
+// with GET /tasks/changes. Deployments without the stream (API Gateway) answer
+// with an error and the subscription stops. Returns the unsubscribe function.
+export const subscribeToTaskEvents = (onChange: () => void): (() => void) => {
+  const controller = new AbortController();
+  let lastEventId: string | null = null;
+
+  const connect = async (): Promise<void> => {
+    while (!controller.signal.aborted) {
+      try {
+        // fetch instead of EventSource, which cannot send the Authorization header
+        const headers: Record<string, string> = { Accept: 'text/event-stream' };
+        const token = localStorage.getItem('id_token');
+        if (token) headers.Authorization = `Bearer ${token}`;
+        if (lastEventId) headers['Last-Event-ID'] = lastEventId;
+
+        const response = await fetch(`${API_BASE_URL}/tasks/events`, { headers, signal: controller.signal });
+        if (!response.ok || !response.body) return;
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        for (;;) {
+          const { value, done } = await reader.read();
+          if (done) break;
+          buffer += decoder.decode(value, { stream: true });
+          let end = buffer.indexOf('\n\n');
+          while (end >= 0) {
+            let event = 'message';
+            buffer.slice(0, end).split('\n').forEach((line) => {
+              if (line.startsWith('id: ')) lastEventId = line.slice(4);
+              else if (line.startsWith('event: ')) event = line.slice(7);
+            });
+            if (event === 'task' || event === 'resync') onChange();
+            buffer = buffer.slice(end + 2);
+            end = buffer.indexOf('\n\n');
+          }
+        }
+      } catch (error) {
+        if (controller.signal.aborted) return;
+        console.error('Task events stream failed:', error);
+      }
+      // Reconnect; the server replays what was missed after lastEventId
+      await new Promise((resolve) => setTimeout(resolve, 3000));
+    }
+  };
+
+  connect();
+  return () => controller.abort();
+};
@@ -1,9 +1,18 @@
 import api from './api';
-import { Task, TaskCreate, TaskUpdate } from '../types/task';
+import { Task, TaskCreate, TaskUpdate, TaskPage, TaskStats, TaskQuery, TaskChanges } from '../types/task';
 
-export const getTasks = async (): Promise<Task[]> => {
+export const getTasksPage = async (cursor?: string | null, limit?: number, query: TaskQuery = {}): Promise<TaskPage> => {
   try {
-    const response = await api.get('/tasks');
+    const params: Record<string, string | number> = {};
+    if (query.status && query.status.length) params.status = query.status.join(',');
+    if (query.created_after) params.created_after = query.created_after;
+    if (query.created_before) params.created_before = query.created_before;
+    if (query.updated_since) params.updated_since = query.updated_since;
+    if (query.sort) params.sort = query.sort;
+    if (query.fields && query.fields.length) params.fields = query.fields.join(',');
+    if (cursor) params.cursor = cursor;
+    if (limit) params.limit = limit;
+    const response = await api.get('/tasks', { params });
     return response.data;
   } catch (error) {
     console.error('Error fetching tasks:', error);
@@ -11,6 +20,74 @@ export const getTasks = async (): Promise<Task[]> => {
   }
 };
 
+export const getTasks = async (query: TaskQuery = {}): Promise<Task[]> => {
+  const tasks: Task[] = [];
+  let cursor: string | null = null;
+  do {
+    const page: TaskPage = await getTasksPage(cursor, undefined, query);
+    tasks.push(...page.items);
+    cursor = page.next_cursor;
+  } while (cursor);
+  return tasks;
+};
+
+// Tasks matching `q` in the title or description, most relevant first
+export const searchTasks = async (q: string, cursor?: string | null, limit?: number): Promise<TaskPage> => {
+  try {
+    const params: Record<string, string | number> = { q };
+    if (cursor) params.cursor = cursor;
+    if (limit) params.limit = limit;
+    const response = await api.get('/tasks/search', { params });
+    return response.data;
+  } catch (error) {
+    console.error('Error searching tasks:', error);
+    throw error;
+  }
+};
+
+export const getTaskChanges = async (since?: string | null): Promise<TaskChanges> => {
+  const response = await api.get('/tasks/changes', { params: since ? { since } : {} });
+  return response.data;
+};
+
+// Applies the changes since `token` to `tasks` (everything when there is no
+// token). Returns the updated list, oldest first, and the token for the next sync.
+export const syncTasks = async (tasks: Task[], token?: string | null): Promise<{ tasks: Task[]; token: string }> => {
+  const byId = new Map(token ? tasks.map((task): [string, Task] => [task.id, task]) : []);
+  let since = token;
+  try {
+    let changes: TaskChanges;
+    do {
+      try {
+        changes = await getTaskChanges(since);
+      } catch (error: any) {
+        // The token outlived the tombstones: start over
+        if (error.response?.status !== 410 || !since) throw error;
+        byId.clear();
+        changes = await getTaskChanges(null);
+      }
+      changes.changed.forEach((task) => byId.set(task.id, task));
+      changes.deleted.forEach((taskId) => byId.delete(taskId));
+      since = changes.next_token;
+    } while (changes.has_more);
+  } catch (error) {
+    console.error('Error syncing tasks:', error);
+    throw error;
+  }
+  const synced = Array.from(byId.values()).sort((a, b) => a.created_at.localeCompare(b.created_at));
+  return { tasks: synced, token: since as string };
+};
+
+export const getTaskStats = async (): Promise<TaskStats> => {
+  try {
+    const response = await api.get('/tasks/stats');
+    return response.data;
+  } catch (error) {
+    console.error('Error fetching task statistics:', error);
+    throw error;
+  }
+};
+
 export const getTask = async (taskId: string): Promise<Task> => {
   try {
     const response = await api.get(`/tasks/${taskId}`);
@@ -31,9 +108,12 @@ export const createTask = async (taskData: TaskCreate): Promise<Task> => {
   }
 };
 
-export const updateTask = async (taskId: string, taskData: TaskUpdate): Promise<Task> => {
+// Pass the version the task was read at to reject concurrent edits (HTTP 412)
+const ifMatch = (version?: number) => (version !== undefined ? { headers: { 'If-Match': `"${version}"` } } : undefined);
+
+export const updateTask = async (taskId: string, taskData: TaskUpdate, version?: number): Promise<Task> => {
   try {
-    const response = await api.put(`/tasks/${taskId}`, taskData);
+    const response = await api.put(`/tasks/${taskId}`, taskData, ifMatch(version));
     return response.data;
   } catch (error) {
     console.error(`Error updating task ${taskId}:`, error);
@@ -41,9 +121,9 @@ export const updateTask = async (taskId: string, taskData: TaskUpdate): Promise<
   }
 };
 
-export const deleteTask = async (taskId: string): Promise<{ message: string }> => {
+export const deleteTask = async (taskId: string, version?: number): Promise<{ message: string }> => {
   try {
-    const response = await api.delete(`/tasks/${taskId}`);
+    const response = await api.delete(`/tasks/${taskId}`, ifMatch(version));
     return response.data;
   } catch (error) {
     console.error(`Error deleting task ${taskId}:`, error);
@@ -12,6 +12,38 @@ export interface Task {
   user_id: string;
   created_at: string;
   updated_at: string | null;
+  version?: number;
+  // Relevance, only in search results
+  score?: number;
+}
+
+export interface TaskPage {
+  items: Task[];
+  next_cursor: string | null;
+}
+
+// Response of GET /tasks/changes
+export interface TaskChanges {
+  changed: Task[];
+  deleted: string[];
+  next_token: string;
+  has_more: boolean;
+}
+
+// Server-side filters and sort order of GET /tasks
+export interface TaskQuery {
+  status?: TaskStatus[];
+  created_after?: string;
+  created_before?: string;
+  updated_since?: string;
+  sort?: 'created_at' | '-created_at' | 'updated_at' | '-updated_at';
+  // Only these fields are returned (id is always included)
+  fields?: (keyof Task)[];
+}
+
+export interface TaskStats {
+  total: number;
+  by_status: Record<TaskStatus, number>;
 }
 
 export interface TaskCreate {